@@ -9,6 +9,7 @@ from DIRAC.Core.Base.DB import DB
 from DIRAC import S_OK, S_ERROR, gMonitor, gConfig
 from DIRAC.Core.Utilities import List, ThreadSafe, Time, DEncode
 from DIRAC.AccountingSystem.private.ObjectLoader import loadObjects
+from DIRAC.AccountingSystem.private import BucketSplitter
 from DIRAC.AccountingSystem.Client.Types.BaseAccountingType import BaseAccountingType
 from DIRAC.Core.Utilities.ThreadPool import ThreadPool
 
@@ -24,6 +25,10 @@ class AccountingDB( DB ):
     self.__doingCompaction = False
     self.__doingPendingLockTime = 0
     self.__deadLockRetries = 2
+    #Rows per multi-row INSERT when writing bundles of records
+    self.__insertChunkSize = 1000
+    #Buckets of the next granularity compacted per transaction
+    self.__compactionWindowBuckets = 100
     self.__queuedRecordsLock = ThreadSafe.Synchronizer()
     self.__queuedRecordsToInsert = []
     self.dbCatalog = {}
@@ -42,6 +47,29 @@ class AccountingDB( DB ):
                                            }
                         }
                       )
+    #Progress of the buckets regenerations, to resume them if interrupted
+    self.regenerationTableName = _getTableName( "catalog", "Regenerations" )
+    self._createTables( { self.regenerationTableName : { 'Fields' : { 'name' : "VARCHAR(64) UNIQUE NOT NULL",
+                                                                      'nowEpoch' : "INT UNSIGNED NOT NULL",
+                                                                      'lastTime' : "INT UNSIGNED NOT NULL",
+                                                                    },
+                                                         'PrimaryKey' : 'name'
+                                                       }
+                        }
+                      )
+    #Log of the bucket changes, for the caches of bucketed data in other processes
+    self.bucketsChangesTableName = _getTableName( "catalog", "BucketsChanges" )
+    self._createTables( { self.bucketsChangesTableName : { 'Fields' : { 'id' : "INTEGER NOT NULL AUTO_INCREMENT",
+                                                                        'name' : "VARCHAR(64) NOT NULL",
+                                                                        'startTime' : "INT UNSIGNED NOT NULL",
+                                                                        'changeTime' : "INT UNSIGNED NOT NULL",
+                                                                      },
+                                                           'Indexes' : { 'changeTimeIndex' : [ 'changeTime' ] },
+                                                           'PrimaryKey' : 'id'
+                                                         }
+                        }
+                      )
+    self.__bucketsChangesLifeTime = 86400 * 2
     self.__loadCatalogFromDB()
     gMonitor.registerActivity( "registeradded",
                                "Register added",
@@ -531,12 +559,7 @@ class AccountingDB( DB ):
     """
     Get the expected bucket time for a moment in time
     """
-    for granuT in self.dbBucketsLength[ typeName ]:
-      nowBucketed = now - now % granuT[1]
-      dif = max( 0, nowBucketed - when )
-      if dif <= granuT[0]:
-        return granuT[1]
-    return self.maxBucketTime
+    return BucketSplitter.getBucketLength( self.dbBucketsLength[ typeName ], self.maxBucketTime, now, when )
 
   def calculateBuckets( self, typeName, startTime, endTime, nowEpoch = False ):
     """
@@ -545,24 +568,7 @@ class AccountingDB( DB ):
     """
     if not nowEpoch:
       nowEpoch = int( Time.toEpoch( Time.dateTime() ) )
-    bucketTimeLength = self.calculateBucketLengthForTime( typeName, nowEpoch, startTime )
-    currentBucketStart = startTime - startTime % bucketTimeLength
-    if startTime == endTime:
-      return [ ( currentBucketStart,
-                 1,
-                 bucketTimeLength ) ]
-    buckets = []
-    totalLength = endTime - startTime
-    while currentBucketStart < endTime:
-      start = max( currentBucketStart, startTime )
-      end = min( currentBucketStart + bucketTimeLength, endTime )
-      proportion = float( end - start ) / totalLength
-      buckets.append( ( currentBucketStart,
-                        proportion,
-                        bucketTimeLength ) )
-      currentBucketStart += bucketTimeLength
-      bucketTimeLength = self.calculateBucketLengthForTime( typeName, nowEpoch, currentBucketStart )
-    return buckets
+    return BucketSplitter.getBuckets( self.dbBucketsLength[ typeName ], self.maxBucketTime, nowEpoch, startTime, endTime )
 
   def __insertInQueueTable( self, typeName, startTime, endTime, valuesList ):
     sqlFields = [ 'id', 'taken', 'takenSince' ] + self.dbCatalog[ typeName ][ 'typeFields' ]
@@ -581,18 +587,36 @@ class AccountingDB( DB ):
     return S_OK( retVal[ 'lastRowId' ] )
 
   def insertRecordBundleThroughQueue( self, recordsToQueue ) :
+    """
+    Insert a bundle of records in the intables with one multi-row insert per type and chunk
+    """
     if self.__readOnly:
       return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
-    recordsToProcess = []
-    now = Time.toEpoch()
+    recordsByType = {}
     for record in recordsToQueue:
       typeName, startTime, endTime, valuesList = record
-      result = self.__insertInQueueTable( typeName, startTime, endTime, valuesList )
-      if not result[ 'OK' ]:
-        return result
-      iD = result[ 'Value' ]
-      recordsToProcess.append( ( iD, typeName, startTime, endTime, valuesList, now ) )
-
+      if not typeName in self.dbCatalog:
+        return S_ERROR( "Type %s has not been defined in the db" % typeName )
+      numExp = len( self.dbCatalog[ typeName ][ 'typeFields' ] )
+      if len( valuesList ) + 2 != numExp:
+        return S_ERROR( "Fields mismatch for record %s. %s fields and %s expected" % ( typeName,
+                                                                                       len( valuesList ) + 2,
+                                                                                       numExp ) )
+      if typeName not in recordsByType:
+        recordsByType[ typeName ] = []
+      recordsByType[ typeName ].append( list( valuesList ) + [ startTime, endTime ] )
+    for typeName in recordsByType:
+      sqlFields = [ 'taken', 'takenSince' ] + self.dbCatalog[ typeName ][ 'typeFields' ]
+      sqlRow = "( 0, UTC_TIMESTAMP(), %s )" % ", ".join( [ "%s" ] * ( len( sqlFields ) - 2 ) )
+      rows = recordsByType[ typeName ]
+      for iPos in range( 0, len( rows ), self.__insertChunkSize ):
+        chunk = rows[ iPos : iPos + self.__insertChunkSize ]
+        cmd = "INSERT INTO `%s` ( %s ) VALUES %s" % ( _getTableName( "in", typeName ),
+                                                      ", ".join( [ "`%s`" % f for f in sqlFields ] ),
+                                                      ", ".join( [ sqlRow ] * len( chunk ) ) )
+        retVal = self._update( cmd, params = [ value for row in chunk for value in row ] )
+        if not retVal[ 'OK' ]:
+          return retVal
     return S_OK()
 
   def insertRecordThroughQueue( self, typeName, startTime, endTime, valuesList ):
@@ -615,6 +639,11 @@ class AccountingDB( DB ):
     Do the real insert and delete from the in buffer table
     """
     self.log.verbose( "Received bundle to process", "of %s elements" % len( recordTuples ) )
+    result = self.__insertBundleFromINTable( recordTuples )
+    if result[ 'OK' ]:
+      return
+    #Insert them one by one so a bad record doesn't block the rest
+    self.log.warn( "Can't insert the bundle, inserting the records one by one", result[ 'Message' ] )
     for record in recordTuples:
       iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
       result = self.insertRecordDirectly( typeName, startTime, endTime, valuesList )
@@ -628,6 +657,153 @@ class AccountingDB( DB ):
       gMonitor.addMark( "insertiontime", Time.toEpoch() - insertionEpoch )
 
 
+  def __insertBundleFromINTable( self, recordTuples ):
+    """
+    Insert a bundle of records from the in buffer table and delete them from it in one transaction
+    """
+    if self.__readOnly:
+      return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
+    records = []
+    idsByType = {}
+    for record in recordTuples:
+      iD, typeName, startTime, endTime, valuesList, insertionEpoch = record
+      records.append( ( typeName, startTime, endTime, valuesList ) )
+      if typeName not in idsByType:
+        idsByType[ typeName ] = []
+      idsByType[ typeName ].append( str( iD ) )
+    retVal = self.__getBundleInsertCommands( records )
+    if not retVal[ 'OK' ]:
+      return retVal
+    cmdList = retVal[ 'Value' ]
+    for typeName in idsByType:
+      cmdList.append( ( "DELETE FROM `%s` WHERE id in (%s)" % ( _getTableName( "in", typeName ),
+                                                               ", ".join( idsByType[ typeName ] ) ), None ) )
+    retVal = self.__executeBundleCommands( cmdList )
+    if not retVal[ 'OK' ]:
+      return retVal
+    now = Time.toEpoch()
+    for record in recordTuples:
+      gMonitor.addMark( "insertiontime", now - record[5] )
+    self.__markRecordsAdded( records )
+    return S_OK( len( records ) )
+
+  def insertRecordBundleDirectly( self, recordsToInsert ):
+    """
+    Add a bundle of ( typeName, startTime, endTime, valuesList ) entries to the type contents.
+    The buckets of all the entries are aggregated in memory and written with multi-row upserts
+    """
+    if self.__readOnly:
+      return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
+    retVal = self.__getBundleInsertCommands( recordsToInsert )
+    if not retVal[ 'OK' ]:
+      return retVal
+    retVal = self.__executeBundleCommands( retVal[ 'Value' ] )
+    if not retVal[ 'OK' ]:
+      return retVal
+    self.__markRecordsAdded( recordsToInsert )
+    return S_OK( len( recordsToInsert ) )
+
+  def __markRecordsAdded( self, records ):
+    numByType = {}
+    for record in records:
+      numByType[ record[0] ] = numByType.get( record[0], 0 ) + 1
+    gMonitor.addMark( "registeradded", len( records ) )
+    for typeName in numByType:
+      gMonitor.addMark( "registeradded:%s" % typeName, numByType[ typeName ] )
+
+  def __getBundleInsertCommands( self, recordsToInsert ):
+    """
+    Generate the ( cmd, params ) list inserting a bundle of records in the type tables
+    and adding them to the buckets
+    """
+    recordsByType = {}
+    for record in recordsToInsert:
+      typeName, startTime, endTime, valuesList = record
+      if not typeName in self.dbCatalog:
+        return S_ERROR( "Type %s has not been defined in the db" % typeName )
+      numExp = len( self.dbCatalog[ typeName ][ 'typeFields' ] )
+      if len( valuesList ) + 2 != numExp:
+        return S_ERROR( "Fields mismatch for record %s. %s fields and %s expected" % ( typeName,
+                                                                                       len( valuesList ) + 2,
+                                                                                       numExp ) )
+      if typeName not in recordsByType:
+        recordsByType[ typeName ] = []
+      recordsByType[ typeName ].append( ( startTime, endTime, valuesList ) )
+    cmdList = []
+    for typeName in recordsByType:
+      keyFields = self.dbCatalog[ typeName ][ 'keys' ]
+      numKeys = len( keyFields )
+      rawRows = []
+      for startTime, endTime, valuesList in recordsByType[ typeName ]:
+        #Discover key indexes, they come from the keys cache but for new values
+        keyIds = []
+        for keyPos in range( numKeys ):
+          retVal = self.__addKeyValue( typeName, keyFields[ keyPos ], valuesList[ keyPos ] )
+          if not retVal[ 'OK' ]:
+            return retVal
+          keyIds.append( retVal[ 'Value' ] )
+        rawRows.append( ( startTime, endTime, tuple( keyIds ), list( valuesList[ numKeys: ] ) ) )
+      #Raw records
+      rows = [ list( keyIds ) + values + [ startTime, endTime ] for startTime, endTime, keyIds, values in rawRows ]
+      cmdList.extend( self.__getMultiRowInsertCommands( _getTableName( "type", typeName ),
+                                                        self.dbCatalog[ typeName ][ 'typeFields' ],
+                                                        rows ) )
+      #Buckets
+      #One more value to be able to count total entries
+      retVal = self.__getBucketsUpsertCommands( typeName,
+                                                [ ( startTime, endTime, keyIds, values + [ 1 ] )
+                                                  for startTime, endTime, keyIds, values in rawRows ],
+                                                int( Time.toEpoch( Time.dateTime() ) ) )
+      if not retVal[ 'OK' ]:
+        return retVal
+      cmdList.extend( retVal[ 'Value' ] )
+    return S_OK( cmdList )
+
+  def __getBucketsUpsertCommands( self, typeName, records, nowEpoch ):
+    """
+    Split ( startTime, endTime, keyIds, values + [ entries ] ) records in buckets in memory, aggregate
+    the identical buckets and generate the ( cmd, params ) list adding them to the bucket table
+    """
+    keyFields = self.dbCatalog[ typeName ][ 'keys' ]
+    try:
+      buckets = BucketSplitter.aggregateBuckets( self.dbBucketsLength[ typeName ], self.maxBucketTime, nowEpoch, records )
+    except ( TypeError, ValueError ), x:
+      return S_ERROR( "Invalid values for type %s: %s" % ( typeName, str( x ) ) )
+    rows = [ [ bucketStartTime, bucketLength ] + list( keyIds ) + bucketValues
+             for ( bucketStartTime, bucketLength, keyIds ), bucketValues in buckets.items() ]
+    sqlFields = [ 'startTime', 'bucketLength' ] + keyFields + self.dbCatalog[ typeName ][ 'values' ] + [ 'entriesInBucket' ]
+    sqlUpdate = ", ".join( [ "`%s`=`%s`+VALUES(`%s`)" % ( f, f, f ) for f in sqlFields[ 2 + len( keyFields ): ] ] )
+    cmdList = self.__getMultiRowInsertCommands( _getTableName( "bucket", typeName ), sqlFields, rows,
+                                                "ON DUPLICATE KEY UPDATE %s" % sqlUpdate )
+    if rows:
+      cmdList.append( self.__getBucketsChangeCommand( typeName, min( [ row[0] for row in rows ] ) ) )
+    return S_OK( cmdList )
+
+  def __getMultiRowInsertCommands( self, tableName, sqlFields, rows, suffix = "" ):
+    """
+    Generate ( cmd, params ) multi-row INSERTs of up to __insertChunkSize rows
+    """
+    sqlRow = "( %s )" % ", ".join( [ "%s" ] * len( sqlFields ) )
+    cmdList = []
+    for iPos in range( 0, len( rows ), self.__insertChunkSize ):
+      chunk = rows[ iPos : iPos + self.__insertChunkSize ]
+      cmd = "INSERT INTO `%s` ( %s ) VALUES %s %s" % ( tableName,
+                                                      ", ".join( [ "`%s`" % f for f in sqlFields ] ),
+                                                      ", ".join( [ sqlRow ] * len( chunk ) ),
+                                                      suffix )
+      cmdList.append( ( cmd, [ value for row in chunk for value in row ] ) )
+    return cmdList
+
+  def __executeBundleCommands( self, cmdList ):
+    """
+    Execute the commands in a transaction, retrying on dead locks
+    """
+    for i in range( max( 1, self.__deadLockRetries ) ):
+      retVal = self._transaction( cmdList )
+      if retVal[ 'OK' ] or retVal[ 'Message' ].find( "try restarting transaction" ) == -1:
+        return retVal
+    return retVal
+
   def insertRecordDirectly( self, typeName, startTime, endTime, valuesList ):
     """
     Add an entry to the type contents
@@ -794,6 +970,8 @@ class AccountingDB( DB ):
         #If OK, break loop
         if retVal[ 'OK' ]:
           break
+    if buckets:
+      return self.__logBucketsChange( typeName, buckets[0][0], connObj = connObj )
     return S_OK()
 
   def __deleteFromBuckets( self, typeName, startTime, endTime, valuesList, numInsertions, connObj = False ):
@@ -825,8 +1003,28 @@ class AccountingDB( DB ):
         #If OK, break loop
         if retVal[ 'OK' ]:
           break
+    if buckets:
+      return self.__logBucketsChange( typeName, buckets[0][0], connObj = connObj )
     return S_OK()
 
+  def __getBucketsChangeCommand( self, typeName, startTime ):
+    """
+    ( cmd, params ) logging that the buckets of a type starting at startTime or later changed
+    """
+    return ( "INSERT INTO `%s` ( `name`, `startTime`, `changeTime` ) VALUES ( %%s, %%s, UNIX_TIMESTAMP() )" % self.bucketsChangesTableName,
+             ( typeName, max( 0, int( startTime ) ) ) )
+
+  def __logBucketsChange( self, typeName, startTime, connObj = False ):
+    cmd, params = self.__getBucketsChangeCommand( typeName, startTime )
+    return self._update( cmd, conn = connObj, params = params )
+
+  def getBucketsChanges( self, sinceEpoch ):
+    """
+    Get the ( id, typeName, startTime, changeTime ) bucket changes logged since sinceEpoch
+    """
+    return self._query( "SELECT `id`, `name`, `startTime`, `changeTime` FROM `%s` WHERE `changeTime` >= %d" % ( self.bucketsChangesTableName,
+                                                                                                             sinceEpoch ) )
+
   def getBucketsDef( self, typeName ):
     return self.dbBucketsLength[ typeName ]
 
@@ -1121,7 +1319,7 @@ class AccountingDB( DB ):
       self.__doingCompaction = True
     finally:
       gSynchro.unlock()
-    slow = True
+    slow = self.getCSOption( "SlowCompaction", False )
     for typeName in self.dbCatalog:
       if typeFilter and typeName.find( typeFilter ) == -1:
         self.log.info( "[COMPACT] Skipping %s" % typeName )
@@ -1135,6 +1333,10 @@ class AccountingDB( DB ):
       else:
         self.__compactBucketsForType( typeName )
     self.log.info( "[COMPACT] Compaction finished" )
+    result = self._update( "DELETE FROM `%s` WHERE `changeTime` < UNIX_TIMESTAMP() - %d" % ( self.bucketsChangesTableName,
+                                                                                           self.__bucketsChangesLifeTime ) )
+    if not result[ 'OK' ]:
+      self.log.error( "[COMPACT] Cannot purge the buckets changes log", result[ 'Message' ] )
     self.__lastCompactionEpoch = int( Time.toEpoch() )
     gSynchro.lock()
     try:
@@ -1144,86 +1346,65 @@ class AccountingDB( DB ):
       gSynchro.unlock()
     return S_OK()
 
-  def __selectForCompactBuckets( self, typeName, timeLimit, bucketLength, nextBucketLength, connObj = False ):
-    """
-    Nasty SQL query to get ideal buckets using grouping by date calculations and adding value contents
-    """
-    tableName = _getTableName( "bucket", typeName )
-    selectSQL = "SELECT "
-    sqlSelectList = []
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlSelectList.append( "`%s`.`%s`" % ( tableName, field ) )
-    for field in self.dbCatalog[ typeName ][ 'values' ]:
-      sqlSelectList.append( "SUM( `%s`.`%s` )" % ( tableName, field ) )
-    sqlSelectList.append( "SUM( `%s`.`entriesInBucket` )" % ( tableName ) )
-    sqlSelectList.append( "MIN( `%s`.`startTime` )" % tableName )
-    sqlSelectList.append( "MAX( `%s`.`startTime` )" % tableName )
-    selectSQL += ", ".join( sqlSelectList )
-    selectSQL += " FROM `%s`" % tableName
-    selectSQL += " WHERE `%s`.`startTime` < '%s' AND" % ( tableName, timeLimit )
-    selectSQL += " `%s`.`bucketLength` = %s" % ( tableName, bucketLength )
-    #MAGIC bucketing
-    sqlGroupList = [ _bucketizeDataField( "`%s`.`startTime`" % tableName, nextBucketLength ) ]
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlGroupList.append( "`%s`.`%s`" % ( tableName, field ) )
-    selectSQL += " GROUP BY %s" % ", ".join( sqlGroupList )
-    return self._query( selectSQL, conn = connObj )
-
-  def __deleteForCompactBuckets( self, typeName, timeLimit, bucketLength, connObj = False ):
-    """
-    Delete compacted buckets
-    """
-    tableName = _getTableName( "bucket", typeName )
-    deleteSQL = "DELETE FROM `%s` WHERE " % tableName
-    deleteSQL += "`%s`.`startTime` < '%s' AND " % ( tableName, timeLimit )
-    deleteSQL += "`%s`.`bucketLength` = %s" % ( tableName, bucketLength )
-    return self._update( deleteSQL, conn = connObj )
-
   def __compactBucketsForType( self, typeName ):
     """
-    Compact all buckets for a given type
+    Compact all buckets for a given type, adding them up in SQL into buckets of the next
+    granularity. Each window of __compactionWindowBuckets next buckets is compacted in a transaction
     """
     nowEpoch = Time.toEpoch()
-    retVal = self._getConnection()
-    if not retVal[ 'OK' ]:
-      return retVal
-    connObj = retVal[ 'Value' ]
-    #retVal = self.__startTransaction( connObj )
-    #if not retVal[ 'OK' ]:
-    #  return retVal
-    for bPos in range( len( self.dbBucketsLength[ typeName ] ) - 1 ):
-      self.log.info( "[COMPACT] Query %d of %d" % ( bPos + 1, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
+    tableName = _getTableName( "bucket", typeName )
+    keyFields = [ "`%s`" % field for field in self.dbCatalog[ typeName ][ 'keys' ] ]
+    sumFields = [ "`%s`" % field for field in self.dbCatalog[ typeName ][ 'values' ] ] + [ '`entriesInBucket`' ]
+    sqlFields = [ '`startTime`', '`bucketLength`' ] + keyFields + sumFields
+    sqlUpdate = ", ".join( [ "`%s`.%s=`%s`.%s+VALUES(%s)" % ( tableName, f, tableName, f, f ) for f in sumFields ] )
+    numCompactions = len( self.dbBucketsLength[ typeName ] ) - 1
+    for bPos in range( numCompactions ):
       secondsLimit = self.dbBucketsLength[ typeName ][ bPos ][0]
       bucketLength = self.dbBucketsLength[ typeName ][ bPos ][1]
       timeLimit = ( nowEpoch - nowEpoch % bucketLength ) - secondsLimit
       nextBucketLength = self.dbBucketsLength[ typeName ][ bPos + 1 ][1]
-      self.log.info( "[COMPACT] Compacting data newer that %s with bucket size %s" % ( Time.fromEpoch( timeLimit ), bucketLength ) )
-      #Retrieve the data
-      retVal = self.__selectForCompactBuckets( typeName, timeLimit, bucketLength, nextBucketLength, connObj )
+      self.log.info( "[COMPACT] Compacting data older than %s with bucket size %s for %s (%d of %d)" % ( Time.fromEpoch( timeLimit ),
+                                                                                                     bucketLength, typeName,
+                                                                                                     bPos + 1, numCompactions ) )
+      retVal = self._query( "SELECT MIN( `startTime` ), COUNT(*) FROM `%s` WHERE `startTime` < %d AND `bucketLength` = %d" % ( tableName,
+                                                                                                                          timeLimit,
+                                                                                                                          bucketLength ) )
       if not retVal[ 'OK' ]:
-        #self.__rollbackTransaction( connObj )
         return retVal
-      bucketsData = retVal[ 'Value' ]
-      self.log.info( "[COMPACT] Got %d records to compact" % len( bucketsData ) )
-      if len( bucketsData ) == 0:
+      minStartTime, numBuckets = retVal[ 'Value' ][0]
+      if not numBuckets:
         continue
-      retVal = self.__deleteForCompactBuckets( typeName, timeLimit, bucketLength, connObj )
-      if not retVal[ 'OK' ]:
-        #self.__rollbackTransaction( connObj )
-        return retVal
-      self.log.info( "[COMPACT] Compacting %s records %s seconds size for %s" % ( len( bucketsData ), bucketLength, typeName ) )
-      #Add data
-      for record in bucketsData:
-        startTime = record[-2]
-        endTime = record[-1]
-        valuesList = record[:-2]
-        retVal = self.__splitInBuckets( typeName, startTime, endTime, valuesList, connObj )
+      windowLength = nextBucketLength * self.__compactionWindowBuckets
+      windowStart = int( minStartTime ) - int( minStartTime ) % nextBucketLength
+      compacted = 0
+      while windowStart < timeLimit:
+        windowEnd = min( windowStart + windowLength, timeLimit )
+        sqlCond = "`startTime` >= %d AND `startTime` < %d AND `bucketLength` = %d" % ( windowStart, windowEnd, bucketLength )
+        #Aggregate in a derived table to read the bucket table before writing into it
+        selectSQL = "SELECT %s, %d, %s, %s FROM `%s` WHERE %s GROUP BY %s" % ( _bucketizeDataField( "`startTime`", nextBucketLength ),
+                                                                              nextBucketLength,
+                                                                              ", ".join( keyFields ),
+                                                                              ", ".join( [ "SUM( %s )" % f for f in sumFields ] ),
+                                                                              tableName,
+                                                                              sqlCond,
+                                                                              ", ".join( [ _bucketizeDataField( "`startTime`",
+                                                                                                                nextBucketLength ) ] + keyFields ) )
+        insertSQL = "INSERT INTO `%s` ( %s ) SELECT * FROM ( %s ) AS compacted ON DUPLICATE KEY UPDATE %s" % ( tableName,
+                                                                                                             ", ".join( sqlFields ),
+                                                                                                             selectSQL,
+                                                                                                             sqlUpdate )
+        deleteSQL = "DELETE FROM `%s` WHERE %s" % ( tableName, sqlCond )
+        retVal = self.__executeBundleCommands( [ ( insertSQL, None ), ( deleteSQL, None ),
+                                                 self.__getBucketsChangeCommand( typeName, windowStart ) ] )
         if not retVal[ 'OK' ]:
-          #self.__rollbackTransaction( connObj )
-          self.log.error( "[COMPACT] Error while compacting data for record in %s: %s" % ( typeName, retVal[ 'Value' ] ) )
-      self.log.info( "[COMPACT] Finished compaction %d of %d" % ( bPos, len( self.dbBucketsLength[ typeName ] ) - 1 ) )
-    #return self.__commitTransaction( connObj )
-    connObj.close()
+          self.log.error( "[COMPACT] Error while compacting buckets", "for %s: %s" % ( typeName, retVal[ 'Message' ] ) )
+          return retVal
+        compacted += retVal[ 'Value' ][1]
+        if retVal[ 'Value' ][1]:
+          self.log.info( "[COMPACT] Compacted %d of %d buckets of %s seconds for %s up to %s" % ( compacted, numBuckets,
+                                                                                                  bucketLength, typeName,
+                                                                                                  Time.fromEpoch( windowEnd ) ) )
+        windowStart = windowEnd
     return S_OK()
 
   def __slowCompactBucketsForType( self, typeName ):
@@ -1273,13 +1454,13 @@ class AccountingDB( DB ):
         self.log.info( "[COMPACT] Deleted %s out-of-bounds buckets (took %.2f secs)" % ( len( bucketsData ),
                                                                                          deleteEndTime - selectEndTime ) )
         #Add data
-        for record in bucketsData:
-          startTime = record[-2]
-          endTime = record[-2] + record[-1]
-          valuesList = record[:-2]
-          retVal = self.__splitInBuckets( typeName, startTime, endTime, valuesList, connObj )
-          if not retVal[ 'OK' ]:
-            self.log.error( "[COMPACT] Error while compacting data for buckets in %s: %s" % ( typeName, retVal[ 'Value' ] ) )
+        numKeys = len( self.dbCatalog[ typeName ][ 'keys' ] )
+        records = [ ( record[-2], record[-2] + record[-1], record[ :numKeys ], record[ numKeys:-2 ] ) for record in bucketsData ]
+        result = self.__getBucketsUpsertCommands( typeName, records, nowEpoch )
+        if result[ 'OK' ]:
+          result = self.__executeBundleCommands( result[ 'Value' ] )
+        if not result[ 'OK' ]:
+          self.log.error( "[COMPACT] Error while compacting data for buckets in %s: %s" % ( typeName, result[ 'Message' ] ) )
         totalCompacted += len( bucketsData )
         insertElapsedTime = time.time() - deleteEndTime
         self.log.info( "[COMPACT] Records compacted (took %.2f secs, %.2f secs/bucket)" % ( insertElapsedTime,
@@ -1361,124 +1542,85 @@ class AccountingDB( DB ):
         self.log.info( "[COMPACT] Deleted %d records for %s table" % ( result[ 'Value' ], table ) )
         deleted = result[ 'Value' ]
         time.sleep( 1 )
+    self.__logBucketsChange( typeName, 0 )
 
-  def regenerateBuckets( self, typeName ):
+  def regenerateBuckets( self, typeName, restart = False ):
+    """
+    Regenerate the buckets of a type from the raw records, one window of RegenerationWindow
+    seconds of records at a time. Each window is committed together with the regeneration
+    progress, so an interrupted regeneration resumes from the last window unless restart is set
+    """
     if self.__readOnly:
       return S_ERROR( "ReadOnly mode enabled. No modification allowed" )
-    retVal = self._getConnection()
+    if not typeName in self.dbCatalog:
+      return S_ERROR( "Type %s has not been defined in the db" % typeName )
+    rawTableName = _getTableName( "type", typeName )
+    retVal = self._query( "SELECT `nowEpoch`, `lastTime` FROM `%s` WHERE `name` = %%s" % self.regenerationTableName,
+                          params = ( typeName, ) )
     if not retVal[ 'OK' ]:
       return retVal
-    connObj = retVal[ 'Value' ]
-    rawTableName = _getTableName( "type", typeName )
-    #retVal = self.__startTransaction( connObj )
-    #if not retVal[ 'OK' ]:
-    #  return retVal
-    self.log.info( "[REBUCKET] Deleting buckets for %s" % typeName )
-    retVal = self._update( "DELETE FROM `%s`" % _getTableName( "bucket", typeName ),
-                           conn = connObj )
+    if retVal[ 'Value' ] and not restart:
+      nowEpoch, lastTime = [ int( v ) for v in retVal[ 'Value' ][0] ]
+      self.log.info( "[REBUCKET] Resuming the regeneration of %s from %s" % ( typeName, Time.fromEpoch( lastTime ) ) )
+    else:
+      nowEpoch = int( Time.toEpoch() )
+      retVal = self._query( "SELECT MIN( `startTime` ) FROM `%s`" % rawTableName )
+      if not retVal[ 'OK' ]:
+        return retVal
+      lastTime = int( retVal[ 'Value' ][0][0] or 0 )
+      self.log.info( "[REBUCKET] Deleting buckets for %s" % typeName )
+      retVal = self._transaction( [ ( "DELETE FROM `%s`" % _getTableName( "bucket", typeName ), None ),
+                                    self.__getBucketsChangeCommand( typeName, 0 ),
+                                    ( "REPLACE INTO `%s` ( `name`, `nowEpoch`, `lastTime` ) VALUES ( %%s, %%s, %%s )" % self.regenerationTableName,
+                                      ( typeName, nowEpoch, lastTime ) ) ] )
+      if not retVal[ 'OK' ]:
+        return retVal
+    retVal = self._query( "SELECT MAX( `startTime` ), COUNT(*) FROM `%s` WHERE `startTime` >= %d" % ( rawTableName, lastTime ) )
     if not retVal[ 'OK' ]:
       return retVal
-    #Generate the common part of the query
-    #SELECT fields
-    startTimeTableField = "`%s`.startTime" % rawTableName
-    endTimeTableField = "`%s`.endTime" % rawTableName
-    #Select strings and sum select strings
-    sqlSUMSelectList = []
-    sqlSelectList = []
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlSUMSelectList.append( "`%s`.`%s`" % ( rawTableName, field ) )
-      sqlSelectList.append( "`%s`.`%s`" % ( rawTableName, field ) )
-    for field in self.dbCatalog[ typeName ][ 'values' ]:
-      sqlSUMSelectList.append( "SUM( `%s`.`%s` )" % ( rawTableName, field ) )
-      sqlSelectList.append( "`%s`.`%s`" % ( rawTableName, field ) )
-    sumSelectString = ", ".join( sqlSUMSelectList )
-    selectString = ", ".join( sqlSelectList )
-    #Grouping fields
-    sqlGroupList = []
-    for field in self.dbCatalog[ typeName ][ 'keys' ]:
-      sqlGroupList.append( "`%s`.`%s`" % ( rawTableName, field ) )
-    groupingString = ", ".join( sqlGroupList )
-    #List to contain all queries
-    sqlQueries = []
-    dateInclusiveConditions = []
-    countedField = "`%s`.`%s`" % ( rawTableName, self.dbCatalog[ typeName ][ 'keys' ][0] )
-    lastTime = Time.toEpoch()
-    #Iterate for all ranges
-    for iRange in range( len( self.dbBucketsLength[ typeName ] ) ):
-      bucketTimeSpan = self.dbBucketsLength[ typeName ][iRange][0]
-      bucketLength = self.dbBucketsLength[ typeName ][iRange][1]
-      startRangeTime = lastTime - bucketTimeSpan
-      endRangeTime = lastTime
-      lastTime -= bucketTimeSpan
-      bucketizedStart = _bucketizeDataField( startTimeTableField, bucketLength )
-      bucketizedEnd = _bucketizeDataField( endTimeTableField, bucketLength )
-
-      timeSelectString = "MIN(%s), MAX(%s)" % ( startTimeTableField,
-                                                endTimeTableField )
-      #Is the last bucket?
-      if iRange == len( self.dbBucketsLength[ typeName ] ) - 1:
-        whereString = "%s <= %d" % ( endTimeTableField,
-                                     endRangeTime )
-      else:
-        whereString = "%s > %d AND %s <= %d" % ( startTimeTableField,
-                                                  startRangeTime,
-                                                  endTimeTableField,
-                                                  endRangeTime )
-      sameBucketCondition = "(%s) = (%s)" % ( bucketizedStart, bucketizedEnd )
-      #Records that fit in a bucket
-      sqlQuery = "SELECT %s, %s, COUNT(%s) FROM `%s` WHERE %s AND %s GROUP BY %s, %s" % ( timeSelectString,
-                                                                               sumSelectString,
-                                                                               countedField,
-                                                                               rawTableName,
-                                                                               whereString,
-                                                                               sameBucketCondition,
-                                                                               groupingString,
-                                                                               bucketizedStart )
-      sqlQueries.append( sqlQuery )
-      #Records that fit in more than one bucket
-      sqlQuery = "SELECT %s, %s, %s, 1 FROM `%s` WHERE %s AND NOT %s" % ( startTimeTableField,
-                                                                          endTimeTableField,
-                                                                          selectString,
-                                                                          rawTableName,
-                                                                          whereString,
-                                                                          sameBucketCondition
-                                                                        )
-      sqlQueries.append( sqlQuery )
-      dateInclusiveConditions.append( "( %s )" % whereString )
-    #Query for records that are in between two ranges
-    sqlQuery = "SELECT %s, %s, %s, 1 FROM `%s` WHERE NOT %s" % ( startTimeTableField,
-                                                       endTimeTableField,
-                                                       selectString,
-                                                       rawTableName,
-                                                       " AND NOT ".join( dateInclusiveConditions ) )
-    sqlQueries.append( sqlQuery )
-    self.log.info( "[REBUCKET] Retrieving data for rebuilding buckets for type %s..." % ( typeName ) )
-    queryNum = 0
-    for sqlQuery in sqlQueries:
-      self.log.info( "[REBUCKET] Executing query #%s..." % queryNum )
-      queryNum += 1
-      retVal = self._query( sqlQuery, conn = connObj )
+    maxStartTime, numRecords = retVal[ 'Value' ][0]
+    if maxStartTime is None:
+      maxStartTime = lastTime - 1
+    windowLength = max( 1, self.getCSOption( "RegenerationWindow", 21600 ) )
+    numKeys = len( self.dbCatalog[ typeName ][ 'keys' ] )
+    selectString = ", ".join( [ "`%s`" % f for f in self.dbCatalog[ typeName ][ 'typeFields' ] ] )
+    self.log.info( "[REBUCKET] Rebucketing %d records of %s in windows of %d seconds" % ( numRecords, typeName, windowLength ) )
+    rebucketedRecords = 0
+    regenerationStart = time.time()
+    while lastTime <= maxStartTime:
+      windowEnd = lastTime + windowLength
+      retVal = self._query( "SELECT %s FROM `%s` WHERE `startTime` >= %d AND `startTime` < %d" % ( selectString, rawTableName,
+                                                                                                 lastTime, windowEnd ) )
       if not retVal[ 'OK' ]:
         self.log.error( "[REBUCKET] Can't retrieve data for rebucketing", retVal[ 'Message' ] )
-        #self.__rollbackTransaction( connObj )
         return retVal
-      rawData = retVal[ 'Value' ]
-      self.log.info( "[REBUCKET] Retrieved %s records" % len( rawData ) )
-      rebucketedRecords = 0
-      for entry in rawData:
-        startT = entry[0]
-        endT = entry[1]
-        values = entry[2:]
-        retVal = self.__splitInBuckets( typeName, startT, endT, values, connObj = connObj )
-        if not retVal[ 'OK' ]:
-          #self.__rollbackTransaction( connObj )
-          return retVal
-        rebucketedRecords += 1
-        if rebucketedRecords % 1000 == 0:
-          self.log.info( "[REBUCKET] Rebucketed %s records..." % rebucketedRecords )
-    #return self.__commitTransaction( connObj )
-    connObj.close()
-    return S_OK()
+      #One more value to be able to count total entries
+      records = [ ( record[-2], record[-1], record[ :numKeys ], list( record[ numKeys:-2 ] ) + [ 1 ] )
+                  for record in retVal[ 'Value' ] ]
+      retVal = self.__getBucketsUpsertCommands( typeName, records, nowEpoch )
+      if not retVal[ 'OK' ]:
+        return retVal
+      cmdList = retVal[ 'Value' ]
+      cmdList.append( ( "UPDATE `%s` SET `lastTime` = %%s WHERE `name` = %%s" % self.regenerationTableName,
+                        ( windowEnd, typeName ) ) )
+      retVal = self.__executeBundleCommands( cmdList )
+      if not retVal[ 'OK' ]:
+        self.log.error( "[REBUCKET] Can't write the buckets", retVal[ 'Message' ] )
+        return retVal
+      lastTime = windowEnd
+      if records:
+        rebucketedRecords += len( records )
+        elapsed = time.time() - regenerationStart
+        self.log.info( "[REBUCKET] Rebucketed %d of %d records of %s (%.1f%%, %.1f records/s), done up to %s" % (
+                                                                                    rebucketedRecords, numRecords, typeName,
+                                                                                    100.0 * rebucketedRecords / max( 1, numRecords ),
+                                                                                    rebucketedRecords / max( elapsed, 0.001 ),
+                                                                                    Time.fromEpoch( lastTime ) ) )
+    retVal = self._update( "DELETE FROM `%s` WHERE `name` = %%s" % self.regenerationTableName, params = ( typeName, ) )
+    if not retVal[ 'OK' ]:
+      return retVal
+    self.log.info( "[REBUCKET] Finished the regeneration of %s" % typeName )
+    return S_OK( rebucketedRecords )
 
 
   def __startTransaction( self, connObj ):
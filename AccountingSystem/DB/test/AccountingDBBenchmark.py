@@ -0,0 +1,86 @@
+########################################################################
+# $HeadURL $
+# File: AccountingDBBenchmark.py
+########################################################################
+
+""" :mod: AccountingDBBenchmark
+    ===========================
+
+    .. module: AccountingDBBenchmark
+    :synopsis: records per second inserted in the AccountingDB
+
+    A temporary accounting type shaped like the Job one is registered and
+    10k records spread over the last day are inserted, first one by one
+    with insertRecordDirectly and then as one bundle with
+    insertRecordBundleDirectly. It needs the AccountingDB configured in
+    the local CS.
+
+    Usage: python AccountingDBBenchmark.py [numRecords]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+import random
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+## SUT
+from DIRAC.AccountingSystem.DB.AccountingDB import AccountingDB
+
+NUM_RECORDS = 10000
+
+KEY_FIELDS = [ ( 'User', 'VARCHAR(32)' ), ( 'Site', 'VARCHAR(32)' ), ( 'FinalStatus', 'VARCHAR(32)' ) ]
+VALUE_FIELDS = [ ( 'CPUTime', 'INT UNSIGNED' ), ( 'ExecTime', 'INT UNSIGNED' ), ( 'DiskSpace', 'BIGINT UNSIGNED' ) ]
+BUCKETS_LENGTH = [ ( 86400 * 7, 900 ), ( 86400 * 35, 3600 ), ( 86400 * 400, 86400 ) ]
+
+def makeRecords( typeName, numRecords ):
+  """ records of jobs of a few users and sites ending in the last day """
+  random.seed( 1 )
+  now = int( time.time() )
+  records = []
+  for i in range( numRecords ):
+    endTime = now - random.randint( 0, 86400 )
+    execTime = random.randint( 60, 36000 )
+    records.append( ( typeName, endTime - execTime, endTime,
+                      [ 'user%d' % random.randint( 1, 20 ), 'LCG.Site%d.org' % random.randint( 1, 50 ),
+                        random.choice( [ 'Done', 'Failed' ] ),
+                        int( execTime * 0.9 ), execTime, random.randint( 0, 10 ** 9 ) ] ) )
+  return records
+
+def insertOneByOne( db, records ):
+  """ one insertRecordDirectly per record """
+  for typeName, startTime, endTime, valuesList in records:
+    result = db.insertRecordDirectly( typeName, startTime, endTime, list( valuesList ) )
+    if not result[ 'OK' ]:
+      return result
+  return result
+
+def insertBundle( db, records ):
+  """ all the records with insertRecordBundleDirectly """
+  return db.insertRecordBundleDirectly( records )
+
+if __name__ == "__main__":
+  numRecords = NUM_RECORDS
+  if len( sys.argv ) > 1:
+    numRecords = int( sys.argv[1] )
+  db = AccountingDB()
+  print "Inserting %s records" % numRecords
+  for name, insert in ( ( "one by one", insertOneByOne ), ( "bundle", insertBundle ) ):
+    typeName = "Benchmark%s" % int( time.time() * 1000 )
+    result = db.registerType( typeName, KEY_FIELDS, VALUE_FIELDS, list( BUCKETS_LENGTH ) )
+    if not result[ 'OK' ]:
+      print "Cannot register the benchmark type: %s" % result[ 'Message' ]
+      sys.exit( 1 )
+    try:
+      records = makeRecords( typeName, numRecords )
+      startTime = time.time()
+      result = insert( db, records )
+      insertTime = time.time() - startTime
+      if not result[ 'OK' ]:
+        print "  %s failed: %s" % ( name, result[ 'Message' ] )
+      else:
+        print "  %-12s %8.2f s, %10.1f records/s" % ( name, insertTime, numRecords / insertTime )
+    finally:
+      db.deleteType( typeName )
@@ -41,7 +41,7 @@ def initializeReportGeneratorHandler( serviceInfo ):
   except IOError:
     gLogger.fatal( "Can't write to %s" % dataPath )
     return S_ERROR( "Data location is not writable" )
-  gDataCache.setGraphsLocation( dataPath )
+  gDataCache.setGraphsLocation( dataPath, gConfig.getValue( "%s/MaxCacheSizeMB" % reportSection, 1024 ) * 1048576 )
   gMonitor.registerActivity( "plotsDrawn", "Drawn plot images", "Accounting reports", "plots", gMonitor.OP_SUM )
   gMonitor.registerActivity( "reportsRequested", "Generated reports", "Accounting reports", "reports", gMonitor.OP_SUM )
   return S_OK()
@@ -0,0 +1,165 @@
+# $HeadURL$
+"""
+  Split accounting records in buckets
+
+  bucketsLength is the list of ( timespan, bucketLength ) of a type: records not older than
+  timespan seconds go to buckets of bucketLength seconds, older ones to the next granularity
+  and to maxBucketTime ones after the last timespan.
+
+  The batch functions use NumPy when it is available, computing the buckets of all the records
+  at once with one vector operation per bucket crossed by the longest record. Otherwise they
+  fall back to splitting the records one by one.
+"""
+__RCSID__ = "$Id$"
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+def getBucketLength( bucketsLength, maxBucketTime, nowEpoch, when ):
+  """
+  Get the expected bucket length for a moment in time
+  """
+  for granuT in bucketsLength:
+    nowBucketed = nowEpoch - nowEpoch % granuT[1]
+    dif = max( 0, nowBucketed - when )
+    if dif <= granuT[0]:
+      return granuT[1]
+  return maxBucketTime
+
+def getBuckets( bucketsLength, maxBucketTime, nowEpoch, startTime, endTime ):
+  """
+  Get the ( bucketStartTime, proportion, bucketLength ) buckets of a record
+  """
+  bucketTimeLength = getBucketLength( bucketsLength, maxBucketTime, nowEpoch, startTime )
+  currentBucketStart = startTime - startTime % bucketTimeLength
+  if startTime == endTime:
+    return [ ( currentBucketStart,
+               1,
+               bucketTimeLength ) ]
+  buckets = []
+  totalLength = endTime - startTime
+  while currentBucketStart < endTime:
+    start = max( currentBucketStart, startTime )
+    end = min( currentBucketStart + bucketTimeLength, endTime )
+    proportion = float( end - start ) / totalLength
+    buckets.append( ( currentBucketStart,
+                      proportion,
+                      bucketTimeLength ) )
+    currentBucketStart += bucketTimeLength
+    bucketTimeLength = getBucketLength( bucketsLength, maxBucketTime, nowEpoch, currentBucketStart )
+  return buckets
+
+def _getBucketLengthsArray( bucketsLength, maxBucketTime, nowEpoch, times ):
+  lengths = numpy.empty( len( times ), numpy.int64 )
+  lengths.fill( maxBucketTime )
+  pending = numpy.ones( len( times ), numpy.bool_ )
+  for timespan, bucketLength in bucketsLength:
+    nowBucketed = nowEpoch - nowEpoch % bucketLength
+    fits = pending & ( numpy.maximum( 0, nowBucketed - times ) <= timespan )
+    lengths[ fits ] = bucketLength
+    pending &= ~fits
+  return lengths
+
+def _getGroups( columns ):
+  """
+  Group the rows of the columns, returns the group id of each row and the first row of each group
+  """
+  #Combine the offsets of the values of each column in a single integer,
+  #the values of sparse columns are replaced by their ranks
+  combined = numpy.zeros( len( columns[0] ), numpy.int64 )
+  radix = 1
+  for column in columns:
+    low = column.min()
+    size = int( column.max() - low ) + 1
+    if size > len( column ):
+      values, column = numpy.unique( column, return_inverse = True )
+      low = 0
+      size = len( values )
+    if radix * size >= 2 ** 62:
+      combinedValues, combined = numpy.unique( combined, return_inverse = True )
+      radix = len( combinedValues )
+    combined = combined * size + ( column - low )
+    radix *= size
+  groups, firstRows, groupIds = numpy.unique( combined, return_index = True, return_inverse = True )
+  return groupIds, firstRows
+
+def splitInBuckets( bucketsLength, maxBucketTime, nowEpoch, startTimes, endTimes ):
+  """
+  Split records in buckets with NumPy, returns the arrays
+  ( recordIndexes, bucketStartTimes, bucketLengths, proportions ) with one entry per bucket
+  """
+  startTimes = numpy.asarray( startTimes, numpy.int64 )
+  endTimes = numpy.asarray( endTimes, numpy.int64 )
+  lengths = _getBucketLengthsArray( bucketsLength, maxBucketTime, nowEpoch, startTimes )
+  current = startTimes - startTimes % lengths
+  indexes = numpy.arange( len( startTimes ) )
+  #Records without length go entirely to their first bucket
+  point = startTimes == endTimes
+  result = [ ( indexes[ point ], current[ point ], lengths[ point ], numpy.ones( numpy.sum( point ) ) ) ]
+  active = ~point
+  indexes = indexes[ active ]
+  current = current[ active ]
+  lengths = lengths[ active ]
+  startTimes = startTimes[ active ]
+  endTimes = endTimes[ active ]
+  totalLengths = ( endTimes - startTimes ).astype( numpy.float64 )
+  while len( indexes ):
+    active = current < endTimes
+    if not numpy.all( active ):
+      indexes = indexes[ active ]
+      current = current[ active ]
+      lengths = lengths[ active ]
+      startTimes = startTimes[ active ]
+      endTimes = endTimes[ active ]
+      totalLengths = totalLengths[ active ]
+      if not len( indexes ):
+        break
+    proportions = ( numpy.minimum( current + lengths, endTimes ) - numpy.maximum( current, startTimes ) ) / totalLengths
+    result.append( ( indexes, current, lengths, proportions ) )
+    current = current + lengths
+    lengths = _getBucketLengthsArray( bucketsLength, maxBucketTime, nowEpoch, current )
+  return tuple( [ numpy.concatenate( [ r[i] for r in result ] ) for i in range( 4 ) ] )
+
+def aggregateBuckets( bucketsLength, maxBucketTime, nowEpoch, records ):
+  """
+  Split ( startTime, endTime, keyIds, values ) records in buckets and add up the values
+  of the identical buckets, returns { ( bucketStartTime, bucketLength, keyIds ) : values }
+  """
+  if not records:
+    return {}
+  if numpy is None:
+    return _aggregateBucketsOneByOne( bucketsLength, maxBucketTime, nowEpoch, records )
+  startTimes = [ record[0] for record in records ]
+  endTimes = [ record[1] for record in records ]
+  keyIds = numpy.array( [ record[2] for record in records ], numpy.int64 ).reshape( len( records ), -1 )
+  values = numpy.array( [ record[3] for record in records ], numpy.float64 ).reshape( len( records ), -1 )
+  indexes, bucketStarts, bucketLengths, proportions = splitInBuckets( bucketsLength, maxBucketTime, nowEpoch,
+                                                                      startTimes, endTimes )
+  #Group the buckets by ( startTime, length, keys ), grouping first the keys of the records
+  keyGroupIds = _getGroups( [ keyIds[ :, i ] for i in range( keyIds.shape[1] ) ] )[0]
+  groupIds, firstRows = _getGroups( [ bucketStarts, bucketLengths, keyGroupIds[ indexes ] ] )
+  groups = numpy.column_stack( ( bucketStarts[ firstRows ], bucketLengths[ firstRows ], keyIds[ indexes[ firstRows ] ] ) )
+  sums = numpy.column_stack( [ numpy.bincount( groupIds, weights = values[ indexes, i ] * proportions, minlength = len( groups ) )
+                               for i in range( values.shape[1] ) ] )
+  buckets = {}
+  for group, groupSums in zip( groups.tolist(), sums.tolist() ):
+    buckets[ ( group[0], group[1], tuple( group[2:] ) ) ] = groupSums
+  return buckets
+
+def _aggregateBucketsOneByOne( bucketsLength, maxBucketTime, nowEpoch, records ):
+  buckets = {}
+  for startTime, endTime, keyIds, values in records:
+    values = [ float( v ) for v in values ]
+    numValues = len( values )
+    for bucketStartTime, proportion, bucketLength in getBuckets( bucketsLength, maxBucketTime, nowEpoch,
+                                                                 startTime, endTime ):
+      bucketKey = ( bucketStartTime, bucketLength, tuple( keyIds ) )
+      if bucketKey not in buckets:
+        buckets[ bucketKey ] = [ v * proportion for v in values ]
+      else:
+        bucketValues = buckets[ bucketKey ]
+        for i in range( numValues ):
+          bucketValues[i] += values[i] * proportion
+  return buckets
@@ -1,5 +1,6 @@
 import types
 from DIRAC.Core.Utilities import Time
+from DIRAC.AccountingSystem.private.RollupCache import gRollupCache
 
 class DBUtils:
 
@@ -40,6 +41,9 @@ class DBUtils:
     if not retVal[ 'OK' ]:
       return retVal
     connObj = retVal[ 'Value' ]
+    if gRollupCache.isCacheable( endTime, groupFields, orderFields ):
+      return gRollupCache.retrieveBucketedData( self._acDB, typeName, startTime, endTime, selectFields, condDict,
+                                                groupFields, orderFields, connObj = connObj )
     return self._acDB.retrieveBucketedData( typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, connObj = connObj )
 
   def _getUniqueValues( self, typeName, startTime, endTime, condDict, fieldList ):
@@ -7,92 +7,70 @@ import time
 import threading
 
 from DIRAC import S_OK, S_ERROR, gLogger, rootPath, gConfig
-from DIRAC.Core.Utilities import DictCache
+from DIRAC.Core.Utilities.DiskCache import DiskCache
 
 
 class DataCache:
 
   def __init__( self ):
     self.graphsLocation = os.path.join( gConfig.getValue( '/LocalSite/InstancePath', rootPath ), 'data', 'accountingPlots' )
-    self.cachedGraphs = {}
     self.alive = True
     self.purgeThread = threading.Thread( target = self.purgeExpired )
     self.purgeThread.setDaemon( 1 )
     self.purgeThread.start()
-    self.__dataCache = DictCache()
-    self.__graphCache = DictCache( deleteFunction = self._deleteGraph )
+    #Shared by all the ReportGenerator processes using the same location, and kept across restarts
+    self.__cache = DiskCache( self.graphsLocation )
     self.__dataLifeTime = 600
     self.__graphLifeTime = 3600
 
-  def setGraphsLocation( self, graphsDir ):
+  def setGraphsLocation( self, graphsDir, maxBytes = False ):
     self.graphsLocation = graphsDir
-    for graphName in os.listdir( self.graphsLocation ):
-      if graphName.find( ".png" ) > 0:
-        graphLocation = "%s/%s" % ( self.graphsLocation, graphName )
-        gLogger.verbose( "Purging %s" % graphLocation )
-        os.unlink( graphLocation )
+    retVal = self.__cache.setLocation( graphsDir, maxBytes )
+    if not retVal[ 'OK' ]:
+      gLogger.error( "Cannot use the plots cache location", retVal[ 'Message' ] )
 
   def purgeExpired( self ):
     while self.alive:
       time.sleep( 600 )
-      self.__graphCache.purgeExpired()
-      self.__dataCache.purgeExpired()
+      retVal = self.__cache.purgeExpired()
+      if not retVal[ 'OK' ]:
+        gLogger.error( "Cannot purge the plots cache", retVal[ 'Message' ] )
 
   def getReportData( self, reportRequest, reportHash, dataFunc ):
     """
     Get report data from cache if exists, else generate it
     """
-    reportData = self.__dataCache.get( reportHash )
-    if reportData == False:
+    def generateData():
       retVal = dataFunc( reportRequest )
       if not retVal[ 'OK' ]:
         return retVal
-      reportData = retVal[ 'Value' ]
-      self.__dataCache.add( reportHash, self.__dataLifeTime, reportData )
-    return S_OK( reportData )
+      return S_OK( ( retVal[ 'Value' ], [] ) )
+
+    return self.__cache.getOrGenerate( "data:%s" % reportHash, self.__dataLifeTime, generateData )
 
   def getReportPlot( self, reportRequest, reportHash, reportData, plotFunc ):
     """
     Get report data from cache if exists, else generate it
     """
-    plotDict = self.__graphCache.get( reportHash )
-    if plotDict == False:
+    def generatePlot():
       basePlotFileName = "%s/%s" % ( self.graphsLocation, reportHash )
       retVal = plotFunc( reportRequest, reportData, basePlotFileName )
       if not retVal[ 'OK' ]:
         return retVal
       plotDict = retVal[ 'Value' ]
+      fileNames = []
       if plotDict[ 'plot' ]:
         plotDict[ 'plot' ] = "%s.png" % reportHash
+        fileNames.append( plotDict[ 'plot' ] )
       if plotDict[ 'thumbnail' ]:
         plotDict[ 'thumbnail' ] = "%s.thb.png" % reportHash
-      self.__graphCache.add( reportHash, self.__graphLifeTime, plotDict )
-    return S_OK( plotDict )
+        fileNames.append( plotDict[ 'thumbnail' ] )
+      return S_OK( ( plotDict, fileNames ) )
 
-  def getPlotData( self, plotFileName ):
-    filename = "%s/%s" % ( self.graphsLocation, plotFileName )
-    try:
-      fd = file( filename, "rb" )
-      data = fd.read()
-      fd.close()
-    except Exception, e:
-      return S_ERROR( "Can't open file %s: %s" % ( plotFileName, str( e ) ) )
-    return S_OK( data )
-
-  def _deleteGraph( self, plotDict ):
-    try:
-      for key in plotDict:
-        value = plotDict[ key ]
-        if value:
-          fPath = os.path.join( self.graphsLocation, str( value ) )
-          if os.path.isfile( fPath ):
-            gLogger.info( "Deleting plot from cache", value )
-            os.unlink( fPath )
-          else:
-            gLogger.info( "Plot has already been deleted", value )
-    except:
-      pass
+    return self.__cache.getOrGenerate( "plot:%s" % reportHash, self.__graphLifeTime, generatePlot )
 
+  def getPlotData( self, plotFileName ):
+    return self.__cache.getFile( plotFileName )
 
 
 gDataCache = DataCache()
@@ -0,0 +1,215 @@
+# $HeadURL$
+"""
+  Cache of the per bucket rows of the accounting plots
+
+  The plots query the buckets grouped by startTime, so the rows of a query are the union of the rows
+  of its buckets. The rows are kept for each query shape ( type, select, conditions, grouping and
+  ordering ) with the time range they cover, and a query only goes to the DB for the buckets out of
+  that range, usually the trailing ones since the previous plot.
+
+  The buckets are written by the DataStore in other processes, which log the changed types with the
+  start of the changed buckets in the buckets changes table of the AccountingDB. The changes are
+  polled before answering from the cache and the cached rows from the first changed bucket on are
+  dropped, to be fetched again.
+"""
+__RCSID__ = "$Id$"
+
+import copy
+import time
+import threading
+
+from DIRAC import S_OK, gLogger
+from DIRAC.Core.Utilities import Time
+
+class RollupCache:
+
+  def __init__( self, maxEntries = 500, lifeTime = 86400, pollMargin = 120 ):
+    self.__maxEntries = maxEntries
+    #Has to be shorter than the time the DB keeps the buckets changes
+    self.__lifeTime = lifeTime
+    #Changes are polled back this far, for the transactions committed late and the clock skews
+    self.__pollMargin = pollMargin
+    self.__lock = threading.Lock()
+    # { typeName : { queryKey : [ coverStart, coverEnd, { startTime : [ rows ] }, creationTime, lastAccess ] } }
+    self.__entries = {}
+    self.__numEntries = 0
+    # { typeName : number of invalidations }, to discard the rows fetched while the buckets changed
+    self.__invalidations = {}
+    # { changeId : changeTime } of the changes already applied
+    self.__appliedChanges = {}
+    self.__lastPoll = time.time()
+    self.__log = gLogger.getSubLogger( "RollupCache" )
+
+  def isCacheable( self, endTime, groupFields, orderFields ):
+    """
+    Only the queries with one row set per bucket can be answered bucket by bucket
+    """
+    if not endTime or not groupFields or len( groupFields ) < 2:
+      return False
+    if 'startTime' not in groupFields[1]:
+      return False
+    if orderFields and ( orderFields[0] != '%s' or list( orderFields[1] ) != [ 'startTime' ] ):
+      return False
+    return True
+
+  def __getQueryKey( self, selectFields, condDict, groupFields, orderFields ):
+    condList = []
+    if condDict:
+      condList = [ ( key, repr( condDict[ key ] ) ) for key in sorted( condDict ) ]
+    canonical = []
+    for fields in ( selectFields, groupFields, orderFields ):
+      if fields:
+        canonical.append( ( fields[0], tuple( fields[1] ) ) )
+      else:
+        canonical.append( None )
+    return ( canonical[0], tuple( condList ), canonical[1], canonical[2] )
+
+  def __syncChanges( self, db ):
+    """
+    Apply the buckets changes logged since the last poll
+    """
+    pollTime = time.time()
+    since = int( self.__lastPoll - self.__pollMargin )
+    retVal = db.getBucketsChanges( since )
+    if not retVal[ 'OK' ]:
+      return retVal
+    self.__lock.acquire()
+    try:
+      for changeId, typeName, changeStart, changeTime in retVal[ 'Value' ]:
+        if changeId in self.__appliedChanges:
+          continue
+        self.__appliedChanges[ changeId ] = changeTime
+        self.__invalidate( typeName, changeStart )
+      for changeId in [ changeId for changeId in self.__appliedChanges if self.__appliedChanges[ changeId ] < since ]:
+        del self.__appliedChanges[ changeId ]
+      self.__lastPoll = pollTime
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def __invalidate( self, typeName, changeStart ):
+    """
+    Drop the cached rows of the buckets starting at changeStart or later. Lock has to be held
+    """
+    self.__invalidations[ typeName ] = self.__invalidations.get( typeName, 0 ) + 1
+    typeEntries = self.__entries.get( typeName, {} )
+    for queryKey in typeEntries.keys():
+      entry = typeEntries[ queryKey ]
+      if changeStart <= entry[0]:
+        del typeEntries[ queryKey ]
+        self.__numEntries -= 1
+        continue
+      if changeStart <= entry[1]:
+        entry[1] = changeStart - 1
+        for bucketStart in [ bucketStart for bucketStart in entry[2] if bucketStart >= changeStart ]:
+          del entry[2][ bucketStart ]
+
+  def invalidate( self, typeName, changeStart = 0 ):
+    """
+    Drop the cached rows of a type from changeStart on
+    """
+    self.__lock.acquire()
+    try:
+      self.__invalidate( typeName, changeStart )
+    finally:
+      self.__lock.release()
+
+  def __purge( self ):
+    """
+    Drop the expired entries and the least recently used ones over the limit. Lock has to be held
+    """
+    limit = time.time() - self.__lifeTime
+    allEntries = []
+    for typeName in self.__entries.keys():
+      typeEntries = self.__entries[ typeName ]
+      for queryKey in typeEntries.keys():
+        if typeEntries[ queryKey ][3] < limit:
+          del typeEntries[ queryKey ]
+        else:
+          allEntries.append( ( typeEntries[ queryKey ][4], typeName, queryKey ) )
+      if not typeEntries:
+        del self.__entries[ typeName ]
+    allEntries.sort()
+    for lastAccess, typeName, queryKey in allEntries[ :max( 0, len( allEntries ) - self.__maxEntries ) ]:
+      del self.__entries[ typeName ][ queryKey ]
+    self.__numEntries = min( len( allEntries ), self.__maxEntries )
+
+  def __fetchRows( self, db, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields, connObj ):
+    """
+    Get { startTime : [ rows ] } for the buckets between startTime and endTime
+    """
+    timedSelect = ( "%%s, %s" % selectFields[0], [ 'startTime' ] + list( selectFields[1] ) )
+    #The DB rewrites the field lists and the conditions while building the query
+    retVal = db.retrieveBucketedData( typeName, startTime, endTime, timedSelect,
+                                      copy.deepcopy( condDict ), copy.deepcopy( groupFields ),
+                                      copy.deepcopy( orderFields ), connObj = connObj )
+    if not retVal[ 'OK' ]:
+      return retVal
+    bucketRows = {}
+    for row in retVal[ 'Value' ]:
+      if startTime <= row[0] <= endTime:
+        bucketRows.setdefault( row[0], [] ).append( tuple( row[1:] ) )
+    return S_OK( bucketRows )
+
+  def retrieveBucketedData( self, db, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields,
+                            connObj = False ):
+    """
+    Get the rows of a query as db.retrieveBucketedData does, from the cache for the buckets it has
+    """
+    retVal = self.__syncChanges( db )
+    if not retVal[ 'OK' ]:
+      self.__log.error( "Cannot get the buckets changes, not using the cache", retVal[ 'Message' ] )
+      return db.retrieveBucketedData( typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields,
+                                      connObj = connObj )
+    nowEpoch = Time.toEpoch()
+    startTime = int( startTime )
+    endTime = int( endTime )
+    startTime = startTime - startTime % db.calculateBucketLengthForTime( typeName, nowEpoch, startTime )
+    queryKey = self.__getQueryKey( selectFields, condDict, groupFields, orderFields )
+    self.__lock.acquire()
+    try:
+      invalidations = self.__invalidations.get( typeName, 0 )
+      entry = self.__entries.get( typeName, {} ).get( queryKey, None )
+      if entry and entry[3] >= time.time() - self.__lifeTime:
+        entry[4] = time.time()
+        coverStart, coverEnd, bucketRows, creationTime = entry[0], entry[1], dict( entry[2] ), entry[3]
+      else:
+        coverStart, coverEnd, bucketRows, creationTime = startTime, startTime - 1, {}, time.time()
+    finally:
+      self.__lock.release()
+    #Only the contiguous ranges next to the cached one are fetched
+    if startTime < coverStart or endTime < coverStart or startTime > coverEnd + 1:
+      coverStart, coverEnd, bucketRows, creationTime = startTime, startTime - 1, {}, time.time()
+    toFetch = []
+    if startTime < coverStart:
+      toFetch.append( ( startTime, coverStart - 1 ) )
+    if endTime > coverEnd:
+      toFetch.append( ( coverEnd + 1, endTime ) )
+    for fetchStart, fetchEnd in toFetch:
+      retVal = self.__fetchRows( db, typeName, fetchStart, fetchEnd, selectFields, condDict, groupFields, orderFields,
+                                 connObj )
+      if not retVal[ 'OK' ]:
+        return retVal
+      bucketRows.update( retVal[ 'Value' ] )
+      coverStart = min( coverStart, fetchStart )
+      coverEnd = max( coverEnd, fetchEnd )
+    if toFetch:
+      self.__lock.acquire()
+      try:
+        #Rows fetched while the buckets of the type changed may be stale, they are not kept
+        if self.__invalidations.get( typeName, 0 ) == invalidations:
+          if queryKey not in self.__entries.get( typeName, {} ):
+            if self.__numEntries >= self.__maxEntries:
+              self.__purge()
+            self.__numEntries += 1
+          self.__entries.setdefault( typeName, {} )[ queryKey ] = [ coverStart, coverEnd, bucketRows,
+                                                                    creationTime, time.time() ]
+      finally:
+        self.__lock.release()
+    rows = []
+    for bucketStart in sorted( bucketRows ):
+      if startTime <= bucketStart <= endTime:
+        rows.extend( bucketRows[ bucketStart ] )
+    return S_OK( tuple( rows ) )
+
+gRollupCache = RollupCache()
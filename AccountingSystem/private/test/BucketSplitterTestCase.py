@@ -0,0 +1,82 @@
+########################################################################
+# $HeadURL $
+# File: BucketSplitterTestCase.py
+########################################################################
+
+""".. module:: BucketSplitterTestCase
+
+Test cases for DIRAC.AccountingSystem.private.BucketSplitter module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import random
+import unittest
+## SUT
+from DIRAC.AccountingSystem.private import BucketSplitter
+
+BUCKETS_LENGTH = [ ( 86400, 900 ), ( 86400 * 7, 3600 ), ( 86400 * 35, 86400 ) ]
+MAX_BUCKET_TIME = 604800
+NOW = 1300000000
+
+########################################################################
+class BucketSplitterTestCase( unittest.TestCase ):
+  """py:class BucketSplitterTestCase
+  Test case for DIRAC.AccountingSystem.private.BucketSplitter module.
+  """
+
+  def setUp( self ):
+    random.seed( 1 )
+    self.records = []
+    for i in range( 2000 ):
+      endTime = NOW - random.randint( 0, 86400 * 40 )
+      startTime = endTime - random.choice( [ 0, 60, 3600, 36000, 86400 * 3 ] )
+      self.records.append( ( startTime, endTime, ( random.randint( 1, 3 ), random.randint( 1, 5 ) ),
+                             [ random.randint( 0, 1000 ), random.random(), 1 ] ) )
+    self.numpy = BucketSplitter.numpy
+
+  def tearDown( self ):
+    BucketSplitter.numpy = self.numpy
+
+  def __checkAggregation( self ):
+    expected = {}
+    for startTime, endTime, keyIds, values in self.records:
+      for bucketStartTime, proportion, bucketLength in BucketSplitter.getBuckets( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW,
+                                                                                  startTime, endTime ):
+        bucketValues = expected.setdefault( ( bucketStartTime, bucketLength, keyIds ), [ 0.0 ] * len( values ) )
+        for i in range( len( values ) ):
+          bucketValues[i] += values[i] * proportion
+    buckets = BucketSplitter.aggregateBuckets( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, self.records )
+    self.assertEqual( sorted( buckets.keys() ), sorted( expected.keys() ) )
+    for bucketKey in expected:
+      for value, expectedValue in zip( buckets[ bucketKey ], expected[ bucketKey ] ):
+        self.assertAlmostEqual( value, expectedValue, 6 )
+    #The entries are kept
+    self.assertAlmostEqual( sum( [ values[-1] for values in buckets.values() ] ), len( self.records ), 6 )
+
+  def testBuckets( self ):
+    """ granularity and proportions of the buckets of a record """
+    self.assertEqual( BucketSplitter.getBucketLength( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, NOW - 3600 ), 900 )
+    self.assertEqual( BucketSplitter.getBucketLength( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, NOW - 86400 * 2 ), 3600 )
+    self.assertEqual( BucketSplitter.getBucketLength( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, NOW - 86400 * 50 ), MAX_BUCKET_TIME )
+    startTime = NOW - NOW % 900 - 1800
+    self.assertEqual( BucketSplitter.getBuckets( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, startTime + 450, startTime + 1350 ),
+                      [ ( startTime, 0.5, 900 ), ( startTime + 900, 0.5, 900 ) ] )
+    self.assertEqual( BucketSplitter.getBuckets( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, startTime + 1, startTime + 1 ),
+                      [ ( startTime, 1, 900 ) ] )
+
+  def testAggregation( self ):
+    """ vectorized and one by one aggregations give the buckets of getBuckets """
+    if self.numpy is not None:
+      self.__checkAggregation()
+    BucketSplitter.numpy = None
+    self.__checkAggregation()
+    self.assertEqual( BucketSplitter.aggregateBuckets( BUCKETS_LENGTH, MAX_BUCKET_TIME, NOW, [] ), {} )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( BucketSplitterTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
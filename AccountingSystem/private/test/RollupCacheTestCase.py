@@ -0,0 +1,122 @@
+########################################################################
+# $HeadURL $
+# File: RollupCacheTestCase.py
+########################################################################
+
+""".. module:: RollupCacheTestCase
+
+Test cases for DIRAC.AccountingSystem.private.RollupCache module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import time
+import unittest
+## SUT
+from DIRAC import S_OK
+from DIRAC.AccountingSystem.private.RollupCache import RollupCache
+
+TYPE_NAME = "Test_Job"
+BUCKET_LENGTH = 3600
+
+class FakeDB:
+  """ buckets of one hour with a value per site, logging the changes as the AccountingDB """
+
+  def __init__( self ):
+    self.buckets = {}
+    self.changes = []
+    self.queries = []
+
+  def addBucket( self, startTime, site, value ):
+    self.buckets[ ( startTime, site ) ] = self.buckets.get( ( startTime, site ), 0 ) + value
+    self.changes.append( ( len( self.changes ) + 1, TYPE_NAME, startTime, int( time.time() ) ) )
+
+  def getBucketsChanges( self, sinceEpoch ):
+    return S_OK( tuple( [ change for change in self.changes if change[3] >= sinceEpoch ] ) )
+
+  def calculateBucketLengthForTime( self, typeName, now, when ):
+    return BUCKET_LENGTH
+
+  def retrieveBucketedData( self, typeName, startTime, endTime, selectFields, condDict, groupFields, orderFields,
+                            connObj = False ):
+    self.queries.append( ( startTime, endTime ) )
+    groupFields[1][0] = "mangled"
+    rows = []
+    for ( bucketStart, site ), value in sorted( self.buckets.items() ):
+      if startTime <= bucketStart <= endTime and site in condDict.get( 'Site', [ site ] ):
+        fields = { 'startTime' : bucketStart, 'Site' : site, 'CPUTime' : value }
+        rows.append( tuple( [ fields[ field ] for field in selectFields[1] ] ) )
+    return S_OK( tuple( rows ) )
+
+########################################################################
+class RollupCacheTestCase( unittest.TestCase ):
+  """py:class RollupCacheTestCase
+  Test case for DIRAC.AccountingSystem.private.RollupCache module.
+  """
+
+  def setUp( self ):
+    self.db = FakeDB()
+    for hour in range( 10 ):
+      self.db.addBucket( hour * BUCKET_LENGTH, "A", hour )
+      self.db.addBucket( hour * BUCKET_LENGTH, "B", 100 + hour )
+    self.cache = RollupCache()
+
+  def query( self, startTime, endTime, sites = None ):
+    condDict = {}
+    if sites:
+      condDict[ 'Site' ] = sites
+    return self.cache.retrieveBucketedData( self.db, TYPE_NAME, startTime, endTime,
+                                            ( "%s, %s, %s", [ 'Site', 'startTime', 'CPUTime' ] ), condDict,
+                                            ( "%s, %s", [ 'startTime', 'Site' ] ), ( "%s", [ 'startTime' ] ) )
+
+  def expected( self, startTime, endTime, sites = ( "A", "B" ) ):
+    rows = []
+    for ( bucketStart, site ), value in sorted( self.db.buckets.items() ):
+      if startTime <= bucketStart <= endTime and site in sites:
+        rows.append( ( site, bucketStart, value ) )
+    return tuple( rows )
+
+  def test_01_isCacheable( self ):
+    """ only the queries grouped by startTime """
+    self.assertEqual( self.cache.isCacheable( 100, ( "%s, %s", [ 'startTime', 'Site' ] ), ( "%s", [ 'startTime' ] ) ), True )
+    self.assertEqual( self.cache.isCacheable( 100, ( "%s", [ 'Site' ] ), None ), False )
+    self.assertEqual( self.cache.isCacheable( 100, ( "%s, %s", [ 'startTime', 'Site' ] ), ( "%s", [ 'Site' ] ) ), False )
+    self.assertEqual( self.cache.isCacheable( None, ( "%s", [ 'startTime' ] ), None ), False )
+
+  def test_02_incremental( self ):
+    """ only the buckets out of the cached range are queried """
+    result = self.query( 0, 5 * BUCKET_LENGTH )
+    self.assertEqual( result[ 'OK' ], True )
+    self.assertEqual( result[ 'Value' ], self.expected( 0, 5 * BUCKET_LENGTH ) )
+    self.assertEqual( self.db.queries, [ ( 0, 5 * BUCKET_LENGTH ) ] )
+    result = self.query( 1800, 5 * BUCKET_LENGTH )
+    self.assertEqual( result[ 'Value' ], self.expected( 0, 5 * BUCKET_LENGTH ) )
+    self.assertEqual( len( self.db.queries ), 1 )
+    result = self.query( 2 * BUCKET_LENGTH, 9 * BUCKET_LENGTH )
+    self.assertEqual( result[ 'Value' ], self.expected( 2 * BUCKET_LENGTH, 9 * BUCKET_LENGTH ) )
+    self.assertEqual( self.db.queries[1:], [ ( 5 * BUCKET_LENGTH + 1, 9 * BUCKET_LENGTH ) ] )
+    ## other conditions are another entry
+    result = self.query( 0, 5 * BUCKET_LENGTH, [ "B" ] )
+    self.assertEqual( result[ 'Value' ], self.expected( 0, 5 * BUCKET_LENGTH, [ "B" ] ) )
+    self.assertEqual( len( self.db.queries ), 3 )
+
+  def test_03_invalidation( self ):
+    """ the changed buckets are queried again """
+    self.query( 0, 9 * BUCKET_LENGTH )
+    self.db.addBucket( 7 * BUCKET_LENGTH, "A", 1000 )
+    result = self.query( 0, 9 * BUCKET_LENGTH )
+    self.assertEqual( result[ 'Value' ], self.expected( 0, 9 * BUCKET_LENGTH ) )
+    self.assertEqual( self.db.queries, [ ( 0, 9 * BUCKET_LENGTH ), ( 7 * BUCKET_LENGTH, 9 * BUCKET_LENGTH ) ] )
+    ## a change before the cached range drops the entry
+    self.db.addBucket( 0, "B", 1000 )
+    result = self.query( 0, 9 * BUCKET_LENGTH )
+    self.assertEqual( result[ 'Value' ], self.expected( 0, 9 * BUCKET_LENGTH ) )
+    self.assertEqual( self.db.queries[-1], ( 0, 9 * BUCKET_LENGTH ) )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( RollupCacheTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
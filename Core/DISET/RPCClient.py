@@ -33,6 +33,13 @@ class RPCClient:
     retVal = self.__innerRPCClient.executeRPC( sFunctionName, args )
     return retVal
 
+  def streamRPC( self, sFunctionName, *args ):
+    """
+    Execute the RPC action and iterate the returned list or dict lazily
+    instead of receiving it all at once. See InnerRPCClient.executeStreamingRPC
+    """
+    return self.__innerRPCClient.executeStreamingRPC( sFunctionName, args )
+
   def __getattr__( self, attrName ):
     """
     Function for emulating the existance of functions
@@ -4,6 +4,10 @@ __RCSID__ = "$Id$"
 import sys
 import types
 import thread
+try:
+  from hashlib import md5
+except:
+  from md5 import md5
 import DIRAC
 from DIRAC.Core.DISET.private.Protocols import gProtocolDict
 from DIRAC.FrameworkSystem.Client.Logger import gLogger
@@ -31,6 +35,7 @@ class BaseClient:
   KW_PROXY_CHAIN = "proxyChain"
   KW_SKIP_CA_CHECK = "skipCACheck"
   KW_KEEP_ALIVE_LAPSE = "keepAliveLapse"
+  KW_KEEP_CONNECTED = "keepConnected"
 
   def __init__( self, serviceName, **kwargs ):
     if type( serviceName ) != types.StringType:
@@ -43,7 +48,7 @@ class BaseClient:
     for initFunc in ( self.__discoverSetup, self.__discoverVO, self.__discoverTimeout,
                       self.__discoverURL, self.__discoverCredentialsToUse,
                       self.__discoverExtraCredentials, self.__checkTransportSanity,
-                      self.__setKeepAliveLapse ):
+                      self.__setKeepAliveLapse, self.__discoverConnectionReuse ):
       result = initFunc()
       if not result[ 'OK' ] and self.__initStatus[ 'OK' ]:
         self.__initStatus = result
@@ -212,12 +217,15 @@ and this is thread %s
   def _disconnect( self, trid ):
     getGlobalTransportPool().close( trid )
 
-  def _proposeAction( self, transport, action ):
+  def _proposeAction( self, transport, action, keepConnected = False ):
     if not self.__initStatus[ 'OK' ]:
       return self.__initStatus
     stConnectionInfo = ( ( self.__URLTuple[3], self.setup, self.vo ),
                          action,
                          self.__extraCredentials )
+    if keepConnected:
+      #Servers not supporting persistent connections just ignore this
+      stConnectionInfo += ( { 'keepConnected' : True }, )
     retVal = transport.sendData( S_OK( stConnectionInfo ) )
     if not retVal[ 'OK' ]:
       return retVal
@@ -263,6 +271,48 @@ and this is thread %s
     self.kwargs[ self.KW_KEEP_ALIVE_LAPSE ] = kaa
     return S_OK()
 
+  def __discoverConnectionReuse( self ):
+    #Can the connection be reused by following actions?
+    if self.KW_KEEP_CONNECTED in self.kwargs:
+      self.keepConnected = bool( self.kwargs[ self.KW_KEEP_CONNECTED ] )
+    else:
+      self.keepConnected = gConfig.getValue( "/DIRAC/Connections/KeepConnected", True )
+    if not self.__initStatus[ 'OK' ]:
+      self.__poolKey = False
+      return S_OK()
+    #Connections can only be shared between clients with the same destination and credentials
+    proxyString = self.kwargs.get( self.KW_PROXY_STRING, "" )
+    if proxyString:
+      proxyString = md5( proxyString ).hexdigest()
+    self.__poolKey = ( self.serviceURL, self.useCertificates, self.kwargs.get( self.KW_PROXY_LOCATION, "" ),
+                       proxyString, self.kwargs[ self.KW_SKIP_CA_CHECK ], self.timeout,
+                       str( self.__extraCredentials ) )
+    return S_OK()
+
+  def _getIdleConnection( self ):
+    """
+    Get an already established connection to the service, if any
+    """
+    if not self.__initStatus[ 'OK' ] or not self.__poolKey:
+      return False
+    trPool = getGlobalTransportPool()
+    trid = trPool.getIdle( self.__poolKey )
+    if not trid:
+      return False
+    transport = trPool.get( trid )
+    if not transport:
+      return False
+    gLogger.debug( "Reusing connection to %s" % self.serviceURL )
+    return ( trid, transport )
+
+  def _releaseConnection( self, trid ):
+    """
+    Keep the connection open to be reused by following actions
+    """
+    if not self.__poolKey:
+      return self._disconnect( trid )
+    getGlobalTransportPool().releaseIdle( self.__poolKey, trid )
+
   def _getBaseStub( self ):
     newKwargs = dict( self.kwargs )
     #Set DN
@@ -79,6 +79,10 @@ class GatewayService( Service ):
       self._transportPool.close( trid )
     return result
 
+  def _processProposal( self, trid, proposalTuple, clientInitArgs ):
+    #Connections are not kept through the gateway, drop the options asking for it
+    return Service._processProposal( self, trid, proposalTuple[:3], clientInitArgs )
+
   def _receiveAndCheckProposal( self, trid ):
     clientTransport = self._transportPool.get( trid )
     #Get the peer credentials
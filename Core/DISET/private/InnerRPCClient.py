@@ -4,17 +4,73 @@ __RCSID__ = "$Id$"
 import types
 from DIRAC.Core.DISET.private.BaseClient import BaseClient
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+from DIRAC.Core.Utilities.DEncode import StreamDecoder
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
 
 
 class InnerRPCClient( BaseClient ):
 
   def executeRPC( self, functionName, args ):
+    stub = ( self._getBaseStub(), functionName, args )
+    if self.keepConnected:
+      connection = self._getIdleConnection()
+      if connection:
+        proposed, retVal = self.__executeInConnection( connection, functionName, args, stub )
+        if proposed:
+          return retVal
+        #The server may have dropped the idle connection. Nothing has been executed so try again
+        gLogger.debug( "Reused connection failed. Retrying with a new one", retVal[ 'Message' ] )
+    retVal = self._connect()
+    if not retVal[ 'OK' ]:
+      retVal[ 'rpcStub' ] = stub
+      return retVal
+    return self.__executeInConnection( retVal[ 'Value' ], functionName, args, stub )[1]
+
+  def __executeInConnection( self, connection, functionName, args, stub ):
+    """
+    Execute the RPC using the given connection.
+    Returns ( proposal accepted, result )
+    """
+    trid, transport = connection
+    keepConnected = False
+    try:
+      retVal = self._proposeAction( transport, ( "RPC", functionName ), self.keepConnected )
+      if not retVal[ 'OK' ]:
+        retVal[ 'rpcStub' ] = stub
+        return ( False, retVal )
+      #Only keep the connection if the server has agreed to keep it too
+      keepConnected = self.keepConnected and retVal.get( 'keepConnected', False )
+      retVal = transport.sendData( S_OK( args ) )
+      if not retVal[ 'OK' ]:
+        keepConnected = False
+        return ( True, retVal )
+      receivedData = transport.receiveData()
+      if type( receivedData ) == types.DictType:
+        receivedData[ 'rpcStub' ] = stub
+      #Errors may come from the connection itself. Don't reuse it then
+      if type( receivedData ) != types.DictType or not receivedData.get( 'OK', False ):
+        keepConnected = False
+      return ( True, receivedData )
+    finally:
+      if keepConnected:
+        self._releaseConnection( trid )
+      else:
+        self._disconnect( trid )
+
+  def executeStreamingRPC( self, functionName, args ):
+    """
+    Execute the RPC without decoding the whole reply at once. If the call succeeds
+    the 'Value' of the result is an iterator over the elements of the returned
+    list, or over the ( key, value ) items of the returned dict. The connection
+    is kept open until the iterator is exhausted or discarded
+    """
     stub = ( self._getBaseStub(), functionName, args )
     retVal = self._connect()
     if not retVal[ 'OK' ]:
       retVal[ 'rpcStub' ] = stub
       return retVal
     trid, transport = retVal[ 'Value' ]
+    streaming = False
     try:
       retVal = self._proposeAction( transport, ( "RPC", functionName ) )
       if not retVal[ 'OK' ]:
@@ -23,10 +79,38 @@ class InnerRPCClient( BaseClient ):
       retVal = transport.sendData( S_OK( args ) )
       if not retVal[ 'OK' ]:
         return retVal
-      receivedData = transport.receiveData()
-      if type( receivedData ) == types.DictType:
-        receivedData[ 'rpcStub' ] = stub
-      return receivedData
+      retVal = transport.receiveDataStream()
+      if not retVal[ 'OK' ]:
+        return retVal
+      decoder = StreamDecoder( retVal[ 'Value' ] )
+      try:
+        if decoder.openContainer() != "d":
+          return S_ERROR( "RPC reply is not a return structure" )
+        result = {}
+        while not decoder.closeContainer():
+          key = decoder.decodeObject()
+          if key == 'Value' and result.get( 'OK', False ) and decoder.peekType() in ( "l", "t", "d" ):
+            result[ 'Value' ] = self.__iterStreamedValue( trid, decoder, result )
+            result[ 'rpcStub' ] = stub
+            streaming = True
+            return result
+          result[ key ] = decoder.decodeObject()
+      except Exception, e:
+        return S_ERROR( "Could not decode received data: %s" % str( e ) )
+      #Nothing to stream
+      result[ 'rpcStub' ] = stub
+      return result
     finally:
-      self._disconnect( trid )
+      if not streaming:
+        self._disconnect( trid )
 
+  def __iterStreamedValue( self, trid, decoder, result ):
+    try:
+      for item in decoder.iterContainer():
+        yield item
+      #Anything after the value goes into the result
+      while not decoder.closeContainer():
+        key = decoder.decodeObject()
+        result[ key ] = decoder.decodeObject()
+    finally:
+      self._disconnect( trid )
@@ -1,6 +1,8 @@
 
 import os
 import time
+import select
+import socket
 import DIRAC
 import threading
 from DIRAC import gConfig, gLogger, S_OK, S_ERROR, gMonitor
@@ -45,6 +47,9 @@ class Service:
     self._transportPool = getGlobalTransportPool()
     self.__cloneId = 0
     self.__maxFD = 0
+    self.__idleConnections = {}
+    self.__idleLock = threading.Lock()
+    self.__listeningIdle = False
 
   def setCloneProcessId( self, cloneId ):
     self.__cloneId = cloneId
@@ -277,7 +282,11 @@ class Service:
                                              args = ( clientTransport, ) )
 
   #Threaded process function
-  def _processInThread( self, clientTransport ):
+  def _processInThread( self, clientTransport, trid = False ):
+    """
+    Process a proposal from a client. If trid is defined the connection
+    has already been used for previous proposals
+    """
     self.__maxFD = max( self.__maxFD, clientTransport.oSocket.fileno() )
     self._lockManager.lockGlobal()
     try:
@@ -285,22 +294,31 @@ class Service:
     except Exception, e:
       monReport = False
     try:
-      #Handshake
-      try:
-        result = clientTransport.handshake()
-        if not result[ 'OK' ]:
-          clientTransport.close()
+      reusedConnection = bool( trid )
+      if not reusedConnection:
+        #Handshake
+        try:
+          result = clientTransport.handshake()
+          if not result[ 'OK' ]:
+            clientTransport.close()
+            return
+        except:
+          return
+        #Add to the transport pool
+        trid = self._transportPool.add( clientTransport )
+        if not trid:
           return
-      except:
-        return
-      #Add to the transport pool
-      trid = self._transportPool.add( clientTransport )
-      if not trid:
-        return
       #Receive and check proposal
-      result = self._receiveAndCheckProposal( trid )
+      result = self._receiveAndCheckProposal( trid, reusedConnection )
       if not result[ 'OK' ]:
-        self._transportPool.sendAndClose( trid, result )
+        if 'connectionClosed' in result:
+          #Client just went away
+          self._transportPool.close( trid )
+        else:
+          self._transportPool.sendAndClose( trid, result )
+        return
+      if 'keepAlive' in result and result[ 'keepAlive' ]:
+        self.__addIdleConnection( trid )
         return
       proposalTuple = result[ 'Value' ]
       #Instantiate handler
@@ -316,12 +334,76 @@ class Service:
         if not result[ 'OK' ]:
           gLogger.error( "Error processing proposal: %s" % result[ 'Message' ] )
         self._transportPool.close( trid )
+      elif 'keepConnected' in result and result[ 'keepConnected' ]:
+        #Wait for the next proposal without holding a thread
+        self.__addIdleConnection( trid )
       return result
     finally:
       self._lockManager.unlockGlobal()
       if monReport:
         self.__endReportToMonitoring( *monReport )
 
+  #Persistent connections waiting for the next proposal
+
+  def __addIdleConnection( self, trid ):
+    self.__idleLock.acquire()
+    try:
+      if len( self.__idleConnections ) < self._cfg.getMaxIdleConnections():
+        self.__idleConnections[ trid ] = time.time()
+        if not self.__listeningIdle:
+          self.__listeningIdle = True
+          idleThread = threading.Thread( target = self.__listenIdleConnections )
+          idleThread.setDaemon( True )
+          idleThread.start()
+        return
+    finally:
+      self.__idleLock.release()
+    gLogger.verbose( "Too many idle connections. Closing", trid )
+    self._transportPool.close( trid )
+
+  def __listenIdleConnections( self ):
+    while True:
+      expired = []
+      self.__idleLock.acquire()
+      try:
+        now = time.time()
+        idleTimeout = self._cfg.getIdleConnectionTimeout()
+        sIdList = []
+        for trid in list( self.__idleConnections ):
+          transport = self._transportPool.get( trid )
+          if not transport or now - self.__idleConnections[ trid ] > idleTimeout:
+            del( self.__idleConnections[ trid ] )
+            if transport:
+              expired.append( trid )
+            continue
+          sIdList.append( ( trid, transport ) )
+        if not sIdList and not expired:
+          self.__listeningIdle = False
+          return
+      finally:
+        self.__idleLock.release()
+      for trid in expired:
+        gLogger.debug( "Closing idle connection", trid )
+        self._transportPool.close( trid )
+      if not sIdList:
+        continue
+      try:
+        inList = select.select( [ idTuple[1].getSocket() for idTuple in sIdList ], [], [], 1 )[0]
+      except ( socket.error, select.error ):
+        time.sleep( 0.001 )
+        continue
+      for trid, transport in sIdList:
+        if transport.getSocket() not in inList:
+          continue
+        self.__idleLock.acquire()
+        try:
+          if trid not in self.__idleConnections:
+            continue
+          del( self.__idleConnections[ trid ] )
+        finally:
+          self.__idleLock.release()
+        self._threadPool.generateJobAndQueueIt( self._processInThread,
+                                                 args = ( transport, trid ) )
 
   def _createIdentityString( self, credDict, clientTransport = False ):
     if 'username' in credDict:
@@ -339,17 +421,25 @@ class Service:
       identity += "(%s)" % credDict[ 'DN' ]
     return identity
 
-  def _receiveAndCheckProposal( self, trid ):
+  def _receiveAndCheckProposal( self, trid, reusedConnection = False ):
     clientTransport = self._transportPool.get( trid )
     #Get the peer credentials
     credDict = clientTransport.getConnectingCredentials()
     #Receive the action proposal
-    retVal = clientTransport.receiveData( 1024 )
+    retVal = clientTransport.receiveData( 1024, blockAfterKeepAlive = not reusedConnection )
     if not retVal[ 'OK' ]:
+      if reusedConnection:
+        gLogger.debug( "Persistent connection closed", "%s %s" % ( self._createIdentityString( credDict,
+                                                                                             clientTransport ),
+                                                                 retVal[ 'Message' ] ) )
+        retVal[ 'connectionClosed' ] = True
+        return retVal
       gLogger.error( "Invalid action proposal", "%s %s" % ( self._createIdentityString( credDict,
                                                                                         clientTransport ),
                                                             retVal[ 'Message' ] ) )
       return S_ERROR( "Invalid action proposal" )
+    if 'keepAlive' in retVal and retVal[ 'keepAlive' ]:
+      return retVal
     proposalTuple = retVal[ 'Value' ]
     gLogger.debug( "Received action from client", "/".join( list( proposalTuple[1] ) ) )
     #Check if there are extra credentials
@@ -444,15 +534,26 @@ class Service:
     return S_OK( handlerInstance )
 
   def _processProposal( self, trid, proposalTuple, handlerObj ):
-    #Notify the client we're ready to execute the action
-    retVal = self._transportPool.send( trid, S_OK() )
-    if not retVal[ 'OK' ]:
-      return retVal
-
     messageConnection = False
     if proposalTuple[1] == ( 'Connection', 'new' ):
       messageConnection = True
 
+    #Can the connection be kept for more proposals?
+    keepConnected = False
+    if proposalTuple[1][0] == 'RPC' and len( proposalTuple ) > 3:
+      try:
+        keepConnected = proposalTuple[3][ 'keepConnected' ] and self._cfg.getMaxIdleConnections() > 0
+      except ( KeyError, TypeError ):
+        pass
+
+    #Notify the client we're ready to execute the action
+    readyMsg = S_OK()
+    if keepConnected:
+      readyMsg[ 'keepConnected' ] = True
+    retVal = self._transportPool.send( trid, readyMsg )
+    if not retVal[ 'OK' ]:
+      return retVal
+
     if messageConnection:
 
       if self._msgBroker.getNumConnections() > self._cfg.getMaxMessagingConnections():
@@ -473,7 +574,8 @@ class Service:
       if not result[ 'OK' ]:
         self._msgBroker.removeTransport( trid )
 
-    result[ 'closeTransport' ] = not messageConnection or not result[ 'OK' ]
+    result[ 'closeTransport' ] = not ( messageConnection or keepConnected ) or not result[ 'OK' ]
+    result[ 'keepConnected' ] = keepConnected
     return result
 
   def _mbConnect( self, trid, handlerObj = False ):
@@ -68,6 +68,18 @@ class ServiceConfiguration:
     except:
       return 20
 
+  def getMaxIdleConnections( self ):
+    try:
+      return int( self.getOption( "MaxIdleConnections" ) )
+    except:
+      return 100
+
+  def getIdleConnectionTimeout( self ):
+    try:
+      return int( self.getOption( "IdleConnectionTimeout" ) )
+    except:
+      return 60
+
   def getMaxThreadsForMethod( self, actionType, method ):
     try:
       return int( self.getOption( "ThreadLimit/%s/%s" % ( actionType, method ) ) )
@@ -6,6 +6,11 @@ from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 
 class TransportPool:
 
+  #Max time (secs) a released connection can wait to be reused
+  iMaxIdleTime = 30
+  #Max released connections kept per connection key
+  iMaxIdlePerKey = 10
+
   def __init__( self, logger = False ):
     if logger:
       self.log = logger
@@ -13,12 +18,17 @@ class TransportPool:
       self.log = gLogger
     self.__modLock = threading.Lock()
     self.__transports = {}
+    self.__idleTransports = {}
     self.__listenPersistConn = False
     self.__msgCounter = 0
     result = gThreadScheduler.addPeriodicTask( 5, self.__sendKeepAlives )
     if not result[ 'OK' ]:
       self.log.fatal( "Cannot add task to thread scheduler", result[ 'Message' ] )
     self.__keepAlivesTask = result[ 'Value' ]
+    result = gThreadScheduler.addPeriodicTask( 5, self.__purgeIdle )
+    if not result[ 'OK' ]:
+      self.log.fatal( "Cannot add task to thread scheduler", result[ 'Message' ] )
+    self.__purgeIdleTask = result[ 'Value' ]
 
   #
   # Send keep alives
@@ -46,6 +56,71 @@ class TransportPool:
       except:
         gLogger.exception( "Cannot send keep alive" )
 
+  #
+  # Idle connections ready to be reused
+  #
+
+  def releaseIdle( self, poolKey, trid ):
+    """
+    Keep an established connection to be reused by any client with the same poolKey
+    """
+    self.__modLock.acquire()
+    try:
+      if trid not in self.__transports:
+        return S_ERROR( "No transport with id %s defined" % trid )
+      idleList = self.__idleTransports.setdefault( poolKey, [] )
+      if len( idleList ) < self.iMaxIdlePerKey:
+        idleList.append( ( trid, time.time() ) )
+        return S_OK()
+    finally:
+      self.__modLock.release()
+    #Too many idle connections for this key. Close this one
+    self.close( trid )
+    return S_OK()
+
+  def getIdle( self, poolKey ):
+    """
+    Get the id of an idle connection for the poolKey. False if there's none
+    """
+    expired = []
+    self.__modLock.acquire()
+    try:
+      idleList = self.__idleTransports.get( poolKey, [] )
+      now = time.time()
+      #Latest released first, it's the one with less chances of having been dropped
+      while idleList:
+        trid, idleSince = idleList.pop()
+        if trid not in self.__transports:
+          continue
+        if now - idleSince > self.iMaxIdleTime:
+          expired.append( trid )
+          continue
+        return trid
+      return False
+    finally:
+      self.__modLock.release()
+      for trid in expired:
+        self.close( trid )
+
+  def __purgeIdle( self ):
+    expired = []
+    self.__modLock.acquire()
+    try:
+      now = time.time()
+      for poolKey in list( self.__idleTransports ):
+        idleList = [ idleTuple for idleTuple in self.__idleTransports[ poolKey ] if idleTuple[0] in self.__transports ]
+        expired.extend( [ idleTuple[0] for idleTuple in idleList if now - idleTuple[1] > self.iMaxIdleTime ] )
+        idleList = [ idleTuple for idleTuple in idleList if now - idleTuple[1] <= self.iMaxIdleTime ]
+        if idleList:
+          self.__idleTransports[ poolKey ] = idleList
+        else:
+          del( self.__idleTransports[ poolKey ] )
+    finally:
+      self.__modLock.release()
+    for trid in expired:
+      self.log.debug( "Closing idle connection %s" % trid )
+      self.close( trid )
+
   # exists
 
   def exists( self, trid ):
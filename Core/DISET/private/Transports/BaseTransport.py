@@ -17,6 +17,8 @@ class BaseTransport:
   bAllowReuseAddress = True
   iListenQueueSize = 5
   iReadTimeout = 600
+  #Bytes allocated for a message before they are received, the size in the header is not trusted
+  iMaxPreallocatedSize = 16777216
   keepAliveMagic = "dka"
 
   def __init__( self, stServerAddress, bServerMode = False, **kwargs ):
@@ -118,6 +120,18 @@ class BaseTransport:
   def _write( self, buffer ):
     return S_OK( self.oSocket.send( buffer ) )
 
+  def _readInto( self, bufView, skipReadyCheck = False ):
+    """
+    Read up to len( bufView ) bytes into a writable buffer. Returns the number of bytes read.
+    Transports able to receive directly into a buffer should overwrite this
+    """
+    retVal = self._read( len( bufView ), skipReadyCheck = skipReadyCheck )
+    if not retVal[ 'OK' ]:
+      return retVal
+    data = retVal[ 'Value' ]
+    bufView[ :len( data ) ] = data
+    return S_OK( len( data ) )
+
   def sendData( self, uData, prefix = False ):
     self.__updateLastActionTimestamp()
     sCodedData = DEncode.encode( uData )
@@ -125,12 +139,15 @@ class BaseTransport:
       dataToSend = "%s%s:%s" % ( prefix, len( sCodedData ), sCodedData )
     else:
       dataToSend = "%s:%s" % ( len( sCodedData ), sCodedData )
+    #Send the packets out of a view of the data so no substring has to be built
+    dataView = memoryview( dataToSend )
     for index in range( 0, len( dataToSend ), self.packetSize ):
-      bytesToSend = len( dataToSend[ index : index + self.packetSize ] )
+      packetView = dataView[ index : index + self.packetSize ]
+      bytesToSend = len( packetView )
       packSentBytes = 0
       while packSentBytes < bytesToSend:
         try:
-          result = self._write( dataToSend[ index + packSentBytes : index + bytesToSend ] )
+          result = self._write( packetView[ packSentBytes: ] )
           if not result[ 'OK' ]:
             return result
           sentBytes = result[ 'Value' ]
@@ -141,6 +158,70 @@ class BaseTransport:
         packSentBytes += sentBytes
     return S_OK()
 
+  def __receiveMessageBody( self, size, maxBufferSize ):
+    """
+    Receive a message of known size into a preallocated buffer. The buffer grows as the data
+    arrives, so a peer announcing a huge size does not get it allocated upfront
+    """
+    if maxBufferSize and size > maxBufferSize:
+      return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
+    #What has already been read past the header is the beginning of the message
+    if len( self.byteStream ) >= size:
+      data = self.byteStream[ :size ]
+      self.byteStream = self.byteStream[ size: ]
+      return S_OK( data )
+    received = len( self.byteStream )
+    msgBuffer = bytearray( max( received, min( size, self.iMaxPreallocatedSize ) ) )
+    msgBuffer[ :received ] = self.byteStream
+    self.byteStream = ""
+    while received < size:
+      if received == len( msgBuffer ):
+        msgBuffer.extend( bytearray( min( len( msgBuffer ), size - received ) ) )
+      retVal = self._readInto( memoryview( msgBuffer )[ received: ], skipReadyCheck = True )
+      if not retVal[ 'OK' ]:
+        return retVal
+      if not retVal[ 'Value' ]:
+        return S_ERROR( "Peer closed connection" )
+      received += retVal[ 'Value' ]
+    return S_OK( str( msgBuffer ) )
+
+  def __receiveHeader( self, maxBufferSize ):
+    """
+    Receive the header of the next message. Returns the size of the message
+    or False if it's a keep alive
+    """
+    #Look either for message length of keep alive magic string
+    iSeparatorPosition = self.byteStream.find( ":", 0, 10 )
+    keepAliveMagicLen = len( BaseTransport.keepAliveMagic )
+    isKeepAlive = self.byteStream.find( BaseTransport.keepAliveMagic, 0, keepAliveMagicLen ) == 0
+    #While not found the message length or the ka, keep receiving
+    while iSeparatorPosition == -1 and not isKeepAlive:
+      retVal = self._read( 1024 )
+      #If error return
+      if not retVal[ 'OK' ]:
+        return retVal
+      #If closed return error
+      if not retVal[ 'Value' ]:
+        return S_ERROR( "Peer closed connection" )
+      #New data!
+      self.byteStream += retVal[ 'Value' ]
+      #Look again for either message length of ka magic string
+      iSeparatorPosition = self.byteStream.find( ":", 0, 10 )
+      isKeepAlive = self.byteStream.find( BaseTransport.keepAliveMagic, 0, keepAliveMagicLen ) == 0
+      #Over the limit?
+      if maxBufferSize and len( self.byteStream ) > maxBufferSize and iSeparatorPosition == -1 :
+        return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
+    #Keep alive magic!
+    if isKeepAlive:
+      gLogger.debug( "Received keep alive header" )
+      #Remove the ka magic from the buffer
+      self.byteStream = self.byteStream[ keepAliveMagicLen: ]
+      return S_OK( False )
+    #From here it must be a real message!
+    #Process the size and remove the msg length from the bytestream
+    size = int( self.byteStream[ :iSeparatorPosition ] )
+    self.byteStream = self.byteStream[ iSeparatorPosition + 1: ]
+    return S_OK( size )
 
   def receiveData( self, maxBufferSize = 0, blockAfterKeepAlive = True, idleReceive = False ):
     self.__updateLastActionTimestamp()
@@ -149,52 +230,20 @@ class BaseTransport:
     #Buffer size can't be less than 0
     maxBufferSize = max( maxBufferSize, 0 )
     try:
-      #Look either for message length of keep alive magic string
-      iSeparatorPosition = self.byteStream.find( ":", 0, 10 )
-      keepAliveMagicLen = len( BaseTransport.keepAliveMagic )
-      isKeepAlive = self.byteStream.find( BaseTransport.keepAliveMagic, 0, keepAliveMagicLen ) == 0
-      #While not found the message length or the ka, keep receiving
-      while iSeparatorPosition == -1 and not isKeepAlive:
-        retVal = self._read( 1024 )
-        #If error return
-        if not retVal[ 'OK' ]:
-          return retVal
-        #If closed return error
-        if not retVal[ 'Value' ]:
-          return S_ERROR( "Peer closed connection" )
-        #New data!
-        self.byteStream += retVal[ 'Value' ]
-        #Look again for either message length of ka magic string
-        iSeparatorPosition = self.byteStream.find( ":", 0, 10 )
-        isKeepAlive = self.byteStream.find( BaseTransport.keepAliveMagic, 0, keepAliveMagicLen ) == 0
-        #Over the limit?
-        if maxBufferSize and len( self.byteStream ) > maxBufferSize and iSeparatorPosition == -1 :
-          return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
-      #Keep alive magic!
-      if isKeepAlive:
-        gLogger.debug( "Received keep alive header" )
-        #Remove the ka magic from the buffer and process the keep alive
-        self.byteStream = self.byteStream[ keepAliveMagicLen: ]
+      retVal = self.__receiveHeader( maxBufferSize )
+      if not retVal[ 'OK' ]:
+        return retVal
+      size = retVal[ 'Value' ]
+      #Keep alive magic! process the keep alive
+      if size is False:
         return self.__processKeepAlive( maxBufferSize, blockAfterKeepAlive )
-      #From here it must be a real message!
-      #Process the size and remove the msg length from the bytestream
-      size = int( self.byteStream[ :iSeparatorPosition ] )
-      self.byteStream = self.byteStream[ iSeparatorPosition + 1: ]
-      #Receive while there's still data to be received 
-      while len( self.byteStream ) < size:
-        retVal = self._read( size - len( self.byteStream ), skipReadyCheck = True )
-        if not retVal[ 'OK' ]:
-          return retVal
-        if not retVal[ 'Value' ]:
-          return S_ERROR( "Peer closed connection" )
-        self.byteStream += retVal[ 'Value' ]
-        if maxBufferSize and len( self.byteStream ) > maxBufferSize:
-          return S_ERROR( "Read limit exceeded (%s chars)" % maxBufferSize )
-      #Data is here! take it out from the bytestream, dencode and return
-      data = self.byteStream[ :size ]
-      self.byteStream = self.byteStream[ size: ]
+      #Receive the whole message
+      retVal = self.__receiveMessageBody( size, maxBufferSize )
+      if not retVal[ 'OK' ]:
+        return retVal
+      #Data is here! dencode and return
       try:
-        data = DEncode.decode( data )[0]
+        data = DEncode.decode( retVal[ 'Value' ] )[0]
       except Exception, e:
         return S_ERROR( "Could not decode received data: %s" % str( e ) )
       if idleReceive:
@@ -205,6 +254,51 @@ class BaseTransport:
       gLogger.exception( "Network error while receiving data" )
       return S_ERROR( "Network error while receiving data: %s" % str( e ) )
 
+  def receiveDataStream( self, chunkSize = 1048576 ):
+    """
+    Receive the next message as an iterator of encoded chunks instead of decoding
+    it at once. Keep alives received before the message are processed.
+    The iterator raises IOError if the connection fails while reading
+    """
+    self.__updateLastActionTimestamp()
+    try:
+      while True:
+        retVal = self.__receiveHeader( 0 )
+        if not retVal[ 'OK' ]:
+          return retVal
+        size = retVal[ 'Value' ]
+        if size is not False:
+          break
+        retVal = self.__processKeepAlive( 0, blockAfterKeepAlive = False )
+        if not retVal[ 'OK' ]:
+          return retVal
+    except Exception, e:
+      gLogger.exception( "Network error while receiving data" )
+      return S_ERROR( "Network error while receiving data: %s" % str( e ) )
+    return S_OK( self.__iterMessageBody( size, chunkSize ) )
+
+  def __iterMessageBody( self, size, chunkSize ):
+    #What has already been read past the header is the beginning of the message
+    if len( self.byteStream ) >= size:
+      data = self.byteStream[ :size ]
+      self.byteStream = self.byteStream[ size: ]
+      yield data
+      return
+    received = len( self.byteStream )
+    if self.byteStream:
+      data = self.byteStream
+      self.byteStream = ""
+      yield data
+    while received < size:
+      retVal = self._read( min( chunkSize, size - received ), skipReadyCheck = True )
+      if not retVal[ 'OK' ]:
+        raise IOError( retVal[ 'Message' ] )
+      if not retVal[ 'Value' ]:
+        raise IOError( "Peer closed connection" )
+      received += len( retVal[ 'Value' ] )
+      self.__updateLastActionTimestamp()
+      yield retVal[ 'Value' ]
+
   def __processKeepAlive( self, maxBufferSize, blockAfterKeepAlive = True ):
     gLogger.debug( "Received Keep Alive" )
     #Next message down the stream will be the ka data
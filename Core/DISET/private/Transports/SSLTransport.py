@@ -156,6 +156,9 @@ class SSLTransport( BaseTransport ):
               return S_ERROR( "Renegotiation failed: %s" % str( e ) )
 
 
+      #pyGSI can only write strings
+      if type( buffer ) == memoryview:
+        buffer = buffer.tobytes()
       sentBytes = 0
       timeout = self.oSocketInfo.infoDict[ 'timeout' ]
       if timeout:
@@ -0,0 +1,60 @@
+########################################################################
+# $HeadURL $
+# File: BaseTransportTestCase.py
+########################################################################
+
+""".. module:: BaseTransportTestCase
+
+Test cases for DIRAC.Core.DISET.private.Transports.BaseTransport module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
+from DIRAC.Core.Utilities import DEncode
+## SUT
+from DIRAC.Core.DISET.private.Transports.BaseTransport import BaseTransport
+
+class StringTransport( BaseTransport ):
+  """ a transport reading from a string in small pieces """
+
+  def __init__( self, stream, pieceSize = 100 ):
+    BaseTransport.__init__( self, ( "localhost", 0 ) )
+    self.stream = stream
+    self.pieceSize = pieceSize
+
+  def _read( self, bufSize = 4096, skipReadyCheck = False ):
+    if not self.stream:
+      return S_ERROR( "Connection closed by peer" )
+    data = self.stream[ :min( bufSize, self.pieceSize ) ]
+    self.stream = self.stream[ len( data ): ]
+    return S_OK( data )
+
+########################################################################
+class BaseTransportTestCase( unittest.TestCase ):
+  """py:class BaseTransportTestCase
+  Test case for DIRAC.Core.DISET.private.Transports.BaseTransport module.
+  """
+
+  def test_01_growingBuffer( self ):
+    """ messages bigger than the preallocated size are received whole """
+    data = DEncode.encode( "x" * 1000 )
+    transport = StringTransport( "%s:%s" % ( len( data ), data ) )
+    transport.iMaxPreallocatedSize = 10
+    self.assertEqual( transport.receiveData(), "x" * 1000 )
+
+  def test_02_announcedSize( self ):
+    """ a huge announced size with no data behind fails without allocating it """
+    transport = StringTransport( "999999999:s4:abcd" )
+    transport.iMaxPreallocatedSize = 10
+    self.assertEqual( transport.receiveData()[ 'OK' ], False )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( BaseTransportTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,102 @@
+########################################################################
+# $HeadURL $
+# File: GatewayServiceTestCase.py
+########################################################################
+
+""".. module:: GatewayServiceTestCase
+
+Test cases for DIRAC.Core.DISET.private.GatewayService module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.Core.DISET.private.GatewayService import GatewayService
+
+class FakeTransport:
+  """ a client connection sending one RPC proposal asking to keep the connection """
+
+  def __init__( self, method ):
+    self.proposal = ( ( "Framework/Target", "Setup" ), ( "RPC", method ), False, { 'keepConnected' : True } )
+    self.sent = []
+    self.closed = False
+
+  def handshake( self ):
+    return S_OK()
+
+  def getConnectingCredentials( self ):
+    return {}
+
+  def receiveData( self, maxBufferSize = 0 ):
+    return S_OK( self.proposal )
+
+class FakeTransportPool:
+  """ the TransportPool methods used by the service """
+
+  def __init__( self ):
+    self.transports = {}
+
+  def add( self, transport ):
+    trid = len( self.transports ) + 1
+    self.transports[ trid ] = transport
+    return trid
+
+  def get( self, trid ):
+    return self.transports[ trid ]
+
+  def send( self, trid, data ):
+    self.transports[ trid ].sent.append( data )
+    return S_OK()
+
+  def sendAndClose( self, trid, data ):
+    self.send( trid, data )
+    self.close( trid )
+
+  def close( self, trid ):
+    self.transports[ trid ].closed = True
+
+class FakeServiceConfiguration:
+
+  def getMaxIdleConnections( self ):
+    return 100
+
+class TestGatewayService( GatewayService ):
+  """ a gateway forwarding nothing """
+
+  def __init__( self ):
+    self._transportPool = FakeTransportPool()
+    self._cfg = FakeServiceConfiguration()
+    self.forwarded = []
+
+  def _executeAction( self, trid, proposalTuple, clientInitArgs ):
+    self.forwarded.append( proposalTuple[1][1] )
+    return S_OK( proposalTuple[1][1] )
+
+########################################################################
+class GatewayServiceTestCase( unittest.TestCase ):
+  """py:class GatewayServiceTestCase
+  Test case for DIRAC.Core.DISET.private.GatewayService module.
+  """
+
+  def test_01_consecutiveRPCs( self ):
+    """ the gateway does not keep connections, each RPC is closed after its reply """
+    gateway = TestGatewayService()
+    for method in ( "ping", "echo" ):
+      transport = FakeTransport( method )
+      result = gateway._processInThread( transport )
+      self.assertEqual( result[ 'Value' ], method )
+      self.assertEqual( result[ 'keepConnected' ], False )
+      self.assertEqual( transport.sent, [ S_OK() ] )
+      self.assertEqual( transport.closed, True )
+    self.assertEqual( gateway.forwarded, [ "ping", "echo" ] )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( GatewayServiceTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,82 @@
+########################################################################
+# $HeadURL $
+# File: TransportBenchmark.py
+########################################################################
+
+""" :mod: TransportBenchmark
+    ========================
+
+    .. module: TransportBenchmark
+    :synopsis: throughput of DISET messages over PlainTransport
+
+    Sends messages of 1 KB, 1 MB and 100 MB through a local PlainTransport
+    connection and prints the achieved throughput.
+
+    Usage: python TransportBenchmark.py [ sizeInBytes ... ]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+import threading
+## from DIRAC
+from DIRAC.Core.Utilities.ReturnValues import S_OK
+## SUT
+from DIRAC.Core.DISET.private.Transports.PlainTransport import PlainTransport
+
+def serverLoop( serverTransport, iterations, results ):
+  """ receive messages and store the time they took """
+  result = serverTransport.acceptConnection()
+  if not result[ 'OK' ]:
+    results.append( result )
+    return
+  clientTransport = result[ 'Value' ]
+  for i in range( iterations ):
+    result = clientTransport.receiveData()
+    if not result[ 'OK' ]:
+      results.append( result )
+      break
+  clientTransport.close()
+  results.append( S_OK() )
+
+def benchmark( size, iterations ):
+  """ send iterations messages of size bytes and return the bytes/sec """
+  serverTransport = PlainTransport( ( "127.0.0.1", 0 ), bServerMode = True )
+  serverTransport.initAsServer()
+  serverAddress = serverTransport.getSocket().getsockname()
+  results = []
+  serverThread = threading.Thread( target = serverLoop, args = ( serverTransport, iterations, results ) )
+  serverThread.setDaemon( True )
+  serverThread.start()
+
+  clientTransport = PlainTransport( serverAddress, timeout = 600 )
+  result = clientTransport.initAsClient()
+  if not result[ 'OK' ]:
+    return result
+  payload = S_OK( "x" * size )
+  start = time.time()
+  for i in range( iterations ):
+    result = clientTransport.sendData( payload )
+    if not result[ 'OK' ]:
+      return result
+  serverThread.join()
+  elapsed = time.time() - start
+  clientTransport.close()
+  serverTransport.close()
+  if not results[0][ 'OK' ]:
+    return results[0]
+  return S_OK( size * iterations / elapsed )
+
+if __name__ == "__main__":
+  sizes = [ int( arg ) for arg in sys.argv[1:] ]
+  if not sizes:
+    sizes = [ 1024, 1024 ** 2, 100 * 1024 ** 2 ]
+  for size in sizes:
+    iterations = max( 3, min( 10000, ( 256 * 1024 ** 2 ) / size ) )
+    result = benchmark( size, iterations )
+    if not result[ 'OK' ]:
+      print "Size %s failed: %s" % ( size, result[ 'Message' ] )
+      continue
+    print "%10s bytes x %5s msgs: %10.2f MB/s" % ( size, iterations, result[ 'Value' ] / 1024. ** 2 )
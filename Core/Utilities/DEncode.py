@@ -14,6 +14,7 @@ Encoding and decoding for dirac, Ids:
 """
 __RCSID__ = "$Id$"
 
+import os
 import types
 import datetime
 
@@ -221,8 +222,8 @@ g_dEncodeFunctions[ types.DictType ] = encodeDict
 g_dDecodeFunctions[ "d" ] = decodeDict
 
 
-#Encode function
-def encode( uObject ):
+#Reference encode function, one table lookup per object
+def pyEncode( uObject ):
   try:
     eList = []
     #print "ENCODE FUNCTION : %s" % g_dEncodeFunctions[ type( uObject ) ]
@@ -231,7 +232,7 @@ def encode( uObject ):
   except Exception:
     raise
 
-def decode( data ):
+def pyDecode( data ):
   if not data:
     return data
   try:
@@ -240,6 +241,220 @@ def decode( data ):
   except Exception:
     raise
 
+#Optimized codec. Produces exactly the same output as the reference one.
+#Containers handle strings and ints inline to save a function call per element,
+#any other type is dispatched through the g_dFast*Functions tables
+_StringType = types.StringType
+_IntType = types.IntType
+_ListType = types.ListType
+
+def _fastEncodeDict( dValue, eList ):
+  append = eList.append
+  extend = eList.extend
+  append( "d" )
+  for key in sorted( dValue ):
+    if type( key ) is _StringType:
+      extend( ( "s", str( len( key ) ), ":", key ) )
+    else:
+      g_dFastEncodeFunctions[ type( key ) ]( key, eList )
+    value = dValue[ key ]
+    valueType = type( value )
+    if valueType is _StringType:
+      extend( ( "s", str( len( value ) ), ":", value ) )
+    elif valueType is _IntType:
+      extend( ( "i", str( value ), "e" ) )
+    else:
+      g_dFastEncodeFunctions[ valueType ]( value, eList )
+  append( "e" )
+
+def _fastEncodeSequence( lValue, eList ):
+  append = eList.append
+  extend = eList.extend
+  if type( lValue ) is _ListType:
+    append( "l" )
+  else:
+    append( "t" )
+  for value in lValue:
+    valueType = type( value )
+    if valueType is _StringType:
+      extend( ( "s", str( len( value ) ), ":", value ) )
+    elif valueType is _IntType:
+      extend( ( "i", str( value ), "e" ) )
+    else:
+      g_dFastEncodeFunctions[ valueType ]( value, eList )
+  append( "e" )
+
+g_dFastEncodeFunctions = dict( g_dEncodeFunctions )
+g_dFastEncodeFunctions[ types.DictType ] = _fastEncodeDict
+g_dFastEncodeFunctions[ types.ListType ] = _fastEncodeSequence
+g_dFastEncodeFunctions[ types.TupleType ] = _fastEncodeSequence
+
+def fastEncode( uObject ):
+  eList = []
+  g_dFastEncodeFunctions[ type( uObject ) ]( uObject, eList )
+  return "".join( eList )
+
+def _fastDecodeDict( data, i ):
+  index = data.index
+  oD = {}
+  i += 1
+  while data[ i ] != "e":
+    if data[ i ] == "s":
+      colon = index( ":", i + 1 )
+      i = colon + 1 + int( data[ i + 1 : colon ] )
+      key = data[ colon + 1 : i ]
+    else:
+      key, i = g_dFastDecodeFunctions[ data[ i ] ]( data, i )
+    dataType = data[ i ]
+    if dataType == "s":
+      colon = index( ":", i + 1 )
+      i = colon + 1 + int( data[ i + 1 : colon ] )
+      oD[ key ] = data[ colon + 1 : i ]
+    elif dataType == "i":
+      end = index( "e", i + 1 )
+      oD[ key ] = int( data[ i + 1 : end ] )
+      i = end + 1
+    else:
+      oD[ key ], i = g_dFastDecodeFunctions[ dataType ]( data, i )
+  return ( oD, i + 1 )
+
+def _fastDecodeList( data, i ):
+  index = data.index
+  oL = []
+  append = oL.append
+  i += 1
+  dataType = data[ i ]
+  while dataType != "e":
+    if dataType == "s":
+      colon = index( ":", i + 1 )
+      i = colon + 1 + int( data[ i + 1 : colon ] )
+      append( data[ colon + 1 : i ] )
+    elif dataType == "i":
+      end = index( "e", i + 1 )
+      append( int( data[ i + 1 : end ] ) )
+      i = end + 1
+    else:
+      obj, i = g_dFastDecodeFunctions[ dataType ]( data, i )
+      append( obj )
+    dataType = data[ i ]
+  return ( oL, i + 1 )
+
+def _fastDecodeTuple( data, i ):
+  oL, i = _fastDecodeList( data, i )
+  return ( tuple( oL ), i )
+
+g_dFastDecodeFunctions = dict( g_dDecodeFunctions )
+g_dFastDecodeFunctions[ "d" ] = _fastDecodeDict
+g_dFastDecodeFunctions[ "l" ] = _fastDecodeList
+g_dFastDecodeFunctions[ "t" ] = _fastDecodeTuple
+
+def fastDecode( data ):
+  if not data:
+    return data
+  return g_dFastDecodeFunctions[ data[ 0 ] ]( data, 0 )
+
+#Incremental decoding of data arriving in chunks
+class StreamDecoder:
+  """
+  Decode DEncoded data from an iterable of string chunks without holding it all in memory.
+  Top level containers can be walked element by element with iterContainer
+  """
+
+  def __init__( self, chunks ):
+    self.__chunks = iter( chunks )
+    self.__data = ""
+    self.__pos = 0
+    self.__eof = False
+
+  def __readMore( self ):
+    #Read at least as much as it's pending so partial objects are not decoded too many times
+    pending = len( self.__data ) - self.__pos
+    newChunks = []
+    received = 0
+    while received <= pending:
+      try:
+        chunk = self.__chunks.next()
+      except StopIteration:
+        self.__eof = True
+        break
+      newChunks.append( chunk )
+      received += len( chunk )
+    if not received:
+      return False
+    #Drop what has already been decoded
+    self.__data = self.__data[ self.__pos: ] + "".join( newChunks )
+    self.__pos = 0
+    return True
+
+  def peekType( self ):
+    """
+    Type id of the next object in the stream
+    """
+    while self.__pos >= len( self.__data ):
+      if not self.__readMore():
+        raise ValueError( "Unexpected end of DEncoded data" )
+    return self.__data[ self.__pos ]
+
+  def decodeObject( self ):
+    """
+    Decode the whole next object in the stream
+    """
+    self.peekType()
+    while True:
+      eof = self.__eof
+      try:
+        obj, end = g_dFastDecodeFunctions[ self.__data[ self.__pos ] ]( self.__data, self.__pos )
+        #Something has to follow unless it's the end of the stream. Otherwise the object may be incomplete
+        if end < len( self.__data ) or ( eof and end == len( self.__data ) ):
+          self.__pos = end
+          return obj
+      except ( IndexError, ValueError ):
+        if eof:
+          raise
+      #Try once more if the end of the stream has just been found
+      if not self.__readMore() and eof:
+        raise ValueError( "Unexpected end of DEncoded data" )
+
+  def openContainer( self ):
+    """
+    Enter the list, tuple or dict that comes next in the stream. Returns its type id
+    """
+    containerType = self.peekType()
+    if containerType not in ( "l", "t", "d" ):
+      raise ValueError( "Expected a container and found type %s" % containerType )
+    self.__pos += 1
+    return containerType
+
+  def closeContainer( self ):
+    """
+    Returns True and leaves the current container if all its elements have been decoded
+    """
+    if self.peekType() != "e":
+      return False
+    self.__pos += 1
+    return True
+
+  def iterContainer( self ):
+    """
+    Iterate lazily the container that comes next in the stream.
+    Lists and tuples yield their elements and dicts yield ( key, value ) tuples
+    """
+    containerType = self.openContainer()
+    while not self.closeContainer():
+      if containerType == "d":
+        key = self.decodeObject()
+        yield ( key, self.decodeObject() )
+      else:
+        yield self.decodeObject()
+
+#Encode and decode functions. Use the optimized codec unless the reference one is requested
+if os.environ.get( "DIRAC_USE_REFERENCE_DENCODE" ):
+  encode = pyEncode
+  decode = pyDecode
+else:
+  encode = fastEncode
+  decode = fastDecode
+
 
 if __name__ == "__main__":
   gObject = {2:"3", True : ( 3, None ), 2.0 * 10 ** 20 : 2.0 * 10 ** -10 }
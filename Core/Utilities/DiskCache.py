@@ -0,0 +1,387 @@
+# $HeadURL$
+"""
+  DiskCache keeps generated values, and the files generated with them, in a directory
+
+  The index of the entries is a file of the cache directory shared by all the processes using
+  the directory, so the entries survive restarts and are seen by all the instances of a service.
+  Entries expire after their lifetime, and the least recently used ones are evicted when the cache
+  takes more than maxBytes. Concurrent requests of the same missing entry, from threads or from
+  processes, wait for the first one to generate it instead of generating it again.
+"""
+__RCSID__ = "$Id$"
+
+import os
+import os.path
+import time
+import fcntl
+import threading
+try:
+  import hashlib as md5
+except ImportError:
+  import md5
+
+from DIRAC import S_OK, S_ERROR, gLogger
+from DIRAC.Core.Utilities import DEncode
+
+class DiskCache:
+
+  def __init__( self, cacheDir = False, maxBytes = 1073741824, numLockStripes = 256 ):
+    self.__cacheDir = cacheDir
+    self.__maxBytes = maxBytes
+    self.__numLockStripes = numLockStripes
+    self.__lock = threading.RLock()
+    # { key : [ expirationTime, lastAccess, size, [ fileNames ] ] }
+    self.__index = {}
+    # { fileName : key }
+    self.__fileKeys = {}
+    self.__indexStat = None
+    # { key : accessTime } of the accesses not written to the index yet
+    self.__accesses = {}
+    self.__accessesFlushTime = time.time()
+    self.__accessesFlushPeriod = 60
+    self.__orphanLifeTime = 3600
+    self.__log = gLogger.getSubLogger( "DiskCache" )
+
+  def setLocation( self, cacheDir, maxBytes = False ):
+    """
+    Use the entries of cacheDir, the files not in its index are removed
+    """
+    self.__lock.acquire()
+    try:
+      self.__cacheDir = cacheDir
+      if maxBytes:
+        self.__maxBytes = maxBytes
+      self.__index = {}
+      self.__fileKeys = {}
+      self.__indexStat = None
+      self.__accesses = {}
+    finally:
+      self.__lock.release()
+    retVal = self.__checkLocation()
+    if not retVal[ 'OK' ]:
+      return retVal
+    return self.__removeOrphans()
+
+  def getLocation( self ):
+    return self.__cacheDir
+
+  def __getPath( self, fileName ):
+    return os.path.join( self.__cacheDir, fileName )
+
+  def __getValueFileName( self, key ):
+    return "%s.val" % md5.md5( key ).hexdigest()
+
+  def __checkLocation( self ):
+    if not self.__cacheDir:
+      return S_ERROR( "The cache location is not defined" )
+    for path in ( self.__cacheDir, self.__getPath( "locks" ) ):
+      if not os.path.isdir( path ):
+        try:
+          os.makedirs( path )
+        except OSError, x:
+          if not os.path.isdir( path ):
+            return S_ERROR( "Cannot create cache directory %s: %s" % ( path, str( x ) ) )
+    return S_OK()
+
+  def __getIndexStat( self ):
+    try:
+      stat = os.stat( self.__getPath( "index" ) )
+    except OSError:
+      return None
+    return ( stat.st_ino, stat.st_mtime, stat.st_size )
+
+  def __loadIndex( self ):
+    """
+    Read the index if another process changed it. Lock has to be held
+    """
+    if not self.__cacheDir:
+      return
+    indexStat = self.__getIndexStat()
+    if indexStat == self.__indexStat:
+      return
+    index = {}
+    if indexStat:
+      try:
+        indexFile = open( self.__getPath( "index" ), "rb" )
+        try:
+          index = DEncode.decode( indexFile.read() )[0]
+        finally:
+          indexFile.close()
+      except Exception, x:
+        self.__log.warn( "Ignoring the unreadable cache index of %s: %s" % ( self.__cacheDir, str( x ) ) )
+        index = {}
+    self.__index = index
+    self.__fileKeys = {}
+    for key in index:
+      for fileName in index[ key ][3]:
+        self.__fileKeys[ fileName ] = key
+    self.__indexStat = indexStat
+
+  def __acquireFileLock( self, lockPath ):
+    lockFile = open( lockPath, "a" )
+    try:
+      fcntl.flock( lockFile.fileno(), fcntl.LOCK_EX )
+    except:
+      lockFile.close()
+      raise
+    return lockFile
+
+  def __releaseFileLock( self, lockFile ):
+    try:
+      fcntl.flock( lockFile.fileno(), fcntl.LOCK_UN )
+    finally:
+      lockFile.close()
+
+  def __updateIndex( self, updateFunc = False ):
+    """
+    Apply updateFunc to the index, evict the expired and the exceeding entries and write it
+    """
+    retVal = self.__checkLocation()
+    if not retVal[ 'OK' ]:
+      return retVal
+    self.__lock.acquire()
+    try:
+      try:
+        lockFile = self.__acquireFileLock( self.__getPath( "index.lock" ) )
+        try:
+          #The stat of the index could be reused by a new one, always read it before writing
+          self.__indexStat = None
+          self.__loadIndex()
+          for key, accessTime in self.__accesses.items():
+            if key in self.__index:
+              self.__index[ key ][1] = max( self.__index[ key ][1], accessTime )
+          self.__accesses = {}
+          self.__accessesFlushTime = time.time()
+          if updateFunc:
+            updateFunc()
+          self.__evict()
+          self.__writeIndex()
+        finally:
+          self.__releaseFileLock( lockFile )
+      except Exception, x:
+        return S_ERROR( "Cannot update the cache index of %s: %s" % ( self.__cacheDir, str( x ) ) )
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def __writeIndex( self ):
+    indexPath = self.__getPath( "index" )
+    tmpPath = "%s.%s.tmp" % ( indexPath, os.getpid() )
+    indexFile = open( tmpPath, "wb" )
+    try:
+      indexFile.write( DEncode.encode( self.__index ) )
+    finally:
+      indexFile.close()
+    os.rename( tmpPath, indexPath )
+    self.__indexStat = self.__getIndexStat()
+
+  def __removeEntry( self, key ):
+    """
+    Remove an entry and its files. Lock has to be held
+    """
+    for fileName in [ self.__getValueFileName( key ) ] + self.__index[ key ][3]:
+      try:
+        os.unlink( self.__getPath( fileName ) )
+      except OSError:
+        pass
+      if self.__fileKeys.get( fileName ) == key:
+        del self.__fileKeys[ fileName ]
+    del self.__index[ key ]
+
+  def __evict( self ):
+    """
+    Remove the expired entries, then the least recently used ones until the cache fits. Lock has to be held
+    """
+    now = time.time()
+    for key in [ key for key in self.__index if self.__index[ key ][0] < now ]:
+      self.__removeEntry( key )
+    totalBytes = sum( [ entry[2] for entry in self.__index.values() ] )
+    if totalBytes <= self.__maxBytes:
+      return
+    byAccess = [ ( entry[1], key ) for key, entry in self.__index.items() ]
+    byAccess.sort()
+    for lastAccess, key in byAccess:
+      if totalBytes <= self.__maxBytes:
+        break
+      totalBytes -= self.__index[ key ][2]
+      self.__removeEntry( key )
+
+  def __removeOrphans( self ):
+    """
+    Remove the files left by the processes that died before indexing them
+    """
+    self.__lock.acquire()
+    try:
+      self.__loadIndex()
+      known = set( self.__fileKeys )
+      for key in self.__index:
+        known.add( self.__getValueFileName( key ) )
+    finally:
+      self.__lock.release()
+    limit = time.time() - self.__orphanLifeTime
+    for fileName in os.listdir( self.__cacheDir ):
+      filePath = self.__getPath( fileName )
+      if fileName in known or fileName in ( "index", "index.lock" ) or not os.path.isfile( filePath ):
+        continue
+      try:
+        if os.path.getmtime( filePath ) < limit:
+          self.__log.verbose( "Purging %s" % filePath )
+          os.unlink( filePath )
+      except OSError:
+        pass
+    return S_OK()
+
+  def __recordAccess( self, key ):
+    """
+    Note an access to be written with the next index update. Lock has to be held
+    """
+    self.__accesses[ key ] = time.time()
+    return time.time() - self.__accessesFlushTime > self.__accessesFlushPeriod
+
+  def get( self, key ):
+    """
+    Get the value cached for the key, False if there is none
+    """
+    self.__lock.acquire()
+    try:
+      self.__loadIndex()
+      entry = self.__index.get( key )
+      if not entry or entry[0] < time.time():
+        return False
+      flush = self.__recordAccess( key )
+    finally:
+      self.__lock.release()
+    try:
+      valueFile = open( self.__getPath( self.__getValueFileName( key ) ), "rb" )
+      try:
+        value = DEncode.decode( valueFile.read() )[0]
+      finally:
+        valueFile.close()
+    except Exception:
+      #Evicted meanwhile by another process
+      return False
+    if flush:
+      self.__updateIndex()
+    return value
+
+  def getFile( self, fileName ):
+    """
+    Get the contents of a file of the cache
+    """
+    if not self.__cacheDir or os.path.basename( fileName ) != fileName:
+      return S_ERROR( "Invalid cache file %s" % fileName )
+    self.__lock.acquire()
+    try:
+      self.__loadIndex()
+      flush = False
+      if fileName in self.__fileKeys:
+        flush = self.__recordAccess( self.__fileKeys[ fileName ] )
+    finally:
+      self.__lock.release()
+    try:
+      fd = open( self.__getPath( fileName ), "rb" )
+      try:
+        data = fd.read()
+      finally:
+        fd.close()
+    except Exception, x:
+      return S_ERROR( "Can't open file %s: %s" % ( fileName, str( x ) ) )
+    if flush:
+      self.__updateIndex()
+    return S_OK( data )
+
+  def __hasEntry( self, key ):
+    self.__lock.acquire()
+    try:
+      self.__loadIndex()
+      return key in self.__index
+    finally:
+      self.__lock.release()
+
+  def getOrGenerate( self, key, lifeTime, generateFunc ):
+    """
+    Get the value cached for the key, else generate it and cache it for lifeTime seconds
+      generateFunc takes no arguments and returns S_OK( ( value, fileNames ) ), fileNames being
+      the names of the files it created in the cache directory for the entry
+    """
+    value = self.get( key )
+    if value is not False:
+      return S_OK( value )
+    retVal = self.__checkLocation()
+    if not retVal[ 'OK' ]:
+      return retVal
+    stripe = int( md5.md5( key ).hexdigest()[:8], 16 ) % self.__numLockStripes
+    lockFile = self.__acquireFileLock( self.__getPath( os.path.join( "locks", "%d.lock" % stripe ) ) )
+    try:
+      #Somebody may have generated it while waiting for the lock
+      value = self.get( key )
+      if value is not False:
+        return S_OK( value )
+      #Drop the expired entry before generating, else evicting it meanwhile would remove the new files
+      if self.__hasEntry( key ):
+        retVal = self.delete( key )
+        if not retVal[ 'OK' ]:
+          return retVal
+      retVal = generateFunc()
+      if not retVal[ 'OK' ]:
+        return retVal
+      value, fileNames = retVal[ 'Value' ]
+      retVal = self.__add( key, lifeTime, value, fileNames )
+      if not retVal[ 'OK' ]:
+        self.__log.error( "Cannot cache entry", retVal[ 'Message' ] )
+    finally:
+      self.__releaseFileLock( lockFile )
+    return S_OK( value )
+
+  def __add( self, key, lifeTime, value, fileNames ):
+    try:
+      data = DEncode.encode( value )
+    except Exception, x:
+      return S_ERROR( "Cannot encode the value of %s: %s" % ( key, str( x ) ) )
+    valuePath = self.__getPath( self.__getValueFileName( key ) )
+    tmpPath = "%s.%s.tmp" % ( valuePath, os.getpid() )
+    try:
+      valueFile = open( tmpPath, "wb" )
+      try:
+        valueFile.write( data )
+      finally:
+        valueFile.close()
+      os.rename( tmpPath, valuePath )
+      size = len( data )
+      for fileName in fileNames:
+        size += os.path.getsize( self.__getPath( fileName ) )
+    except Exception, x:
+      return S_ERROR( "Cannot write the value of %s: %s" % ( key, str( x ) ) )
+    now = time.time()
+
+    def addEntry():
+      if key in self.__index:
+        for fileName in self.__index[ key ][3]:
+          if fileName not in fileNames:
+            try:
+              os.unlink( self.__getPath( fileName ) )
+            except OSError:
+              pass
+            self.__fileKeys.pop( fileName, None )
+      self.__index[ key ] = [ now + lifeTime, now, size, list( fileNames ) ]
+      for fileName in fileNames:
+        self.__fileKeys[ fileName ] = key
+
+    return self.__updateIndex( addEntry )
+
+  def delete( self, key ):
+    """
+    Remove the entry of a key
+    """
+    def deleteEntry():
+      if key in self.__index:
+        self.__removeEntry( key )
+    return self.__updateIndex( deleteEntry )
+
+  def purgeExpired( self ):
+    """
+    Remove the expired entries and the least recently used ones over the size limit
+    """
+    if not self.__cacheDir:
+      return S_OK()
+    return self.__updateIndex()
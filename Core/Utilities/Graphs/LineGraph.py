@@ -3,7 +3,8 @@
 ########################################################################
 
 """ LineGraph represents line graphs both simple and stacked. It includes
-    also cumulative graph functionality. 
+    also cumulative graph functionality. With the stacked preference set to
+    False the lines are drawn unfilled, each one from its own values.
     
     The DIRAC Graphs package is derived from the GraphTool plotting package of the
     CMS/Phedex Project by ... <to be added>
@@ -59,6 +60,8 @@ class LineGraph( PlotBase ):
       end_plot = date2num( datetime.datetime.fromtimestamp(to_timestamp(self.prefs['endtime'])))                         
       
     self.polygons = []
+    stacked = self.prefs.get('stacked',True)
+    ymax = max(tmp_b)
     seq_b = [(self.gdata.max_num_key,0.0),(self.gdata.min_num_key,0.0)]    
     zorder = 0.0      
     labels = self.gdata.getLabels()
@@ -85,17 +88,25 @@ class LineGraph( PlotBase ):
         if value is None:
           value = 0.
         tmp_x.append( key )
-        tmp_y.append( float(value)+tmp_b[ind] )   
+        if stacked:
+          tmp_y.append( float(value)+tmp_b[ind] )   
+        else:
+          tmp_y.append( float(value) )
         ind += 1       
-      seq_t = zip(tmp_x,tmp_y)     
-      seq = seq_t+seq_b       
-      poly = Polygon( seq, facecolor=color, fill=True, linewidth=.2, zorder=zorder)
-      self.ax.add_patch( poly )
-      self.polygons.append( poly )        
-      tmp_b = list(tmp_y)  
+      if stacked:
+        seq_t = zip(tmp_x,tmp_y)     
+        seq = seq_t+seq_b       
+        poly = Polygon( seq, facecolor=color, fill=True, linewidth=.2, zorder=zorder)
+        self.ax.add_patch( poly )
+        self.polygons.append( poly )        
+        tmp_b = list(tmp_y)  
+      else:
+        self.ax.plot( tmp_x, tmp_y, color=color, linewidth=1., zorder=zorder )
+      if tmp_y:
+        ymax = max( ymax, max(tmp_y) )
       zorder -= 0.1
                     
-    ymax = max(tmp_b); ymax *= 1.1
+    ymax *= 1.1
     if self.log_xaxis:  
       xmin = 0.001
     else: 
@@ -32,26 +32,43 @@
     Returns S_OK or S_ERROR.
 
 
-    _query( cmd, [conn] )
+    _query( cmd, [conn], [params] )
 
     Executes SQL command "cmd".
     Gets a connection from the Queue (or open a new one if none is available),
     the used connection is  back into the Queue.
     If a connection to the the DB is passed as second argument this connection
     is used and is not  in the Queue.
+    If params is given, its values are bound by the driver to the %s
+    placeholders of "cmd" and must not be escaped beforehand.
     Returns S_OK with fetchall() out in Value or S_ERROR upon failure.
 
 
-    _update( cmd, [conn] )
+    _update( cmd, [conn], [params] )
 
     Executes SQL command "cmd" and issue a commit
     Gets a connection from the Queue (or open a new one if none is available),
     the used connection is  back into the Queue.
     If a connection to the the DB is passed as second argument this connection
     is used and is not  in the Queue
+    If params is given, its values are bound by the driver to the %s
+    placeholders of "cmd" and must not be escaped beforehand.
     Returns S_OK with number of updated registers in Value or S_ERROR upon failure.
 
 
+    _transaction( cmdList, [conn] )
+
+    Executes the ( cmd, params ) tuples of "cmdList" in order on the same
+    connection and issue a single commit at the end. If any of them fails
+    the transaction is rolled back and none of the changes is applied.
+    Returns S_OK with the list of the numbers of updated registers or S_ERROR.
+
+
+    _escapeString( myString ), _escapeValues( inValues )
+
+    Escape and quote values to be put in a SQL command. No connection is used.
+
+
     _createTables( tableDict )
 
     Create a new Table in the DB
@@ -289,11 +306,13 @@ class MySQL:
       return S_ERROR( '%s: (%s)' % ( err, str( e ) ) )
 
 
-  def __escapeString( self, myString, connection ):
+  def __escapeString( self, myString ):
     """
     To be used for escaping any MySQL string before passing it to the DB
     this should prevent passing non-MySQL accepted characters to the DB
     It also includes quotation marks " around the given string
+    The escaping is done on the client side without using a connection,
+    it is safe for the latin1 and utf8 character sets used by the DBs
     """
 
     specialValues = { 'UTC_TIMESTAMP()': 'UTC_TIMESTAMP()'}
@@ -301,7 +320,7 @@ class MySQL:
     try:
       if myString in specialValues:
         return S_OK( specialValues[myString] )
-      escape_string = connection.escape_string( str( myString ) )
+      escape_string = MySQLdb.escape_string( str( myString ) )
       self.logger.debug( '__scape_string: returns', '"%s"' % escape_string )
       return S_OK( '"%s"' % escape_string )
     except Exception, x:
@@ -334,19 +353,11 @@ class MySQL:
   def _escapeString( self, myString, conn = None ):
     """
       Wrapper around the internal method __escapeString
+      conn is kept for backward compatibility, no connection is needed
     """
     self.logger.debug( '_scapeString:', '"%s"' % myString )
 
-    retDict = self.__getConnection( conn )
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
-
-    retDict = self.__escapeString( myString, connection )
-    if not conn:
-      self.__putConnection( connection )
-
-    return retDict
+    return self.__escapeString( myString )
 
 
   def _escapeValues( self, inValues = None ):
@@ -355,11 +366,6 @@ class MySQL:
     """
     self.logger.debug( '_escapeValues:', inValues )
 
-    retDict = self.__getConnection()
-    if not retDict['OK']:
-      return retDict
-    connection = retDict['Value']
-
     inEscapeValues = []
 
     if not inValues:
@@ -367,18 +373,12 @@ class MySQL:
 
     for value in inValues:
       if type( value ) in StringTypes:
-        retDict = self.__escapeString( value, connection )
-        if not retDict['OK']:
-          self.__putConnection( connection )
-          return retDict
-        inEscapeValues.append( retDict['Value'] )
+        retDict = self.__escapeString( value )
       else:
-        retDict = self.__escapeString( str( value ), connection )
-        if not retDict['OK']:
-          self.__putConnection( connection )
-          return retDict
-        inEscapeValues.append( retDict['Value'] )
-    self.__putConnection( connection )
+        retDict = self.__escapeString( str( value ) )
+      if not retDict['OK']:
+        return retDict
+      inEscapeValues.append( retDict['Value'] )
     return S_OK( inEscapeValues )
 
 
@@ -404,26 +404,27 @@ class MySQL:
       return self._except( '_connect', x, 'Could not connect to DB.' )
 
 
-  def _query( self, cmd, conn = None ):
+  def _query( self, cmd, conn = None, params = None ):
     """
     execute MySQL query command
+    params is an optional tuple (or dict) of values bound by the driver to the
+    %s (or %(name)s) placeholders of cmd, they must not be escaped or quoted
     return S_OK structure with fetchall result as tuple
     it returns an empty tuple if no matching rows are found
     return S_ERROR upon error
     """
     self.logger.verbose( '_query:', cmd )
+    if params is not None:
+      self.logger.verbose( '_query: params', params )
 
-    if conn:
-      connection = conn
-    else:
-      retDict = self._getConnection()
-      if not retDict['OK']:
-        return retDict
-      connection = retDict[ 'Value' ]
+    retDict = self.__getConnection( conn = conn )
+    if not retDict['OK']:
+      return retDict
+    connection = retDict[ 'Value' ]
 
     try:
       cursor = connection.cursor()
-      if cursor.execute( cmd ):
+      if cursor.execute( cmd, params ):
         res = cursor.fetchall()
       else:
         res = ()
@@ -444,16 +445,28 @@ class MySQL:
       cursor.close()
     except Exception:
       pass
+    if not conn:
+      # End the read transaction, or the next queries on the pooled connection
+      # would keep seeing its first snapshot
+      try:
+        connection.commit()
+      except Exception:
+        pass
+      self.__putConnection( connection )
 
     return retDict
 
 
-  def _update( self, cmd, conn = None ):
+  def _update( self, cmd, conn = None, params = None ):
     """ execute MySQL update command
+        params is an optional tuple (or dict) of values bound by the driver to the
+        %s (or %(name)s) placeholders of cmd, they must not be escaped or quoted
         return S_OK with number of updated registers upon success
         return S_ERROR upon error
     """
     self.logger.verbose( '_update:', cmd )
+    if params is not None:
+      self.logger.verbose( '_update: params', params )
 
     retDict = self.__getConnection( conn = conn )
     if not retDict['OK']:
@@ -462,7 +475,7 @@ class MySQL:
 
     try:
       cursor = connection.cursor()
-      res = cursor.execute( cmd )
+      res = cursor.execute( cmd, params )
       connection.commit()
       self.logger.verbose( '_update:', res )
       retDict = S_OK( res )
@@ -482,6 +495,47 @@ class MySQL:
     return retDict
 
 
+  def _transaction( self, cmdList, conn = None ):
+    """ execute a list of ( cmd, params ) MySQL update commands in one transaction
+        params can be None as in _update
+        return S_OK with the list of the numbers of updated registers upon success
+        return S_ERROR upon error, nothing is committed then
+    """
+    self.logger.verbose( '_transaction: %s commands' % len( cmdList ) )
+
+    retDict = self.__getConnection( conn = conn )
+    if not retDict['OK']:
+      return retDict
+    connection = retDict['Value']
+
+    cmd = None
+    try:
+      cursor = connection.cursor()
+      res = []
+      for cmd, params in cmdList:
+        self.logger.verbose( '_transaction:', cmd )
+        res.append( cursor.execute( cmd, params ) )
+      connection.commit()
+      self.logger.verbose( '_transaction:', res )
+      retDict = S_OK( res )
+    except Exception, x:
+      self.logger.warn( '_transaction:', cmd )
+      retDict = self._except( '_transaction', x, 'Execution failed.' )
+      try:
+        connection.rollback()
+      except Exception:
+        pass
+
+    try:
+      cursor.close()
+    except Exception:
+      pass
+    if not conn:
+      self.__putConnection( connection )
+
+    return retDict
+
+
   def _createTables( self, tableDict, force = False ):
     """
     tableDict:
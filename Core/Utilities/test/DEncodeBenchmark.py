@@ -0,0 +1,69 @@
+########################################################################
+# $HeadURL $
+# File: DEncodeBenchmark.py
+########################################################################
+
+""" :mod: DEncodeBenchmark
+    ======================
+
+    .. module: DEncodeBenchmark
+    :synopsis: compare the reference and the fast DEncode codecs
+
+    Times encoding and decoding of payloads similar to the ones seen by the
+    services: job attribute dicts, replica maps and small RPC replies.
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import time
+import datetime
+## SUT
+from DIRAC.Core.Utilities import DEncode
+
+def jobAttributes( nJobs = 2000 ):
+  """ JobMonitoring like reply """
+  now = datetime.datetime.utcnow()
+  jobs = {}
+  for jobID in range( nJobs ):
+    attrs = dict( [ ( "Attribute%d" % i, "Value of attribute %d" % i ) for i in range( 25 ) ] )
+    attrs.update( { 'JobID' : jobID, 'LastUpdateTime' : now, 'VerifiedFlag' : True, 'UserPriority' : 1 } )
+    jobs[ jobID ] = attrs
+  return { 'OK' : True, 'Value' : jobs }
+
+def replicaMap( nFiles = 20000 ):
+  """ getReplicas like reply """
+  successful = {}
+  for fileIndex in range( nFiles ):
+    lfn = "/vo/data/2012/RAW/FULL/%08d.raw" % fileIndex
+    successful[ lfn ] = dict( [ ( se, "srm://srm.%s.org:8443/srm/managerv2?SFN=/storage%s" % ( se, lfn ) )
+                                for se in ( "CERN-RAW", "CNAF-RAW", "GRIDKA-RAW" ) ] )
+  return { 'OK' : True, 'Value' : { 'Successful' : successful, 'Failed' : {} } }
+
+def smallReply():
+  """ typical small RPC reply """
+  return { 'OK' : True, 'Value' : [ 1234, "Running", "Application", 3.5 ] }
+
+def timeIt( func, arg, iterations ):
+  """ best time out of 5 runs of iterations calls """
+  best = False
+  for run in range( 5 ):
+    start = time.time()
+    for i in range( iterations ):
+      func( arg )
+    elapsed = time.time() - start
+    if best is False or elapsed < best:
+      best = elapsed
+  return best / iterations
+
+if __name__ == "__main__":
+  for name, payload, iterations in ( ( "small reply", smallReply(), 20000 ),
+                                     ( "job attributes", jobAttributes(), 3 ),
+                                     ( "replica map", replicaMap(), 3 ) ):
+    encoded = DEncode.pyEncode( payload )
+    print "%s (%s bytes)" % ( name, len( encoded ) )
+    for codec, encFunc, decFunc in ( ( "reference", DEncode.pyEncode, DEncode.pyDecode ),
+                                     ( "fast", DEncode.fastEncode, DEncode.fastDecode ) ):
+      encTime = timeIt( encFunc, payload, iterations )
+      decTime = timeIt( decFunc, encoded, iterations )
+      print "  %-10s encode %10.2f us  decode %10.2f us" % ( codec, encTime * 10 ** 6, decTime * 10 ** 6 )
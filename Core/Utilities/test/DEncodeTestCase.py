@@ -0,0 +1,102 @@
+########################################################################
+# $HeadURL $
+# File: DEncodeTestCase.py
+########################################################################
+
+""".. module:: DEncodeTestCase
+
+Test cases for DIRAC.Core.Utilities.DEncode module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import random
+import datetime
+import unittest
+## SUT
+from DIRAC.Core.Utilities import DEncode
+
+def randomString( rnd ):
+  """ random printable string, sometimes empty or with separators inside """
+  return "".join( [ rnd.choice( "abcdefXYZ0123456789:e/_-. " ) for i in range( rnd.randint( 0, 20 ) ) ] )
+
+def randomObject( rnd, depth = 0 ):
+  """ random nested structure of all types known to DEncode """
+  leaves = ( lambda: randomString( rnd ),
+             lambda: rnd.randint( -10 ** 6, 10 ** 6 ),
+             lambda: long( rnd.randint( -10 ** 6, 10 ** 6 ) ) * 10 ** 12,
+             lambda: rnd.randint( -1000, 1000 ) / 8.0,
+             lambda: rnd.choice( ( True, False ) ),
+             lambda: None,
+             lambda: unicode( randomString( rnd ) ) + u"\xe9",
+             lambda: datetime.datetime( 2012, rnd.randint( 1, 12 ), rnd.randint( 1, 28 ),
+                                        rnd.randint( 0, 23 ), rnd.randint( 0, 59 ), 0, rnd.randint( 0, 999999 ) ),
+             lambda: datetime.date( 2012, rnd.randint( 1, 12 ), rnd.randint( 1, 28 ) ) )
+  if depth > 3 or rnd.random() < 0.4:
+    return rnd.choice( leaves )()
+  container = rnd.choice( ( "list", "tuple", "dict" ) )
+  if container == "dict":
+    return dict( [ ( rnd.choice( leaves[:3] )(), randomObject( rnd, depth + 1 ) ) for i in range( rnd.randint( 0, 8 ) ) ] )
+  elements = [ randomObject( rnd, depth + 1 ) for i in range( rnd.randint( 0, 8 ) ) ]
+  if container == "tuple":
+    return tuple( elements )
+  return elements
+
+########################################################################
+class DEncodeTestCase( unittest.TestCase ):
+  """py:class DEncodeTestCase
+  Test case for DIRAC.Core.Utilities.DEncode module.
+  """
+
+  def testKnownValues( self ):
+    """ encoding of simple values """
+    self.assertEqual( DEncode.encode( { 'OK' : True, 'Value' : [ 1, "a", ( None, ) ] } ), "ds2:OKb1s5:Valueli1es1:atneee" )
+    self.assertEqual( DEncode.decode( "ds2:OKb1s5:Valueli1es1:atneee" ),
+                      ( { 'OK' : True, 'Value' : [ 1, "a", ( None, ) ] }, 29 ) )
+    self.assertEqual( DEncode.decode( "" ), "" )
+
+  def testFastCodecFuzz( self ):
+    """ fast and reference codecs agree byte by byte and round trip """
+    rnd = random.Random( 1234 )
+    for i in range( 2000 ):
+      obj = randomObject( rnd )
+      encoded = DEncode.pyEncode( obj )
+      self.assertEqual( DEncode.fastEncode( obj ), encoded )
+      self.assertEqual( DEncode.fastDecode( encoded ), DEncode.pyDecode( encoded ) )
+      self.assertEqual( DEncode.fastDecode( encoded ), ( obj, len( encoded ) ) )
+
+  def testStreamDecoder( self ):
+    """ decoding data split in random chunks """
+    rnd = random.Random( 4321 )
+    for i in range( 500 ):
+      obj = randomObject( rnd )
+      encoded = DEncode.encode( obj )
+      cuts = sorted( [ rnd.randint( 0, len( encoded ) ) for j in range( rnd.randint( 0, 10 ) ) ] )
+      chunks = [ encoded[ start : end ] for start, end in zip( [ 0 ] + cuts, cuts + [ len( encoded ) ] ) ]
+      decoder = DEncode.StreamDecoder( chunks )
+      if type( obj ) in ( list, tuple ):
+        self.assertEqual( list( decoder.iterContainer() ), list( obj ) )
+      elif type( obj ) == dict:
+        self.assertEqual( dict( decoder.iterContainer() ), obj )
+      else:
+        self.assertEqual( decoder.decodeObject(), obj )
+    #Float exponents split between chunks
+    decoder = DEncode.StreamDecoder( [ "lf1e", "+20ee" ] )
+    self.assertEqual( list( decoder.iterContainer() ), [ 1e+20 ] )
+    #Truncated data
+    decoder = DEncode.StreamDecoder( [ "ls3:ab" ] )
+    self.assertRaises( ValueError, list, decoder.iterContainer() )
+
+  def testUnknownType( self ):
+    """ both codecs reject types they don't know """
+    self.assertRaises( KeyError, DEncode.pyEncode, [ object() ] )
+    self.assertRaises( KeyError, DEncode.fastEncode, [ object() ] )
+    self.assertRaises( KeyError, DEncode.fastDecode, "lxe" )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( DEncodeTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
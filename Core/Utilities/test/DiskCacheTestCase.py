@@ -0,0 +1,113 @@
+########################################################################
+# $HeadURL $
+# File: DiskCacheTestCase.py
+########################################################################
+
+""".. module:: DiskCacheTestCase
+
+Test cases for DIRAC.Core.Utilities.DiskCache module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+## SUT
+from DIRAC import S_OK
+from DIRAC.Core.Utilities.DiskCache import DiskCache
+
+########################################################################
+class DiskCacheTestCase( unittest.TestCase ):
+  """py:class DiskCacheTestCase
+  Test case for DIRAC.Core.Utilities.DiskCache module.
+  """
+
+  def setUp( self ):
+    self.cacheDir = tempfile.mkdtemp()
+    self.generated = []
+
+  def tearDown( self ):
+    shutil.rmtree( self.cacheDir )
+
+  def generator( self, name, size = 10, delay = 0 ):
+    """ generate a file of size bytes for an entry """
+    def generate():
+      time.sleep( delay )
+      self.generated.append( name )
+      fd = open( os.path.join( self.cacheDir, "%s.png" % name ), "wb" )
+      fd.write( "x" * size )
+      fd.close()
+      return S_OK( ( { 'plot' : "%s.png" % name }, [ "%s.png" % name ] ) )
+    return generate
+
+  def test_01_restart( self ):
+    """ entries are shared by the instances of the cache directory """
+    cache = DiskCache( self.cacheDir )
+    result = cache.getOrGenerate( "a", 600, self.generator( "a" ) )
+    self.assertEqual( result[ 'OK' ], True )
+    self.assertEqual( result[ 'Value' ], { 'plot' : "a.png" } )
+    other = DiskCache()
+    other.setLocation( self.cacheDir )
+    result = other.getOrGenerate( "a", 600, self.generator( "a" ) )
+    self.assertEqual( result[ 'Value' ], { 'plot' : "a.png" } )
+    self.assertEqual( self.generated, [ "a" ] )
+    self.assertEqual( other.getFile( "a.png" )[ 'Value' ], "x" * 10 )
+    self.assertEqual( other.getFile( "../a.png" )[ 'OK' ], False )
+    ## expired entries are generated again
+    cache.getOrGenerate( "b", -1, self.generator( "b" ) )
+    other.getOrGenerate( "b", 600, self.generator( "b" ) )
+    self.assertEqual( self.generated, [ "a", "b", "b" ] )
+
+  def test_02_eviction( self ):
+    """ least recently used entries go first """
+    cache = DiskCache( self.cacheDir, maxBytes = 1000 )
+    for name in ( "a", "b", "c" ):
+      cache.getOrGenerate( name, 600, self.generator( name, 300 ) )
+      time.sleep( 0.01 )
+    cache.get( "a" )
+    cache.getOrGenerate( "d", 600, self.generator( "d", 300 ) )
+    self.assertEqual( cache.get( "b" ), False )
+    self.assertEqual( os.path.exists( os.path.join( self.cacheDir, "b.png" ) ), False )
+    for name in ( "a", "c", "d" ):
+      self.assertEqual( cache.get( name ), { 'plot' : "%s.png" % name } )
+
+  def test_03_coalescing( self ):
+    """ concurrent identical requests generate once """
+    results = []
+    def request():
+      results.append( DiskCache( self.cacheDir ).getOrGenerate( "a", 600, self.generator( "a", delay = 0.2 ) ) )
+    threads = [ threading.Thread( target = request ) for i in range( 5 ) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assertEqual( self.generated, [ "a" ] )
+    self.assertEqual( [ result[ 'Value' ] for result in results ], [ { 'plot' : "a.png" } ] * 5 )
+
+  def test_04_regeneration( self ):
+    """ files of a regenerated entry survive the eviction of the expired one """
+    cache = DiskCache( self.cacheDir )
+    cache.getOrGenerate( "a", 0.1, self.generator( "a" ) )
+    time.sleep( 0.2 )
+    generate = self.generator( "a" )
+    def generateAndPurge():
+      result = generate()
+      ## another process updates the index meanwhile
+      DiskCache( self.cacheDir ).purgeExpired()
+      return result
+    result = cache.getOrGenerate( "a", 600, generateAndPurge )
+    self.assertEqual( result[ 'Value' ], { 'plot' : "a.png" } )
+    self.assertEqual( cache.getFile( "a.png" )[ 'Value' ], "x" * 10 )
+    self.assertEqual( DiskCache( self.cacheDir ).get( "a" ), { 'plot' : "a.png" } )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( DiskCacheTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,102 @@
+########################################################################
+# $HeadURL $
+# File: MySQLBenchmark.py
+########################################################################
+
+""" :mod: MySQLBenchmark
+    ====================
+
+    .. module: MySQLBenchmark
+    :synopsis: queries per second of the MySQL class under many threads
+
+    50 threads run heartbeat like statements against a test table for a few
+    seconds, first escaping every value with _escapeString and then binding
+    them with the params argument of _query/_update. It needs a local MySQL
+    with the same test account as the MySQL module self test.
+
+    Usage: python MySQLBenchmark.py [host] [user] [password] [db]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+import threading
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+## SUT
+from DIRAC.Core.Utilities.MySQL import MySQL
+
+NUM_THREADS = 50
+DURATION = 10
+
+TABLES = { 'BenchmarkTable' : { 'Fields': { 'ID'    : "INTEGER NOT NULL",
+                                            'Name'  : "VARCHAR(64) NOT NULL",
+                                            'Value' : "VARCHAR(255) NOT NULL",
+                                          },
+                                'PrimaryKey': [ 'ID', 'Name' ]
+                              }
+         }
+
+def escapedWork( db, threadId, iteration ):
+  """ escape each value on its own as the DBs did so far """
+  values = []
+  for value in ( threadId, "CPUConsumed", "%s.5" % iteration ):
+    result = db._escapeString( value )
+    if not result[ 'OK' ]:
+      return result
+    values.append( result[ 'Value' ] )
+  result = db._update( "REPLACE INTO BenchmarkTable ( ID, Name, Value ) VALUES ( %s, %s, %s )" % tuple( values ) )
+  if not result[ 'OK' ]:
+    return result
+  return db._query( "SELECT Value FROM BenchmarkTable WHERE ID=%s AND Name=%s" % tuple( values[:2] ) )
+
+def paramsWork( db, threadId, iteration ):
+  """ let the driver bind the values """
+  result = db._update( "REPLACE INTO BenchmarkTable ( ID, Name, Value ) VALUES ( %s, %s, %s )",
+                       params = ( threadId, "CPUConsumed", "%s.5" % iteration ) )
+  if not result[ 'OK' ]:
+    return result
+  return db._query( "SELECT Value FROM BenchmarkTable WHERE ID=%s AND Name=%s",
+                    params = ( threadId, "CPUConsumed" ) )
+
+def runThreads( db, work ):
+  """ run work in NUM_THREADS threads for DURATION seconds, return statements per second """
+  counters = [ 0 ] * NUM_THREADS
+  errors = []
+  endTime = time.time() + DURATION
+
+  def loop( threadId ):
+    iteration = 0
+    while time.time() < endTime:
+      result = work( db, threadId, iteration )
+      if not result[ 'OK' ]:
+        errors.append( result[ 'Message' ] )
+        return
+      iteration += 1
+    counters[ threadId ] = iteration * 2
+
+  threads = [ threading.Thread( target = loop, args = ( threadId, ) ) for threadId in range( NUM_THREADS ) ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  if errors:
+    print "  %s errors, first one: %s" % ( len( errors ), errors[0] )
+  return sum( counters ) / float( DURATION )
+
+if __name__ == "__main__":
+  args = sys.argv[1:] + [ '127.0.0.1', 'Dirac', 'Dirac', 'AccountingDB' ][ len( sys.argv[1:] ): ]
+  host, user, password, dbName = args[:4]
+  db = MySQL( host, user, password, dbName )
+  result = db._createTables( TABLES, force = True )
+  if not result[ 'OK' ]:
+    print "Cannot create the benchmark table: %s" % result[ 'Message' ]
+    sys.exit( 1 )
+  try:
+    print "%s threads, %s seconds each" % ( NUM_THREADS, DURATION )
+    for name, work in ( ( "escaped values", escapedWork ), ( "bound params", paramsWork ) ):
+      print "  %-20s %10.1f queries/s" % ( name, runThreads( db, work ) )
+  finally:
+    db._update( "DROP TABLE BenchmarkTable" )
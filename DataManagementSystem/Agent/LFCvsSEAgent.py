@@ -35,7 +35,7 @@ class LFCvsSEAgent( AgentModule ):
 
   def execute( self ):
 
-    res = self.RequestDBClient.getRequest( 'integrity' )
+    res = self.RequestDBClient.getRequest( 'integrity', requestFormat = 'binary' )
     if not res['OK']:
       gLogger.info( "LFCvsSEAgent.execute: Failed to get request from database." )
       return S_OK()
@@ -45,6 +45,7 @@ class LFCvsSEAgent( AgentModule ):
     requestString = res['Value']['RequestString']
     requestName = res['Value']['RequestName']
     sourceServer = res['Value']['Server']
+    requestFormat = res['Value']['RequestFormat']
     gLogger.info( "LFCvsSEAgent.execute: Obtained request %s" % requestName )
     oRequest = RequestContainer( request = requestString )
 
@@ -157,7 +158,7 @@ class LFCvsSEAgent( AgentModule ):
 
     ################################################
     #  Generate the new request string after operation
-    requestString = oRequest.toXML()['Value']
+    requestString = oRequest.serialize( requestFormat )['Value']
     res = self.RequestDBClient.updateRequest( requestName, requestString, sourceServer )
 
     return S_OK()
@@ -39,7 +39,7 @@ class SEvsLFCAgent( AgentModule ):
 
     IntegrityDB = RPCClient( 'DataManagement/DataIntegrity' )
 
-    res = self.RequestDBClient.getRequest( 'integrity' )
+    res = self.RequestDBClient.getRequest( 'integrity', requestFormat = 'binary' )
     if not res['OK']:
       gLogger.info( "SEvsLFCAgent.execute: Failed to get request from database." )
       return S_OK()
@@ -49,6 +49,7 @@ class SEvsLFCAgent( AgentModule ):
     requestString = res['Value']['requestString']
     requestName = res['Value']['requestName']
     sourceServer = res['Value']['Server']
+    requestFormat = res['Value']['RequestFormat']
     gLogger.info( "SEvsLFCAgent.execute: Obtained request %s" % requestName )
     oRequest = RequestContainer( request = requestString )
 
@@ -227,7 +228,7 @@ class SEvsLFCAgent( AgentModule ):
 
     ################################################
     #  Generate the new request string after operation
-    requestString = oRequest.toXML()['Value']
+    requestString = oRequest.serialize( requestFormat )['Value']
     res = self.RequestDBClient.updateRequest( requestName, requestString, sourceServer )
 
     return S_OK()
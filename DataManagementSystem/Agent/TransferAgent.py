@@ -655,6 +655,7 @@ class TransferAgent( RequestAgentBase ):
 
     here requestDict
     requestDict = { "requestString" : str,
+                    "requestFormat" : str,
                     "requestName" : str,
                     "sourceServer" : str,
                     "executionOrder" : int,
@@ -754,7 +755,7 @@ class TransferAgent( RequestAgentBase ):
     ## update Request in DB after operation 
     ## if all subRequests are statuses = Done, 
     ## this will also set the Request status to Done
-    requestString = requestObj.toXML()["Value"]
+    requestString = requestObj.serialize( requestDict["requestFormat"] )["Value"]
     res = self.requestClient().updateRequest( requestName, requestString, requestDict["sourceServer"] )
     if not res["OK"]:
       self.log.error( "schedule: failed to update request", "%s %s" % ( requestName, res["Message"] ) )
@@ -30,8 +30,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
     return 'Directory'
 
   def findDir(self,path):
-    req = "SELECT DirID,Level from FC_DirectoryLevelTree WHERE DirName='%s'" % path
-    result = self.db._query(req)
+    req = "SELECT DirID,Level from FC_DirectoryLevelTree WHERE DirName=%s"
+    result = self.db._query(req,params=(path,))
     if not result['OK']:
       return result
     
@@ -327,9 +327,8 @@ class DirectoryLevelTree(DirectoryTreeBase):
       dPath += '/'+el
       pelements.append(dPath)
       
-    pathString = [ "'"+p+"'" for p in pelements ]
-    req = "SELECT DirID FROM FC_DirectoryLevelTree WHERE DirName in (%s) ORDER BY DirID" % ','.join(pathString)
-    result = self.db._query(req)
+    req = "SELECT DirID FROM FC_DirectoryLevelTree WHERE DirName in (%s) ORDER BY DirID" % ','.join(['%s']*len(pelements))
+    result = self.db._query(req,params=tuple(pelements))
     if not result['OK']:
       return result
     if not result['Value']:
@@ -70,9 +70,11 @@ class FileManager(FileManagerBase):
         statusIDs.append(res['Value'])
       if statusIDs:
         req = "%s AND Status IN (%s)" % (req,intListToString(statusIDs))
+    params = None
     if fileNames:
-      req = "%s AND FileName IN (%s)" % (req,stringListToString(fileNames))
-    res = self.db._query(req,connection)
+      req = "%s AND FileName IN (%s)" % (req,','.join(['%s']*len(fileNames)))
+      params = tuple(fileNames)
+    res = self.db._query(req,connection,params=params)
     if not res['OK']:
       return res
     fileNameIDs = res['Value']
@@ -205,8 +207,8 @@ class FileManager(FileManagerBase):
       return S_OK({})
     if type(guid) not in [ListType,TupleType]:
       guid = [guid] 
-    req = "SELECT FileID,GUID FROM FC_FileInfo WHERE GUID IN (%s)" % stringListToString(guid)
-    res = self.db._query(req,connection)
+    req = "SELECT FileID,GUID FROM FC_FileInfo WHERE GUID IN (%s)" % ','.join(['%s']*len(guid))
+    res = self.db._query(req,connection,params=tuple(guid))
     if not res['OK']:
       return res
     guidDict = {}
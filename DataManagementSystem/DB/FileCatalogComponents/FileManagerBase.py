@@ -869,14 +869,14 @@ class FileManagerBase:
 
   def _getStatusInt( self, status, connection = False ):
     connection = self._getConnection( connection )
-    req = "SELECT StatusID FROM FC_Statuses WHERE Status = '%s';" % status
-    res = self.db._query( req, connection )
+    req = "SELECT StatusID FROM FC_Statuses WHERE Status = %s;"
+    res = self.db._query( req, connection, params = ( status, ) )
     if not res['OK']:
       return res
     if res['Value']:
       return S_OK( res['Value'][0][0] )
-    req = "INSERT INTO FC_Statuses (Status) VALUES ('%s');" % status
-    res = self.db._update( req, connection )
+    req = "INSERT INTO FC_Statuses (Status) VALUES (%s);"
+    res = self.db._update( req, connection, params = ( status, ) )
     if not res['OK']:
       return res
     return S_OK( res['lastRowId'] )
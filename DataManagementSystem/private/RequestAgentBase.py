@@ -299,6 +299,7 @@ class RequestAgentBase( AgentModule ):
     :return: S_OK with request dictionary::
 
       requestDict = { "requestString" : str,
+                      "requestFormat" : str,
                       "requestName" : str,
                       "sourceServer" : str,
                       "executionOrder" : list,
@@ -306,12 +307,13 @@ class RequestAgentBase( AgentModule ):
     """
     ## prepare requestDict
     requestDict = { "requestString" : None,
+                    "requestFormat" : None,
                     "requestName" : None,
                     "sourceServer" : None,
                     "executionOrder" : None,
                     "jobID" : None }
-    ## get request out of RequestClient
-    res = self.requestClient().getRequest( requestType )
+    ## get request out of RequestClient, binary if the server knows it
+    res = self.requestClient().getRequest( requestType, requestFormat = "binary" )
     if not res["OK"]:
       self.log.error( res["Message"] )
       return res
@@ -322,6 +324,7 @@ class RequestAgentBase( AgentModule ):
     ## store values
     requestDict["requestName"] = res["Value"]["RequestName"]
     requestDict["requestString"] = res["Value"]["RequestString"]
+    requestDict["requestFormat"] = res["Value"]["RequestFormat"]
     requestDict["sourceServer"] = res["Value"]["Server"]
     ## get JobID
     try:
@@ -105,16 +105,18 @@ class RequestTask( object ):
   ## monitoring dict
   __monitor = {} 
 
-  def __init__( self, requestString, requestName, executionOrder, jobID, sourceServer, configPath ):
+  def __init__( self, requestString, requestName, executionOrder, jobID, sourceServer, configPath,
+                requestFormat = "xml" ):
     """ c'tor
 
     :param self: self reference
-    :param str requestString: XML serialised RequestContainer
+    :param str requestString: XML or binary serialised RequestContainer
     :param str requestName: request name
     :param list executionOrder: request execution order
     :param int jobID: jobID
     :param str sourceServer: request's source server
     :param str configPath: path in CS for parent agent
+    :param str requestFormat: format of requestString, the request is put back in it
     """    
     ## fixtures
 
@@ -156,10 +158,14 @@ class RequestTask( object ):
 
     ## save request string
     self.requestString = requestString
+    self.requestFormat = requestFormat
     ## build request object
-    from DIRAC.RequestManagementSystem.Client.RequestContainer import RequestContainer
+    from DIRAC.RequestManagementSystem.Client.RequestContainer import RequestContainer, isBinaryRequest
     self.requestObj = RequestContainer( init = False )
-    self.requestObj.parseRequest( request = self.requestString )
+    if isBinaryRequest( self.requestString ):
+      self.requestObj.parseBinaryRequest( self.requestString )
+    else:
+      self.requestObj.parseRequest( request = self.requestString )
     ## save request name
     self.requestName = requestName
     ## .. and jobID
@@ -485,7 +491,7 @@ class RequestTask( object ):
 
     ################################################
     #  Generate the new request string after operation
-    newRequestString = self.requestObj.toXML()['Value']
+    newRequestString = self.requestObj.serialize( self.requestFormat )['Value']
     update = self.putBackRequest( self.requestName, newRequestString, self.sourceServer )
     if not update["OK"]:
       self.error( "handleRequest: error when updating request: %s" % update["Message"] )
@@ -35,17 +35,17 @@ class SystemLoggingDB(DB):
     DB.__init__( self, 'SystemLoggingDB', 'Framework/SystemLoggingDB',
                  maxQueueSize)
 
-  def _query( self, cmd, conn=False ):
+  def _query( self, cmd, conn=False, params=None ):
     start = time.time()
-    ret = DB._query( self, cmd, conn )
+    ret = DB._query( self, cmd, conn, params )
     if DEBUG:
       print >> debugFile, time.time() - start, cmd.replace('\n','')
       debugFile.flush()
     return ret
 
-  def _update( self, cmd, conn=False ):
+  def _update( self, cmd, conn=False, params=None ):
     start = time.time()
-    ret = DB._update( self, cmd, conn )
+    ret = DB._update( self, cmd, conn, params )
     if DEBUG:
       print >> debugFile, time.time() - start, cmd.replace('\n','')
       debugFile.flush()
@@ -373,6 +373,101 @@ class SystemLoggingDB(DB):
 
     return self._insert( 'MessageRepository', fieldsList, messageList )
 
+  def __getSatelliteKey( self, keysCache, tableName, outFields, inFields, inValues ):
+    """ __DBCommit with the keys already resolved during this bundle
+        remembered in keysCache
+    """
+    cacheKey = ( tableName, tuple( inValues ) )
+    if cacheKey not in keysCache:
+      result = self.__DBCommit( tableName, outFields, inFields, inValues )
+      if not result['OK']:
+        return result
+      keysCache[ cacheKey ] = result['Value']
+    return S_OK( keysCache[ cacheKey ] )
+
+  def _insertMessagesIntoSystemLoggingDB( self, messagesList, site, nodeFQDN,
+                                          userDN, userGroup, remoteAddress ):
+    """ This function inserts a bundle of Log messages into the DB
+        messagesList is a list of ( messageObject, repetitions ) tuples.
+        The satellite keys are resolved once per distinct value and all the
+        messages go into MessageRepository with a single INSERT. Messages
+        repeated by the client are stored once, the number of repetitions
+        is appended to their variable text.
+    """
+    if not messagesList:
+      return S_OK( 0 )
+    keysCache = {}
+
+    result = self.__getSatelliteKey( keysCache, 'UserDNs', [ 'UserDNID' ],
+                                     [ 'OwnerDN', 'OwnerGroup' ], [ userDN, userGroup ] )
+    if not result['OK']:
+      return result
+    userDNKey = result['Value']
+
+    if not site:
+      site = 'Unknown'
+    result = self.__getSatelliteKey( keysCache, 'Sites', [ 'SiteID' ],
+                                     [ 'SiteName' ], [ site ] )
+    if not result['OK']:
+      return result
+    siteIDKey = result['Value']
+
+    result = self.__getSatelliteKey( keysCache, 'ClientIPs', [ 'ClientIPNumberID' ],
+                                     [ 'ClientIPNumberString' , 'ClientFQDN', 'SiteID' ],
+                                     [ remoteAddress, nodeFQDN, siteIDKey ] )
+    if not result['OK']:
+      return result
+    clientIPKey = result['Value']
+
+    fieldsList = [ 'MessageTime', 'VariableText', 'UserDNID', 'ClientIPNumberID',
+                   'LogLevel', 'FixedTextID' ]
+    rowsValues = []
+    for message, repetitions in messagesList:
+      messageSubSystemName = message.getSubSystemName()
+      if not messageSubSystemName:
+        messageSubSystemName = 'Unknown'
+      result = self.__getSatelliteKey( keysCache, 'SubSystems', [ 'SubSystemID' ],
+                                       [ 'SubSystemName' ], [ messageSubSystemName ] )
+      if not result['OK']:
+        return result
+      subSystemsKey = result['Value']
+
+      messageName = message.getName()
+      if not messageName:
+        messageName = 'Unknown'
+      result = self.__getSatelliteKey( keysCache, 'Systems', [ 'SystemID' ],
+                                       [ 'SystemName', 'SubSystemID' ], [ messageName, subSystemsKey ] )
+      if not result['OK']:
+        return result
+      systemIDKey = result['Value']
+
+      result = self.__getSatelliteKey( keysCache, 'FixedTextMessages', [ 'FixedTextID' ],
+                                       [ 'FixedTextString' , 'SystemID' ],
+                                       [ message.getFixedMessage(), systemIDKey ] )
+      if not result['OK']:
+        return result
+      fixedTextKey = result['Value']
+
+      messageDate = Time.toString( message.getTime() )
+      messageDate = messageDate[:messageDate.find('.')]
+      variableText = message.getVariableMessage()
+      if repetitions > 1:
+        repetitionsText = ' (repeated %d times)' % repetitions
+        variableText = variableText[ :255 - len( repetitionsText ) ] + repetitionsText
+      rowsValues.extend( [ messageDate, variableText, userDNKey, clientIPKey,
+                           message.getLevel(), fixedTextKey ] )
+
+    result = self._escapeValues( rowsValues )
+    if not result['OK']:
+      return result
+    escapedValues = result['Value']
+    nFields = len( fieldsList )
+    rowsValues = [ '( %s )' % ', '.join( escapedValues[ i : i + nFields ] )
+                   for i in range( 0, len( escapedValues ), nFields ) ]
+    cmd = "INSERT INTO MessageRepository ( %s ) VALUES %s" % ( ', '.join( fieldsList ),
+                                                               ', '.join( rowsValues ) )
+    return self._update( cmd )
+
   def _insertDataIntoAgentTable(self, agentName, data):
     """Insert the persistent data needed by the agents running on top of
        the SystemLoggingDB.
@@ -11,7 +11,7 @@ import time
 import threading
 
 from DIRAC import S_OK, S_ERROR, gLogger, rootPath
-from DIRAC.Core.Utilities import DictCache
+from DIRAC.Core.Utilities.DiskCache import DiskCache
 from DIRAC.Core.Utilities import Time
 from DIRAC.Core.Utilities.Graphs import graph
 
@@ -20,31 +20,29 @@ class PlotCache:
   def __init__( self, plotsLocation = False ):
     self.plotsLocation = plotsLocation
     self.alive = True
-    self.__graphCache = DictCache( deleteFunction = _deleteGraph )
+    self.__graphCache = DiskCache( plotsLocation )
     self.__graphLifeTime = 600
     self.purgeThread = threading.Thread( target = self.purgeExpired )
     self.purgeThread.start()
 
-  def setPlotsLocation( self, plotsDir ):
+  def setPlotsLocation( self, plotsDir, maxBytes = False ):
     self.plotsLocation = plotsDir
-    for plot in os.listdir( self.plotsLocation ):
-      if plot.find( ".png" ) > 0:
-        plotLocation = "%s/%s" % ( self.plotsLocation, plot )
-        gLogger.verbose( "Purging %s" % plotLocation )
-        os.unlink( plotLocation )
+    retVal = self.__graphCache.setLocation( plotsDir, maxBytes )
+    if not retVal[ 'OK' ]:
+      gLogger.error( "Cannot use the plots cache location", retVal[ 'Message' ] )
 
   def purgeExpired( self ):
     while self.alive:
       time.sleep( self.__graphLifeTime )
-      self.__graphCache.purgeExpired()
+      retVal = self.__graphCache.purgeExpired()
+      if not retVal[ 'OK' ]:
+        gLogger.error( "Cannot purge the plots cache", retVal[ 'Message' ] )
 
   def getPlot( self, plotHash, plotData, plotMetadata, subplotMetadata ):
     """
     Get plot from the cache if exists, else generate it
     """
-
-    plotDict = self.__graphCache.get( plotHash )
-    if plotDict == False:
+    def generatePlot():
       basePlotFileName = "%s/%s.png" % ( self.plotsLocation, plotHash )
       if subplotMetadata:
         retVal = graph( plotData, basePlotFileName, plotMetadata, metadata = subplotMetadata )
@@ -53,28 +51,15 @@ class PlotCache:
       if not retVal[ 'OK' ]:
         return retVal
       plotDict = retVal[ 'Value' ]
+      fileNames = []
       if plotDict[ 'plot' ]:
         plotDict[ 'plot' ] = os.path.basename( basePlotFileName )
-      self.__graphCache.add( plotHash, self.__graphLifeTime, plotDict )
-    return S_OK( plotDict )
+        fileNames.append( plotDict[ 'plot' ] )
+      return S_OK( ( plotDict, fileNames ) )
 
-  def getPlotData( self, plotFileName ):
-    filename = "%s/%s" % ( self.plotsLocation, plotFileName )
-    try:
-      fd = file( filename, "rb" )
-      data = fd.read()
-      fd.close()
-    except Exception, v:
-      return S_ERROR( "Can't open file %s: %s" % ( plotFileName, str( v ) ) )
-    return S_OK( data )
+    return self.__graphCache.getOrGenerate( plotHash, self.__graphLifeTime, generatePlot )
 
-def _deleteGraph( plotDict ):
-  try:
-    for key in plotDict:
-      value = plotDict[ key ]
-      if value and os.path.isfile( value ):
-        os.unlink( value )
-  except:
-    pass
+  def getPlotData( self, plotFileName ):
+    return self.__graphCache.getFile( plotFileName )
 
 gPlotCache = PlotCache()
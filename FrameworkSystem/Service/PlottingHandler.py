@@ -42,7 +42,7 @@ def initializePlottingHandler( serviceInfo ):
     gLogger.fatal( "Can't write to %s" % dataPath )
     return S_ERROR( "Data location is not writable" )
 
-  gPlotCache.setPlotsLocation( dataPath )
+  gPlotCache.setPlotsLocation( dataPath, gConfig.getValue( "%s/MaxCacheSizeMB" % plottingSection, 1024 ) * 1048576 )
   gMonitor.registerActivity( "plotsDrawn", "Drawn plot images", "Plotting requests", "plots", gMonitor.OP_SUM )
   return S_OK()
 
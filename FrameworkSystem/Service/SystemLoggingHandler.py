@@ -7,10 +7,13 @@ SystemLoggingHandler is the implementation of the Logging service
     The following methods are available in the Service interface
 
     addMessages()
+    addCompressedMessages()
 
 """
+import zlib
+from types import StringType
 from DIRAC import S_OK, S_ERROR, gConfig, gLogger
-from DIRAC.Core.Utilities import Time
+from DIRAC.Core.Utilities import Time, DEncode
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC.FrameworkSystem.private.logging.Message import tupleToMessage
 from DIRAC.FrameworkSystem.DB.SystemLoggingDB import SystemLoggingDB
@@ -24,26 +27,17 @@ def initializeSystemLoggingHandler( serviceInfo ):
 
 class SystemLoggingHandler( RequestHandler ):
 
-  def __addMessage( self, messageObject, site, nodeFQDN ):
-    """  This is the function that actually adds the Message to 
-         the log Database
+  def __addMessagesBundle( self, messagesList, site, nodeFQDN ):
+    """ Insert a list of ( messageObject, repetitions ) in one go
     """
     Credentials = self.getRemoteCredentials()
-    if Credentials.has_key('DN'):
-      userDN = Credentials['DN']
-    else:
-      userDN = 'unknown'
-    if Credentials.has_key('group'):
-      userGroup = Credentials['group']
-    else:
-      userGroup = 'unknown'
-      
+    userDN = Credentials.get( 'DN', 'unknown' )
+    userGroup = Credentials.get( 'group', 'unknown' )
     remoteAddress = self.getRemoteAddress()[0]
-    return LogDB._insertMessageIntoSystemLoggingDB( messageObject, site,
-                                                    nodeFQDN, userDN,
-                                                    userGroup, remoteAddress )
+    return LogDB._insertMessagesIntoSystemLoggingDB( messagesList, site,
+                                                     nodeFQDN, userDN,
+                                                     userGroup, remoteAddress )
 
-        
   types_addMessages = []
 
   #A normal exported function (begins with export_)
@@ -55,17 +49,43 @@ class SystemLoggingHandler( RequestHandler ):
            S_OK if no exception was raised
            S_ERROR if an exception was raised
     """
-    for messageTuple in messagesList:
-      messageObject = tupleToMessage( messageTuple )
-      try:
-        result = self.__addMessage( messageObject, site, nodeFQDN )
-        if not result['OK']:
-          gLogger.error('The Log Message could not be inserted into the DB',
-                        'because: "%s"' % result['Message'])
-      except Exception, v:
-        errorString = 'Message was not added because of exception: '
-        exceptionString = str(v)
-        gLogger.exception( errorString ,exceptionString )
-        return S_ERROR( "%s %s" % ( errorString, exceptionString ) )
+    try:
+      bundle = [ ( tupleToMessage( messageTuple ), 1 ) for messageTuple in messagesList ]
+      result = self.__addMessagesBundle( bundle, site, nodeFQDN )
+      if not result['OK']:
+        gLogger.error('The Log Messages could not be inserted into the DB',
+                      'because: "%s"' % result['Message'])
+    except Exception, v:
+      errorString = 'Messages were not added because of exception: '
+      exceptionString = str(v)
+      gLogger.exception( errorString ,exceptionString )
+      return S_ERROR( "%s %s" % ( errorString, exceptionString ) )
     return S_OK()
 
+  types_addCompressedMessages = [ StringType ]
+
+  def export_addCompressedMessages( self, compressedBundle, site, nodeFQDN ):
+    """ Bulk version of addMessages used by the RemoteBackend
+        inputs:
+           compressedBundle is the zlib compressed DEncoded list of
+           ( messageTuple, repetitions ) pairs
+        outputs:
+           S_OK if no exception was raised
+           S_ERROR if an exception was raised
+    """
+    try:
+      messagesList = DEncode.decode( zlib.decompress( compressedBundle ) )[0]
+      bundle = [ ( tupleToMessage( messageTuple ), repetitions ) for messageTuple, repetitions in messagesList ]
+    except Exception, v:
+      return S_ERROR( "Malformed message bundle: %s" % str( v ) )
+    try:
+      result = self.__addMessagesBundle( bundle, site, nodeFQDN )
+      if not result['OK']:
+        gLogger.error('The Log Messages could not be inserted into the DB',
+                      'because: "%s"' % result['Message'])
+    except Exception, v:
+      errorString = 'Messages were not added because of exception: '
+      exceptionString = str(v)
+      gLogger.exception( errorString ,exceptionString )
+      return S_ERROR( "%s %s" % ( errorString, exceptionString ) )
+    return S_OK()
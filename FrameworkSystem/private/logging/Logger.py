@@ -9,7 +9,6 @@ import traceback
 import os
 import os.path
 import re
-import inspect
 import Queue
 from DIRAC.FrameworkSystem.private.logging.LogLevels import LogLevels
 from DIRAC.FrameworkSystem.private.logging.Message import Message
@@ -20,6 +19,19 @@ import DIRAC
 
 DEBUG = 1
 
+#Absolute value of each level. Messages below the minimum level are discarded
+#comparing against these before anything is built
+_gLogLevels = LogLevels()
+_alwaysValue = abs( _gLogLevels.getLevelValue( _gLogLevels.always ) )
+_noticeValue = abs( _gLogLevels.getLevelValue( _gLogLevels.notice ) )
+_infoValue = abs( _gLogLevels.getLevelValue( _gLogLevels.info ) )
+_verboseValue = abs( _gLogLevels.getLevelValue( _gLogLevels.verbose ) )
+_debugValue = abs( _gLogLevels.getLevelValue( _gLogLevels.debug ) )
+_warnValue = abs( _gLogLevels.getLevelValue( _gLogLevels.warn ) )
+_errorValue = abs( _gLogLevels.getLevelValue( _gLogLevels.error ) )
+_exceptionValue = abs( _gLogLevels.getLevelValue( _gLogLevels.exception ) )
+_fatalValue = abs( _gLogLevels.getLevelValue( _gLogLevels.fatal ) )
+
 class Logger:
 
   defaultLogLevel = 'NOTICE'
@@ -127,6 +139,9 @@ class Logger:
     levelName = levelName.upper()
     if levelName.upper() in self._logLevels.getLevels():
       self._minLevel = abs( self._logLevels.getLevelValue( levelName ) )
+      #Sub loggers discard messages by themselves, keep them in sync
+      for subLogger in self._subLoggersDict.values():
+        subLogger.setLevel( levelName )
       return True
     return False
 
@@ -134,70 +149,44 @@ class Logger:
   def getName( self ):
     return self._systemName
 
-  def always( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.always,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def always( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _alwaysValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.always, sMsg, sVarMsg, fmtArgs )
 
-  def notice( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.notice,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def notice( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _noticeValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.notice, sMsg, sVarMsg, fmtArgs )
 
-  def info( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.info,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def info( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _infoValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.info, sMsg, sVarMsg, fmtArgs )
 
-  def verbose( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.verbose,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def verbose( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _verboseValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.verbose, sMsg, sVarMsg, fmtArgs )
 
-  def debug( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.debug,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def debug( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _debugValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.debug, sMsg, sVarMsg, fmtArgs )
 
-  def warn( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.warn,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def warn( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _warnValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.warn, sMsg, sVarMsg, fmtArgs )
 
-  def error( self, sMsg, sVarMsg = '' ):
-    messageObject = Message( self._systemName,
-                             self._logLevels.error,
-                             Time.dateTime(),
-                             sMsg,
-                             sVarMsg,
-                             self.__discoverCallingFrame() )
-    return self.processMessage( messageObject )
+  def error( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _errorValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.error, sMsg, sVarMsg, fmtArgs )
 
   def exception( self, sMsg = "", sVarMsg = '', lException = False, lExcInfo = False ):
+    if _exceptionValue < self._minLevel:
+      return True
     if sVarMsg:
       sVarMsg += "\n%s" % self.__getExceptionString( lException, lExcInfo )
     else:
@@ -210,13 +199,21 @@ class Logger:
                              self.__discoverCallingFrame() )
     return self.processMessage( messageObject )
 
-  def fatal( self, sMsg, sVarMsg = '' ):
+  def fatal( self, sMsg, sVarMsg = '', *fmtArgs ):
+    if _fatalValue < self._minLevel:
+      return True
+    return self.__emitMessage( self._logLevels.fatal, sMsg, sVarMsg, fmtArgs )
+
+  def __emitMessage( self, level, sMsg, sVarMsg, fmtArgs ):
+    #Format arguments are only interpolated into the variable message if it's going to be shown
+    if fmtArgs:
+      sVarMsg = sVarMsg % fmtArgs
     messageObject = Message( self._systemName,
-                             self._logLevels.fatal,
+                             level,
                              Time.dateTime(),
                              sMsg,
                              sVarMsg,
-                             self.__discoverCallingFrame() )
+                             self.__discoverCallingFrame( 3 ) )
     return self.processMessage( messageObject )
 
   def showStack( self ):
@@ -276,12 +273,11 @@ class Logger:
                          stack )
 
 
-  def __discoverCallingFrame( self ):
+  def __discoverCallingFrame( self, depth = 2 ):
     if self.__testLevel( self._logLevels.debug ) and self._showCallingFrame:
-      oActualFrame = inspect.currentframe()
-      lOuterFrames = inspect.getouterframes( oActualFrame )
-      lCallingFrame = lOuterFrames[2]
-      return "%s:%s" % ( lCallingFrame[1].replace( sys.path[0], "" )[1:], lCallingFrame[2] )
+      #depth is the number of frames between this function and the caller of the logger
+      callingFrame = sys._getframe( depth )
+      return "%s:%s" % ( callingFrame.f_code.co_filename.replace( sys.path[0], "" )[1:], callingFrame.f_lineno )
     else:
       return ""
 
@@ -16,6 +16,8 @@ class SubSystemLogger( Logger ):
         setattr( self, attrName, attrValue )
     self.__masterLogger = masterLogger
     self._subName = subName
+    #Start discarding the same messages as the master
+    self._minLevel = masterLogger._minLevel
 
   def processMessage( self, messageObject ):
     if self.__child:
@@ -3,12 +3,19 @@ __RCSID__ = "$Id$"
 """This Backend sends the Log Messages to a Log Server
 It will only report to the server ERROR, EXCEPTION, FATAL
 and ALWAYS messages.
+
+Messages are kept in a bounded buffer where identical messages are
+merged and counted. The buffer is shipped as a compressed bundle when it
+reaches BundleSize messages or every SleepTime seconds. When the buffer
+holds QueueSize different messages new ones are dropped and only their
+number is reported.
 """
 import threading
-import Queue
-from DIRAC.Core.Utilities import Time, Network
+import zlib
+from DIRAC.Core.Utilities import Time, Network, DEncode
 from DIRAC.FrameworkSystem.private.logging.backends.BaseBackend import BaseBackend
 from DIRAC.FrameworkSystem.private.logging.LogLevels import LogLevels
+from DIRAC.FrameworkSystem.private.logging.Message import Message
 
 class RemoteBackend( BaseBackend, threading.Thread ):
 
@@ -16,7 +23,6 @@ class RemoteBackend( BaseBackend, threading.Thread ):
     threading.Thread.__init__( self )
     self.__interactive = optionsDictionary[ 'Interactive' ]
     self.__sleep = optionsDictionary[ 'SleepTime' ]
-    self._messageQueue = Queue.Queue()
     self._Transactions = []
     self._alive = True
     self._site = optionsDictionary[ 'Site' ]
@@ -24,57 +30,114 @@ class RemoteBackend( BaseBackend, threading.Thread ):
     self._logLevels = LogLevels()
     self._negativeLevel = self._logLevels.getLevelValue( 'ERROR' )
     self._positiveLevel = self._logLevels.getLevelValue( 'ALWAYS' )
-    self._maxBundledMessages = 20
+    self._maxBundledMessages = self.__getIntOption( optionsDictionary, 'BundleSize', 200 )
+    self._maxQueuedMessages = self.__getIntOption( optionsDictionary, 'QueueSize', 5000 )
+    self._maxTransactions = 100
+    #Pending messages: ( system, subsystem, level, fixed, variable ) -> [ messageTuple, repetitions ]
+    self.__pendingCondition = threading.Condition()
+    self.__pendingMessages = {}
+    self.__pendingKeys = []
+    self.__droppedMessages = 0
+    self.__sendLock = threading.Lock()
+    self.__rpcClient = False
+    self.__useCompression = True
     self.setDaemon(1)
     self.start()
 
+  def __getIntOption( self, optionsDictionary, optionName, defaultValue ):
+    try:
+      return max( 1, int( optionsDictionary[ optionName ] ) )
+    except:
+      return defaultValue
+
   def doMessage( self, messageObject ):
-    self._messageQueue.put( messageObject )
+    if not self._testLevel( messageObject.getLevel() ):
+      return
+    msgKey = ( messageObject.getName(), messageObject.getSubSystemName(), messageObject.getLevel(),
+               messageObject.getFixedMessage(), messageObject.getVariableMessage() )
+    self.__pendingCondition.acquire()
+    try:
+      if msgKey in self.__pendingMessages:
+        self.__pendingMessages[ msgKey ][1] += 1
+      elif len( self.__pendingKeys ) < self._maxQueuedMessages:
+        self.__pendingMessages[ msgKey ] = [ messageObject.toTuple(), 1 ]
+        self.__pendingKeys.append( msgKey )
+        if len( self.__pendingKeys ) == self._maxBundledMessages:
+          self.__pendingCondition.notify()
+      else:
+        self.__droppedMessages += 1
+    finally:
+      self.__pendingCondition.release()
 
   def run( self ):
-    import time
     while self._alive:
-      self._bundleMessages()
-      time.sleep( self.__sleep )
-
-  def _bundleMessages( self ):
-    while not self._messageQueue.empty():
-      bundle = []
-      while ( len( bundle ) < self._maxBundledMessages ) and \
-                ( not self._messageQueue.empty() ):
-        message = self._messageQueue.get()
-        if self._testLevel( message.getLevel() ):
-          bundle.append( message.toTuple() )
+      self.__pendingCondition.acquire()
+      try:
+        if len( self.__pendingKeys ) < self._maxBundledMessages:
+          self.__pendingCondition.wait( self.__sleep )
+        bundles = self.__takeBundles()
+      finally:
+        self.__pendingCondition.release()
+      self._sendMessageToServer( bundles )
 
-      if len( bundle ):
-        self._sendMessageToServer( bundle )
+  def __takeBundles( self ):
+    """ Empty the pending messages into bundles of at most
+        _maxBundledMessages ( messageTuple, repetitions ) pairs.
+        Must be called with the pending condition held
+    """
+    pending = [ tuple( self.__pendingMessages[ msgKey ] ) for msgKey in self.__pendingKeys ]
+    if self.__droppedMessages:
+      dropMessage = Message( "RemoteBackend", self._logLevels.error, Time.dateTime(),
+                             "Log messages dropped because the queue was full",
+                             "%s messages" % self.__droppedMessages, "" )
+      pending.append( ( dropMessage.toTuple(), 1 ) )
+    self.__pendingMessages = {}
+    self.__pendingKeys = []
+    self.__droppedMessages = 0
+    return [ pending[ i : i + self._maxBundledMessages ] for i in range( 0, len( pending ), self._maxBundledMessages ) ]
 
-    if len( self._Transactions ):
-      self._sendMessageToServer()
+  def _sendMessageToServer( self, messageBundles = None ):
+    self.__sendLock.acquire()
+    try:
+      if messageBundles:
+        self._Transactions.extend( messageBundles )
+      TransactionsLength = len( self._Transactions )
+      if TransactionsLength > self._maxTransactions:
+        del self._Transactions[:TransactionsLength - self._maxTransactions]
+      if not self._Transactions:
+        return True
 
-  def _sendMessageToServer( self, messageBundle=None ):
-    from DIRAC.Core.DISET.RPCClient import RPCClient
-    if messageBundle:
-      self._Transactions.append( messageBundle )
-    TransactionsLength = len( self._Transactions )
-    if TransactionsLength > 100:
-      del self._Transactions[:TransactionsLength-100]
-      TransactionsLength = 100
+      if not self.__rpcClient:
+        from DIRAC.Core.DISET.RPCClient import RPCClient
+        try:
+          self.__rpcClient = RPCClient( "Framework/SystemLogging" )
+        except Exception:
+          return False
 
-    try:
-      oSock = RPCClient( "Framework/SystemLogging" )
-    except Exception,v:
-      return False
+      while self._Transactions:
+        result = self.__sendBundle( self._Transactions[0] )
+        if not result['OK']:
+          return False
+        self._Transactions.pop( 0 )
+      return True
+    finally:
+      self.__sendLock.release()
 
-    while TransactionsLength:
-      result = oSock.addMessages( self._Transactions[0],
-                                  self._site, self._hostname )
-      if result['OK']:
-        TransactionsLength = TransactionsLength - 1
-        self._Transactions.pop(0) 
-      else:
-        return False
-    return True
+  def __sendBundle( self, bundle ):
+    if self.__useCompression:
+      compressedBundle = zlib.compress( DEncode.encode( bundle ) )
+      result = self.__rpcClient.addCompressedMessages( compressedBundle, self._site, self._hostname )
+      if result[ 'OK' ] or result[ 'Message' ].find( "Unknown method" ) != 0:
+        return result
+      #Old server, fall back to sending the plain tuples
+      self.__useCompression = False
+    messagesList = []
+    for messageTuple, repetitions in bundle:
+      if repetitions > 1:
+        messageTuple = list( messageTuple )
+        messageTuple[4] = "%s (repeated %d times)" % ( messageTuple[4], repetitions )
+      messagesList.append( messageTuple )
+    return self.__rpcClient.addMessages( messagesList, self._site, self._hostname )
 
   def _testLevel( self, sLevel ):
     messageLevel = self._logLevels.getLevelValue( sLevel )
@@ -82,8 +145,12 @@ class RemoteBackend( BaseBackend, threading.Thread ):
            messageLevel >= self._positiveLevel
 
   def flush( self ):
-    self._alive = False
-    if not self.__interactive and self._sendMessageToServer()['OK']:
-      while not self._messageQueue.empty():
-        self._bundleMessages()
-
+    self.__pendingCondition.acquire()
+    try:
+      self._alive = False
+      bundles = self.__takeBundles()
+      self.__pendingCondition.notify()
+    finally:
+      self.__pendingCondition.release()
+    if not self.__interactive:
+      self._sendMessageToServer( bundles )
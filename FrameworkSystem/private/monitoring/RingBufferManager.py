@@ -0,0 +1,352 @@
+# $HeadURL$
+"""
+  RingBufferManager keeps the monitoring activities in fixed size ring files, replacing the rrdtool
+  processes forked by RRDManager with the same interface
+
+  The file of an activity has a header and a ring with one value per bucket for the retention time.
+  The marks of a commit are written into the ring with one positioned write, and the header of every
+  ring used is kept in memory, so updating does not fork any process nor read the file. No file
+  descriptor is kept open between calls, so the number of activities is not bound by the open files
+  limit of the service. Plots consolidate the buckets to the plot resolution as rrdtool graph does,
+  and are drawn with the DIRAC Graphs package.
+"""
+__RCSID__ = "$Id$"
+import os
+import os.path
+import sys
+import array
+import struct
+import threading
+try:
+  import hashlib as md5
+except:
+  import md5
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities import Time
+
+#magic, bucket length, number of slots, last update time, creation time
+HEADER_FORMAT = "<8siiqq"
+HEADER_SIZE = struct.calcsize( HEADER_FORMAT )
+LAST_UPDATE_OFFSET = 16
+MAGIC = "DRCRING1"
+VALUE_SIZE = 8
+
+class RingBufferManager:
+
+  __sizesList = [ [ 200, 50 ], [ 400, 100 ], [ 600, 150 ], [ 800, 200 ] ]
+
+  def __init__( self, ringLocation, graphLocation, retention = 31536000 ):
+    """
+    Initialize RingBufferManager
+    """
+    self.ringLocation = ringLocation
+    self.graphLocation = graphLocation
+    self.retention = retention
+    self.log = gLogger.getSubLogger( "RingBufferManager" )
+    # { ringPath : [ bucketLength, numSlots, lastUpdate, creationTime ] }
+    self.__headers = {}
+    self.__lock = threading.Lock()
+    for path in ( self.ringLocation, self.graphLocation ):
+      try:
+        os.makedirs( path )
+      except:
+        pass
+
+  def __getRingPath( self, rrdFile ):
+    return "%s/%s.ring" % ( self.ringLocation, os.path.splitext( rrdFile )[0] )
+
+  def existsRRDFile( self, rrdFile ):
+    ringPath = self.__getRingPath( rrdFile )
+    return ringPath in self.__headers or os.path.isfile( ringPath )
+
+  def getGraphLocation( self ):
+    """
+    Set the location for graph files
+    """
+    return self.graphLocation
+
+  def getCurrentBucketTime( self, bucketLength ):
+    """
+    Get current time "bucketized"
+    """
+    return self.bucketize( Time.toEpoch(), bucketLength )
+
+  def bucketize( self, secs, bucketLength ):
+    """
+    Bucketize a time (in secs)
+    """
+    secs = int( secs )
+    return secs - secs % bucketLength
+
+  def create( self, type, rrdFile, bucketLength ):
+    """
+    Create the ring file of an activity
+    """
+    ringPath = self.__getRingPath( rrdFile )
+    if os.path.isfile( ringPath ):
+      return S_OK()
+    try:
+      os.makedirs( os.path.dirname( ringPath ) )
+    except:
+      pass
+    self.log.info( "Creating ring file %s" % ringPath )
+    numSlots = max( 1, self.retention / bucketLength )
+    #As rrdtool create --start, marks older than a day ago are not accepted
+    lastUpdate = self.getCurrentBucketTime( bucketLength ) - 86400
+    tmpPath = "%s.tmp" % ringPath
+    try:
+      ringFile = open( tmpPath, "wb" )
+      try:
+        ringFile.write( struct.pack( HEADER_FORMAT, MAGIC, bucketLength, numSlots, lastUpdate, lastUpdate ) )
+        ringFile.truncate( HEADER_SIZE + numSlots * VALUE_SIZE )
+      finally:
+        ringFile.close()
+      os.rename( tmpPath, ringPath )
+    except Exception, e:
+      return S_ERROR( "Cannot create ring file %s: %s" % ( ringPath, str( e ) ) )
+    return S_OK()
+
+  def __getHeader( self, ringPath, fd ):
+    """
+    Get the header of a ring, read from its open file the first time. Lock has to be held
+    """
+    if ringPath in self.__headers:
+      return self.__headers[ ringPath ]
+    os.lseek( fd, 0, 0 )
+    magic, bucketLength, numSlots, lastUpdate, creationTime = struct.unpack( HEADER_FORMAT, os.read( fd, HEADER_SIZE ) )
+    if magic != MAGIC:
+      raise Exception( "%s is not a ring file" % ringPath )
+    header = [ bucketLength, numSlots, lastUpdate, creationTime ]
+    self.__headers[ ringPath ] = header
+    return header
+
+  def __readValues( self, fd, numSlots, slot, numValues ):
+    values = array.array( 'd' )
+    first = min( numValues, numSlots - slot )
+    os.lseek( fd, HEADER_SIZE + slot * VALUE_SIZE, 0 )
+    values.fromstring( os.read( fd, first * VALUE_SIZE ) )
+    if numValues > first:
+      os.lseek( fd, HEADER_SIZE, 0 )
+      values.fromstring( os.read( fd, ( numValues - first ) * VALUE_SIZE ) )
+    if sys.byteorder == 'big':
+      values.byteswap()
+    return values
+
+  def __writeValues( self, fd, numSlots, slot, values ):
+    if sys.byteorder == 'big':
+      values = array.array( 'd', values )
+      values.byteswap()
+    first = min( len( values ), numSlots - slot )
+    os.lseek( fd, HEADER_SIZE + slot * VALUE_SIZE, 0 )
+    os.write( fd, values[ :first ].tostring() )
+    if len( values ) > first:
+      os.lseek( fd, HEADER_SIZE, 0 )
+      os.write( fd, values[ first: ].tostring() )
+
+  def update( self, type, rrdFile, bucketLength, valuesList, lastUpdate = 0 ):
+    """
+    Add marks to the ring of an activity. The last update time is the one of the ring, lastUpdate is ignored
+    """
+    ringPath = self.__getRingPath( rrdFile )
+    self.__lock.acquire()
+    try:
+      try:
+        fd = os.open( ringPath, os.O_RDWR )
+      except Exception, e:
+        return S_ERROR( "Cannot open ring file %s: %s" % ( ringPath, str( e ) ) )
+      try:
+        try:
+          header = self.__getHeader( ringPath, fd )
+          ringBucketLength, numSlots, lastUpdateTime, creationTime = header
+          marks = {}
+          for instant, value in valuesList:
+            instant = self.bucketize( instant, ringBucketLength )
+            #As rrdtool, marks for buckets already updated are rejected
+            if instant > lastUpdateTime:
+              marks[ instant ] = float( value )
+            else:
+              self.log.verbose( "Ignoring mark older than the last update", "%s: %s <= %s" % ( rrdFile, instant, lastUpdateTime ) )
+          if not marks:
+            return S_OK( lastUpdateTime )
+          lastTime = max( marks )
+          #The buckets without marks since the last update are set to 0 as RRDManager does
+          firstTime = max( lastUpdateTime + ringBucketLength, lastTime - ( numSlots - 1 ) * ringBucketLength )
+          #but the slots not written since the creation of the ring are 0 already
+          firstTime = max( firstTime, min( min( marks ), creationTime + numSlots * ringBucketLength ) )
+          values = array.array( 'd', [ 0.0 ] ) * ( ( lastTime - firstTime ) / ringBucketLength + 1 )
+          for instant in marks:
+            if instant >= firstTime:
+              values[ ( instant - firstTime ) / ringBucketLength ] = marks[ instant ]
+          self.__writeValues( fd, numSlots, ( firstTime / ringBucketLength ) % numSlots, values )
+          os.lseek( fd, LAST_UPDATE_OFFSET, 0 )
+          os.write( fd, struct.pack( "<q", lastTime ) )
+          header[2] = lastTime
+        except Exception, e:
+          #Read the header again next time
+          self.__headers.pop( ringPath, None )
+          return S_ERROR( "Cannot update ring file %s: %s" % ( ringPath, str( e ) ) )
+      finally:
+        os.close( fd )
+    finally:
+      self.__lock.release()
+    return S_OK( lastTime )
+
+  def fetch( self, rrdFile, fromSecs, toSecs ):
+    """
+    Get ( bucketLength, [ ( bucketTime, value ) ] ) for the buckets of an activity between fromSecs and toSecs
+    """
+    ringPath = self.__getRingPath( rrdFile )
+    self.__lock.acquire()
+    try:
+      try:
+        fd = os.open( ringPath, os.O_RDONLY )
+      except Exception, e:
+        return S_ERROR( "Cannot open ring file %s: %s" % ( ringPath, str( e ) ) )
+      try:
+        try:
+          bucketLength, numSlots, lastUpdateTime = self.__getHeader( ringPath, fd )[:3]
+          startTime = max( self.bucketize( fromSecs, bucketLength ), lastUpdateTime - ( numSlots - 1 ) * bucketLength )
+          endTime = min( self.bucketize( toSecs, bucketLength ), lastUpdateTime )
+          if endTime < startTime:
+            return S_OK( ( bucketLength, [] ) )
+          numValues = ( endTime - startTime ) / bucketLength + 1
+          values = self.__readValues( fd, numSlots, ( startTime / bucketLength ) % numSlots, numValues )
+        except Exception, e:
+          return S_ERROR( "Cannot read ring file %s: %s" % ( ringPath, str( e ) ) )
+      finally:
+        os.close( fd )
+    finally:
+      self.__lock.release()
+    return S_OK( ( bucketLength, [ ( startTime + i * bucketLength, values[i] ) for i in range( numValues ) ] ) )
+
+  def __getYScalingFactor( self, timeSpan, bucketLength, plotWidth ):
+    expectedTimeSpan = plotWidth * bucketLength
+    if timeSpan < expectedTimeSpan:
+      return 1
+    else:
+      return float( timeSpan ) / expectedTimeSpan
+
+  def consolidate( self, activity, fromSecs, toSecs, plotWidth ):
+    """
+    Get ( step, { time : value } ) with the values of an activity averaged in plotWidth columns, scaled as
+    RRDManager does with the rrdtool CDEFs
+    """
+    retVal = self.fetch( activity.getFile(), fromSecs, toSecs )
+    if not retVal[ 'OK' ]:
+      return retVal
+    bucketLength, values = retVal[ 'Value' ]
+    timeSpan = int( toSecs - fromSecs )
+    yScaleFactor = self.__getYScalingFactor( timeSpan, bucketLength, plotWidth )
+    activity.setBucketScaleFactor( yScaleFactor )
+    step = max( bucketLength, timeSpan / plotWidth )
+    step -= step % bucketLength
+    columns = {}
+    for instant, value in values:
+      column = instant - instant % step
+      if column in columns:
+        columns[ column ][0] += value
+        columns[ column ][1] += 1
+      else:
+        columns[ column ] = [ value, 1 ]
+    activityType = activity.getType()
+    scale = 1.0
+    if activityType in ( 'sum', 'acum', 'rate' ):
+      #rrdtool ABSOLUTE data sources store the value per second
+      scale /= bucketLength
+    if activityType in ( 'sum', 'acum' ):
+      scale *= yScaleFactor * bucketLength
+    data = {}
+    accumulated = 0
+    for column in sorted( columns ):
+      value = columns[ column ][0] / columns[ column ][1] * scale
+      if activityType == 'acum':
+        accumulated += value
+        value = accumulated
+      data[ column ] = value
+    return S_OK( ( step, data ) )
+
+  def __generateName( self, *args, **kwargs ):
+    """
+    Generate a random name
+    """
+    m = md5.md5()
+    m.update( str( args ) )
+    m.update( str( kwargs ) )
+    return m.hexdigest()
+
+  def __drawPlot( self, graphFilename, fromSecs, toSecs, size, step, dataDict, title, unit = "", stacked = True ):
+    """
+    Draw the consolidated data
+    """
+    try:
+      from DIRAC.Core.Utilities.Graphs import lineGraph
+    except Exception, e:
+      return S_ERROR( "Missing plotting lib: %s" % str( e ) )
+    metadata = { 'title' : title,
+                 'ylabel' : unit,
+                 'starttime' : fromSecs,
+                 'endtime' : toSecs,
+                 'span' : step,
+                 'stacked' : stacked,
+                 'width' : self.__sizesList[ size ][0] + 100,
+                 'height' : self.__sizesList[ size ][1] + 150 }
+    graphPath = "%s/%s" % ( self.graphLocation, graphFilename )
+    try:
+      graphFile = open( graphPath, "wb" )
+      try:
+        lineGraph( dataDict, graphFile, **metadata )
+      finally:
+        graphFile.close()
+    except Exception, e:
+      return S_ERROR( "Cannot draw plot %s: %s" % ( graphFilename, str( e ) ) )
+    return S_OK( graphFilename )
+
+  def groupPlot( self, fromSecs, toSecs, activitiesList, stackActivities, size, graphFilename = "" ):
+    """
+    Generate a group plot
+    """
+    if not graphFilename:
+      graphFilename = "%s.png" % self.__generateName( fromSecs,
+                                                    toSecs,
+                                                    activitiesList,
+                                                    stackActivities
+                                                    )
+    activitiesList.sort()
+    dataDict = {}
+    step = 0
+    for activity in activitiesList:
+      retVal = self.consolidate( activity, fromSecs, toSecs, self.__sizesList[ size ][0] )
+      if not retVal[ 'OK' ]:
+        return retVal
+      step, dataDict[ activity.getLabel() ] = retVal[ 'Value' ]
+    return self.__drawPlot( graphFilename, fromSecs, toSecs, size, step, dataDict, activitiesList[ 0 ].getGroupLabel(),
+                            stacked = stackActivities )
+
+  def plot( self, fromSecs, toSecs, activity, stackActivities , size, graphFilename = "" ):
+    """
+    Generate a non grouped plot
+    """
+    if not graphFilename:
+      graphFilename = "%s.png" % self.__generateName( fromSecs,
+                                                    toSecs,
+                                                    activity,
+                                                    stackActivities
+                                                    )
+    retVal = self.consolidate( activity, fromSecs, toSecs, self.__sizesList[ size ][0] )
+    if not retVal[ 'OK' ]:
+      return retVal
+    step, data = retVal[ 'Value' ]
+    return self.__drawPlot( graphFilename, fromSecs, toSecs, size, step, { activity.getLabel() : data },
+                            activity.getLabel(), activity.getUnit() )
+
+  def deleteRRD( self, rrdFile ):
+    ringPath = self.__getRingPath( rrdFile )
+    self.__lock.acquire()
+    try:
+      self.__headers.pop( ringPath, None )
+    finally:
+      self.__lock.release()
+    try:
+      os.unlink( ringPath )
+    except Exception, e:
+      self.log.error( "Could not delete ring file %s: %s" % ( ringPath, str( e ) ) )
@@ -2,7 +2,9 @@
 __RCSID__ = "$Id$"
 import DIRAC
 from DIRAC import gLogger, rootPath, gConfig
+from DIRAC.ConfigurationSystem.Client.PathFinder import getServiceSection
 from DIRAC.FrameworkSystem.private.monitoring.RRDManager import RRDManager
+from DIRAC.FrameworkSystem.private.monitoring.RingBufferManager import RingBufferManager
 from DIRAC.Core.Utilities.ReturnValues import S_OK, S_ERROR
 from DIRAC.Core.Utilities import DEncode, List
 
@@ -14,13 +16,20 @@ class ServiceInterface:
     self.dataPath = "%s/data/monitoring" % gConfig.getValue( '/LocalSite/InstancePath', rootPath )
     self.plotsPath = "%s/plots" % self.dataPath
     self.rrdPath = "%s/rrd" % self.dataPath
+    self.ringPath = "%s/ring" % self.dataPath
     self.srvUp = False
     self.compmonDB = False
+    self.storageBackend = "rrdtool"
+    self.ringBufferManager = False
 
   def __createRRDManager( self ):
     """
-    Generate an RRDManager
+    Generate an RRDManager, or get the RingBufferManager, that keeps the ring headers in memory
     """
+    if self.storageBackend == "RingBuffer":
+      if not self.ringBufferManager:
+        self.ringBufferManager = RingBufferManager( self.ringPath, self.plotsPath )
+      return self.ringBufferManager
     return RRDManager( self.rrdPath, self.plotsPath )
 
   def __createCatalog( self ):
@@ -44,7 +53,12 @@ class ServiceInterface:
     from DIRAC.FrameworkSystem.DB.ComponentMonitoringDB import ComponentMonitoringDB
 
     self.dataPath = dataPath
-    self.plotCache = PlotCache( RRDManager( self.rrdPath, self.plotsPath ) )
+    self.storageBackend = gConfig.getValue( "%s/StorageBackend" % getServiceSection( "Framework/Monitoring" ), "rrdtool" )
+    if self.storageBackend not in ( "rrdtool", "RingBuffer" ):
+      gLogger.error( "Unknown monitoring storage backend, using rrdtool", self.storageBackend )
+      self.storageBackend = "rrdtool"
+    gLogger.info( "Monitoring storage backend is %s" % self.storageBackend )
+    self.plotCache = PlotCache( self.__createRRDManager() )
     self.srvUp = True
     try:
       self.compmonDB = ComponentMonitoringDB()
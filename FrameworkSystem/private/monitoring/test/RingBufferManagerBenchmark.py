@@ -0,0 +1,94 @@
+########################################################################
+# $HeadURL $
+# File: RingBufferManagerBenchmark.py
+########################################################################
+
+""" :mod: RingBufferManagerBenchmark
+    ================================
+
+    .. module: RingBufferManagerBenchmark
+    :synopsis: time to commit one minute marks of many activities
+
+    Creates 10k one minute activities and commits one mark per activity and
+    minute, as the Monitoring service does when the components send their
+    marks, first with the RingBufferManager and then, if rrdtool is in the
+    PATH, with the RRDManager for a sample of the activities. The first
+    minute is timed apart: it reads the headers and writes the first pages of
+    the files. The benchmark runs with the usual limit of 1024 open files.
+
+    Usage: python RingBufferManagerBenchmark.py [numActivities] [numMinutes]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import sys
+import time
+import random
+import shutil
+import resource
+import tempfile
+## SUT
+from DIRAC.FrameworkSystem.private.monitoring.RingBufferManager import RingBufferManager
+from DIRAC.FrameworkSystem.private.monitoring.RRDManager import RRDManager
+
+NUM_ACTIVITIES = 10000
+NUM_MINUTES = 60
+RRD_SAMPLE = 100
+MAX_OPEN_FILES = 1024
+
+def activityFile( index ):
+  """ catalog like file name """
+  name = "%08x" % index
+  return "%s/%s.rrd" % ( name[-2:], name )
+
+def benchmark( manager, numActivities, numMinutes ):
+  """ create the activities and commit numMinutes marks of each one, returns the times to create,
+      to commit the first minute and to commit the next ones """
+  startTime = time.time()
+  for index in range( numActivities ):
+    manager.create( "sum", activityFile( index ), 60 )
+  createTime = time.time() - startTime
+  now = manager.getCurrentBucketTime( 60 )
+  startTime = time.time()
+  lastUpdates = {}
+  for minute in range( numMinutes ):
+    if minute == 1:
+      firstTime = time.time() - startTime
+      startTime = time.time()
+    markTime = now - ( numMinutes - minute ) * 60
+    for index in range( numActivities ):
+      rrdFile = activityFile( index )
+      result = manager.update( "sum", rrdFile, 60, [ ( markTime, random.randint( 0, 100 ) ) ],
+                               lastUpdates.get( rrdFile, 0 ) )
+      if not result[ 'OK' ]:
+        print "Update failed: %s" % result[ 'Message' ]
+        sys.exit( 1 )
+      lastUpdates[ rrdFile ] = result[ 'Value' ]
+  updateTime = time.time() - startTime
+  return createTime, firstTime, updateTime
+
+if __name__ == "__main__":
+  numActivities = NUM_ACTIVITIES
+  numMinutes = NUM_MINUTES
+  if len( sys.argv ) > 1:
+    numActivities = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    numMinutes = max( 2, int( sys.argv[2] ) )
+  softLimit, hardLimit = resource.getrlimit( resource.RLIMIT_NOFILE )
+  resource.setrlimit( resource.RLIMIT_NOFILE, ( min( MAX_OPEN_FILES, hardLimit ), hardLimit ) )
+  dataDir = tempfile.mkdtemp()
+  try:
+    backends = [ ( "RingBufferManager", RingBufferManager( "%s/ring" % dataDir, "%s/plots" % dataDir ), numActivities ) ]
+    if [ path for path in os.environ.get( "PATH", "" ).split( ":" ) if os.path.isfile( "%s/rrdtool" % path ) ]:
+      backends.append( ( "RRDManager", RRDManager( "%s/rrd" % dataDir, "%s/plots" % dataDir ), min( RRD_SAMPLE, numActivities ) ) )
+    else:
+      print "rrdtool is not in the PATH, skipping RRDManager"
+    for name, manager, activities in backends:
+      createTime, firstTime, updateTime = benchmark( manager, activities, numMinutes )
+      print "%-18s %6d activities: create %8.2f s, first minute %8.2f s, next %3d minutes %8.2f s, %10.0f marks/s" % \
+            ( name, activities, createTime, firstTime, numMinutes - 1, updateTime,
+              activities * ( numMinutes - 1 ) / updateTime )
+  finally:
+    shutil.rmtree( dataDir )
@@ -0,0 +1,121 @@
+########################################################################
+# $HeadURL $
+# File: RingBufferManagerTestCase.py
+########################################################################
+
+""".. module:: RingBufferManagerTestCase
+
+Test cases for DIRAC.FrameworkSystem.private.monitoring.RingBufferManager module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import shutil
+import tempfile
+import unittest
+## SUT
+from DIRAC.FrameworkSystem.private.monitoring.RingBufferManager import RingBufferManager
+
+class FakeActivity:
+  """ the Activity getters used for consolidation """
+
+  def __init__( self, rrdFile, acType ):
+    self.rrdFile = rrdFile
+    self.acType = acType
+    self.scaleFactor = None
+
+  def getFile( self ):
+    return self.rrdFile
+
+  def getType( self ):
+    return self.acType
+
+  def setBucketScaleFactor( self, scaleFactor ):
+    self.scaleFactor = scaleFactor
+
+########################################################################
+class RingBufferManagerTestCase( unittest.TestCase ):
+  """py:class RingBufferManagerTestCase
+  Test case for DIRAC.FrameworkSystem.private.monitoring.RingBufferManager module.
+  """
+
+  def setUp( self ):
+    self.dataDir = tempfile.mkdtemp()
+    ## a ring of 10 one minute buckets
+    self.manager = RingBufferManager( "%s/ring" % self.dataDir, "%s/plots" % self.dataDir, retention = 600 )
+    self.now = self.manager.getCurrentBucketTime( 60 )
+    self.assertEqual( self.manager.create( "sum", "ab/abcd.rrd", 60 )[ 'OK' ], True )
+
+  def tearDown( self ):
+    shutil.rmtree( self.dataDir )
+
+  def test_01_update( self ):
+    """ marks are written, gaps are zeros and older marks are rejected """
+    self.assertEqual( self.manager.existsRRDFile( "ab/abcd.rrd" ), True )
+    now = self.now
+    result = self.manager.update( "sum", "ab/abcd.rrd", 60, [ ( now - 240, 1 ), ( now - 120, 3 ) ] )
+    self.assertEqual( result, { 'OK' : True, 'Value' : now - 120 } )
+    result = self.manager.update( "sum", "ab/abcd.rrd", 60, [ ( now - 180, 7 ), ( now + 10, 4 ) ] )
+    self.assertEqual( result[ 'Value' ], now )
+    bucketLength, values = self.manager.fetch( "ab/abcd.rrd", now - 300, now + 600 )[ 'Value' ]
+    self.assertEqual( bucketLength, 60 )
+    self.assertEqual( values, [ ( now - 300, 0 ), ( now - 240, 1 ), ( now - 180, 0 ), ( now - 120, 3 ),
+                                ( now - 60, 0 ), ( now, 4 ) ] )
+
+  def test_02_wrap( self ):
+    """ only the last retention of marks is kept, also across reopening """
+    now = self.now
+    for i in range( 15 ):
+      self.manager.update( "sum", "ab/abcd.rrd", 60, [ ( now + i * 60, i ) ] )
+    other = RingBufferManager( "%s/ring" % self.dataDir, "%s/plots" % self.dataDir, retention = 600 )
+    bucketLength, values = other.fetch( "ab/abcd.rrd", now, now + 3600 )[ 'Value' ]
+    self.assertEqual( values, [ ( now + i * 60, i ) for i in range( 5, 15 ) ] )
+    ## the slots of a gap after wrapping are set to 0
+    other.update( "sum", "ab/abcd.rrd", 60, [ ( now + 19 * 60, 19 ) ] )
+    bucketLength, values = other.fetch( "ab/abcd.rrd", now, now + 3600 )[ 'Value' ]
+    self.assertEqual( values, [ ( now + i * 60, i ) for i in range( 10, 15 ) ] +
+                              [ ( now + i * 60, 0 ) for i in range( 15, 19 ) ] + [ ( now + 19 * 60, 19 ) ] )
+
+  def test_03_consolidate( self ):
+    """ columns are averaged and scaled as the rrdtool CDEFs """
+    now = self.now
+    self.manager.update( "sum", "ab/abcd.rrd", 60, [ ( now - 240 + i * 60, i + 1 ) for i in range( 5 ) ] )
+    activity = FakeActivity( "ab/abcd.rrd", "sum" )
+    step, data = self.manager.consolidate( activity, now - 240, now + 59, 300 )[ 'Value' ]
+    self.assertEqual( step, 60 )
+    self.assertEqual( activity.scaleFactor, 1 )
+    self.assertEqual( sorted( data.items() ), [ ( now - 240 + i * 60, i + 1 ) for i in range( 5 ) ] )
+    ## two buckets per column: sums are averaged then scaled by the buckets per column
+    base = now - now % 120 - 360
+    step, data = self.manager.consolidate( activity, base, base + 240, 2 )[ 'Value' ]
+    self.assertEqual( step, 120 )
+    self.assertEqual( activity.scaleFactor, 2 )
+    values = dict( self.manager.fetch( "ab/abcd.rrd", base, base + 240 )[ 'Value' ][1] )
+    self.assertEqual( data, { base : values[ base ] + values[ base + 60 ],
+                              base + 120 : values[ base + 120 ] + values[ base + 180 ],
+                              base + 240 : values[ base + 240 ] * 2 } )
+    activity = FakeActivity( "ab/abcd.rrd", "rate" )
+    step, data = self.manager.consolidate( activity, now - 240, now + 59, 300 )[ 'Value' ]
+    self.assertEqual( data[ now ], 5 / 60. )
+    activity = FakeActivity( "ab/abcd.rrd", "acum" )
+    step, data = self.manager.consolidate( activity, now - 240, now + 59, 300 )[ 'Value' ]
+    self.assertEqual( data[ now ], 15 )
+
+  def test_04_openFiles( self ):
+    """ no file stays open whatever the number of activities """
+    openFiles = len( os.listdir( "/proc/self/fd" ) )
+    for i in range( 100 ):
+      rrdFile = "cd/%04d.rrd" % i
+      self.manager.create( "sum", rrdFile, 60 )
+      self.assertEqual( self.manager.update( "sum", rrdFile, 60, [ ( self.now, i ) ] )[ 'OK' ], True )
+      self.assertEqual( self.manager.fetch( rrdFile, self.now, self.now )[ 'Value' ][1], [ ( self.now, i ) ] )
+    self.assertEqual( len( os.listdir( "/proc/self/fd" ) ), openFiles )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( RingBufferManagerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
@@ -0,0 +1,24 @@
+# $HeadURL$
+__RCSID__ = "$Id$"
+"""
+  Calls per second of gLogger for suppressed and emitted messages
+"""
+import time
+from DIRAC.FrameworkSystem.Client.Logger import gLogger
+
+def callsPerSecond( logFunc, iterations = 200000 ):
+  start = time.time()
+  for i in xrange( iterations ):
+    logFunc( "Matching resource key", "%s = %s", "Site", i )
+  return iterations / ( time.time() - start )
+
+if __name__ == "__main__":
+  #Build the messages but don't write them anywhere
+  gLogger.registerBackends( [] )
+  gLogger.setLevel( "INFO" )
+  subLogger = gLogger.getSubLogger( "Benchmark" )
+  for name, logFunc in ( ( "gLogger.debug (suppressed)", gLogger.debug ),
+                         ( "subLogger.debug (suppressed)", subLogger.debug ),
+                         ( "gLogger.info (emitted)", gLogger.info ),
+                         ( "subLogger.info (emitted)", subLogger.info ) ):
+    print "%-30s %12.0f calls/s" % ( name, callsPerSecond( logFunc ) )
@@ -68,9 +68,9 @@ class DISETForwardingAgent( AgentModule, RequestAgentMixIn ):
     """
     gMonitor.addMark( "Iteration", 1 )
     if self.RequestDB:
-      res = self.RequestDB.getRequest( 'diset' )
+      res = self.RequestDB.getRequest( 'diset', 'binary' )
     else:
-      res = self.RequestDBClient.getRequest( 'diset', url = self.local )
+      res = self.RequestDBClient.getRequest( 'diset', url = self.local, requestFormat = 'binary' )
     if not res['OK']:
       gLogger.error( "DISETForwardingAgent.execute: Failed to get request from database.", self.local )
       return S_OK()
@@ -81,6 +81,8 @@ class DISETForwardingAgent( AgentModule, RequestAgentMixIn ):
     gMonitor.addMark( "Attempted", 1 )
     requestString = res['Value']['RequestString']
     requestName = res['Value']['RequestName']
+    # The request goes back in the format it was served in
+    requestFormat = res['Value'].get( 'RequestFormat', 'binary' )
     try:
       jobID = int( res['Value']['JobID'] )
     except:
@@ -141,7 +143,7 @@ class DISETForwardingAgent( AgentModule, RequestAgentMixIn ):
 
     ################################################
     #  Generate the new request string after operation
-    requestString = oRequest.toXML()['Value']
+    requestString = oRequest.serialize( requestFormat )['Value']
     if self.RequestDB:
       res = self.RequestDB.updateRequest( requestName, requestString )
     else:
@@ -227,26 +227,42 @@ class RequestClient( Client ):
     self.log.error( errMsg )
     return S_ERROR( errMsg )
     
-  def getRequest( self, requestType, url = "" ):
+  def getRequest( self, requestType, url = "", requestFormat = "xml" ):
     """ Get request from RequestDB. 
     First try client passed as parameter, then in order: local, central and at the end one of voboxes. 
     
     :param self: self reference
     :param str requestType: type of request
     :param str url: reuqest RPC client URL
+    :param str requestFormat: format of the request string, 'xml' or 'binary'
+
+    Servers not knowing the requested format send the request in XML, the format
+    of the returned request string is in its 'RequestFormat' key, updates sent back
+    to the server should use it.
     """
     try:
       for requestRPCClient in self.requestRPCClients( url, [ "local", "central", "voboxes"] ):
         thisURL = requestRPCClient.thisURL
         self.log.info( "RequestDBClient.getRequest: Attempting to get request.", "%s %s" % ( thisURL, 
                                                                                             requestType ) )
-        res = requestRPCClient.getRequest( requestType )
+        thisFormat = requestFormat
+        if thisFormat == "xml":
+          res = requestRPCClient.getRequest( requestType )
+        else:
+          res = requestRPCClient.getRequest( requestType, thisFormat )
+          ## servers older than the format argument fail while calling the handler
+          if not res["OK"] and ( res["Message"].startswith( "Unknown request format" ) or
+                                 res["Message"].startswith( "Server error while serving getRequest" ) ):
+            self.log.verbose( "RequestDBClient.getRequest: %s format not served, using xml." % thisFormat, thisURL )
+            thisFormat = "xml"
+            res = requestRPCClient.getRequest( requestType )
         if res["OK"]:
           if not res["Value"]:
             self.log.info( "Found no '%s' requests on RequestDB (%s)" % ( requestType, thisURL ) )
           else:  
             self.log.info( "Got '%s' request from RequestDB (%s)" % ( requestType, thisURL ) )
             res['Value']['Server'] = thisURL
+            res['Value']['RequestFormat'] = thisFormat
           return res
         else:
           self.log.error( "Failed getting request of type '%s' from %s: %s" % ( requestType, thisURL, res["Message"] ) )
@@ -15,6 +15,16 @@ from DIRAC.RequestManagementSystem.Client.DISETSubRequest import DISETSubRequest
 
 __RCSID__ = "$Id$"
 
+#Serialization formats understood by RequestContainer.serialize()
+REQUEST_FORMATS = ( 'xml', 'binary' )
+#Prefix of the requests serialized in the binary format
+BINARY_REQUEST_MAGIC = "DIRACRequest:1\n"
+
+def isBinaryRequest( requestString ):
+  """ Check if a request string is in the binary format
+  """
+  return type( requestString ) in StringTypes and requestString.startswith( BINARY_REQUEST_MAGIC )
+
 class RequestContainer:
   """
   .. class:: RequestContainer
@@ -61,11 +71,14 @@ class RequestContainer:
       for attr in self.attributeNames:
         self.attributes[attr] = request.attributes[attr]
 
-    # initialize request from an XML string
+    # initialize request from a binary or an XML string
     if type( request ) in StringTypes:
       for name in self.attributeNames:
         self.attributes[name] = 'Unknown'
-      self.parseRequest( request )
+      if isBinaryRequest( request ):
+        self.parseBinaryRequest( request )
+      else:
+        self.parseRequest( request )
 
     # Initialize request from another request
     elif isinstance( request, RequestContainer ):
@@ -214,6 +227,8 @@ class RequestContainer:
     """ Get the the sub-requests of a particular type
     """
     if self.subRequests.has_key( type ):
+      for subRequest in self.subRequests[type]:
+        self.__loadFiles( subRequest )
       return S_OK( self.subRequests[type] )
     else:
       return S_OK( [] )
@@ -274,7 +289,7 @@ class RequestContainer:
     elif len( self.subRequests[type] ) < ind:
       return S_ERROR( "Subrequest index is out of range." )
     else:
-      return S_OK( self.subRequests[type][ind] )
+      return S_OK( self.__loadFiles( self.subRequests[type][ind] ) )
 
   def removeSubRequest( self, ind, type ):
     """ Remove sub-request as specified by its index
@@ -284,7 +299,7 @@ class RequestContainer:
     elif len( self.subRequests[type] ) < ind:
       return S_ERROR( "Subrequest index is out of range." )
     else:
-      return S_OK( self.subRequests[type].pop( ind ) )
+      return S_OK( self.__loadFiles( self.subRequests[type].pop( ind ) ) )
 
   def getNumSubRequests( self, type ):
     """ Get the number of sub-requests for a given request type
@@ -363,7 +378,7 @@ class RequestContainer:
       return S_ERROR( "No requests of type specified found." )
     elif len( self.subRequests[type] ) < ind:
       return S_ERROR( "Subrequest index is out of range." )
-    elif not self.subRequests[type][ind].has_key( 'Files' ):
+    elif not self.__loadFiles( self.subRequests[type][ind] ).has_key( 'Files' ):
       return S_OK( 0 )
     else:
       numFiles = len( self.subRequests[type][ind]['Files'] )
@@ -376,7 +391,7 @@ class RequestContainer:
       return S_ERROR( "No requests of type specified found." )
     elif len( self.subRequests[type] ) < ind:
       return S_ERROR( "Subrequest index is out of range." )
-    elif not self.subRequests[type][ind].has_key( 'Files' ):
+    elif not self.__loadFiles( self.subRequests[type][ind] ).has_key( 'Files' ):
       return S_OK( [] )
     else:
       files = self.subRequests[type][ind]['Files']
@@ -390,7 +405,7 @@ class RequestContainer:
     elif len( self.subRequests[type] ) < ind:
       return S_ERROR( "Subrequest index is out of range." )
     else:
-      if not self.subRequests[type][ind].has_key( 'Files' ):
+      if not self.__loadFiles( self.subRequests[type][ind] ).has_key( 'Files' ):
         # Make deep copy
         self.subRequests[type][ind]['Files'] = copy.deepcopy( files )
       else:
@@ -646,6 +661,48 @@ class RequestContainer:
   # Parsing methods
   #
 
+  def serialize( self, requestFormat = 'xml', desiredType = '' ):
+    """ Output the request in one of the REQUEST_FORMATS
+    """
+    if requestFormat == 'binary':
+      return self.toBinary( desiredType )
+    elif requestFormat == 'xml':
+      return self.toXML( desiredType )
+    return S_ERROR( "Unknown request format %s" % requestFormat )
+
+  def toBinary( self, desiredType = '' ):
+    """ Output the request in the binary format: the magic prefix followed by length
+        prefixed DEncode records. The first record holds the request attributes, then
+        every sub-request has a record with its type and attributes followed by a record
+        with its files, so the files are only decoded when the reader accesses them
+    """
+    requestTypes = self.getSubRequestTypes()['Value']
+    if desiredType:
+      if not self.getNumSubRequests( desiredType )['Value']:
+        # You have requested a request type and there are no sub requests of this type
+        return S_OK()
+      requestTypes = [ desiredType ]
+    try:
+      records = [ DEncode.encode( self.attributes ) ]
+      for requestType in requestTypes:
+        for subRequest in self.subRequests[requestType]:
+          subRequestDict = {}
+          for key, value in subRequest.items():
+            if key not in ( 'Files', 'EncodedFiles' ):
+              subRequestDict[key] = value
+          records.append( DEncode.encode( ( requestType, subRequestDict ) ) )
+          if subRequest.has_key( 'EncodedFiles' ):
+            # Files never accessed are sent back as they were received
+            records.append( subRequest['EncodedFiles'] )
+          else:
+            records.append( DEncode.encode( subRequest.get( 'Files', [] ) ) )
+    except Exception, x:
+      return S_ERROR( "Cannot encode the request: %s" % str( x ) )
+    out = [ BINARY_REQUEST_MAGIC ]
+    for record in records:
+      out.append( "%s\n%s" % ( len( record ), record ) )
+    return S_OK( "".join( out ) )
+
   def toFile( self, fname ):
     res = self.toXML()
     if not res['OK']:
@@ -711,7 +768,7 @@ class RequestContainer:
         ## <REQUESTTYPE_SUBREQUEST />
         requestTag.appendChild ( self.__dictToXML( xmlDoc,   
                                                    "%s_SUBREQUEST" % requestType.upper(), 
-                                                   self.subRequests[requestType][i] ) )
+                                                   self.__loadFiles( self.subRequests[requestType][i] ) ) )
 
     xmlDoc.appendChild( requestTag )
     return S_OK( xmlDoc.toprettyxml( " ", encoding="UTF-8" ) )
@@ -751,7 +808,7 @@ class RequestContainer:
         a dictionary of subrequest attributes
     """
     name = rtype.upper() + '_SUBREQUEST'
-    out = self.__dictionaryToXML( name, self.subRequests[rtype][ind] )
+    out = self.__dictionaryToXML( name, self.__loadFiles( self.subRequests[rtype][ind] ) )
     return S_OK( out )
 
   def __dictionaryToXML( self, name, dict, indent = 0, attributes = {} ):
@@ -806,6 +863,42 @@ class RequestContainer:
       out += ' ' * indent * 8 + '</%s>\n' % name
     return out
 
+  def __readBinaryRecords( self, request ):
+    """ Iterate over the length prefixed records of a binary request
+    """
+    offset = len( BINARY_REQUEST_MAGIC )
+    while offset < len( request ):
+      lineEnd = request.find( "\n", offset )
+      if lineEnd == -1:
+        raise ValueError( "Truncated binary request" )
+      length = int( request[ offset:lineEnd ] )
+      offset = lineEnd + 1 + length
+      if offset > len( request ):
+        raise ValueError( "Truncated binary request" )
+      yield request[ lineEnd + 1:offset ]
+
+  def parseBinaryRequest( self, request ):
+    """ Create request from the binary string, the files of the sub-requests are
+        decoded on first access
+    """
+    records = self.__readBinaryRecords( request )
+    for name, value in DEncode.decode( records.next() )[0].items():
+      self.attributes[name] = value
+    for record in records:
+      requestType, subRequest = DEncode.decode( record )[0]
+      try:
+        subRequest['EncodedFiles'] = records.next()
+      except StopIteration:
+        raise ValueError( "Missing files of a %s sub-request" % requestType )
+      self.subRequests.setdefault( requestType, [] ).append( subRequest )
+
+  def __loadFiles( self, subRequest ):
+    """ Decode the files of a sub-request parsed from a binary request
+    """
+    if subRequest.has_key( 'EncodedFiles' ):
+      subRequest['Files'] = DEncode.decode( subRequest.pop( 'EncodedFiles' ) )[0]
+    return subRequest
+
   def parseRequest( self, request ):
     """ Create request from the XML string or file
     """
@@ -891,6 +984,7 @@ class RequestContainer:
     digestStrings = []
     for stype in self.subRequests.keys():
       for ind in range( len( self.subRequests[stype] ) ):
+        self.__loadFiles( self.subRequests[stype][ind] )
         digestList = []
         digestList.append( stype )
         digestList.append( self.subRequests[stype][ind]['Attributes']['Operation'] )
@@ -0,0 +1,86 @@
+########################################################################
+# $HeadURL $
+# File: RequestClientTestCase.py
+########################################################################
+
+""".. module:: RequestClientTestCase
+
+Test cases for the request format negotiation of DIRAC.RequestManagementSystem.Client.RequestClient.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import gLogger, S_OK, S_ERROR
+## SUT
+from DIRAC.RequestManagementSystem.Client.RequestClient import RequestClient
+
+class FakeRPCClient:
+  """ request manager answering getRequest like a server of a given age """
+
+  def __init__( self, formats ):
+    self.thisURL = "dips://fake:9143/RequestManagement/RequestManager"
+    self.formats = formats
+    self.calls = []
+
+  def getRequest( self, requestType, *args ):
+    self.calls.append( args )
+    if args and not self.formats:
+      return S_ERROR( "Server error while serving getRequest: export_getRequest() takes exactly 2 arguments (3 given)" )
+    requestFormat = 'xml'
+    if args:
+      requestFormat = args[0]
+    if self.formats and requestFormat not in self.formats:
+      return S_ERROR( "Unknown request format %s" % requestFormat )
+    return S_OK( { 'RequestName' : 'test', 'RequestString' : requestFormat, 'JobID' : 0 } )
+
+class TestRequestClient( RequestClient ):
+  """ client talking to one fake server, without reading the configuration """
+
+  def __init__( self, rpcClient ):
+    self.log = gLogger.getSubLogger( "RequestClientTestCase" )
+    self.rpcClient = rpcClient
+
+  def requestRPCClients( self, url = "", servicePriority = [] ):
+    yield self.rpcClient
+
+########################################################################
+class RequestClientTestCase( unittest.TestCase ):
+  """py:class RequestClientTestCase
+  Test case for the format requested by RequestClient.getRequest.
+  """
+
+  def testBinary( self ):
+    """ servers serving binary are asked once """
+    rpcClient = FakeRPCClient( ( 'xml', 'binary' ) )
+    res = TestRequestClient( rpcClient ).getRequest( 'transfer', requestFormat = 'binary' )
+    self.assertEqual( res['OK'], True )
+    self.assertEqual( res['Value']['RequestFormat'], 'binary' )
+    self.assertEqual( res['Value']['RequestString'], 'binary' )
+    self.assertEqual( rpcClient.calls, [ ( 'binary', ) ] )
+
+  def testFallback( self ):
+    """ servers not knowing the binary format serve XML """
+    for formats in ( ( 'xml', ), () ):
+      rpcClient = FakeRPCClient( formats )
+      res = TestRequestClient( rpcClient ).getRequest( 'transfer', requestFormat = 'binary' )
+      self.assertEqual( res['OK'], True )
+      self.assertEqual( res['Value']['RequestFormat'], 'xml' )
+      self.assertEqual( res['Value']['RequestString'], 'xml' )
+      self.assertEqual( rpcClient.calls, [ ( 'binary', ), () ] )
+
+  def testXML( self ):
+    """ XML is asked without the format argument """
+    rpcClient = FakeRPCClient( () )
+    res = TestRequestClient( rpcClient ).getRequest( 'transfer' )
+    self.assertEqual( res['Value']['RequestFormat'], 'xml' )
+    self.assertEqual( rpcClient.calls, [ () ] )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( RequestClientTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
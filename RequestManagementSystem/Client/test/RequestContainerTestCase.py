@@ -0,0 +1,71 @@
+########################################################################
+# $HeadURL $
+# File: RequestContainerTestCase.py
+########################################################################
+
+""".. module:: RequestContainerTestCase
+
+Test cases for the serialization formats of DIRAC.RequestManagementSystem.Client.RequestContainer.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## SUT
+from DIRAC.RequestManagementSystem.Client.RequestContainer import RequestContainer, isBinaryRequest
+
+########################################################################
+class RequestContainerTestCase( unittest.TestCase ):
+  """py:class RequestContainerTestCase
+  Test case for the binary and XML serialization of RequestContainer.
+  """
+
+  def setUp( self ):
+    self.request = RequestContainer( init = False )
+    for name in self.request.attributeNames:
+      self.request.attributes[name] = 'Unknown'
+    self.request.setRequestName( "test" )
+    self.request.setJobID( 123 )
+    for requestType, operation in ( ( 'transfer', 'replicateAndRegister' ), ( 'removal', 'removeFile' ) ):
+      files = [ { 'LFN' : '/a/b/%s%d' % ( requestType, i ), 'Status' : 'Waiting' } for i in range( 3 ) ]
+      self.request.addSubRequest( { 'Attributes' : { 'Operation' : operation, 'TargetSE' : 'CERN-USER' },
+                                    'Files' : files }, requestType )
+
+  def testBinary( self ):
+    """ binary round trip with lazily decoded files """
+    binary = self.request.toBinary()['Value']
+    self.assertEqual( isBinaryRequest( binary ), True )
+    self.assertEqual( isBinaryRequest( self.request.toXML()['Value'] ), False )
+    request = RequestContainer( request = binary )
+    self.assertEqual( request.getRequestName()['Value'], "test" )
+    self.assertEqual( request.getJobID()['Value'], 123 )
+    self.assertEqual( sorted( request.getSubRequestTypes()['Value'] ), [ 'removal', 'transfer' ] )
+    self.assertEqual( request.getSubRequestAttributeValue( 0, 'transfer', 'Operation' )['Value'], 'replicateAndRegister' )
+    #Untouched files are passed through, accessed ones are encoded again
+    self.assertEqual( request.toBinary()['Value'], binary )
+    self.assertEqual( request.getSubRequestNumFiles( 0, 'removal' )['Value'], 3 )
+    request.setSubRequestFileAttributeValue( 0, 'removal', '/a/b/removal1', 'Status', 'Done' )
+    request = RequestContainer( request = request.toBinary()['Value'] )
+    self.assertEqual( request.getSubRequestFileAttributeValue( 0, 'removal', '/a/b/removal1', 'Status' )['Value'], 'Done' )
+    self.assertEqual( request.getSubRequestFiles( 0, 'transfer' )['Value'],
+                      self.request.getSubRequestFiles( 0, 'transfer' )['Value'] )
+    self.assertRaises( ValueError, RequestContainer, request = binary[:-5] )
+
+  def testFormats( self ):
+    """ a binary request converts to the same XML and desired types are honoured """
+    request = RequestContainer( request = self.request.serialize( 'binary' )['Value'] )
+    fromXML = RequestContainer( request = request.serialize( 'xml' )['Value'] )
+    self.assertEqual( fromXML.getSubRequestFiles( 0, 'transfer' )['Value'],
+                      self.request.getSubRequestFiles( 0, 'transfer' )['Value'] )
+    request = RequestContainer( request = self.request.toBinary( desiredType = 'removal' )['Value'] )
+    self.assertEqual( request.getSubRequestTypes()['Value'], [ 'removal' ] )
+    self.assertEqual( self.request.toBinary( desiredType = 'register' )['Value'], '' )
+    self.assertEqual( self.request.serialize( 'json' )['OK'], False )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( RequestContainerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
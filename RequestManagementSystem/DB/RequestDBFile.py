@@ -113,8 +113,9 @@ class RequestDBFile:
       gLogger.exception( errStr, requestName, lException = x )
       return S_ERROR( errStr )
 
-  def getRequest( self, requestType ):
-    """ Obtain a request from the database of a certain type
+  def getRequest( self, requestType, requestFormat = 'xml' ):
+    """ Obtain a request from the database of a certain type, the request string
+        is in requestFormat, one of the RequestContainer REQUEST_FORMATS
     """
     gLogger.info( "RequestDBFile._getRequest: Attempting to get %s type request." % requestType )
     try:
@@ -152,6 +153,14 @@ class RequestDBFile:
         gLogger.error( errStr, res['Message'] )
         return S_ERROR( errStr )
       selectedRequestString = res['Value']
+      if requestFormat != 'xml':
+        res = res['Request'].serialize( requestFormat )
+        if not res['OK']:
+          self.getIdLock.release()
+          errStr = "RequestDBFile._getRequest: Failed to convert %s to %s." % ( selectedRequestName, requestFormat )
+          gLogger.error( errStr, res['Message'] )
+          return S_ERROR( errStr )
+        selectedRequestString = res['Value']
 
       # Set the request status to assigned
       res = self.setRequestStatus( selectedRequestName, 'Assigned' )
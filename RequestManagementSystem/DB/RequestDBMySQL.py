@@ -15,6 +15,11 @@ import threading
 import types
 import random, time
 
+#Maximum number of files written by a single statement
+FILE_CHUNK_SIZE = 1000
+#Columns of the Files table that can be set from the file attributes of a request
+FILE_COLUMNS = [ 'Status', 'LFN', 'Size', 'PFN', 'GUID', 'Md5', 'Addler', 'Attempt', 'Error' ]
+
 class RequestDBMySQL( DB ):
   """
   .. class:: RequestDBmySQL 
@@ -266,8 +271,9 @@ class RequestDBMySQL( DB ):
     pass
 
 
-  def getRequest( self, requestType ):
-    """ Get a request of a given type eligible for execution
+  def getRequest( self, requestType, requestFormat = 'xml' ):
+    """ Get a request of a given type eligible for execution, the request string
+        is in requestFormat, one of the RequestContainer REQUEST_FORMATS
     """
     # RG: What if requestType is not given?
     # the first query will return nothing.
@@ -416,9 +422,9 @@ class RequestDBMySQL( DB ):
     dmRequest.setSourceComponent( sourceComponent )
     dmRequest.setCreationTime( str( creationTime ) )
     dmRequest.setLastUpdate( str( lastUpdate ) )
-    res = dmRequest.toXML()
+    res = dmRequest.serialize( requestFormat )
     if not res['OK']:
-      err = 'RequestDB._getRequest: Failed to create XML for RequestID %s' % ( requestID )
+      err = 'RequestDB._getRequest: Failed to create %s request string for RequestID %s' % ( requestFormat, requestID )
       self.__releaseSubRequests( requestID, subIDList )
       return S_ERROR( '%s\n%s' % ( err, res['Message'] ) )
     requestString = res['Value']
@@ -512,50 +518,108 @@ class RequestDBMySQL( DB ):
       return S_OK( requestID )
 
   def updateRequest( self, requestName, requestString ):
+    """ Update the files and the status of the sub-requests of an existing request.
+        Only the file attributes differing from the ones in the DB are written, grouped
+        in multi-row statements, and all the changes are applied in one transaction
+    """
     request = RequestContainer( request = requestString )
     requestTypes = ['transfer', 'register', 'removal', 'stage', 'diset', 'logupload']
     requestID = request.getRequestID()['Value']
-    updateRequestFailed = False
+    subRequestFiles = {}
+    subRequestStatus = {}
+    subRequestErrors = {}
     for requestType in requestTypes:
       res = request.getNumSubRequests( requestType )
-      if res['OK']:
-        numRequests = res['Value']
-        for ind in range( numRequests ):
-          res = request.getSubRequestAttributes( ind, requestType )
-          if res['OK']:
-            subRequestDict = res['Value']
-            if 'SubRequestID' in subRequestDict:
-              subRequestID = res['Value']['SubRequestID']
-              res = self.__updateSubRequestFiles( ind, requestType, subRequestID, request )
-              if res['OK']:
-                if request.isSubRequestDone( ind, requestType )['Value']:
-                  res = self._setSubRequestAttribute( requestID, subRequestID, 'Status', 'Done' )
-                else:
-                  res = self._setSubRequestAttribute( requestID, subRequestID, 'Status', 'Waiting' )
-                if not res['OK']:
-                  updateRequestFailed = True
-              else:
-                updateRequestFailed = True
-              if "Error" in subRequestDict:
-                result = self._setSubRequestAttribute( requestID, subRequestID, 'Error', subRequestDict['Error'] )
-                if not result['OK']:
-                  updateRequestFailed = True
-            else:
-              updateRequestFailed = True
-          else:
-            updateRequestFailed = True
-      else:
-        updateRequestFailed = True
-    if updateRequestFailed:
-      errStr = 'Failed to update request %s.' % requestID
-      return S_ERROR( errStr )
-    else:
-      if request.isRequestDone()['Value']:
-        res = self._setRequestAttribute( requestID, 'Status', 'Done' )
+      if not res['OK']:
+        return S_ERROR( 'Failed to update request %s.' % requestID )
+      for ind in range( res['Value'] ):
+        res = request.getSubRequestAttributes( ind, requestType )
+        if not res['OK'] or 'SubRequestID' not in res['Value']:
+          return S_ERROR( 'Failed to update request %s.' % requestID )
+        subRequestDict = res['Value']
+        try:
+          subRequestID = int( subRequestDict['SubRequestID'] )
+        except ( ValueError, TypeError ):
+          return S_ERROR( 'Invalid SubRequestID %s' % subRequestDict['SubRequestID'] )
+        res = request.getSubRequestFiles( ind, requestType )
         if not res['OK']:
-          errStr = 'Failed to update request status of %s to Done.' % requestID
-          return S_ERROR( errStr )
-      return S_OK()
+          return S_ERROR( 'Failed to get request files' )
+        subRequestFiles[subRequestID] = res['Value']
+        if request.isSubRequestDone( ind, requestType )['Value']:
+          status = 'Done'
+        else:
+          status = 'Waiting'
+        subRequestStatus.setdefault( status, [] ).append( subRequestID )
+        if "Error" in subRequestDict:
+          subRequestErrors.setdefault( subRequestDict['Error'], [] ).append( subRequestID )
+
+    res = self.__getFileUpdates( subRequestFiles )
+    if not res['OK']:
+      gLogger.error( 'RequestDB.updateRequest: Failed to compute the file updates', res['Message'] )
+      return S_ERROR( 'Failed to update request %s.' % requestID )
+    cmdList = res['Value']
+    for status, subRequestIDs in subRequestStatus.items():
+      cmdList.append( ( "UPDATE SubRequests SET Status=%%s, LastUpdate=UTC_TIMESTAMP() WHERE RequestID=%%s AND SubRequestID IN (%s);" % intListToString( subRequestIDs ),
+                        ( status, requestID ) ) )
+    for error, subRequestIDs in subRequestErrors.items():
+      cmdList.append( ( "UPDATE SubRequests SET Error=%%s, LastUpdate=UTC_TIMESTAMP() WHERE RequestID=%%s AND SubRequestID IN (%s);" % intListToString( subRequestIDs ),
+                        ( error, requestID ) ) )
+    if request.isRequestDone()['Value']:
+      cmdList.append( ( "UPDATE Requests SET Status='Done', LastUpdate=UTC_TIMESTAMP() WHERE RequestID=%s;", ( requestID, ) ) )
+    res = self._transaction( cmdList )
+    if not res['OK']:
+      gLogger.error( 'RequestDB.updateRequest: Failed to update request %s' % requestID, res['Message'] )
+      return S_ERROR( 'Failed to update request %s.' % requestID )
+    return S_OK()
+
+  def __getFileUpdates( self, subRequestFiles ):
+    """ Compare the files of the sub-requests { subRequestID : [ fileDict ] } with the Files table
+        and return the ( cmd, params ) UPDATE statements setting the attributes that changed,
+        files with the same changes are updated together
+    """
+    if not subRequestFiles:
+      return S_OK( [] )
+    currentFiles = {}
+    req = "SELECT SubRequestID, FileID, %s FROM Files WHERE SubRequestID IN (%s);" % ( ', '.join( FILE_COLUMNS ),
+                                                                                   intListToString( subRequestFiles.keys() ) )
+    res = self._query( req )
+    if not res['OK']:
+      return res
+    for row in res['Value']:
+      currentFiles[( int( row[0] ), int( row[1] ) )] = dict( zip( FILE_COLUMNS, row[2:] ) )
+
+    updates = {}
+    for subRequestID, files in subRequestFiles.items():
+      for fileDict in files:
+        if not fileDict.has_key( 'FileID' ):
+          return S_ERROR( 'No FileID associated to file' )
+        try:
+          fileKey = ( subRequestID, int( fileDict['FileID'] ) )
+        except ( ValueError, TypeError ):
+          return S_ERROR( 'Invalid FileID %s' % fileDict['FileID'] )
+        if not fileKey in currentFiles:
+          continue
+        currentFile = currentFiles[fileKey]
+        changes = []
+        for fileAttribute in FILE_COLUMNS:
+          attributeValue = fileDict.get( fileAttribute )
+          if not attributeValue:
+            continue
+          currentValue = currentFile[fileAttribute]
+          if currentValue is None or str( currentValue ) != str( attributeValue ):
+            changes.append( ( fileAttribute, str( attributeValue ) ) )
+        if changes:
+          updates.setdefault( ( fileKey[0], tuple( changes ) ), [] ).append( fileKey[1] )
+
+    cmdList = []
+    for ( subRequestID, changes ), fileIDs in updates.items():
+      setString = ', '.join( [ '%s=%%s' % fileAttribute for fileAttribute, attributeValue in changes ] )
+      params = tuple( [ attributeValue for fileAttribute, attributeValue in changes ] ) + ( subRequestID, )
+      for i in range( 0, len( fileIDs ), FILE_CHUNK_SIZE ):
+        req = "UPDATE Files SET %s WHERE SubRequestID=%%s AND FileID IN (%s);" % ( setString,
+                                                                                   intListToString( fileIDs[i:i + FILE_CHUNK_SIZE] ) )
+        cmdList.append( ( req, params ) )
+    return S_OK( cmdList )
 
   def deleteRequest( self, requestName ):
 
@@ -620,46 +684,31 @@ class RequestDBMySQL( DB ):
         return S_ERROR( 'Failed to set dataset in DB' )
     return res
 
-  def __updateSubRequestFiles( self, ind, requestType, subRequestID, request ):
-    res = request.getSubRequestFiles( ind, requestType )
-    if not res['OK']:
-      return S_ERROR( 'Failed to get request files' )
-    files = res['Value']
-    for fileDict in files:
-      if not fileDict.has_key( 'FileID' ):
-        return S_ERROR( 'No FileID associated to file' )
-      fileID = fileDict['FileID']
-      req = "UPDATE Files SET"
-      for fileAttribute, attributeValue in fileDict.items():
-        if not fileAttribute == 'FileID':
-          if attributeValue:
-            req = "%s %s='%s'," % ( req, fileAttribute, attributeValue )
-      req = req.rstrip( ',' )
-      req = "%s WHERE SubRequestID = %s AND FileID = %s;" % ( req, subRequestID, fileID )
-      res = self._update( req )
-      if not res['OK']:
-        return S_ERROR( 'Failed to update file in db' )
-    return S_OK()
-
   def __setSubRequestFiles( self, ind, requestType, subRequestID, request ):
-    """ This is the new method for updating the File table
+    """ This is the new method for updating the File table, the files are
+        inserted with multi-row statements
     """
     res = request.getSubRequestFiles( ind, requestType )
     if not res['OK']:
       return S_ERROR( 'Failed to get request files' )
     files = res['Value']
+    # Only the attributes set for some file are inserted, the others take the default NULL
+    fileAttributes = ['SubRequestID', 'Status']
     for fileDict in files:
-      fileAttributes = ['SubRequestID']
-      attributeValues = [subRequestID]
       for fileAttribute, attributeValue in fileDict.items():
-        if not fileAttribute in ['FileID', 'TargetSE']:
-          if attributeValue:
-            fileAttributes.append( fileAttribute )
-            attributeValues.append( attributeValue )
-      if not 'Status' in fileAttributes:
-        fileAttributes.append( 'Status' )
-        attributeValues.append( 'Waiting' )
-      res = self._insert( 'Files', fileAttributes, attributeValues )
+        if attributeValue and fileAttribute in FILE_COLUMNS and not fileAttribute in fileAttributes:
+          fileAttributes.append( fileAttribute )
+    rowString = "(%s)" % ','.join( ['%s'] * len( fileAttributes ) )
+    for i in range( 0, len( files ), FILE_CHUNK_SIZE ):
+      chunk = files[i:i + FILE_CHUNK_SIZE]
+      params = []
+      for fileDict in chunk:
+        params.append( subRequestID )
+        params.append( fileDict.get( 'Status' ) or 'Waiting' )
+        for fileAttribute in fileAttributes[2:]:
+          params.append( fileDict.get( fileAttribute ) or None )
+      req = "INSERT INTO Files (%s) VALUES %s;" % ( ','.join( fileAttributes ), ','.join( [rowString] * len( chunk ) ) )
+      res = self._update( req, params = tuple( params ) )
       if not res['OK']:
         gLogger.error( 'Failed to insert file into db', res['Message'] )
         return S_ERROR( 'Failed to insert file into db' )
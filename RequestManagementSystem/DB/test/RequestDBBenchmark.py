@@ -0,0 +1,105 @@
+########################################################################
+# $HeadURL $
+# File: RequestDBBenchmark.py
+########################################################################
+
+""" :mod: RequestDBBenchmark
+    ========================
+
+    .. module: RequestDBBenchmark
+    :synopsis: time to update a request with many files in the RequestDB
+
+    A transfer request with 10k files is put in the RequestDB, then all its
+    files are set to Done, first with one UPDATE per file as updateRequest
+    did so far and then with the diff based updateRequest. It needs the
+    RequestDB configured in the local CS.
+
+    Usage: python RequestDBBenchmark.py [numFiles]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+## SUT
+from DIRAC.RequestManagementSystem.DB.RequestDBMySQL import RequestDBMySQL
+from DIRAC.RequestManagementSystem.Client.RequestContainer import RequestContainer
+
+NUM_FILES = 10000
+
+def makeRequest( requestName, numFiles ):
+  """ request with a single transfer sub-request of numFiles files """
+  request = RequestContainer()
+  request.setRequestName( requestName )
+  files = [ { 'LFN' : '/benchmark/%s/file_%06d' % ( requestName, i ), 'Size' : 1000 + i,
+              'GUID' : '%032X' % i, 'Addler' : '12345678' } for i in range( numFiles ) ]
+  request.addSubRequest( { 'Attributes' : { 'Operation' : 'replicateAndRegister', 'TargetSE' : 'CERN-USER' },
+                           'Files' : files }, 'transfer' )
+  return request.toXML()['Value']
+
+def getAssignedRequest( db, requestName ):
+  """ get the benchmark request back from the DB with its FileIDs """
+  result = db.getRequest( 'transfer' )
+  if not result[ 'OK' ] or not result[ 'Value' ]:
+    return None
+  if result[ 'Value' ][ 'RequestName' ] != requestName:
+    print "Got request %s, is the RequestDB empty?" % result[ 'Value' ][ 'RequestName' ]
+    return None
+  return RequestContainer( request = result[ 'Value' ][ 'RequestString' ] )
+
+def setFilesDone( request ):
+  """ set all the files of the request to Done """
+  files = request.getSubRequestFiles( 0, 'transfer' )[ 'Value' ]
+  for fileDict in files:
+    fileDict[ 'Status' ] = 'Done'
+  return files
+
+def perFileUpdate( db, request ):
+  """ one UPDATE per file, as updateRequest used to do """
+  subRequestID = request.getSubRequestAttributeValue( 0, 'transfer', 'SubRequestID' )[ 'Value' ]
+  for fileDict in setFilesDone( request ):
+    req = "UPDATE Files SET"
+    for fileAttribute, attributeValue in fileDict.items():
+      if not fileAttribute == 'FileID' and attributeValue:
+        req = "%s %s='%s'," % ( req, fileAttribute, attributeValue )
+    req = "%s WHERE SubRequestID = %s AND FileID = %s;" % ( req.rstrip( ',' ), subRequestID, fileDict[ 'FileID' ] )
+    result = db._update( req )
+    if not result[ 'OK' ]:
+      return result
+  return db.setRequestStatus( request.getRequestName()[ 'Value' ], 'Done' )
+
+def diffUpdate( db, request ):
+  """ the diff based updateRequest """
+  setFilesDone( request )
+  return db.updateRequest( request.getRequestName()[ 'Value' ], request.toXML()[ 'Value' ] )
+
+if __name__ == "__main__":
+  numFiles = NUM_FILES
+  if len( sys.argv ) > 1:
+    numFiles = int( sys.argv[1] )
+  db = RequestDBMySQL()
+  print "Updating a request with %s files" % numFiles
+  for name, update in ( ( "per file updates", perFileUpdate ), ( "diff based update", diffUpdate ) ):
+    requestName = "benchmark_%s" % int( time.time() * 1000 )
+    startTime = time.time()
+    result = db.setRequest( requestName, makeRequest( requestName, numFiles ) )
+    if not result[ 'OK' ]:
+      print "Cannot set the benchmark request: %s" % result[ 'Message' ]
+      sys.exit( 1 )
+    setTime = time.time() - startTime
+    try:
+      request = getAssignedRequest( db, requestName )
+      if not request:
+        sys.exit( 1 )
+      startTime = time.time()
+      result = update( db, request )
+      updateTime = time.time() - startTime
+      if not result[ 'OK' ]:
+        print "  %s failed: %s" % ( name, result[ 'Message' ] )
+      else:
+        print "  %-20s setRequest %8.2f s, update %8.2f s" % ( name, setTime, updateTime )
+    finally:
+      db.deleteRequest( requestName )
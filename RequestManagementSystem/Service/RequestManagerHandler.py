@@ -7,6 +7,7 @@ from types import *
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
 from DIRAC import gLogger, gConfig, S_OK, S_ERROR
 from DIRAC.ConfigurationSystem.Client import PathFinder
+from DIRAC.RequestManagementSystem.Client.RequestContainer import REQUEST_FORMATS
 
 requestDB = False
 
@@ -35,7 +36,7 @@ class RequestManagerHandler(RequestHandler):
 
   types_setRequest = [StringTypes,StringTypes]
   def export_setRequest(self,requestName,requestString):
-    """ Set a new request
+    """ Set a new request, the request string can be in any of the REQUEST_FORMATS
     """
     gLogger.info("RequestManagerHandler.setRequest: Attempting to set %s." % requestName)
     try:
@@ -61,7 +62,7 @@ class RequestManagerHandler(RequestHandler):
 
   types_updateRequest = [StringTypes,StringTypes]
   def export_updateRequest(self,requestName,requestString):
-    """ Update the request with the supplied string
+    """ Update the request with the supplied string in any of the REQUEST_FORMATS
     """
     gLogger.info("RequestManagerHandler.updateRequest: Attempting to update %s." % requestName)
     try:
@@ -86,12 +87,15 @@ class RequestManagerHandler(RequestHandler):
       return S_ERROR(errStr)
 
   types_getRequest = [StringTypes]
-  def export_getRequest(self,requestType):
-    """ Get a request of given type from the database
+  def export_getRequest(self,requestType,requestFormat='xml'):
+    """ Get a request of given type from the database, clients understanding
+        the binary format can ask for it in requestFormat
     """
+    if requestFormat not in REQUEST_FORMATS:
+      return S_ERROR("Unknown request format %s" % requestFormat)
     gLogger.info("RequestHandler.getRequest: Attempting to get request type", requestType)
     try:
-      res = requestDB.getRequest(requestType)
+      res = requestDB.getRequest(requestType,requestFormat)
       return res
     except Exception,x:
       errStr = "RequestManagerHandler.getRequest: Exception while getting request."
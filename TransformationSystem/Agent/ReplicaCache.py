@@ -0,0 +1,155 @@
+"""  ReplicaCache keeps the catalog replicas and sizes of the files processed by the TransformationAgent
+
+     Only the LFNs not in the cache, or cached more than lifeTime seconds ago, are looked up in the
+     catalog. The active replicas are selected from the cached ones on every call, so a change of the
+     SE status is seen immediately. The cache is saved to a file to survive agent restarts.
+"""
+
+__RCSID__ = "$Id$"
+
+from DIRAC                                                      import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities                                       import DEncode
+import os, time, threading
+
+class ReplicaCache:
+
+  def __init__( self, replicaManager, cacheFile = None, lifeTime = 7200 ):
+    self.rm = replicaManager
+    self.cacheFile = cacheFile
+    self.lifeTime = lifeTime
+    # { lfn : ( cacheTime, { se : pfn } ) }
+    self.replicas = {}
+    # { lfn : size }, sizes do not change and are kept as long as the replicas
+    self.sizes = {}
+    self.lock = threading.Lock()
+    self.log = gLogger.getSubLogger( "ReplicaCache" )
+
+  def load( self ):
+    """ Load the cache saved by a previous run
+    """
+    if not self.cacheFile or not os.path.isfile( self.cacheFile ):
+      return S_OK( 0 )
+    try:
+      cacheFile = open( self.cacheFile, "rb" )
+      try:
+        replicas, sizes = DEncode.decode( cacheFile.read() )[0]
+      finally:
+        cacheFile.close()
+    except Exception, x:
+      self.log.warn( "Ignoring the unreadable cache file %s: %s" % ( self.cacheFile, str( x ) ) )
+      return S_OK( 0 )
+    self.lock.acquire()
+    try:
+      for lfn, ( cacheTime, seDict ) in replicas.items():
+        self.replicas[lfn] = ( cacheTime, seDict )
+      self.sizes.update( sizes )
+    finally:
+      self.lock.release()
+    self.purge()
+    return S_OK( len( self.replicas ) )
+
+  def save( self ):
+    """ Save the cache to the cache file
+    """
+    if not self.cacheFile:
+      return S_OK()
+    self.lock.acquire()
+    try:
+      data = DEncode.encode( ( self.replicas, self.sizes ) )
+    finally:
+      self.lock.release()
+    tmpFile = "%s.tmp" % self.cacheFile
+    try:
+      cacheFile = open( tmpFile, "wb" )
+      try:
+        cacheFile.write( data )
+      finally:
+        cacheFile.close()
+      os.rename( tmpFile, self.cacheFile )
+    except Exception, x:
+      return S_ERROR( "Failed to save the replica cache to %s: %s" % ( self.cacheFile, str( x ) ) )
+    return S_OK()
+
+  def purge( self ):
+    """ Drop the expired replicas and the sizes of the files without replicas in the cache
+    """
+    limit = time.time() - self.lifeTime
+    self.lock.acquire()
+    try:
+      for lfn in [ lfn for lfn, ( cacheTime, seDict ) in self.replicas.items() if cacheTime < limit ]:
+        del self.replicas[lfn]
+      for lfn in [ lfn for lfn in self.sizes if not lfn in self.replicas ]:
+        del self.sizes[lfn]
+    finally:
+      self.lock.release()
+
+  def invalidate( self, lfns ):
+    """ Forget the replicas and sizes of the LFNs, to be called when they change in the catalog
+    """
+    self.lock.acquire()
+    try:
+      for lfn in lfns:
+        self.replicas.pop( lfn, None )
+        self.sizes.pop( lfn, None )
+    finally:
+      self.lock.release()
+
+  def getReplicas( self, lfns, active = True ):
+    """ Get the replicas of the LFNs as ReplicaManager.getReplicas() or getActiveReplicas() do
+    """
+    limit = time.time() - self.lifeTime
+    successful = {}
+    self.lock.acquire()
+    try:
+      for lfn in lfns:
+        if lfn in self.replicas and self.replicas[lfn][0] >= limit:
+          successful[lfn] = self.replicas[lfn][1].copy()
+    finally:
+      self.lock.release()
+    failed = {}
+    toLookup = [ lfn for lfn in lfns if not lfn in successful ]
+    if toLookup:
+      startTime = time.time()
+      res = self.rm.getReplicas( toLookup )
+      if not res['OK']:
+        return res
+      self.log.verbose( "Looked up %d new files out of %d in %.2f seconds" % ( len( toLookup ), len( lfns ),
+                                                                              time.time() - startTime ) )
+      failed = res['Value']['Failed']
+      self.lock.acquire()
+      try:
+        for lfn, seDict in res['Value']['Successful'].items():
+          self.replicas[lfn] = ( startTime, seDict )
+          successful[lfn] = seDict.copy()
+      finally:
+        self.lock.release()
+    replicaDict = { 'Successful' : successful, 'Failed' : failed }
+    if active:
+      return self.rm.checkActiveReplicas( replicaDict )
+    return S_OK( replicaDict )
+
+  def getFileSizes( self, lfns ):
+    """ Get the catalog sizes of the LFNs as ReplicaManager.getCatalogFileSize() does
+    """
+    successful = {}
+    self.lock.acquire()
+    try:
+      for lfn in lfns:
+        if lfn in self.sizes:
+          successful[lfn] = self.sizes[lfn]
+    finally:
+      self.lock.release()
+    failed = {}
+    toLookup = [ lfn for lfn in lfns if not lfn in successful ]
+    if toLookup:
+      res = self.rm.getCatalogFileSize( toLookup )
+      if not res['OK']:
+        return res
+      failed = res['Value']['Failed']
+      self.lock.acquire()
+      try:
+        self.sizes.update( res['Value']['Successful'] )
+      finally:
+        self.lock.release()
+      successful.update( res['Value']['Successful'] )
+    return S_OK( { 'Successful' : successful, 'Failed' : failed } )
@@ -1,4 +1,12 @@
 """  TransformationAgent processes transformations found in the transformation database. 
+
+     With NumberOfThreads > 1 the transformations are processed in parallel by a thread pool.
+     The transformations with less unused files in the previous cycle are queued first and the
+     agent cycle waits at most TransformationTimeout seconds for each of them: a transformation
+     taking longer goes on in the background and is not queued again until it is finished.
+
+     The replicas and sizes of the input files are kept in a ReplicaCache for ReplicaCacheLifeTime
+     seconds (0 disables the cache), so only the new unused files are looked up in the catalog.
 """
 
 __RCSID__ = "$Id$"
@@ -7,7 +15,9 @@ from DIRAC                                                      import gLogger,
 from DIRAC.Core.Base.AgentModule                                import AgentModule
 from DIRAC.TransformationSystem.Client.TransformationClient     import TransformationClient
 from DIRAC.DataManagementSystem.Client.ReplicaManager           import ReplicaManager
-import time, re
+from DIRAC.Core.Utilities.ThreadPool                            import ThreadPool
+from DIRAC.TransformationSystem.Agent.ReplicaCache              import ReplicaCache
+import time, re, threading, os
 
 AGENT_NAME = 'Transformation/TransformationAgent'
 
@@ -21,12 +31,28 @@ class TransformationAgent( AgentModule ):
     self.checkCatalog = self.am_getOption( 'CheckCatalog', 'yes' )
     self.transformationStatus = self.am_getOption( 'transformationStatus', ['Active', 'Completing', 'Flush'] )
     self.maxFiles = self.am_getOption( 'MaxFiles', 5000 )
+    self.numThreads = self.am_getOption( 'NumberOfThreads', 1 )
+    self.transformationTimeout = self.am_getOption( 'TransformationTimeout', 3600 )
 
     self.am_setOption( 'shifterProxy', 'ProductionManager' )
 
     self.transDB = TransformationClient( 'TransformationDB' )
     self.rm = ReplicaManager()
+    self.replicaCache = None
+    cacheLifeTime = self.am_getOption( 'ReplicaCacheLifeTime', 7200 )
+    if cacheLifeTime:
+      cacheFile = os.path.join( self.am_getWorkDirectory(), 'ReplicaCache.dat' )
+      self.replicaCache = ReplicaCache( self.rm, cacheFile = cacheFile, lifeTime = cacheLifeTime )
+      res = self.replicaCache.load()
+      if res['Value']:
+        gLogger.info( "initialize: Loaded %d files from the replica cache." % res['Value'] )
     self.unusedFiles = {}
+    # Transformations queued or being processed by the thread pool { transID : startTime or None while queued }
+    self.runningTransformations = {}
+    self.runningLock = threading.Lock()
+    self.threadPool = None
+    if self.numThreads > 1:
+      self.threadPool = ThreadPool( 1, self.numThreads )
     return S_OK()
 
   def execute( self ):
@@ -36,17 +62,85 @@ class TransformationAgent( AgentModule ):
     if not res['OK']:
       gLogger.info( "execute: Failed to obtain transformations: %s" % res['Message'] )
       return S_OK()
-    # Process the transformations
-    for transDict in res['Value']:
+    # Process first the transformations with less unused files so that they are not delayed by the big ones
+    transformations = res['Value']
+    transformations.sort( key = lambda transDict: self.unusedFiles.get( transDict['TransformationID'], 0 ) )
+    if not self.threadPool:
+      for transDict in transformations:
+        self.__executeTransformation( transDict )
+      self.__saveReplicaCache()
+      return S_OK()
+
+    for transDict in transformations:
       transID = long( transDict['TransformationID'] )
+      self.runningLock.acquire()
+      try:
+        if transID in self.runningTransformations:
+          gLogger.info( "execute: Transformation %s is still being processed." % transID )
+          continue
+        self.runningTransformations[transID] = None
+      finally:
+        self.runningLock.release()
+      self.threadPool.generateJobAndQueueIt( self.__executeTransformation,
+                                             args = ( transDict, ),
+                                             oExceptionCallback = self.__transformationException )
+    # Wait for the transformations queued in this cycle, the ones exceeding the timeout go on in the background
+    while True:
+      self.threadPool.processResults()
+      self.runningLock.acquire()
+      try:
+        now = time.time()
+        waiting = [ transID for transID, startTime in self.runningTransformations.items()
+                    if startTime is None or now - startTime < self.transformationTimeout ]
+        exceeding = [ transID for transID in self.runningTransformations if not transID in waiting ]
+      finally:
+        self.runningLock.release()
+      if not waiting:
+        break
+      time.sleep( 1 )
+    for transID in exceeding:
+      gLogger.warn( "execute: Transformation %s exceeded the timeout of %s seconds, it will not be queued again until it finishes." % ( transID,
+                                                                                                                                    self.transformationTimeout ) )
+    self.__saveReplicaCache()
+    return S_OK()
+
+  def __saveReplicaCache( self ):
+    """ Drop the expired entries of the replica cache and save it
+    """
+    if not self.replicaCache:
+      return
+    self.replicaCache.purge()
+    res = self.replicaCache.save()
+    if not res['OK']:
+      gLogger.warn( "execute: %s" % res['Message'] )
+
+  def __executeTransformation( self, transDict ):
+    """ Process a transformation and log the outcome
+    """
+    transID = long( transDict['TransformationID'] )
+    startTime = time.time()
+    self.runningLock.acquire()
+    try:
+      if transID in self.runningTransformations:
+        self.runningTransformations[transID] = startTime
+    finally:
+      self.runningLock.release()
+    try:
       gLogger.info( "execute: Processing transformation %s." % transID )
-      startTime = time.time()
       res = self.processTransformation( transDict )
       if not res['OK']:
-        gLogger.info( "execute: Failed to process transformation: %s" % res['Message'] )
+        gLogger.info( "execute: Failed to process transformation %s: %s" % ( transID, res['Message'] ) )
       else:
-        gLogger.info( "execute: Processed transformation in %.1f seconds" % ( time.time() - startTime ) )
-    return S_OK()
+        gLogger.info( "execute: Processed transformation %s in %.1f seconds" % ( transID, time.time() - startTime ) )
+    finally:
+      self.runningLock.acquire()
+      try:
+        self.runningTransformations.pop( transID, None )
+      finally:
+        self.runningLock.release()
+
+  def __transformationException( self, threadedJob, exceptionInfo ):
+    gLogger.exception( "execute: Exception while processing a transformation", lExcInfo = exceptionInfo )
 
   def getTransformations( self ):
     """ Obtain the transformations to be executed 
@@ -127,14 +221,22 @@ class TransformationAgent( AgentModule ):
     # Create the tasks
     allCreated = True
     created = 0
-    for se, lfns in tasks:
-      res = self.transDB.addTaskForTransformation( transID, lfns, se )
+    if tasks:
+      res = self.transDB.addTasksForTransformation( transID, tasks )
       if not res['OK']:
-        gLogger.error( "processTransformation: Failed to add task generated by plug-in: %s." % res['Message'] )
+        gLogger.error( "processTransformation: Failed to add tasks generated by plug-in: %s." % res['Message'] )
         allCreated = False
       else:
-        created += 1
-        unusedFiles -= len( lfns )
+        for taskIndex, reason in res['Value']['Failed'].items():
+          gLogger.error( "processTransformation: Failed to add task generated by plug-in: %s." % reason )
+          allCreated = False
+        for taskIndex in res['Value']['Successful']:
+          se, lfns = tasks[taskIndex]
+          created += 1
+          unusedFiles -= len( lfns )
+          # The replicas of these files are about to change
+          if replicateOrRemove and self.replicaCache:
+            self.replicaCache.invalidate( lfns )
     if created:
       gLogger.info( "processTransformation: Successfully created %d tasks for transformation." % created )
     self.unusedFiles[transID] = unusedFiles
@@ -164,7 +266,8 @@ class TransformationAgent( AgentModule ):
     try:
       plugin_o = getattr( plugModule, 'TransformationPlugin' )( '%s' % plugin,
                                                                 transClient = self.transDB,
-                                                                replicaManager = self.rm )
+                                                                replicaManager = self.rm,
+                                                                replicaCache = self.replicaCache )
       return S_OK( plugin_o )
     except AttributeError, e:
       gLogger.exception( "__generatePluginObject: Failed to create %s(): %s." % ( plugin, e ) )
@@ -174,7 +277,9 @@ class TransformationAgent( AgentModule ):
     """ Get the replicas for the LFNs and check their statuses 
     """
     startTime = time.time()
-    if active:
+    if self.replicaCache:
+      res = self.replicaCache.getReplicas( lfns, active = active )
+    elif active:
       res = self.rm.getActiveReplicas( lfns )
     else:
       res = self.rm.getReplicas( lfns )
@@ -199,6 +304,8 @@ class TransformationAgent( AgentModule ):
         gLogger.warn( "__getDataReplicas: %s not found in the catalog." % lfn )
         missingLfns.append( lfn )
     if missingLfns:
+      if self.replicaCache:
+        self.replicaCache.invalidate( missingLfns )
       res = self.transDB.setFileStatusForTransformation( transID, 'MissingLFC', missingLfns )
       if not res['OK']:
         gLogger.warn( "__getDataReplicas: Failed to update status of missing files: %s." % res['Message'] )
@@ -7,7 +7,7 @@ import re
 
 class TransformationPlugin( object ):
 
-  def __init__( self, plugin, transClient = None, replicaManager = None ):
+  def __init__( self, plugin, transClient = None, replicaManager = None, replicaCache = None ):
     self.params = False
     self.data = False
     self.plugin = plugin
@@ -22,6 +22,8 @@ class TransformationPlugin( object ):
       self.rm = ReplicaManager()
     else:
       self.rm = replicaManager
+    # Optional ReplicaCache shared with the TransformationAgent
+    self.replicaCache = replicaCache
 
 
   def isOK( self ):
@@ -272,7 +274,10 @@ class TransformationPlugin( object ):
     # Group files by SE
     fileGroups = self._getFileGroups( self.data )
     # Get the file sizes
-    res = self.rm.getCatalogFileSize( self.data.keys() )
+    if self.replicaCache:
+      res = self.replicaCache.getFileSizes( self.data.keys() )
+    else:
+      res = self.rm.getCatalogFileSize( self.data.keys() )
     if not res['OK']:
       return S_ERROR( "Failed to get sizes for files" )
     if res['Value']['Failed']:
@@ -0,0 +1,100 @@
+########################################################################
+# $HeadURL $
+# File: ReplicaCacheTestCase.py
+########################################################################
+
+""".. module:: ReplicaCacheTestCase
+
+Test cases for DIRAC.TransformationSystem.Agent.ReplicaCache module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import shutil
+import tempfile
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.TransformationSystem.Agent.ReplicaCache import ReplicaCache
+
+class FakeReplicaManager:
+  """ catalog with two replicas per file, records the looked up LFNs """
+
+  def __init__( self ):
+    self.lookups = []
+    self.bannedSEs = []
+
+  def getReplicas( self, lfns ):
+    self.lookups.append( sorted( lfns ) )
+    successful = {}
+    failed = {}
+    for lfn in lfns:
+      if lfn.startswith( "/missing" ):
+        failed[lfn] = "No such file or directory"
+      else:
+        successful[lfn] = { 'CERN-DST' : 'srm:/cern%s' % lfn, 'RAL-DST' : 'srm:/ral%s' % lfn }
+    return S_OK( { 'Successful' : successful, 'Failed' : failed } )
+
+  def checkActiveReplicas( self, replicaDict ):
+    for replicas in replicaDict['Successful'].values():
+      for se in self.bannedSEs:
+        replicas.pop( se, None )
+    return S_OK( replicaDict )
+
+  def getCatalogFileSize( self, lfns ):
+    self.lookups.append( sorted( lfns ) )
+    return S_OK( { 'Successful' : dict( [ ( lfn, len( lfn ) ) for lfn in lfns ] ), 'Failed' : {} } )
+
+########################################################################
+class ReplicaCacheTestCase( unittest.TestCase ):
+  """py:class ReplicaCacheTestCase
+  Test case for DIRAC.TransformationSystem.Agent.ReplicaCache module.
+  """
+
+  def setUp( self ):
+    self.tmpDir = tempfile.mkdtemp()
+    self.rm = FakeReplicaManager()
+    self.cache = ReplicaCache( self.rm, cacheFile = os.path.join( self.tmpDir, "cache.dat" ) )
+
+  def tearDown( self ):
+    shutil.rmtree( self.tmpDir )
+
+  def testIncremental( self ):
+    """ only new or invalidated LFNs are looked up, active replicas are checked on every call """
+    res = self.cache.getReplicas( [ '/a', '/b', '/missing' ] )
+    self.assertEqual( sorted( res['Value']['Successful'].keys() ), [ '/a', '/b' ] )
+    self.assertEqual( res['Value']['Failed'].keys(), [ '/missing' ] )
+    self.rm.bannedSEs = [ 'RAL-DST' ]
+    res = self.cache.getReplicas( [ '/a', '/b', '/c' ] )
+    self.assertEqual( res['Value']['Successful']['/a'].keys(), [ 'CERN-DST' ] )
+    res = self.cache.getReplicas( [ '/a' ], active = False )
+    self.assertEqual( sorted( res['Value']['Successful']['/a'].keys() ), [ 'CERN-DST', 'RAL-DST' ] )
+    self.cache.invalidate( [ '/b' ] )
+    self.cache.getReplicas( [ '/a', '/b', '/c' ] )
+    self.assertEqual( self.rm.lookups, [ [ '/a', '/b', '/missing' ], [ '/c' ], [ '/b' ] ] )
+    self.assertEqual( self.cache.getFileSizes( [ '/a', '/b' ] )['Value']['Successful'], { '/a' : 2, '/b' : 2 } )
+    self.cache.getFileSizes( [ '/a' ] )
+    self.assertEqual( len( self.rm.lookups ), 4 )
+
+  def testPersistence( self ):
+    """ the saved cache is used by a new instance until the entries expire """
+    self.cache.getReplicas( [ '/a', '/b' ] )
+    self.cache.getFileSizes( [ '/a' ] )
+    self.assertEqual( self.cache.save()['OK'], True )
+    cache = ReplicaCache( self.rm, cacheFile = self.cache.cacheFile )
+    self.assertEqual( cache.load()['Value'], 2 )
+    cache.getReplicas( [ '/a', '/b' ] )
+    cache.getFileSizes( [ '/a' ] )
+    self.assertEqual( len( self.rm.lookups ), 2 )
+    cache = ReplicaCache( self.rm, cacheFile = self.cache.cacheFile, lifeTime = -1 )
+    self.assertEqual( cache.load()['Value'], 0 )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( ReplicaCacheTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
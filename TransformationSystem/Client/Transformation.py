@@ -218,6 +218,9 @@ class Transformation( API ):
   def addTaskForTransformation( self, lfns = [], se = 'Unknown', printOutput = False ):
     return self.__executeOperation( 'addTaskForTransformation', lfns, se, printOutput = printOutput )
 
+  def addTasksForTransformation( self, tasks, printOutput = False ):
+    return self.__executeOperation( 'addTasksForTransformation', tasks, printOutput = printOutput )
+
   def setTaskStatus( self, taskID, status, printOutput = False ):
     return self.__executeOperation( 'setTaskStatus', taskID, status, printOutput = printOutput )
 
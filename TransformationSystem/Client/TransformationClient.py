@@ -34,6 +34,7 @@ class TransformationClient(Client,FileCatalogueBase):
       
           addFilesToTransformation(transName,lfns)
           addTaskForTransformation(transName,lfns=[],se='Unknown')
+          addTasksForTransformation(transName,[(se,lfns),...])
           setFileStatusForTransformation(transName,status,lfns)
           setFileUsedSEForTransformation(transName,usedSE,lfns)  
           getTransformationStats(transName)
@@ -0,0 +1,180 @@
+"""  LFNFilter matches LFNs against the FileMask regular expressions of many transformations at once
+
+     Most masks contain a literal fragment that any matching LFN must contain. Each mask is indexed
+     by one token of its literal fragments, an alphanumeric word with a separator on both sides in
+     the fragment, which is then a whole word of any matching LFN. The token shared by the fewest
+     masks is used, as words common to many masks (lhcb, RAW, DST...) are also in most LFNs. An LFN
+     is only tested against the masks indexed by one of its own words, and only if it contains their
+     longest literal fragment. Masks without such a token are always tested. Adding, changing or
+     removing a mask only updates the index entries of that mask.
+"""
+
+__RCSID__ = "$Id$"
+
+import re, sre_parse, sre_constants
+
+TOKEN = re.compile( '[A-Za-z0-9]+' )
+
+def getRequiredLiterals( mask ):
+  """ Literal strings that any string matching the regular expression mask contains
+  """
+  try:
+    parsed = sre_parse.parse( mask )
+  except Exception:
+    return []
+  if parsed.pattern.flags & ( re.IGNORECASE | re.LOCALE | re.UNICODE ):
+    return []
+  literals = []
+  current = []
+  for op, av in parsed:
+    if op == sre_constants.LITERAL:
+      current.append( chr( av ) )
+    elif op == sre_constants.AT and av == sre_constants.AT_BEGINNING and not literals and not current:
+      continue
+    else:
+      if current:
+        literals.append( ''.join( current ) )
+      current = []
+  if current:
+    literals.append( ''.join( current ) )
+  return literals
+
+def getIndexKeys( literals ):
+  """ The tokens of the literals that are whole words of any string containing the literals
+  """
+  keys = []
+  for literal in literals:
+    for match in TOKEN.finditer( literal ):
+      if match.start() > 0 and match.end() < len( literal ):
+        keys.append( match.group() )
+  return keys
+
+class LFNFilter:
+
+  def __init__( self, filters = None ):
+    # { transID : ( order, mask, compiledMask, indexKey, literal, keys ) }
+    self.__filters = {}
+    # { token : set( transIDs ) }
+    self.__index = {}
+    # { token : number of masks having it in their literals }
+    self.__tokenCounts = {}
+    # transIDs of the masks without index key
+    self.__unindexed = set()
+    self.__order = 0
+    if filters:
+      self.setFilters( filters )
+
+  def addFilter( self, transID, mask ):
+    """ Add or replace the mask of a transformation, mask is a string or a compiled pattern
+    """
+    if type( mask ) == type( '' ) or type( mask ) == type( u'' ):
+      maskString = mask
+      compiledMask = None
+    else:
+      maskString = mask.pattern
+      compiledMask = mask
+    if transID in self.__filters:
+      if self.__filters[transID][1] == maskString:
+        return
+      self.removeFilter( transID )
+    if compiledMask is None:
+      compiledMask = re.compile( maskString )
+    literals = getRequiredLiterals( maskString )
+    keys = list( set( getIndexKeys( literals ) ) )
+    for key in keys:
+      self.__tokenCounts[key] = self.__tokenCounts.get( key, 0 ) + 1
+    literal = ''
+    if literals:
+      literal = max( literals, key = len )
+    self.__order += 1
+    self.__filters[transID] = ( self.__order, maskString, compiledMask, None, literal, keys )
+    self.__indexFilter( transID )
+
+  def __getBestKey( self, keys ):
+    """ The key shared by the fewest masks, the longest one for equal counts
+    """
+    bestKey = None
+    for key in keys:
+      if bestKey is None or ( self.__tokenCounts[key], -len( key ), key ) < ( self.__tokenCounts[bestKey], -len( bestKey ), bestKey ):
+        bestKey = key
+    return bestKey
+
+  def __indexFilter( self, transID ):
+    """ Put the mask in the bucket of its best key, if it is not there already
+    """
+    order, mask, compiledMask, indexKey, literal, keys = self.__filters[transID]
+    bestKey = self.__getBestKey( keys )
+    if bestKey == indexKey and ( indexKey is not None or transID in self.__unindexed ):
+      return
+    self.__unindexFilter( transID )
+    self.__filters[transID] = ( order, mask, compiledMask, bestKey, literal, keys )
+    if bestKey is None:
+      self.__unindexed.add( transID )
+    else:
+      self.__index.setdefault( bestKey, set() ).add( transID )
+
+  def __unindexFilter( self, transID ):
+    indexKey = self.__filters[transID][3]
+    if indexKey is None:
+      self.__unindexed.discard( transID )
+    elif transID in self.__index.get( indexKey, () ):
+      self.__index[indexKey].discard( transID )
+      if not self.__index[indexKey]:
+        del self.__index[indexKey]
+
+  def removeFilter( self, transID ):
+    """ Remove the mask of a transformation
+    """
+    if not transID in self.__filters:
+      return
+    self.__unindexFilter( transID )
+    for key in self.__filters.pop( transID )[5]:
+      self.__tokenCounts[key] -= 1
+      if not self.__tokenCounts[key]:
+        del self.__tokenCounts[key]
+
+  def setFilters( self, filters ):
+    """ Set the ( transID, mask ) filters, only the new or changed masks are compiled again
+    """
+    newTransIDs = set()
+    for transID, mask in filters:
+      self.addFilter( transID, mask )
+      newTransIDs.add( transID )
+    for transID in [ transID for transID in self.__filters if not transID in newTransIDs ]:
+      self.removeFilter( transID )
+    # The token counts are complete now, the masks added first may have a better key
+    for transID in self.__filters:
+      self.__indexFilter( transID )
+
+  def getFilters( self ):
+    """ The ( transID, compiled mask ) filters in the order they were added
+    """
+    filters = [ ( values[0], transID, values[2] ) for transID, values in self.__filters.items() ]
+    filters.sort()
+    return [ ( transID, compiledMask ) for order, transID, compiledMask in filters ]
+
+  def match( self, lfn ):
+    """ The transIDs of the masks found in the LFN, in the order the masks were added
+    """
+    candidates = set( self.__unindexed )
+    index = self.__index
+    for token in TOKEN.findall( lfn ):
+      if token in index:
+        candidates.update( index[token] )
+    result = []
+    for transID in candidates:
+      order, mask, compiledMask, indexKey, literal, keys = self.__filters[transID]
+      if literal in lfn and compiledMask.search( lfn ):
+        result.append( ( order, transID ) )
+    result.sort()
+    return [ transID for order, transID in result ]
+
+  def matchList( self, lfns ):
+    """ Match a batch of LFNs, return { lfn : [ transIDs ] } for the LFNs matching some mask
+    """
+    result = {}
+    for lfn in lfns:
+      transIDs = self.match( lfn )
+      if transIDs:
+        result[lfn] = transIDs
+    return result
@@ -21,6 +21,7 @@ from DIRAC.Core.Utilities.SiteSEMapping                                import ge
 from DIRAC.Core.Utilities.Shifter                                      import setupShifterProxyInEnv
 from DIRAC.ConfigurationSystem.Client.Helpers.Operations               import Operations
 from DIRAC.Core.Utilities.Subprocess                                   import pythonCall
+from DIRAC.TransformationSystem.DB.LFNFilter                           import LFNFilter
 
 from types import *
 import re, time, string, threading, copy
@@ -46,6 +47,8 @@ class TransformationDB( DB ):
 
     self.lock = threading.Lock()
     self.dbname = dbname
+    self.filters = []
+    self.filterEngine = LFNFilter()
     res = self.__updateFilters()
     if not res['OK']:
       gLogger.fatal( "Failed to create filters" )
@@ -153,7 +156,8 @@ class TransformationDB( DB ):
     self.lock.release()
     # If the transformation has an input data specification
     if fileMask:
-      self.filters.append( ( transID, re.compile( fileMask ) ) )
+      self.filterEngine.addFilter( transID, fileMask )
+      self.filters = self.filterEngine.getFilters()
 
     if inheritedFrom:
       res = self._getTransformationID( inheritedFrom, connection = connection )
@@ -322,8 +326,7 @@ class TransformationDB( DB ):
     setup = gConfig.getValue( '/DIRAC/Setup', '' )
     value = Operations().getValue( 'InputDataFilter/%sFilter' % self.database_name, '' )
     if value:
-      refilter = re.compile( value )
-      resultList.append( ( 0, refilter ) )
+      resultList.append( ( 0, value ) )
     # Per transformation filters
     req = "SELECT TransformationID,FileMask FROM Transformations;"
     res = self._query( req, connection )
@@ -331,23 +334,19 @@ class TransformationDB( DB ):
       return res
     for transID, mask in res['Value']:
       if mask:
-        refilter = re.compile( mask )
-        resultList.append( ( transID, refilter ) )
-    self.filters = resultList
-    return S_OK( resultList )
-
-  def __filterFile( self, lfn, filters = None ):
-    """Pass the input file through a supplied filter or those currently active """
-    result = []
+        resultList.append( ( transID, mask ) )
+    # Only the new or changed masks are compiled and indexed again
+    self.filterEngine.setFilters( resultList )
+    self.filters = self.filterEngine.getFilters()
+    return S_OK( self.filters )
+
+  def __filterFiles( self, lfns, filters = None ):
+    """ Pass a batch of input files through a supplied filter or those currently active,
+        return { lfn : [ transIDs ] } for the files passing some filter
+    """
     if filters:
-      for transID, refilter in filters:
-        if refilter.search( lfn ):
-          result.append( transID )
-    else:
-      for transID, refilter in self.filters:
-        if refilter.search( lfn ):
-          result.append( transID )
-    return result
+      return LFNFilter( filters ).matchList( lfns )
+    return self.filterEngine.matchList( lfns )
 
   ###########################################################################
   #
@@ -689,20 +688,14 @@ class TransformationDB( DB ):
 
   def __addExistingFiles( self, transID, connection = False ):
     """ Add files that already exist in the DataFiles table to the transformation specified by the transID """
-    for tID, filter in self.filters:
-      if tID == transID:
-        filters = [( tID, filter )]
-        break
+    filters = [ ( tID, filter ) for tID, filter in self.filters if tID == transID ]
     if not filters:
       return S_ERROR( 'No filters defined for transformation %d' % transID )
     res = self.__getAllFileIDs( connection = connection )
     if not res['OK']:
       return res
     fileIDs, lfnFilesIDs = res['Value']
-    passFilter = []
-    for fileID, lfn in fileIDs.items():
-      if self.__filterFile( lfn, filters ):
-        passFilter.append( fileID )
+    passFilter = [ lfnFilesIDs[lfn] for lfn in self.__filterFiles( lfnFilesIDs.keys(), filters ) ]
     return self.__addFilesToTransformation( transID, passFilter, connection = connection )
 
   def __insertExistingTransformationFiles( self, transID, fileTuples, connection = False ):
@@ -1324,6 +1317,113 @@ class TransformationDB( DB ):
         return res
     return S_OK( taskID )
 
+  def addTasksForTransformation( self, transID, tasks, connection = False ):
+    """ Create several tasks given as a list of ( se, lfns ) tuples for a transformation.
+        The tasks, their inputs and the file assignments are written with a few multi-row
+        statements. Tasks with files not Unused in the transformation are not created.
+        Returns S_OK( { 'Successful' : { taskIndex : taskID }, 'Failed' : { taskIndex : reason } } )
+    """
+    res = self._getConnectionTransID( connection, transID )
+    if not res['OK']:
+      return res
+    connection = res['Value']['Connection']
+    transID = res['Value']['TransformationID']
+    # Be sure the all the supplied LFNs are known to the database for the supplied transformation
+    allLfns = []
+    for se, lfns in tasks:
+      allLfns.extend( lfns )
+    fileDicts = {}
+    if allLfns:
+      res = self.getTransformationFiles( condDict = {'TransformationID':transID, 'LFN':allLfns}, connection = connection )
+      if not res['OK']:
+        return res
+      for fileDict in res['Value']:
+        fileDicts[fileDict['LFN']] = fileDict
+    failed = {}
+    newTasks = []
+    usedLfns = set()
+    for taskIndex in range( len( tasks ) ):
+      se, lfns = tasks[taskIndex]
+      for lfn in lfns:
+        if not lfn in fileDicts:
+          failed[taskIndex] = "Supplied file not found for transformation: %s" % lfn
+        elif fileDicts[lfn]['Status'] != 'Unused':
+          failed[taskIndex] = "Supplied file not in Unused status but %s: %s" % ( fileDicts[lfn]['Status'], lfn )
+        elif lfn in usedLfns:
+          failed[taskIndex] = "Supplied file in several tasks: %s" % lfn
+        if taskIndex in failed:
+          gLogger.error( "Task not added", failed[taskIndex] )
+          break
+      else:
+        usedLfns.update( lfns )
+        newTasks.append( ( taskIndex, se, lfns ) )
+    if not newTasks:
+      return S_OK( { 'Successful' : {}, 'Failed' : failed } )
+
+    # Insert all the tasks at once, they get consecutive task IDs
+    rows = []
+    params = []
+    for taskIndex, se, lfns in newTasks:
+      rows.append( "(%s,'Created','0',%s,UTC_TIMESTAMP(),UTC_TIMESTAMP())" )
+      params.extend( [ transID, se ] )
+    req = "INSERT INTO TransformationTasks(TransformationID, ExternalStatus, ExternalID, TargetSE, CreationTime, LastUpdateTime) VALUES %s;" % ','.join( rows )
+    self.lock.acquire()
+    res = self._update( req, connection, params = tuple( params ) )
+    if not res['OK']:
+      self.lock.release()
+      gLogger.error( "Failed to publish tasks for transformation", res['Message'] )
+      return res
+    numInserted = res['Value']
+    res = self._query( "SELECT LAST_INSERT_ID();", connection )
+    self.lock.release()
+    if not res['OK']:
+      return res
+    firstTaskID = int( res['Value'][0][0] )
+    taskIDs = range( firstTaskID, firstTaskID + len( newTasks ) )
+    if numInserted != len( newTasks ):
+      for taskID in taskIDs:
+        self.__deleteTransformationTask( transID, taskID, connection = connection )
+      return S_ERROR( "Inserted %s tasks instead of %s" % ( numInserted, len( newTasks ) ) )
+    gLogger.verbose( "Published tasks %d to %d for transformation %d." % ( taskIDs[0], taskIDs[-1], transID ) )
+
+    # Then their inputs and the assignment of their files in one go
+    cmdList = []
+    inputRows = []
+    inputParams = []
+    fileTasks = []
+    for ( taskIndex, se, lfns ), taskID in zip( newTasks, taskIDs ):
+      if not lfns:
+        continue
+      inputRows.append( "(%s,%s,%s)" )
+      inputParams.extend( [ transID, taskID, str.join( ';', lfns ) ] )
+      for lfn in lfns:
+        fileTasks.append( ( int( fileDicts[lfn]['FileID'] ), taskID, se ) )
+    if inputRows:
+      req = "INSERT INTO TaskInputs (TransformationID,TaskID,InputVector) VALUES %s;" % ','.join( inputRows )
+      cmdList.append( ( req, tuple( inputParams ) ) )
+    for i in range( 0, len( fileTasks ), 1000 ):
+      chunk = fileTasks[i:i + 1000]
+      taskCases = ' '.join( [ "WHEN %d THEN %d" % ( fileID, taskID ) for fileID, taskID, se in chunk ] )
+      seCases = ' '.join( [ "WHEN %d THEN %%s" % fileID for fileID, taskID, se in chunk ] )
+      fileIDs = intListToString( [ fileID for fileID, taskID, se in chunk ] )
+      req = "UPDATE TransformationFiles SET TaskID=CASE FileID %s END, UsedSE=CASE FileID %s END, Status='Assigned', LastUpdate=UTC_TIMESTAMP()" % ( taskCases, seCases )
+      req = "%s WHERE TransformationID = %d AND FileID IN (%s);" % ( req, transID, fileIDs )
+      cmdList.append( ( req, tuple( [ se for fileID, taskID, se in chunk ] ) ) )
+      fileTuples = ','.join( [ "(%d,%d,%d)" % ( transID, fileID, taskID ) for fileID, taskID, se in chunk ] )
+      cmdList.append( ( "INSERT INTO TransformationFileTasks (TransformationID,FileID,TaskID) VALUES %s;" % fileTuples, None ) )
+    if cmdList:
+      res = self._transaction( cmdList, connection )
+      if not res['OK']:
+        gLogger.error( "Failed to assign files to the new tasks", res['Message'] )
+        # Not all the tables are transactional, clean up what may have been written
+        for taskID in taskIDs:
+          self.__removeTransformationTask( transID, taskID, connection = connection )
+        return res
+    successful = {}
+    for ( taskIndex, se, lfns ), taskID in zip( newTasks, taskIDs ):
+      successful[taskIndex] = taskID
+    return S_OK( { 'Successful' : successful, 'Failed' : failed } )
+
   def extendTransformation( self, transName, nTasks, author = '', connection = False ):
     """ Extend SIMULATION type transformation by nTasks number of tasks
     """
@@ -1473,8 +1573,9 @@ class TransformationDB( DB ):
     # Determine which files pass the filters and are to be added to transformations 
     transFiles = {}
     filesToAdd = []
+    lfnTrans = self.__filterFiles( [ fileTuple[0] for fileTuple in fileTuples ] )
     for lfn, pfn, size, se, guid, checksum in fileTuples:
-      fileTrans = self.__filterFile( lfn )
+      fileTrans = lfnTrans.get( lfn, [] )
       if not ( fileTrans or force ):
         successful[lfn] = True
       else:
@@ -1500,7 +1601,7 @@ class TransformationDB( DB ):
       for transID, lfns in transFiles.items():
         fileIDs = []
         for lfn in lfns:
-          if lfn.has_key( lfn ):
+          if lfnFileIDs.has_key( lfn ):
             fileIDs.append( lfnFileIDs[lfn] )
         if fileIDs:
           res = self.__addFilesToTransformation( transID, fileIDs, connection = connection )
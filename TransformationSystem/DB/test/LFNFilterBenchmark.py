@@ -0,0 +1,107 @@
+########################################################################
+# $HeadURL $
+# File: LFNFilterBenchmark.py
+########################################################################
+
+""" :mod: LFNFilterBenchmark
+    ========================
+
+    .. module: LFNFilterBenchmark
+    :synopsis: time to filter new LFNs through the masks of many transformations
+
+    1k transformation masks shaped like the production ones are matched
+    against 1M LFNs with the LFNFilter. The sequential loop over all the
+    masks, as TransformationDB.__filterFile did so far, is timed on a
+    sample of the LFNs and checked to give the same result.
+
+    Usage: python LFNFilterBenchmark.py [numMasks [numLFNs]]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+import random
+import re
+## SUT
+from DIRAC.TransformationSystem.DB.LFNFilter import LFNFilter
+
+NUM_MASKS = 1000
+NUM_LFNS = 1000000
+SAMPLE_SIZE = 10000
+
+CONFIGS = [ 'Collision%02d' % year for year in range( 10, 13 ) ] + [ 'MC%d' % year for year in range( 2010, 2013 ) ]
+STREAMS = [ 'BHADRON', 'CHARM', 'DIMUON', 'EW', 'LEPTONIC', 'RADIATIVE', 'SEMILEPTONIC', 'MINIBIAS', 'CALIBRATION' ]
+
+def makeMasks( numMasks ):
+  """ masks on a production directory, a stream or a file name pattern """
+  masks = []
+  for transID in range( 1, numMasks + 1 ):
+    kind = transID % 10
+    if kind < 7:
+      masks.append( ( transID, "/lhcb/LHCb/%s/%s.DST/%08d/" % ( CONFIGS[transID % len( CONFIGS )],
+                                                              STREAMS[transID % len( STREAMS )], transID ) ) )
+    elif kind < 9:
+      masks.append( ( transID, "^/lhcb/data/20%02d/RAW/FULL/LHCb/COLLISION%02d/%d" % ( 10 + transID % 3, 10 + transID % 3,
+                                                                                   transID ) ) )
+    else:
+      masks.append( ( transID, "_%08d_[0-9]+_1\\.%s\\.dst$" % ( transID, STREAMS[transID % len( STREAMS )].lower() ) ) )
+  return masks
+
+def makeLFNs( numLFNs, numMasks ):
+  """ LFNs of the productions of the masks and of other ones """
+  random.seed( 1 )
+  lfns = []
+  for i in xrange( numLFNs ):
+    prodID = random.randint( 1, 2 * numMasks )
+    stream = STREAMS[prodID % len( STREAMS )]
+    if prodID % 10 in ( 7, 8 ):
+      lfns.append( "/lhcb/data/20%02d/RAW/FULL/LHCb/COLLISION%02d/%d/%06d_%010d.raw" % ( 10 + prodID % 3, 10 + prodID % 3,
+                                                                                     prodID, prodID, i ) )
+    else:
+      lfns.append( "/lhcb/LHCb/%s/%s.DST/%08d/%04d/%08d_%08d_1.%s.dst" % ( CONFIGS[prodID % len( CONFIGS )], stream,
+                                                                       prodID, i / 1000, prodID, i, stream.lower() ) )
+  return lfns
+
+def sequentialMatch( filters, lfns ):
+  """ all the masks on every LFN """
+  result = {}
+  for lfn in lfns:
+    transIDs = [ transID for transID, refilter in filters if refilter.search( lfn ) ]
+    if transIDs:
+      result[lfn] = transIDs
+  return result
+
+if __name__ == "__main__":
+  numMasks = NUM_MASKS
+  numLFNs = NUM_LFNS
+  if len( sys.argv ) > 1:
+    numMasks = int( sys.argv[1] )
+  if len( sys.argv ) > 2:
+    numLFNs = int( sys.argv[2] )
+  masks = makeMasks( numMasks )
+  lfns = makeLFNs( numLFNs, numMasks )
+  print "Filtering %d LFNs with %d masks" % ( numLFNs, numMasks )
+
+  startTime = time.time()
+  lfnFilter = LFNFilter( masks )
+  print "  %-25s %8.2f s" % ( "building the filter", time.time() - startTime )
+
+  startTime = time.time()
+  result = lfnFilter.matchList( lfns )
+  filterTime = time.time() - startTime
+  print "  %-25s %8.2f s, %d LFNs selected" % ( "LFNFilter", filterTime, len( result ) )
+
+  sample = lfns[:SAMPLE_SIZE]
+  startTime = time.time()
+  expected = sequentialMatch( [ ( transID, re.compile( mask ) ) for transID, mask in masks ], sample )
+  sequentialTime = ( time.time() - startTime ) * len( lfns ) / len( sample )
+  print "  %-25s %8.2f s (extrapolated from %d LFNs)" % ( "sequential masks", sequentialTime, len( sample ) )
+  if expected != lfnFilter.matchList( sample ):
+    print "  The LFNFilter result differs from the sequential one"
+    sys.exit( 1 )
+
+  startTime = time.time()
+  lfnFilter.setFilters( masks[1:] + [ ( numMasks + 1, "/lhcb/LHCb/Collision12/EW.DST/" ) ] )
+  print "  %-25s %8.2f s" % ( "incremental update", time.time() - startTime )
@@ -0,0 +1,84 @@
+########################################################################
+# $HeadURL $
+# File: LFNFilterTestCase.py
+########################################################################
+
+""".. module:: LFNFilterTestCase
+
+Test cases for DIRAC.TransformationSystem.DB.LFNFilter module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import re
+import unittest
+## SUT
+from DIRAC.TransformationSystem.DB.LFNFilter import LFNFilter, getRequiredLiterals, getIndexKeys
+
+########################################################################
+class LFNFilterTestCase( unittest.TestCase ):
+  """py:class LFNFilterTestCase
+  Test case for DIRAC.TransformationSystem.DB.LFNFilter module.
+  """
+
+  def setUp( self ):
+    self.masks = [ ( 0, "/lhcb/" ),
+                   ( 1, "^/lhcb/data/2011/RAW/FULL/LHCb/COLLISION11/" ),
+                   ( 2, "/lhcb/LHCb/Collision11/BHADRON.DST/" ),
+                   ( 3, "/MC/(2011|2012)/" ),
+                   ( 4, "(?i)/lhcb/mc/" ),
+                   ( 5, ".*\\.raw$" ),
+                   ( 6, "/user/[a-z]/" ) ]
+    self.lfns = [ "/lhcb/data/2011/RAW/FULL/LHCb/COLLISION11/97114/097114_0000000004.raw",
+                  "/lhcb/LHCb/Collision11/BHADRON.DST/00012345/0000/00012345_00000001_1.bhadron.dst",
+                  "/lhcb/LHCb/Collision11/BHADRONXDST/00012345/0000/00012345_00000001_1.bhadron.dst",
+                  "/lhcb/MC/2012/ALLSTREAMS.DST/00020000/0000/00020000_00000001_1.allstreams.dst",
+                  "/other/MC/2013/file.raw",
+                  "/lhcb/user/a/auser/file.root",
+                  "/lhcb/data/2011/RAW/FULL/LHCb/COLLISION11" ]
+
+  def testLiterals( self ):
+    """ required literals and index keys of the masks """
+    self.assertEqual( getRequiredLiterals( "^/lhcb/data/2011/RAW" ), [ "/lhcb/data/2011/RAW" ] )
+    self.assertEqual( getRequiredLiterals( "/a/BHADRON.DST/" ), [ "/a/BHADRON", "DST/" ] )
+    self.assertEqual( getRequiredLiterals( "/a/|b/" ), [] )
+    self.assertEqual( getRequiredLiterals( "(?i)/lhcb/" ), [] )
+    self.assertEqual( getIndexKeys( [ "/lhcb/data/2011/RAW" ] ), [ "lhcb", "data", "2011" ] )
+    self.assertEqual( getIndexKeys( [ "/lhcb/BHADRON", "DST/0012/", "_1.raw" ] ), [ "lhcb", "0012", "1" ] )
+    self.assertEqual( getIndexKeys( [ "lhcb/" ] ), [] )
+
+  def testMatch( self ):
+    """ same result as running all the masks sequentially """
+    lfnFilter = LFNFilter( self.masks )
+    compiled = [ ( transID, re.compile( mask ) ) for transID, mask in self.masks ]
+    expected = {}
+    for lfn in self.lfns:
+      transIDs = [ transID for transID, refilter in compiled if refilter.search( lfn ) ]
+      self.assertEqual( lfnFilter.match( lfn ), transIDs )
+      if transIDs:
+        expected[lfn] = transIDs
+    self.assertEqual( lfnFilter.matchList( self.lfns ), expected )
+    self.assertEqual( lfnFilter.match( "/nothing/here" ), [] )
+
+  def testUpdate( self ):
+    """ masks are added, changed and removed incrementally """
+    lfnFilter = LFNFilter( self.masks )
+    compiled = dict( lfnFilter.getFilters() )
+    lfn = self.lfns[1]
+    self.assertEqual( lfnFilter.match( lfn ), [ 0, 2 ] )
+    lfnFilter.setFilters( [ ( 0, "/lhcb/" ), ( 2, "/Collision11/" ), ( 7, "bhadron" ) ] )
+    self.assertEqual( [ transID for transID, refilter in lfnFilter.getFilters() ], [ 0, 2, 7 ] )
+    #The unchanged mask is not compiled again
+    self.assertEqual( dict( lfnFilter.getFilters() )[0] is compiled[0], True )
+    self.assertEqual( lfnFilter.match( lfn ), [ 0, 2, 7 ] )
+    lfnFilter.removeFilter( 0 )
+    lfnFilter.addFilter( 8, re.compile( "LHCb" ) )
+    self.assertEqual( lfnFilter.match( lfn ), [ 2, 7, 8 ] )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( LFNFilterTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
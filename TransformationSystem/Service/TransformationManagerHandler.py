@@ -136,6 +136,11 @@ class TransformationManagerHandlerBase( RequestHandler ):
     res = database.addTaskForTransformation( transName, lfns = lfns, se = se )
     return self._parseRes( res )
 
+  types_addTasksForTransformation = [transTypes, ListType]
+  def export_addTasksForTransformation( self, transName, tasks ):
+    res = database.addTasksForTransformation( transName, tasks )
+    return self._parseRes( res )
+
   types_setFileStatusForTransformation = [transTypes, StringTypes, ListType]
   def export_setFileStatusForTransformation( self, transName, status, lfns, force = False ):
     res = database.setFileStatusForTransformation( transName, status, lfns, force )
@@ -49,6 +49,7 @@ class JobSchedulingAgent( OptimizerModule ):
     self.rescheduleDelaysList = [ int( x ) for x in delays ]
     self.maxRescheduleDelay = self.rescheduleDelaysList[-1]
     self.excludedOnHoldJobTypes = self.am_getOption( 'ExcludedOnHoldJobTypes', [] )
+    self.requiredJobAttributes = ['RescheduleCounter', 'RescheduleTime', 'ApplicationStatus']
 
     return S_OK()
 
@@ -59,7 +60,7 @@ class JobSchedulingAgent( OptimizerModule ):
     self.log.verbose( 'Job %s will be processed' % ( job ) )
 
     # Check if the job was recently rescheduled
-    result = self.jobDB.getJobAttributes( job, ['RescheduleCounter', 'RescheduleTime', 'ApplicationStatus'] )
+    result = self.getLoadedJobAttributes( job, ['RescheduleCounter', 'RescheduleTime', 'ApplicationStatus'] )
     if not result['OK']:
       self.log.error( result['Message'] )
       return S_ERROR( 'Can not get job attributes from JobDB' )
@@ -52,6 +52,9 @@ class OptimizerModule( AgentModule ):
     self.startingMajorStatus = "Checking"
     self.failedStatus = self.am_getOption( "FailedJobStatus" , 'Failed' )
     self.requiredJobInfo = 'jdl'
+    #Attributes loaded at once for all the jobs of the cycle, see getLoadedJobAttributes
+    self.requiredJobAttributes = []
+    self.__jobAttributes = {}
     self.am_setOption( "PollingTime", 30 )
 
     return self.initializeOptimizer()
@@ -84,8 +87,24 @@ class OptimizerModule( AgentModule ):
       self.log.verbose( 'No pending jobs to process' )
       return S_OK( 'No work to do' )
 
-    for job in result['Value']:
-      result = self.getJobDefinition( job )
+    jobList = result['Value']
+    #Load the JDLs of all the jobs at once
+    jdlDict = {}
+    if self.requiredJobInfo in ( 'jdl', 'jdlOriginal' ):
+      result = self.jobDB.getJDLsForJobList( jobList, original = self.requiredJobInfo == 'jdlOriginal' )
+      if result['OK']:
+        jdlDict = result['Value']
+    self.__jobAttributes = {}
+    if self.requiredJobAttributes:
+      result = self.jobDB.getAttributesForJobList( jobList, self.requiredJobAttributes )
+      if result['OK']:
+        self.__jobAttributes = result['Value']
+
+    for job in jobList:
+      jobDef = False
+      if int( job ) in jdlDict:
+        jobDef = { 'jdl' : jdlDict[ int( job ) ] }
+      result = self.getJobDefinition( job, jobDef )
       if not result['OK']:
         self.setFailedJob( job, result[ 'Message' ], '' )
         continue
@@ -94,6 +113,16 @@ class OptimizerModule( AgentModule ):
 
     return S_OK()
 
+  #############################################################################
+  def getLoadedJobAttributes( self, job, attrList ):
+    """ Get job attributes from the ones loaded for all the jobs of the cycle,
+        from the JobDB if they were not loaded
+    """
+    jobAttrs = self.__jobAttributes.get( int( job ), {} )
+    if not jobAttrs or [ attr for attr in attrList if attr not in jobAttrs ]:
+      return self.jobDB.getJobAttributes( job, attrList )
+    return S_OK( dict( [ ( attr, jobAttrs[ attr ] ) for attr in attrList ] ) )
+
   #############################################################################
   def optimizeJob( self, job, classAdJob ):
     """ Call the corresponding Optimizer checkJob method
@@ -100,15 +100,22 @@ class StalledJobAgent( AgentModule ):
       self.log.info( '%s Running jobs will be checked for being stalled' % ( len( jobs ) ) )
       jobs.sort()
 #      jobs = jobs[:10] #for debugging
+      result = self.jobDB.getAttributesForJobList( jobs, ['HeartBeatTime', 'LastUpdateTime'] )
+      if not result['OK']:
+        return result
+      jobsAttrs = result['Value']
+      stalledJobs = []
       for job in jobs:
-        result = self.__getStalledJob( job, stalledTime )
+        result = self.__getStalledJob( job, jobsAttrs.get( int( job ), {} ), stalledTime )
         if result['OK']:
           self.log.verbose( 'Updating status to Stalled for job %s' % ( job ) )
-          self.__updateJobStatus( job, 'Stalled' )
+          stalledJobs.append( job )
           stalledCounter += 1
         else:
           self.log.verbose( result['Message'] )
           runningCounter += 1
+      if stalledJobs:
+        self.__updateJobsStatus( stalledJobs, 'Stalled' )
 
     self.log.info( 'Total jobs: %s, Stalled job count: %s, Running job count: %s' %
                    ( len( jobs ), stalledCounter, runningCounter ) )
@@ -132,29 +139,51 @@ class StalledJobAgent( AgentModule ):
       jobs = result['Value']
       self.log.info( '%s Stalled jobs will be checked for failure' % ( len( jobs ) ) )
 
+      result = self.jobDB.getAttributesForJobList( jobs, ['HeartBeatTime', 'LastUpdateTime'] )
+      if not result['OK']:
+        return result
+      jobsAttrs = result['Value']
+      result = self.jobDB.getParametersForJobList( jobs, ['Pilot_Reference'] )
+      if not result['OK']:
+        return result
+      jobsParams = result['Value']
+
+      pilotLostJobs = []
+      timedOutJobs = []
       for job in jobs:
 
         # Check if the job pilot is lost
-        result = self.__getJobPilotStatus( job )
+        result = self.__getJobPilotStatus( job, jobsParams.get( int( job ), {} ).get( 'Pilot_Reference' ) )
         if result['OK']:
           pilotStatus = result['Value']
           if pilotStatus != "Running":
-            result = self.__updateJobStatus( job, 'Failed',
-                                             "Job stalled: pilot not running" )
-            failedCounter += 1
-            result = self.__sendAccounting( job )
+            pilotLostJobs.append( job )
             continue
 
-        result = self.__getLatestUpdateTime( job )
+        result = self.__getLatestUpdateTime( job, jobsAttrs.get( int( job ), {} ) )
         if not result['OK']:
           return result
         currentTime = toEpoch()
         lastUpdate = result['Value']
         elapsedTime = currentTime - lastUpdate
         if elapsedTime > failedTime:
-          self.__updateJobStatus( job, 'Failed', 'Stalling for more than %d sec' % failedTime )
-          failedCounter += 1
-          result = self.__sendAccounting( job )
+          timedOutJobs.append( job )
+
+      for failedJobs, minor in ( ( pilotLostJobs, "Job stalled: pilot not running" ),
+                                 ( timedOutJobs, 'Stalling for more than %d sec' % failedTime ) ):
+        if not failedJobs:
+          continue
+        result = self.__updateJobsStatus( failedJobs, 'Failed', minor )
+        if not result['OK']:
+          continue
+        failedCounter += len( failedJobs )
+        result = self.jobDB.getAttributesForJobList( failedJobs )
+        if not result['OK']:
+          self.log.error( result['Message'] )
+          continue
+        failedAttrs = result['Value']
+        for job in failedJobs:
+          result = self.__sendAccounting( job, failedAttrs.get( int( job ), {} ) )
 
     recoverCounter = 0
 
@@ -166,8 +195,13 @@ class StalledJobAgent( AgentModule ):
       if result['Value']:
         jobs = result['Value']
         self.log.info( '%s Stalled jobs will be Accounted' % ( len( jobs ) ) )
+        result = self.jobDB.getAttributesForJobList( jobs )
+        if not result['OK']:
+          self.log.error( result['Message'] )
+          return result
+        jobsAttrs = result['Value']
         for job in jobs:
-          result = self.__sendAccounting( job )
+          result = self.__sendAccounting( job, jobsAttrs.get( int( job ), {} ) )
           if not result['OK']:
             break
           recoverCounter += 1
@@ -180,12 +214,10 @@ class StalledJobAgent( AgentModule ):
     return S_OK( failedCounter )
 
   #############################################################################
-  def __getJobPilotStatus( self, jobID ):
-    """ Get the job pilot status
+  def __getJobPilotStatus( self, jobID, pilotReference ):
+    """ Get the status of the job pilot given its reference
     """
-    result = self.jobDB.getJobParameter( jobID, 'Pilot_Reference' )
-    if result['OK'] and result['Value']:
-      pilotReference = result['Value']
+    if pilotReference:
       wmsAdminClient = RPCClient( 'WorkloadManagement/WMSAdministrator' )
       result = wmsAdminClient.getPilotInfo( pilotReference )
       if result['OK']:
@@ -198,11 +230,11 @@ class StalledJobAgent( AgentModule ):
 
 
   #############################################################################
-  def __getStalledJob( self, job, stalledTime ):
+  def __getStalledJob( self, job, jobAttrs, stalledTime ):
     """ Compares the most recent of LastUpdateTime and HeartBeatTime against
         the stalledTime limit.
     """
-    result = self.__getLatestUpdateTime( job )
+    result = self.__getLatestUpdateTime( job, jobAttrs )
     if not result['OK']:
       return result
 
@@ -218,25 +250,24 @@ class StalledJobAgent( AgentModule ):
     return S_ERROR( 'Job %s is running and will be ignored' % job )
 
   #############################################################################
-  def __getLatestUpdateTime( self, job ):
+  def __getLatestUpdateTime( self, job, jobAttrs ):
     """ Returns the most recent of HeartBeatTime and LastUpdateTime
+        given the job attributes
     """
-    result = self.jobDB.getJobAttributes( job, ['HeartBeatTime', 'LastUpdateTime'] )
-    if not result['OK'] or not result['Value']:
-      self.log.warn( result )
+    if not jobAttrs:
       return S_ERROR( 'Could not get attributes for job %s' % job )
 
-    self.log.verbose( result )
+    self.log.verbose( jobAttrs )
     latestUpdate = 0
-    if not result['Value']['HeartBeatTime'] or result['Value']['HeartBeatTime'] == 'None':
+    if not jobAttrs['HeartBeatTime'] or jobAttrs['HeartBeatTime'] == 'None':
       self.log.verbose( 'HeartBeatTime is null for job %s' % job )
     else:
-      latestUpdate = toEpoch( fromString( result['Value']['HeartBeatTime'] ) )
+      latestUpdate = toEpoch( fromString( jobAttrs['HeartBeatTime'] ) )
 
-    if not result['Value']['LastUpdateTime'] or result['Value']['LastUpdateTime'] == 'None':
+    if not jobAttrs['LastUpdateTime'] or jobAttrs['LastUpdateTime'] == 'None':
       self.log.verbose( 'LastUpdateTime is null for job %s' % job )
     else:
-      lastUpdate = toEpoch( fromString( result['Value']['LastUpdateTime'] ) )
+      lastUpdate = toEpoch( fromString( jobAttrs['LastUpdateTime'] ) )
       if latestUpdate < lastUpdate:
         latestUpdate = lastUpdate
 
@@ -247,29 +278,31 @@ class StalledJobAgent( AgentModule ):
       return S_OK( latestUpdate )
 
   #############################################################################
-  def __updateJobStatus( self, job, status, minorstatus = None ):
-    """ This method updates the job status in the JobDB, this should only be
-        used to fail jobs due to the optimizer chain.
+  def __updateJobsStatus( self, jobs, status, minorstatus = None ):
+    """ This method updates the status of a list of jobs in the JobDB and
+        adds the corresponding logging records in one go
     """
-    self.log.verbose( "self.jobDB.setJobAttribute(%s,'Status','%s',update=True)" % ( job, status ) )
+    self.log.verbose( "self.jobDB.setJobsStatus(%s jobs,'%s','%s',update=True)" % ( len( jobs ), status, minorstatus ) )
 
-    if self.am_getOption( 'Enable', True ):
-      result = self.jobDB.setJobAttribute( job, 'Status', status, update = True )
-    else:
-      result = S_OK( 'DisabledMode' )
+    if not self.am_getOption( 'Enable', True ):
+      return S_OK( 'DisabledMode' )
 
-    if result['OK']:
-      if minorstatus:
-        self.log.verbose( "self.jobDB.setJobAttribute(%s,'MinorStatus','%s',update=True)" % ( job, minorstatus ) )
-        result = self.jobDB.setJobAttribute( job, 'MinorStatus', minorstatus, update = True )
+    result = self.jobDB.setJobsStatus( jobs, status, minorstatus, update = True )
+    if not result['OK']:
+      self.log.warn( result['Message'] )
+      return result
 
+    minorDict = {}
     if not minorstatus: #Retain last minor status for stalled jobs
-      result = self.jobDB.getJobAttributes( job, ['MinorStatus'] )
+      result = self.jobDB.getAttributesForJobList( jobs, ['MinorStatus'] )
       if result['OK']:
-        minorstatus = result['Value']['MinorStatus']
+        minorDict = result['Value']
 
-    logStatus = status
-    result = self.logDB.addLoggingRecord( job, status = logStatus, minor = minorstatus, source = 'StalledJobAgent' )
+    records = []
+    for job in jobs:
+      jobMinor = minorstatus or minorDict.get( int( job ), {} ).get( 'MinorStatus', 'idem' )
+      records.append( ( job, status, jobMinor, 'idem', '', 'StalledJobAgent' ) )
+    result = self.logDB.addLoggingRecords( records )
     if not result['OK']:
       self.log.warn( result )
 
@@ -289,16 +322,14 @@ class StalledJobAgent( AgentModule ):
 
 
   #############################################################################
-  def __sendAccounting( self, jobID ):
-    """ Send WMS accounting data for the given job
+  def __sendAccounting( self, jobID, jobDict ):
+    """ Send WMS accounting data for the given job given its attributes
     """
 
     accountingReport = Job()
 
-    result = self.jobDB.getJobAttributes( jobID )
-    if not result['OK']:
-      return result
-    jobDict = result['Value']
+    if not jobDict:
+      return S_ERROR( 'Could not get attributes for job %s' % jobID )
 
     startTime, endTime = self.__checkLoggingInfo( jobID, jobDict )
 
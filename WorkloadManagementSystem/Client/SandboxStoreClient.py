@@ -11,17 +11,22 @@ except:
 import tempfile
 import types
 import re
+import shutil
+import threading
 from DIRAC.Core.DISET.TransferClient import TransferClient
 from DIRAC.Core.DISET.RPCClient import RPCClient
 from DIRAC.DataManagementSystem.Client.ReplicaManager import ReplicaManager
 from DIRAC.Core.Utilities.File import getSize, getGlobbedTotalSize
 from DIRAC.Core.Utilities import List
+from DIRAC.WorkloadManagementSystem.private.SandboxChunks import getTarChunks, getChunkHash, compressChunk
 from DIRAC import gLogger, S_OK, S_ERROR, gConfig
 
 class SandboxStoreClient:
 
   __validSandboxTypes = ( 'Input', 'Output' )
   __smdb = None
+  #Chunks of a sandbox sent at the same time
+  __parallelTransfers = 4
 
   def __init__( self, useCertificates = False, rpcClient = False, transferClient = False,
                 delegatedDN = None, delegatedGroup = None, setup = None ):
@@ -101,6 +106,12 @@ class SandboxStoreClient:
     if errorFiles:
       return S_ERROR( "Failed to locate files: %s" % ", ".join( errorFiles ) )
 
+    #Send only the chunks the store doesn't have, fall back to a whole tarball if it can't be done
+    result = self.__uploadChunkedSandbox( files2Upload, sizeLimit, assignTo )
+    if result[ 'OK' ]:
+      return result
+    gLogger.verbose( "Cannot upload a chunked sandbox, sending it whole", result[ 'Message' ] )
+
     try:
       fd, tmpFilePath = tempfile.mkstemp( prefix = "LDSB." )
       os.close( fd )
@@ -135,6 +146,103 @@ class SandboxStoreClient:
       pass
     return result
 
+  def __uploadChunkedSandbox( self, files2Upload, sizeLimit, assignTo ):
+    """ Upload the files as a chunked sandbox: the files are packed in a plain tar archive
+        split in chunks and only the chunks missing in the SandboxStore are sent
+    """
+    try:
+      tmpDir = tempfile.mkdtemp( prefix = "LDSB." )
+    except Exception, e:
+      return S_ERROR( "Cannot create temporal directory: %s" % str( e ) )
+
+    try:
+      tarPath = os.path.join( tmpDir, "sandbox.tar" )
+      oMD5 = md5.md5()
+      chunkHashes = []
+      chunkFiles = {}
+      compressedBytes = 0
+      try:
+        tf = tarfile.open( name = tarPath, mode = "w" )
+        for file in files2Upload:
+          tf.add( os.path.realpath( file ), os.path.basename( file ), recursive = True )
+        tf.close()
+
+        fd = open( tarPath, "rb" )
+        try:
+          for offset, length in getTarChunks( tarPath ):
+            fd.seek( offset )
+            data = fd.read( length )
+            oMD5.update( data )
+            chunkHash = getChunkHash( data )
+            chunkHashes.append( chunkHash )
+            if chunkHash in chunkFiles:
+              continue
+            data = compressChunk( data )
+            compressedBytes += len( data )
+            chunkFiles[ chunkHash ] = os.path.join( tmpDir, chunkHash )
+            cFD = open( chunkFiles[ chunkHash ], "wb" )
+            try:
+              cFD.write( data )
+            finally:
+              cFD.close()
+        finally:
+          fd.close()
+      except Exception, e:
+        return S_ERROR( "Cannot split the sandbox in chunks: %s" % str( e ) )
+
+      if sizeLimit > 0 and compressedBytes > sizeLimit:
+        return S_ERROR( "Size over the limit" )
+
+      rpcClient = self.__getRPCClient()
+      result = rpcClient.getMissingSandboxChunks( chunkFiles.keys() )
+      if not result[ 'OK' ]:
+        return result
+      missing = result[ 'Value' ]
+      gLogger.verbose( "Sending %s out of %s sandbox chunks" % ( len( missing ), len( chunkFiles ) ) )
+      result = self.__sendChunks( [ ( chunkHash, chunkFiles[ chunkHash ] ) for chunkHash in missing
+                                    if chunkHash in chunkFiles ] )
+      if not result[ 'OK' ]:
+        return result
+
+      manifest = { 'Hash' : oMD5.hexdigest(), 'Size' : getSize( tarPath ), 'Chunks' : chunkHashes }
+      return rpcClient.registerChunkedSandbox( manifest, assignTo )
+    finally:
+      shutil.rmtree( tmpDir, True )
+
+  def __sendChunks( self, chunkList ):
+    """ Send a list of ( chunkHash, chunkPath ) using several transfers at the same time
+    """
+    pending = list( chunkList )
+    errors = []
+    lock = threading.Lock()
+
+    def sendLoop():
+      transferClient = self.__getTransferClient()
+      while True:
+        lock.acquire()
+        try:
+          if not pending or errors:
+            return
+          chunkHash, chunkPath = pending.pop()
+        finally:
+          lock.release()
+        result = transferClient.sendFile( chunkPath, "Chunk:%s" % chunkHash )
+        if not result[ 'OK' ]:
+          errors.append( result[ 'Message' ] )
+
+    numTransfers = min( SandboxStoreClient.__parallelTransfers, len( pending ) )
+    #A transfer client given to us is not shared between threads
+    if self.__transferClient:
+      numTransfers = min( 1, numTransfers )
+    threads = [ threading.Thread( target = sendLoop ) for i in range( numTransfers ) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    if errors:
+      return S_ERROR( "Cannot send sandbox chunks: %s" % errors[0] )
+    return S_OK()
+
   ##############
   # Download sandbox
 
@@ -14,12 +14,15 @@
     getAllJobAttributes()
     getDistinctJobAttributes()
     getAttributesForJobList()
+    getOptParametersForJobList()
     getJobParameter()
     getJobParameters()
+    getParametersForJobList()
     getAllJobParameters()
     getInputData()
     getSubjobs()
     getJobJDL()
+    getJDLsForJobList()
 
     selectJobs()
     selectJobsWithStatus()
@@ -30,6 +33,7 @@
     setJobParameters()
     setJobJDL()
     setJobStatus()
+    setJobsStatus()
     setInputData()
 
     insertNewJobIntoDB()
@@ -42,6 +46,12 @@
     setMask()
     allowSiteInMask()
     banSiteInMask()
+    addSiteMaskListener()
+    getSiteMaskVersion()
+
+    setHeartBeatDataForJobs()
+    getPendingJobCommands()
+    addJobCommandListener()
 
     getCounters()
 """
@@ -56,6 +66,7 @@ from DIRAC                                                   import S_OK, S_ERRO
 from DIRAC.ConfigurationSystem.Client.Config                 import gConfig
 from DIRAC.ConfigurationSystem.Client.Helpers.Registry       import getVOForGroup, getVOOption
 from DIRAC.Core.Base.DB                                      import DB
+from DIRAC.Core.Utilities.List                               import breakListIntoChunks
 from DIRAC.Core.Security.CS                                  import getUsernameForDN, getDNForUsername
 from DIRAC.WorkloadManagementSystem.Client.JobState.JobManifest   import JobManifest
 
@@ -64,6 +75,9 @@ JOB_STATES = ['Received', 'Checking', 'Staging', 'Waiting', 'Matched',
               'Running', 'Stalled', 'Done', 'Completed', 'Failed']
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
 
+#Maximum number of job IDs in a single IN (...) condition
+JOB_LIST_CHUNK_SIZE = 1000
+
 JOB_DEPRECATED_ATTRIBUTES = [ 'UserPriority', 'SystemPriority' ]
 
 JOB_STATIC_ATTRIBUTES = [ 'JobID', 'JobType', 'DIRACSetup', 'JobGroup', 'JobSplitType', 'MasterJobID',
@@ -83,6 +97,11 @@ if DEBUG:
 #############################################################################
 class JobDB( DB ):
 
+  #Callables notified of the site mask changes done by any JobDB of the process
+  __siteMaskListeners = []
+  #Callables notified of the job commands stored by any JobDB of the process
+  __jobCommandListeners = []
+
   def __init__( self, maxQueueSize = 10 ):
     """ Standard Constructor
     """
@@ -108,17 +127,17 @@ class JobDB( DB ):
     if DEBUG:
       result = self.dumpParameters()
 
-  def _query( self, cmd, conn = False ):
+  def _query( self, cmd, conn = False, params = None ):
     start = time.time()
-    ret = DB._query( self, cmd, conn )
+    ret = DB._query( self, cmd, conn, params )
     if DEBUG:
       print >> gDebugFile, time.time() - start, cmd.replace( '\n', '' )
       gDebugFile.flush()
     return ret
 
-  def _update( self, cmd, conn = False ):
+  def _update( self, cmd, conn = False, params = None ):
     start = time.time()
-    ret = DB._update( self, cmd, conn )
+    ret = DB._update( self, cmd, conn, params )
     if DEBUG:
       print >> gDebugFile, time.time() - start, cmd.replace( '\n', '' )
       gDebugFile.flush()
@@ -269,17 +288,19 @@ class JobDB( DB ):
     else:
       attrNames = ','.join( [ str( x ) for x in self.jobAttributeNames ] )
       attr_tmp_list = self.jobAttributeNames
-    jobList = ','.join( [str( x ) for x in jobIDList] )
 
     # FIXME: need to check if the attributes are in the list of job Attributes
 
-    cmd = 'SELECT JobID,%s FROM Jobs WHERE JobID in ( %s )' % ( attrNames, jobList )
-    res = self._query( cmd )
-    if not res['OK']:
-      return res
+    rows = []
+    for jobList in self.__getJobListChunks( jobIDList ):
+      cmd = 'SELECT JobID,%s FROM Jobs WHERE JobID in ( %s )' % ( attrNames, jobList )
+      res = self._query( cmd )
+      if not res['OK']:
+        return res
+      rows.extend( res['Value'] )
     try:
       retDict = {}
-      for retValues in res['Value']:
+      for retValues in rows:
         jobID = retValues[0]
         jobDict = {}
         jobDict[ 'JobID' ] = jobID
@@ -294,6 +315,11 @@ class JobDB( DB ):
     except Exception, x:
       return S_ERROR( 'JobDB.getAttributesForJobList: Failed\n%s' % str( x ) )
 
+  def __getJobListChunks( self, jobIDList ):
+    """ Split the job IDs in comma separated strings small enough for an IN condition
+    """
+    return [ ','.join( [ str( int( jobID ) ) for jobID in chunk ] )
+             for chunk in breakListIntoChunks( list( jobIDList ), JOB_LIST_CHUNK_SIZE ) ]
 
 #############################################################################
   def getDistinctJobAttributes( self, attribute, condDict = None, older = None,
@@ -361,6 +387,40 @@ class JobDB( DB ):
 
         return S_OK( resultDict )
 
+#############################################################################
+  def getParametersForJobList( self, jobIDList, paramList = None ):
+    """ Get Job Parameters for the jobs in the jobIDList.
+        Returns an S_OK structure with a dictionary of dictionaries as its Value:
+        ValueDict[jobID][parameter_name] = parameter_value
+        If paramList is empty - all the parameters are returned.
+    """
+    return self.__getNameValuesForJobList( 'JobParameters', jobIDList, paramList )
+
+  def __getNameValuesForJobList( self, table, jobIDList, nameList = None ):
+    """ Get the Name/Value pairs of table for the jobs in the jobIDList
+    """
+    if not jobIDList:
+      return S_OK( {} )
+    nameCond = ''
+    if nameList:
+      ret = self._escapeValues( nameList )
+      if not ret['OK']:
+        return ret
+      nameCond = " and Name in (%s)" % ','.join( ret['Value'] )
+
+    resultDict = dict( [ ( int( jobID ), {} ) for jobID in jobIDList ] )
+    for jobList in self.__getJobListChunks( jobIDList ):
+      cmd = "SELECT JobID, Name, Value from %s WHERE JobID in (%s)%s" % ( table, jobList, nameCond )
+      result = self._query( cmd )
+      if not result['OK']:
+        return S_ERROR( 'JobDB: failed to retrieve %s' % table )
+      for jobID, name, value in result['Value']:
+        try:
+          resultDict[int( jobID )][name] = value.tostring()
+        except Exception:
+          resultDict[int( jobID )][name] = value
+    return S_OK( resultDict )
+
 #############################################################################
   def getAtticJobParameters( self, jobID, paramList = None, rescheduleCounter = -1 ):
     """ Get Attic Job Parameters defined for a job with jobID.
@@ -590,6 +650,14 @@ class JobDB( DB ):
     else:
       return S_ERROR( 'JobDB.getJobOptParameters: failed to retrieve parameters' )
 
+#############################################################################
+  def getOptParametersForJobList( self, jobIDList, paramList = None ):
+    """ Get optimizer parameters for the jobs in the jobIDList.
+        Returns an S_OK structure with a dictionary of dictionaries as its Value:
+        ValueDict[jobID][parameter_name] = parameter_value
+    """
+    return self.__getNameValuesForJobList( 'OptimizerParameters', jobIDList, paramList )
+
 #############################################################################
   def getTimings( self, site, period = 3600 ):
     """ Get CPU and wall clock times for the jobs finished in the last hour
@@ -772,27 +840,19 @@ class JobDB( DB ):
         The LastUpdate time stamp is refreshed if explicitly requested
     """
 
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
-    ret = self._escapeString( attrValue )
-    if not ret['OK']:
-      return ret
-    value = ret['Value']
-
     #FIXME: need to check the validity of attrName
 
     if update:
-      cmd = "UPDATE Jobs SET %s=%s,LastUpdateTime=UTC_TIMESTAMP() WHERE JobID=%s" % ( attrName, value, jobID )
+      cmd = "UPDATE Jobs SET %s=%%s,LastUpdateTime=UTC_TIMESTAMP() WHERE JobID=%%s" % attrName
     else:
-      cmd = "UPDATE Jobs SET %s=%s WHERE JobID=%s" % ( attrName, value, jobID )
+      cmd = "UPDATE Jobs SET %s=%%s WHERE JobID=%%s" % attrName
+    params = [ str( attrValue ), str( jobID ) ]
 
     if myDate:
-      cmd += ' AND LastUpdateTime < %s' % myDate
+      cmd += ' AND LastUpdateTime < %s'
+      params.append( str( myDate ) )
 
-    res = self._update( cmd )
+    res = self._update( cmd, params = tuple( params ) )
     if res['OK']:
       return res
     else:
@@ -804,33 +864,25 @@ class JobDB( DB ):
         The LastUpdate time stamp is refreshed if explicitely requested
     """
 
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
-
     if len( attrNames ) != len( attrValues ):
       return S_ERROR( 'JobDB.setAttributes: incompatible Argument length' )
 
     # FIXME: Need to check the validity of attrNames
-    attr = []
-    for i in range( len( attrNames ) ):
-      ret = self._escapeString( attrValues[i] )
-      if not ret['OK']:
-        return ret
-      value = ret['Value']
-      attr.append( "%s=%s" % ( attrNames[i], value ) )
+    attr = [ "%s=%%s" % attrName for attrName in attrNames ]
+    params = [ str( value ) for value in attrValues ]
     if update:
       attr.append( "LastUpdateTime=UTC_TIMESTAMP()" )
     if len( attr ) == 0:
       return S_ERROR( 'JobDB.setAttributes: Nothing to do' )
 
-    cmd = 'UPDATE Jobs SET %s WHERE JobID=%s' % ( ', '.join( attr ), jobID )
+    cmd = 'UPDATE Jobs SET %s WHERE JobID=%%s' % ', '.join( attr )
+    params.append( str( jobID ) )
 
     if myDate:
-      cmd += ' AND LastUpdateTime < %s' % myDate
+      cmd += ' AND LastUpdateTime < %s'
+      params.append( str( myDate ) )
 
-    res = self._update( cmd )
+    res = self._update( cmd, params = tuple( params ) )
     if res['OK']:
       return res
     else:
@@ -868,46 +920,65 @@ class JobDB( DB ):
     return S_OK()
 
 #############################################################################
-  def setEndExecTime( self, jobID, endDate = None ):
-    """ Set EndExecTime time stamp
+  def setJobsStatus( self, jobIDs, status = '', minor = '', application = '', appCounter = None, update = None ):
+    """ Set the same status to all the jobs in jobIDs with one UPDATE per chunk of jobs.
+        The LastUpdate time stamp is refreshed as in setJobStatus unless update says otherwise
     """
+    if update is None:
+      update = status != "Stalled"
 
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
+    attr = []
+    params = []
+    for attrName, attrValue in ( ( 'Status', status ), ( 'MinorStatus', minor ),
+                                 ( 'ApplicationStatus', application ),
+                                 ( 'ApplicationNumStatus', appCounter ) ):
+      if attrValue:
+        attr.append( "%s=%%s" % attrName )
+        params.append( str( attrValue ) )
+    if update:
+      attr.append( "LastUpdateTime=UTC_TIMESTAMP()" )
+    if not attr:
+      return S_ERROR( 'JobDB.setJobsStatus: Nothing to do' )
 
-    if endDate:
-      ret = self._escapeString( endDate )
-      if not ret['OK']:
-        return ret
-      endDate = ret['Value']
-      req = "UPDATE Jobs SET EndExecTime=%s WHERE JobID=%s AND EndExecTime IS NULL" % ( endDate, jobID )
-    else:
-      req = "UPDATE Jobs SET EndExecTime=UTC_TIMESTAMP() WHERE JobID=%s AND EndExecTime IS NULL" % jobID
-    result = self._update( req )
-    return result
+    for jobList in self.__getJobListChunks( jobIDs ):
+      cmd = 'UPDATE Jobs SET %s WHERE JobID IN ( %s )' % ( ', '.join( attr ), jobList )
+      result = self._update( cmd, params = tuple( params ) )
+      if not result['OK']:
+        return S_ERROR( 'JobDB.setJobsStatus: failed to set the status' )
 
- #############################################################################
-  def setStartExecTime( self, jobID, startDate = None ):
-    """ Set StartExecTime time stamp
+    return S_OK()
+
+#############################################################################
+  def __setExecTime( self, timeName, jobIDs, date ):
+    """ Set StartExecTime or EndExecTime of a job or a list of jobs if not set yet
     """
+    if type( jobIDs ) != type( [] ):
+      jobIDs = [ jobIDs ]
+    if date:
+      timeValue = '%s'
+      params = ( str( date ), )
+    else:
+      timeValue = 'UTC_TIMESTAMP()'
+      params = None
 
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    jobID = ret['Value']
+    for jobList in self.__getJobListChunks( jobIDs ):
+      req = "UPDATE Jobs SET %s=%s WHERE JobID IN ( %s ) AND %s IS NULL" % ( timeName, timeValue, jobList, timeName )
+      result = self._update( req, params = params )
+      if not result['OK']:
+        return result
+    return S_OK()
 
-    if startDate:
-      ret = self._escapeString( startDate )
-      if not ret['OK']:
-        return ret
-      startDate = ret['Value']
-      req = "UPDATE Jobs SET StartExecTime=%s WHERE JobID=%s AND StartExecTime IS NULL" % ( startDate, jobID )
-    else:
-      req = "UPDATE Jobs SET StartExecTime=UTC_TIMESTAMP() WHERE JobID=%s AND StartExecTime IS NULL" % jobID
-    result = self._update( req )
-    return result
+#############################################################################
+  def setEndExecTime( self, jobID, endDate = None ):
+    """ Set EndExecTime time stamp of a job or a list of jobs
+    """
+    return self.__setExecTime( 'EndExecTime', jobID, endDate )
+
+#############################################################################
+  def setStartExecTime( self, jobID, startDate = None ):
+    """ Set StartExecTime time stamp of a job or a list of jobs
+    """
+    return self.__setExecTime( 'StartExecTime', jobID, startDate )
 
 #############################################################################
   def setJobParameter_old( self, jobID, key, value ):
@@ -938,17 +1009,8 @@ class JobDB( DB ):
     """ Set a parameter specified by name,value pair for the job JobID
     """
 
-    ret = self._escapeString( key )
-    if not ret['OK']:
-      return ret
-    e_key = ret['Value']
-    ret = self._escapeString( value )
-    if not ret['OK']:
-      return ret
-    e_value = ret['Value']
-
-    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES (%d,%s,%s)' % ( int( jobID ), e_key, e_value )
-    result = self._update( cmd )
+    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES (%s,%s,%s)'
+    result = self._update( cmd, params = ( int( jobID ), str( key ), str( value ) ) )
     if not result['OK']:
       result = S_ERROR( 'JobDB.setJobParameter: operation failed.' )
 
@@ -1001,20 +1063,12 @@ class JobDB( DB ):
     if not parameters:
       return S_OK()
 
-    insertValueList = []
+    params = []
     for name, value in parameters:
-      ret = self._escapeString( name )
-      if not ret['OK']:
-        return ret
-      e_name = ret['Value']
-      ret = self._escapeString( value )
-      if not ret['OK']:
-        return ret
-      e_value = ret['Value']
-      insertValueList.append( '(%s,%s,%s)' % ( jobID, e_name, e_value ) )
+      params.extend( [ int( jobID ), str( name ), str( value ) ] )
 
-    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES %s' % ', '.join( insertValueList )
-    result = self._update( cmd )
+    cmd = 'REPLACE JobParameters (JobID,Name,Value) VALUES %s' % ', '.join( [ '(%s,%s,%s)' ] * len( parameters ) )
+    result = self._update( cmd, params = tuple( params ) )
     if not result['OK']:
       return S_ERROR( 'JobDB.setJobParameters: operation failed.' )
 
@@ -1219,6 +1273,26 @@ class JobDB( DB ):
     else:
       return result
 
+#############################################################################
+  def getJDLsForJobList( self, jobIDList, original = False ):
+    """ Get the JDLs of the jobs in the jobIDList. By default the current job JDL
+        is returned. If 'original' argument is True, original JDL is returned
+        Returns an S_OK structure with a dictionary ValueDict[jobID] = JDL
+    """
+    jdlDict = {}
+    if original:
+      field = 'OriginalJDL'
+    else:
+      field = 'JDL'
+    for jobList in self.__getJobListChunks( jobIDList ):
+      cmd = "SELECT JobID, %s FROM JobJDLs WHERE JobID in (%s)" % ( field, jobList )
+      result = self._query( cmd )
+      if not result['OK']:
+        return result
+      for jobID, jdl in result['Value']:
+        jdlDict[ int( jobID ) ] = jdl
+    return S_OK( jdlDict )
+
 #############################################################################
   def insertNewJobIntoDB( self, jdl, owner, ownerDN, ownerGroup, diracSetup ):
     """ Insert the initial JDL into the Job database,
@@ -1766,6 +1840,7 @@ class JobDB( DB ):
     """  Set the given site status to 'status' or add a new active site
     """
 
+    siteName = site
     result = self._escapeString( site )
     if not result['OK']:
       return result
@@ -1804,6 +1879,7 @@ class JobDB( DB ):
       result = self._update( req )
       if not result['OK']:
         return S_ERROR( 'Failed to update the Site Mask' )
+      self.__notifySiteMaskChange( siteName )
       # update the site mask logging record
       req = "INSERT INTO SiteMaskLogging VALUES (%s,%s,UTC_TIMESTAMP(),%s,%s)" % ( site, status, authorDN, comment )
       result = self._update( req )
@@ -1834,16 +1910,50 @@ class JobDB( DB ):
   def removeSiteFromMask( self, site ):
     """ Remove the given site from the mask
     """
+    siteName = site
     ret = self._escapeString( site )
     if not ret['OK']:
       return ret
     site = ret['Value']
 
-    if site == "All":
+    if siteName == "All":
       req = "DELETE FROM SiteMask"
     else:
       req = "DELETE FROM SiteMask WHERE Site=%s" % site
-    return self._update( req )
+    result = self._update( req )
+    if result['OK']:
+      self.__notifySiteMaskChange( siteName )
+    return result
+
+#############################################################################
+  def addSiteMaskListener( self, callback ):
+    """ Register a callable to be invoked with the site name ( or "All" ) every
+        time the site mask is changed by a JobDB of this process
+    """
+    if callback not in JobDB.__siteMaskListeners:
+      JobDB.__siteMaskListeners.append( callback )
+    return S_OK()
+
+  def getSiteMaskVersion( self ):
+    """ Get the number of changes of the site mask, done by any process
+    """
+    result = self._query( "SELECT Version FROM SiteMaskVersion WHERE Id=1" )
+    if not result['OK']:
+      return result
+    if not result['Value']:
+      return S_OK( 0 )
+    return S_OK( int( result['Value'][0][0] ) )
+
+  def __notifySiteMaskChange( self, site ):
+    result = self._update( "INSERT INTO SiteMaskVersion (Id,Version) VALUES (1,1) "
+                           "ON DUPLICATE KEY UPDATE Version=Version+1" )
+    if not result['OK']:
+      self.log.warn( "Cannot update the site mask version", result['Message'] )
+    for callback in JobDB.__siteMaskListeners:
+      try:
+        callback( site )
+      except Exception, excp:
+        self.log.exception( "Site mask listener failed", str( excp ) )
 
 #############################################################################
   def getSiteMaskLogging( self, siteList ):
@@ -2222,13 +2332,8 @@ class JobDB( DB ):
     """
 
     # Set the time stamp first
-    ret = self._escapeString( jobID )
-    if not ret['OK']:
-      return ret
-    e_jobID = ret['Value']
-
-    req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), Status='Running' WHERE JobID=%s" % e_jobID
-    result = self._update( req )
+    req = "UPDATE Jobs SET HeartBeatTime=UTC_TIMESTAMP(), Status='Running' WHERE JobID=%s"
+    result = self._update( req, params = ( int( jobID ), ) )
     if not result['OK']:
       return S_ERROR( 'Failed to set the heart beat time: ' + result['Message'] )
 
@@ -2243,25 +2348,17 @@ class JobDB( DB ):
     # Add dynamic data to the job heart beat log
     # start = time.time()
     valueList = []
+    params = []
     for key, value in dynamicDataDict.items():
-      result = self._escapeString( key )
-      if not result['OK']:
-        self.log.warn( 'Failed to escape string ' + key )
-        continue
-      e_key = result['Value']
-      result = self._escapeString( value )
-      if not result['OK']:
-        self.log.warn( 'Failed to escape string ' + value )
-        continue
-      e_value = result['Value']
-      valueList.append( "( %s, %s,%s,UTC_TIMESTAMP())" % ( e_jobID, e_key, e_value ) )
+      valueList.append( "( %s, %s, %s, UTC_TIMESTAMP() )" )
+      params.extend( [ int( jobID ), str( key ), str( value ) ] )
 
     if valueList:
 
       valueString = ','.join( valueList )
       req = "INSERT INTO HeartBeatLoggingInfo (JobID,Name,Value,HeartBeatTime) VALUES "
       req += valueString
-      result = self._update( req )
+      result = self._update( req, params = tuple( params ) )
       if not result['OK']:
         ok = False
         self.log.warn( result['Message'] )
@@ -2273,6 +2370,50 @@ class JobDB( DB ):
     else:
       return S_ERROR( 'Failed to store some or all the parameters' )
 
+#####################################################################################
+  def setHeartBeatDataForJobs( self, heartBeatDict ):
+    """ Store the heart beat data of many jobs at once. heartBeatDict is
+        { jobID : ( heartBeatTime, staticDataDict, [ ( name, value, time ) ] ) }
+        Stalled and Matched jobs are set back to Running like in setHeartBeatData
+        Everything is written in one transaction, so a failed call can be retried
+        without duplicating the HeartBeatLoggingInfo rows
+    """
+    cmdList = []
+    staticRows = []
+    dynamicRows = []
+    for jobList in breakListIntoChunks( heartBeatDict.keys(), JOB_LIST_CHUNK_SIZE ):
+      params = []
+      for jobID in jobList:
+        params.extend( [ int( jobID ), heartBeatDict[ jobID ][0] ] )
+      params.extend( [ int( jobID ) for jobID in jobList ] )
+      req = "UPDATE Jobs SET HeartBeatTime = CASE JobID %s END, " % ' '.join( [ 'WHEN %s THEN %s' ] * len( jobList ) )
+      req += "Status = IF( Status IN ( 'Stalled', 'Matched' ), 'Running', Status ) "
+      req += "WHERE JobID IN ( %s )" % ','.join( [ '%s' ] * len( jobList ) )
+      cmdList.append( ( req, tuple( params ) ) )
+      for jobID in jobList:
+        heartBeatTime, staticDataDict, dynamicDataList = heartBeatDict[ jobID ]
+        for key, value in staticDataDict.items():
+          staticRows.append( ( int( jobID ), str( key ), str( value ) ) )
+        for key, value, dataTime in dynamicDataList:
+          dynamicRows.append( ( int( jobID ), str( key ), str( value ), dataTime ) )
+
+    # FIXME: It is rather not optimal to use parameters to store the heartbeat info, must find a proper solution
+    for rowList in breakListIntoChunks( staticRows, JOB_LIST_CHUNK_SIZE ):
+      req = "INSERT INTO JobParameters (JobID,Name,Value) VALUES %s " % ','.join( [ '(%s,%s,%s)' ] * len( rowList ) )
+      req += "ON DUPLICATE KEY UPDATE Value=VALUES(Value)"
+      cmdList.append( ( req, tuple( [ field for row in rowList for field in row ] ) ) )
+    for rowList in breakListIntoChunks( dynamicRows, JOB_LIST_CHUNK_SIZE ):
+      req = "INSERT INTO HeartBeatLoggingInfo (JobID,Name,Value,HeartBeatTime) VALUES %s" % \
+            ','.join( [ '(%s,%s,%s,%s)' ] * len( rowList ) )
+      cmdList.append( ( req, tuple( [ field for row in rowList for field in row ] ) ) )
+
+    if not cmdList:
+      return S_OK()
+    result = self._transaction( cmdList )
+    if not result['OK']:
+      return S_ERROR( 'Failed to store the heart beat data: ' + result['Message'] )
+    return S_OK()
+
 #####################################################################################
   def getHeartBeatData( self, jobID ):
     """ Retrieve the job's heart beat data
@@ -2302,6 +2443,7 @@ class JobDB( DB ):
     """ Store a command to be passed to the job together with the
         next heart beat
     """
+    commandTuple = ( int( jobID ), command, arguments or '' )
     ret = self._escapeString( jobID )
     if not ret['OK']:
       return ret
@@ -2323,8 +2465,36 @@ class JobDB( DB ):
     req = "INSERT INTO JobCommands (JobID,Command,Arguments,ReceptionTime) "
     req += "VALUES (%s,%s,%s,UTC_TIMESTAMP())" % ( jobID, command, arguments )
     result = self._update( req )
+    if result['OK']:
+      for callback in JobDB.__jobCommandListeners:
+        try:
+          callback( *commandTuple )
+        except Exception, excp:
+          self.log.exception( "Job command listener failed", str( excp ) )
     return result
 
+#####################################################################################
+  def addJobCommandListener( self, callback ):
+    """ Register a callable to be invoked with ( jobID, command, arguments ) every
+        time a job command is stored by a JobDB of this process
+    """
+    if callback not in JobDB.__jobCommandListeners:
+      JobDB.__jobCommandListeners.append( callback )
+    return S_OK()
+
+#####################################################################################
+  def getPendingJobCommands( self ):
+    """ Get the commands not yet passed to their jobs
+        Returns S_OK( { jobID : { command : arguments } } )
+    """
+    result = self._query( "SELECT JobID, Command, Arguments FROM JobCommands WHERE Status='Received'" )
+    if not result['OK']:
+      return result
+    resultDict = {}
+    for jobID, command, arguments in result['Value']:
+      resultDict.setdefault( int( jobID ), {} )[ command ] = arguments
+    return S_OK( resultDict )
+
  #####################################################################################
   def getJobCommand( self, jobID, status = 'Received' ):
     """ Get a command to be passed to the job together with the
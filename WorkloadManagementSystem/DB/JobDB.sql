@@ -173,6 +173,14 @@ CREATE TABLE SiteMask (
     PRIMARY KEY (Site)
 );
 
+-- Incremented at every change of the mask, the processes caching the mask check it
+DROP TABLE IF EXISTS SiteMaskVersion;
+CREATE TABLE SiteMaskVersion (
+    Id INTEGER NOT NULL,
+    Version INTEGER UNSIGNED NOT NULL,
+    PRIMARY KEY (Id)
+);
+
 DROP TABLE IF EXISTS SiteMaskLogging;
 CREATE TABLE SiteMaskLogging (
     Site   VARCHAR(64) NOT NULL,
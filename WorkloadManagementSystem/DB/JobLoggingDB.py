@@ -5,6 +5,7 @@
     The following methods are provided
 
     addLoggingRecord()
+    addLoggingRecords()
     getJobLoggingInfo()
     getWMSTimeStamps()    
 """    
@@ -54,6 +55,19 @@ class JobLoggingDB(DB):
     event = 'status/minor/app=%s/%s/%s' % (status,minor,application)
     self.gLogger.info("Adding record for job "+str(jobID)+": '"+event+"' from "+source)
   
+    _date, time_order = self.__getStatusTime( date )
+
+    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
+           (int(jobID),status,minor,application,str(_date),time_order,source)
+            
+    return self._update( cmd )
+    
+#############################################################################
+  def __getStatusTime( self, date ):
+    """ Get the datetime and the ordering number of a logging record from the
+        date provided, or from the current UTC time if none is given
+    """
     if not date:
       # Make the UTC datetime string and float
       _date = Time.dateTime()
@@ -79,14 +93,44 @@ class JobLoggingDB(DB):
         self.gLogger.exception('Exception while date evaluation')
         _date = Time.dateTime()
         epoc = time.mktime(_date.timetuple()) - MAGIC_EPOC_NUMBER
-        time_order = round(epoc,3)     
+        time_order = round(epoc,3)
+    return _date, time_order
+
+#############################################################################
+  def addLoggingRecords( self, records ):
+    """ Add several entries to the JobLoggingDB table with multi-row inserts.
+        records is a list of ( jobID, status, minor, application, date, source )
+        tuples with the same meaning as the addLoggingRecord arguments
+    """
+    if not records:
+      return S_OK( 0 )
+    self.gLogger.info( "Adding %s logging records" % len( records ) )
+    stringValues = []
+    timeOrders = []
+    for jobID, status, minor, application, date, source in records:
+      _date, time_order = self.__getStatusTime( date )
+      stringValues.extend( [ status, minor, application, str( _date ), source ] )
+      timeOrders.append( time_order )
+    result = self._escapeValues( stringValues )
+    if not result['OK']:
+      return result
+    stringValues = result['Value']
+    rows = []
+    for i in range( len( records ) ):
+      status, minor, application, _date, source = stringValues[ 5 * i : 5 * i + 5 ]
+      rows.append( "(%d,%s,%s,%s,%s,%f,%s)" % ( int( records[i][0] ), status, minor, application,
+                                                _date, timeOrders[i], source ) )
+
+    inserted = 0
+    for i in range( 0, len( rows ), 1000 ):
+      cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
+            "StatusTime, StatusTimeOrder, StatusSource) VALUES " + ",".join( rows[ i : i + 1000 ] )
+      result = self._update( cmd )
+      if not result['OK']:
+        return result
+      inserted += result['Value']
+    return S_OK( inserted )
 
-    cmd = "INSERT INTO LoggingInfo (JobId, Status, MinorStatus, ApplicationStatus, " + \
-          "StatusTime, StatusTimeOrder, StatusSource) VALUES (%d,'%s','%s','%s','%s',%f,'%s')" % \
-           (int(jobID),status,minor,application,str(_date),time_order,source)
-            
-    return self._update( cmd )
-    
 #############################################################################
   def getJobLoggingInfo(self, jobID):
     """ Returns a Status,MinorStatus,ApplicationStatus,StatusTime,StatusSource tuple 
@@ -23,6 +23,7 @@ class SandboxMetadataDB(DB):
       raise RuntimeError( "Can't create tables: %s" % result[ 'Message' ] )
     self.__assignedSBGraceDays = 0
     self.__unassignedSBGraceDays = 15
+    self.__unusedChunkGraceDays = 1
 
   def __initializeDB(self):
     """
@@ -71,6 +72,23 @@ class SandboxMetadataDB(DB):
                                               'UniqueIndexes' : { 'Mapping' : [ 'SBId', 'EntitySetup', 'EntityId', 'Type' ] }
                                            }
 
+    self.__tablesDesc[ 'sb_Chunks' ] = { 'Fields' : { 'ChunkId' : 'INTEGER UNSIGNED AUTO_INCREMENT NOT NULL',
+                                                      'OwnerId' : 'INTEGER UNSIGNED NOT NULL',
+                                                      'Hash' : 'CHAR(32) NOT NULL',
+                                                      'Bytes' : 'BIGINT NOT NULL DEFAULT 0',
+                                                      'RegistrationTime' : 'DATETIME NOT NULL',
+                                                    },
+                                         'PrimaryKey' : 'ChunkId',
+                                         'UniqueIndexes' : { 'OwnerHash' : [ 'OwnerId', 'Hash' ] }
+                                       }
+
+    self.__tablesDesc[ 'sb_SandBoxChunks' ] = { 'Fields' : { 'SBId' : 'INTEGER UNSIGNED NOT NULL',
+                                                             'ChunkId' : 'INTEGER UNSIGNED NOT NULL',
+                                                           },
+                                                'Indexes': { 'ChunkIndex' : [ 'ChunkId' ] },
+                                                'UniqueIndexes' : { 'Mapping' : [ 'SBId', 'ChunkId' ] }
+                                              }
+
     for tableName in self.__tablesDesc:
       if not tableName in tablesInDB:
         tablesToCreate[ tableName ] = self.__tablesDesc[ tableName ]
@@ -319,7 +337,7 @@ class SandboxMetadataDB(DB):
     Delete sandboxes
     """
     sqlSBList = ", ".join( [ str(sbid) for sbid in SBIdList ] )
-    for table in ( 'sb_SandBoxes', 'sb_EntityMapping' ):
+    for table in ( 'sb_SandBoxes', 'sb_EntityMapping', 'sb_SandBoxChunks' ):
       sqlCmd = "DELETE FROM `%s` WHERE SBId IN ( %s )" % ( table, sqlSBList )
       result = self._update( sqlCmd )
       if not result[ 'OK' ]:
@@ -360,3 +378,64 @@ class SandboxMetadataDB(DB):
     if len( data ) == 0:
       return S_ERROR( "No sandbox matches the requirements" )
     return S_OK( data[0][0] )
+
+  ##################
+  # Chunks of content addressed sandboxes
+
+  def registerChunk( self, ownerId, chunkHash, size ):
+    """
+    Register a chunk stored for an owner
+    """
+    sqlCmd = "INSERT INTO `sb_Chunks` ( OwnerId, Hash, Bytes, RegistrationTime ) VALUES ( %s, %s, %s, UTC_TIMESTAMP() )"
+    sqlCmd += " ON DUPLICATE KEY UPDATE Bytes=VALUES(Bytes), RegistrationTime=UTC_TIMESTAMP()"
+    return self._update( sqlCmd, params = ( int( ownerId ), chunkHash, int( size ) ) )
+
+  def getMissingChunks( self, ownerId, hashList ):
+    """
+    Get the hashes in hashList that are not stored for the owner. The registration
+    time of the ones stored is refreshed so they are not purged before being used
+    """
+    hashList = List.uniqueElements( hashList )
+    if not hashList:
+      return S_OK( [] )
+    sqlCond = "OwnerId=%%s AND Hash IN ( %s )" % ", ".join( [ "%s" ] * len( hashList ) )
+    params = tuple( [ int( ownerId ) ] + hashList )
+    result = self._update( "UPDATE `sb_Chunks` SET RegistrationTime=UTC_TIMESTAMP() WHERE %s" % sqlCond, params = params )
+    if not result[ 'OK' ]:
+      return result
+    result = self._query( "SELECT Hash, Bytes FROM `sb_Chunks` WHERE %s" % sqlCond, params = params )
+    if not result[ 'OK' ]:
+      return result
+    stored = dict( [ ( row[0], row[1] ) for row in result[ 'Value' ] ] )
+    result = S_OK( [ chunkHash for chunkHash in hashList if chunkHash not in stored ] )
+    #Stored bytes of the chunks found
+    result[ 'Bytes' ] = stored
+    return result
+
+  def assignChunksToSandbox( self, sbId, ownerId, hashList ):
+    """
+    Record that the sandbox is made of the owner chunks in hashList
+    """
+    hashList = List.uniqueElements( hashList )
+    if not hashList:
+      return S_OK( 0 )
+    sqlCmd = "INSERT IGNORE INTO `sb_SandBoxChunks` ( SBId, ChunkId ) SELECT %%s, ChunkId FROM `sb_Chunks`"
+    sqlCmd += " WHERE OwnerId=%%s AND Hash IN ( %s )" % ", ".join( [ "%s" ] * len( hashList ) )
+    return self._update( sqlCmd, params = tuple( [ int( sbId ), int( ownerId ) ] + hashList ) )
+
+  def getUnusedChunks( self ):
+    """
+    Get chunks not used by any sandbox for a while
+    """
+    sqlCmd = "SELECT ChunkId, OwnerId, Hash FROM `sb_Chunks` WHERE ChunkId NOT IN ( SELECT ChunkId FROM `sb_SandBoxChunks` )"
+    sqlCmd += " AND TIMESTAMPDIFF( DAY, RegistrationTime, UTC_TIMESTAMP() ) >= %d" % self.__unusedChunkGraceDays
+    return self._query( sqlCmd )
+
+  def deleteChunks( self, chunkIdList ):
+    """
+    Delete chunks
+    """
+    if not chunkIdList:
+      return S_OK()
+    sqlCmd = "DELETE FROM `sb_Chunks` WHERE ChunkId IN ( %s )" % ", ".join( [ str( int( chunkId ) ) for chunkId in chunkIdList ] )
+    return self._update( sqlCmd )
@@ -413,11 +413,12 @@ class TaskQueueDB( DB ):
         return S_ERROR( "Can't insert job: %s" % result[ 'Message' ] )
       connObj = result[ 'Value' ]
     if checkTQExists:
-      result = self._query( "SELECT tqId FROM `tq_TaskQueues` WHERE TQId = %s" % tqId, conn = connObj )
+      result = self._query( "SELECT tqId FROM `tq_TaskQueues` WHERE TQId = %s", conn = connObj, params = ( tqId, ) )
       if not result[ 'OK' ] or len ( result[ 'Value' ] ) == 0:
         return S_OK( "Can't find task queue with id %s: %s" % ( tqId, result[ 'Message' ] ) )
     hackedPriority = self.__hackJobPriority( jobPriority )
-    return self._update( "INSERT INTO tq_Jobs ( TQId, JobId, Priority, RealPriority ) VALUES ( %s, %s, %s, %f )" % ( tqId, jobId, jobPriority, hackedPriority ), conn = connObj )
+    return self._update( "INSERT INTO tq_Jobs ( TQId, JobId, Priority, RealPriority ) VALUES ( %s, %s, %s, %s )",
+                         conn = connObj, params = ( tqId, jobId, jobPriority, hackedPriority ) )
 
   def findTaskQueue( self, tqDefDict, skipDefinitionCheck = False, connObj = False ):
     """
@@ -677,13 +678,27 @@ class TaskQueueDB( DB ):
     if not data:
       return S_OK( False )
     tqId, tqOwnerDN, tqOwnerGroup = data[0]
-    retVal = self._update( "DELETE FROM `tq_Jobs` WHERE JobId = %s" % jobId, conn = connObj )
+    return self.extractJobFromTaskQueue( jobId, tqId, tqOwnerDN, tqOwnerGroup, connObj = connObj )
+
+  def extractJobFromTaskQueue( self, jobId, tqId, tqOwnerDN, tqOwnerGroup, deleteTQIfEmpty = True, connObj = False ):
+    """
+    Atomically take a job out of a known task queue
+    Only one of the concurrent callers for the same job gets S_OK( True )
+    Return S_OK( True/False ) / S_ERROR
+    """
+    if not connObj:
+      retVal = self._getConnection()
+      if not retVal[ 'OK' ]:
+        return S_ERROR( "Can't delete job: %s" % retVal[ 'Message' ] )
+      connObj = retVal[ 'Value' ]
+    retVal = self._update( "DELETE FROM `tq_Jobs` WHERE JobId = %s", conn = connObj, params = ( jobId, ) )
     if not retVal[ 'OK' ]:
       return S_ERROR( "Could not delete job from task queue %s: %s" % ( jobId, retVal[ 'Message' ] ) )
-    result = retVal[ 'Value' ]
     if retVal[ 'Value' ] == 0:
       #No job deleted
       return S_OK( False )
+    if not deleteTQIfEmpty:
+      return S_OK( True )
     retries = 10
     #Always return S_OK() because job has already been taken out from the TQ
     while retries:
@@ -698,6 +713,68 @@ class TaskQueueDB( DB ):
     self.log.error( "Max retries when trying to delete TQ %s triggered by deletion of job %s" % ( tqId, jobId ) )
     return S_OK( True )
 
+  def getTaskQueuesState( self, connObj = False ):
+    """
+    Get the single value fields, priority and state of all the task queues
+    together with a ( numJobs, maxJobId, sumPriorities ) signature of their jobs
+    Return S_OK( { tqId : tqDict } ) / S_ERROR
+    """
+    sqlFields = [ 'TQId', 'Priority', 'Enabled' ] + list( self.__singleValueDefFields )
+    retVal = self._query( "SELECT %s FROM `tq_TaskQueues`" % ", ".join( sqlFields ), conn = connObj )
+    if not retVal[ 'OK' ]:
+      return S_ERROR( "Can't retrieve task queues state: %s" % retVal[ 'Message' ] )
+    tqData = {}
+    for record in retVal[ 'Value' ]:
+      tqDict = dict( zip( sqlFields, record ) )
+      tqDict[ 'Enabled' ] = bool( tqDict[ 'Enabled' ] )
+      tqDict[ 'JobsSignature' ] = ( 0, 0, 0 )
+      tqData[ tqDict[ 'TQId' ] ] = tqDict
+    retVal = self._query( "SELECT TQId, COUNT( JobId ), MAX( JobId ), SUM( Priority ) FROM `tq_Jobs` GROUP BY TQId",
+                          conn = connObj )
+    if not retVal[ 'OK' ]:
+      return S_ERROR( "Can't retrieve task queues state: %s" % retVal[ 'Message' ] )
+    for tqId, numJobs, maxJobId, sumPrio in retVal[ 'Value' ]:
+      if tqId in tqData:
+        tqData[ tqId ][ 'JobsSignature' ] = ( int( numJobs ), int( maxJobId ), int( sumPrio ) )
+    return S_OK( tqData )
+
+  def getTaskQueuesMultiValues( self, tqIdList, connObj = False ):
+    """
+    Get the multi value fields of the given task queues
+    Return S_OK( { tqId : { field : [ values ] } } ) / S_ERROR
+    """
+    tqData = dict( [ ( tqId, {} ) for tqId in tqIdList ] )
+    if not tqIdList:
+      return S_OK( tqData )
+    tqIdString = ", ".join( [ str( tqId ) for tqId in tqIdList ] )
+    for field in self.__multiValueDefFields:
+      retVal = self._query( "SELECT TQId, Value FROM `tq_TQTo%s` WHERE TQId in ( %s )" % ( field, tqIdString ),
+                            conn = connObj )
+      if not retVal[ 'OK' ]:
+        return S_ERROR( "Can't retrieve task queues field %s info: %s" % ( field, retVal[ 'Message' ] ) )
+      for tqId, value in retVal[ 'Value' ]:
+        if field not in tqData[ tqId ]:
+          tqData[ tqId ][ field ] = []
+        tqData[ tqId ][ field ].append( value )
+    return S_OK( tqData )
+
+  def getJobsInTaskQueues( self, tqIdList, connObj = False ):
+    """
+    Get the jobs waiting in the given task queues
+    Return S_OK( { tqId : [ ( jobId, priority, realPriority ) ] } ) / S_ERROR
+    """
+    tqData = dict( [ ( tqId, [] ) for tqId in tqIdList ] )
+    if not tqIdList:
+      return S_OK( tqData )
+    tqIdString = ", ".join( [ str( tqId ) for tqId in tqIdList ] )
+    retVal = self._query( "SELECT TQId, JobId, Priority, RealPriority FROM `tq_Jobs` WHERE TQId in ( %s )" % tqIdString,
+                          conn = connObj )
+    if not retVal[ 'OK' ]:
+      return S_ERROR( "Can't retrieve jobs in task queues: %s" % retVal[ 'Message' ] )
+    for tqId, jobId, priority, realPriority in retVal[ 'Value' ]:
+      tqData[ tqId ].append( ( int( jobId ), int( priority ), float( realPriority ) ) )
+    return S_OK( tqData )
+
   def getTaskQueueForJob( self, jobId, connObj = False ):
     """
     Return TaskQueue for a given Job
@@ -709,7 +786,7 @@ class TaskQueueDB( DB ):
         return S_ERROR( "Can't get TQ for job: %s" % retVal[ 'Message' ] )
       connObj = retVal[ 'Value' ]
 
-    retVal = self._query( 'SELECT TQId FROM `tq_Jobs` WHERE JobId = %s ' % jobId, conn = connObj )
+    retVal = self._query( 'SELECT TQId FROM `tq_Jobs` WHERE JobId = %s ', conn = connObj, params = ( jobId, ) )
 
     if not retVal[ 'OK' ]:
       return retVal
@@ -745,7 +822,7 @@ class TaskQueueDB( DB ):
     return S_OK( resultDict )
 
   def __getOwnerForTaskQueue( self, tqId, connObj = False ):
-    retVal = self._query( "SELECT OwnerDN, OwnerGroup from `tq_TaskQueues` WHERE TQId=%s" % tqId, conn = connObj )
+    retVal = self._query( "SELECT OwnerDN, OwnerGroup from `tq_TaskQueues` WHERE TQId=%s", conn = connObj, params = ( tqId, ) )
     if not retVal[ 'OK' ]:
       return retVal
     data = retVal[ 'Value' ]
@@ -770,15 +847,15 @@ class TaskQueueDB( DB ):
       if not data:
         return S_OK( False )
       tqOwnerDN, tqOwnerGroup = data
-    sqlCmd = "DELETE FROM `tq_TaskQueues` WHERE Enabled AND `tq_TaskQueues`.TQId = %s" % tqId
+    sqlCmd = "DELETE FROM `tq_TaskQueues` WHERE Enabled AND `tq_TaskQueues`.TQId = %s"
     sqlCmd = "%s AND `tq_TaskQueues`.TQId not in ( SELECT DISTINCT TQId from `tq_Jobs` )" % sqlCmd
-    retVal = self._update( sqlCmd, conn = connObj )
+    retVal = self._update( sqlCmd, conn = connObj, params = ( tqId, ) )
     if not retVal[ 'OK' ]:
       return S_ERROR( "Could not delete task queue %s: %s" % ( tqId, retVal[ 'Message' ] ) )
     delTQ = retVal[ 'Value' ]
     if delTQ > 0:
       for mvField in self.__multiValueDefFields:
-        retVal = self._update( "DELETE FROM `tq_TQTo%s` WHERE TQId = %s" % ( mvField, tqId ), conn = connObj )
+        retVal = self._update( "DELETE FROM `tq_TQTo%s` WHERE TQId = %%s" % mvField, conn = connObj, params = ( tqId, ) )
         if not retVal[ 'OK' ]:
           return retVal
       self.recalculateTQSharesForEntity( tqOwnerDN, tqOwnerGroup, connObj = connObj )
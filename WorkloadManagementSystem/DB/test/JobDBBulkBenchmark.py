@@ -0,0 +1,94 @@
+########################################################################
+# $HeadURL $
+# File: JobDBBulkBenchmark.py
+########################################################################
+
+""" :mod: JobDBBulkBenchmark
+    ========================
+
+    .. module: JobDBBulkBenchmark
+    :synopsis: compare per job and bulk reads of the JobDB
+
+    Reads attributes, parameters and optimizer parameters of up to 10k jobs
+    one job at a time and with the ...ForJobList methods. It needs a JobDB
+    configured on a local MySQL instance; jobs are created in it if there are
+    not enough already.
+
+    Usage: python JobDBBulkBenchmark.py [numJobs]
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import sys
+import time
+from DIRAC.Core.Base.Script import parseCommandLine
+parseCommandLine()
+## SUT
+from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
+
+JDL = """[
+  Executable = "/bin/true";
+  JobName = "JobDBBulkBenchmark";
+  JobType = "User";
+  CPUTime = 3600;
+]"""
+
+ATTRIBUTES = [ 'Status', 'MinorStatus', 'Site', 'HeartBeatTime', 'LastUpdateTime' ]
+PARAMETERS = [ 'Pilot_Reference', 'CPUNormalizationFactor' ]
+
+def createJobs( jobDB, numJobs ):
+  """ insert numJobs jobs with some parameters """
+  jobIDs = []
+  for i in range( numJobs ):
+    result = jobDB.insertNewJobIntoDB( JDL, 'benchmark', '/DC=benchmark/CN=benchmark', 'user', 'Benchmark' )
+    if not result[ 'OK' ]:
+      print "Cannot create jobs: %s" % result[ 'Message' ]
+      sys.exit( 1 )
+    jobID = result[ 'JobID' ]
+    jobDB.setJobParameters( jobID, [ ( 'Pilot_Reference', 'https://pilot/%s' % jobID ),
+                                     ( 'CPUNormalizationFactor', '10.0' ) ] )
+    jobDB.setJobOptParameter( jobID, 'BenchmarkOptimizer', str( { 'Value' : jobID } ) )
+    jobIDs.append( jobID )
+  return jobIDs
+
+def timeIt( name, func, *args ):
+  start = time.time()
+  func( *args )
+  elapsed = time.time() - start
+  print "  %-40s %8.3f s" % ( name, elapsed )
+  return elapsed
+
+def perJob( method, jobIDs, *args ):
+  for jobID in jobIDs:
+    result = method( jobID, *args )
+    if not result[ 'OK' ]:
+      raise RuntimeError( result[ 'Message' ] )
+
+def bulk( method, jobIDs, *args ):
+  result = method( jobIDs, *args )
+  if not result[ 'OK' ]:
+    raise RuntimeError( result[ 'Message' ] )
+
+if __name__ == "__main__":
+  numJobs = 10000
+  if len( sys.argv ) > 1:
+    numJobs = int( sys.argv[1] )
+  jobDB = JobDB()
+  result = jobDB.selectJobs( { 'Owner' : 'benchmark' }, limit = numJobs )
+  if not result[ 'OK' ]:
+    print "Cannot select jobs: %s" % result[ 'Message' ]
+    sys.exit( 1 )
+  jobIDs = result[ 'Value' ]
+  if len( jobIDs ) < numJobs:
+    print "Creating %s jobs" % ( numJobs - len( jobIDs ) )
+    jobIDs.extend( createJobs( jobDB, numJobs - len( jobIDs ) ) )
+
+  print "Reading %s jobs" % len( jobIDs )
+  for name, single, multiple, args in ( ( "attributes", jobDB.getJobAttributes, jobDB.getAttributesForJobList, ATTRIBUTES ),
+                                        ( "parameters", jobDB.getJobParameters, jobDB.getParametersForJobList, PARAMETERS ),
+                                        ( "optimizer parameters", jobDB.getJobOptParameters,
+                                          jobDB.getOptParametersForJobList, None ) ):
+    perJobTime = timeIt( "%s, per job" % name, perJob, single, jobIDs, args )
+    bulkTime = timeIt( "%s, bulk" % name, bulk, multiple, jobIDs, args )
+    print "  %-40s %8.1f" % ( "speedup", perJobTime / max( bulkTime, 10 ** -6 ) )
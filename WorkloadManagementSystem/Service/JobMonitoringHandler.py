@@ -414,6 +414,14 @@ class JobMonitoringHandler( RequestHandler ):
   def export_getJobParameters( self, jobID ):
     return jobDB.getJobParameters( jobID )
   
+##############################################################################
+  types_getJobsParameters = [ ListType, ListType ]
+  def export_getJobsParameters( self, jobIDs, parameters ):
+    """ Get the given parameters of the jobs in a single call.
+        All the parameters are returned if the parameter list is empty
+    """
+    return jobDB.getParametersForJobList( jobIDs, parameters )
+
 ##############################################################################
   types_getAtticJobParameters = [ [IntType,LongType] ]
   def export_getAtticJobParameters( self,jobID,parameters=[],rescheduleCycle=-1 ):
@@ -424,6 +432,17 @@ class JobMonitoringHandler( RequestHandler ):
   def export_getJobAttributes( self, jobID ):
     return jobDB.getJobAttributes( jobID )
 
+##############################################################################
+  types_getJobsAttributes = [ ListType, ListType ]
+  def export_getJobsAttributes( self, jobIDs, attributes ):
+    """ Get the given attributes of the jobs in a single call.
+        All the attributes are returned if the attribute list is empty
+    """
+    for attribute in attributes:
+      if attribute not in jobDB.jobAttributeNames:
+        return S_ERROR( "Unknown job attribute %s" % attribute )
+    return jobDB.getAttributesForJobList( jobIDs, attributes )
+
 ##############################################################################
   types_getSiteSummary = [ ]
   def export_getSiteSummary( self ):
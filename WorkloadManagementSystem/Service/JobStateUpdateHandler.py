@@ -13,15 +13,26 @@
 
 __RCSID__ = "$Id$"
 
+import os
+import threading
 from types import *
 from DIRAC.Core.DISET.RequestHandler import RequestHandler
-from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC import gLogger, gConfig, S_OK, S_ERROR, rootPath
+from DIRAC.Core.Utilities.ThreadScheduler import gThreadScheduler
 from DIRAC.WorkloadManagementSystem.DB.JobDB import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB import JobLoggingDB
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
 
 # This is a global instance of the JobDB class
 jobDB = False
 logDB = False
+# Heart beats waiting to be written to the JobDB
+gHeartBeatBuffer = False
+# Commands waiting for the next heart beat of their job { jobID : { command : arguments } }
+gJobCommands = {}
+gJobCommandsLock = threading.Lock()
+# Commands added and sent while a refresh reads the JobDB [ ( jobID, { command : arguments }, sent ) ]
+gJobCommandsChanges = None
 
 JOB_FINAL_STATES = ['Done', 'Completed', 'Failed']
 
@@ -29,10 +40,88 @@ def initializeJobStateUpdateHandler( serviceInfo ):
 
   global jobDB
   global logDB
+  global gHeartBeatBuffer
   jobDB = JobDB()
   logDB = JobLoggingDB()
+
+  flushTime = gConfig.getValue( "%s/HeartBeatFlushTime" % serviceInfo['serviceSectionPath'], 30 )
+  if flushTime > 0:
+    workDir = os.path.join( gConfig.getValue( '/LocalSite/InstancePath', rootPath ), 'work',
+                            serviceInfo['serviceName'] )
+    journalPath = gConfig.getValue( "%s/HeartBeatJournal" % serviceInfo['serviceSectionPath'],
+                                    os.path.join( workDir, 'heartbeats.journal' ) )
+    gHeartBeatBuffer = HeartBeatBuffer( jobDB, journalPath )
+    result = gHeartBeatBuffer.initialize()
+    if not result['OK']:
+      return result
+    gHeartBeatBuffer.flush()
+    gThreadScheduler.addPeriodicTask( flushTime, gHeartBeatBuffer.flush )
+
+    # Commands are served from memory, the JobDB tells about the ones set in this process
+    jobDB.addJobCommandListener( addJobCommand )
+    result = refreshJobCommands()
+    if not result['OK']:
+      return result
+    refreshTime = gConfig.getValue( "%s/JobCommandsRefreshTime" % serviceInfo['serviceSectionPath'], 60 )
+    gThreadScheduler.addPeriodicTask( refreshTime, refreshJobCommands )
   return S_OK()
 
+def addJobCommand( jobID, command, arguments ):
+  """ Keep a command to be sent with the next heart beat of jobID
+  """
+  gJobCommandsLock.acquire()
+  try:
+    gJobCommands.setdefault( jobID, {} )[ command ] = arguments
+    if gJobCommandsChanges is not None:
+      gJobCommandsChanges.append( ( jobID, { command : arguments }, False ) )
+  finally:
+    gJobCommandsLock.release()
+
+def refreshJobCommands():
+  """ Reload the commands not sent yet, they can be set by other processes
+  """
+  global gJobCommands
+  global gJobCommandsChanges
+  gJobCommandsLock.acquire()
+  try:
+    gJobCommandsChanges = []
+  finally:
+    gJobCommandsLock.release()
+  result = jobDB.getPendingJobCommands()
+  gJobCommandsLock.acquire()
+  try:
+    changes = gJobCommandsChanges
+    gJobCommandsChanges = None
+    if not result['OK']:
+      gLogger.error( "Cannot load the pending job commands", result['Message'] )
+      return result
+    #The DB may have been read before the changes done meanwhile, apply them again
+    jobCommands = result['Value']
+    for jobID, commands, sent in changes:
+      if sent:
+        for command in commands:
+          jobCommands.get( jobID, {} ).pop( command, None )
+        if jobID in jobCommands and not jobCommands[ jobID ]:
+          del jobCommands[ jobID ]
+      else:
+        jobCommands.setdefault( jobID, {} ).update( commands )
+    gJobCommands = jobCommands
+  finally:
+    gJobCommandsLock.release()
+  return S_OK()
+
+def popJobCommands( jobID ):
+  """ Get and forget the pending commands of jobID
+  """
+  gJobCommandsLock.acquire()
+  try:
+    commands = gJobCommands.pop( jobID, {} )
+    if commands and gJobCommandsChanges is not None:
+      gJobCommandsChanges.append( ( jobID, commands, True ) )
+    return commands
+  finally:
+    gJobCommandsLock.release()
+
 class JobStateUpdateHandler( RequestHandler ):
 
   ###########################################################################
@@ -80,8 +169,31 @@ class JobStateUpdateHandler( RequestHandler ):
         Set optionally the status date and source component which sends the
         status information.
     """
+    result = jobDB.setJobsStatus( jobIDs, status, minorStatus )
+    if not result['OK']:
+      return result
+
+    if status in JOB_FINAL_STATES:
+      result = jobDB.setEndExecTime( jobIDs )
+
+    if status == 'Running' and minorStatus == 'Application':
+      result = jobDB.setStartExecTime( jobIDs )
+
+    result = jobDB.getAttributesForJobList( jobIDs, ['Status', 'MinorStatus'] )
+    if not result['OK']:
+      return result
+    jobsAttrs = result['Value']
+
+    records = []
     for jobID in jobIDs:
-      self.__setJobStatus( jobID, status, minorStatus, source, datetime )
+      if int( jobID ) not in jobsAttrs:
+        gLogger.warn( 'Job %s does not exist' % jobID )
+        continue
+      jobAttrs = jobsAttrs[ int( jobID )]
+      records.append( ( jobID, jobAttrs['Status'], jobAttrs['MinorStatus'], 'idem', datetime, source ) )
+    result = logDB.addLoggingRecords( records )
+    if not result['OK']:
+      return result
     return S_OK()
 
   def __setJobStatus( self, jobID, status, minorStatus, source, datetime ):
@@ -293,7 +405,10 @@ class JobStateUpdateHandler( RequestHandler ):
     """ Send a heart beat sign of life for a job jobID
     """
 
-    result = jobDB.setHeartBeatData( jobID, staticData, dynamicData )
+    if gHeartBeatBuffer:
+      result = gHeartBeatBuffer.addHeartBeat( jobID, staticData, dynamicData )
+    else:
+      result = jobDB.setHeartBeatData( jobID, staticData, dynamicData )
     if not result['OK']:
       gLogger.warn( 'Failed to set the heart beat data for job %d ' % jobID )
 
@@ -312,9 +427,12 @@ class JobStateUpdateHandler( RequestHandler ):
     #    gLogger.warn('Failed to restore the job status to Running')
 
     jobMessageDict = {}
-    result = jobDB.getJobCommand( jobID )
-    if result['OK']:
-      jobMessageDict = result['Value']
+    if gHeartBeatBuffer:
+      jobMessageDict = popJobCommands( jobID )
+    else:
+      result = jobDB.getJobCommand( jobID )
+      if result['OK']:
+        jobMessageDict = result['Value']
 
     if jobMessageDict:
       for key, value in jobMessageDict.items():
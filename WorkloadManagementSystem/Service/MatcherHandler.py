@@ -10,7 +10,7 @@ It also provides an XMLRPC interface to the Matcher
 __RCSID__ = "$Id$"
 
 import time
-from   types import StringType, DictType, StringTypes
+from   types import StringType, DictType, StringTypes, IntType, LongType
 import threading
 
 from DIRAC.ConfigurationSystem.Client.Helpers          import Registry, Operations
@@ -20,6 +20,8 @@ from DIRAC                                             import gConfig, gLogger,
 from DIRAC.WorkloadManagementSystem.DB.JobDB           import JobDB
 from DIRAC.WorkloadManagementSystem.DB.JobLoggingDB    import JobLoggingDB
 from DIRAC.WorkloadManagementSystem.DB.TaskQueueDB     import TaskQueueDB
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+from DIRAC.WorkloadManagementSystem.private.SiteConditionsCache import SiteConditionsCache
 from DIRAC                                             import gMonitor
 from DIRAC.Core.Utilities.ThreadScheduler              import gThreadScheduler
 from DIRAC.Core.Security                               import Properties
@@ -32,6 +34,8 @@ gTaskQueues = {}
 gJobDB = False
 gJobLoggingDB = False
 gTaskQueueDB = False
+gTaskQueueIndex = False
+gSiteConditions = False
 
 def initializeMatcherHandler( serviceInfo ):
   """  Matcher Service initialization
@@ -40,11 +44,17 @@ def initializeMatcherHandler( serviceInfo ):
   global gJobDB
   global gJobLoggingDB
   global gTaskQueueDB
+  global gTaskQueueIndex
+  global gSiteConditions
 
   gJobDB = JobDB()
   gJobLoggingDB = JobLoggingDB()
   gTaskQueueDB = TaskQueueDB()
 
+  maskValidity = gConfig.getValue( "%s/SiteMaskCacheTime" % serviceInfo[ 'serviceSectionPath' ], 60 )
+  countersValidity = gConfig.getValue( "%s/RunningCountersCacheTime" % serviceInfo[ 'serviceSectionPath' ], 60 )
+  gSiteConditions = SiteConditionsCache( gJobDB, maskValidity, countersValidity )
+
   gMonitor.registerActivity( 'matchTime', "Job matching time",
                              'Matching', "secs" , gMonitor.OP_MEAN, 300 )
   gMonitor.registerActivity( 'matchTaskQueues', "Task queues checked per job",
@@ -58,6 +68,15 @@ def initializeMatcherHandler( serviceInfo ):
   gThreadScheduler.addPeriodicTask( 120, gTaskQueueDB.recalculateTQSharesForAll )
   gThreadScheduler.addPeriodicTask( 120, sendNumTaskQueues )
 
+  #Match against an in memory copy of the task queues, the DB is only used to take the jobs out
+  if gConfig.getValue( "%s/UseTaskQueueIndex" % serviceInfo[ 'serviceSectionPath' ], True ):
+    gTaskQueueIndex = TaskQueueIndex( gTaskQueueDB )
+    result = gTaskQueueIndex.refresh()
+    if not result[ 'OK' ]:
+      return result
+    refreshTime = gConfig.getValue( "%s/TaskQueueIndexRefreshTime" % serviceInfo[ 'serviceSectionPath' ], 10 )
+    gThreadScheduler.addPeriodicTask( refreshTime, gTaskQueueIndex.refresh )
+
   sendNumTaskQueues()
 
   return S_OK()
@@ -138,8 +157,95 @@ class MatcherHandler( RequestHandler ):
     """ Main job selection function to find the highest priority job
         matching the resource capacity
     """
+    result = self.selectJobs( resourceDescription, 1 )
+    if not result[ 'OK' ]:
+      return result
+    return S_OK( result[ 'Value' ][0] )
 
+  def selectJobs( self, resourceDescription, numJobs ):
+    """ Find up to numJobs of the highest priority jobs matching the resource
+        capacity. The site mask, limits and delays are evaluated once for all
+        of them and the matched jobs are assigned with bulk DB operations
+    """
     startTime = time.time()
+    result = self.__getMatchConditions( resourceDescription )
+    if not result[ 'OK' ]:
+      return result
+    resourceDict, siteName, negativeCond = result[ 'Value' ]
+
+    #With running limits and matching delays every job taken changes the conditions for the next one
+    limitsDict = {}
+    delayDict = {}
+    if numJobs > 1 and self.__opsHelper.getValue( "JobScheduling/CheckJobLimits", True ):
+      result = self.__extractCSDictOfDicts( "JobScheduling/RunningLimit/%s" % siteName )
+      if result[ 'OK' ]:
+        limitsDict = dict( [ ( attName, attLimits ) for attName, attLimits in result[ 'Value' ].items()
+                             if attName in gJobDB.jobAttributeNames ] )
+    if numJobs > 1 and self.__opsHelper.getValue( "JobScheduling/CheckMatchingDelay", True ):
+      result = self.__extractCSDictOfDicts( "JobScheduling/MatchingDelay/%s" % siteName )
+      if result[ 'OK' ]:
+        delayDict = dict( [ ( attName, attDelays ) for attName, attDelays in result[ 'Value' ].items()
+                            if attName in gJobDB.jobAttributeNames ] )
+    attNames = list( limitsDict )
+    for attName in delayDict:
+      if attName not in attNames:
+        attNames.append( attName )
+
+    jobIDs = []
+    countedIDs = []
+    for iJob in range( numJobs ):
+      if gTaskQueueIndex and 'JobID' not in resourceDict:
+        result = gTaskQueueIndex.matchAndGetJob( resourceDict, negativeCond = negativeCond )
+      else:
+        result = gTaskQueueDB.matchAndGetJob( resourceDict, negativeCond = negativeCond )
+
+      if DEBUG:
+        print result
+
+      if not result['OK']:
+        if jobIDs:
+          break
+        return result
+      result = result['Value']
+      if not result['matchFound']:
+        break
+      jobIDs.append( result['jobId'] )
+      if 'JobID' in resourceDict:
+        break
+      if attNames and iJob < numJobs - 1:
+        result = gJobDB.getJobAttributes( jobIDs[-1], attNames )
+        if not result[ 'OK' ]:
+          continue
+        jobAttrs = result[ 'Value' ]
+        #The delay counters are started when the jobs are assigned, until then keep the delayed values out
+        delayCond = {}
+        for attName in delayDict:
+          if jobAttrs.get( attName ) in delayDict[ attName ]:
+            delayCond[ attName ] = [ jobAttrs[ attName ] ]
+        self.__mergeConditions( negativeCond, delayCond )
+        if limitsDict:
+          gSiteConditions.addMatchedJobs( siteName, { jobIDs[-1] : dict( [ ( attName, jobAttrs.get( attName ) )
+                                                                           for attName in limitsDict ] ) } )
+          countedIDs.append( jobIDs[-1] )
+          result = self.__getRunningCondition( siteName )
+          if result[ 'OK' ]:
+            self.__mergeConditions( negativeCond, result[ 'Value' ] )
+    if not jobIDs:
+      return S_ERROR( 'No match found' )
+
+    result = self.__assignJobs( jobIDs, siteName, countedIDs )
+    if not result[ 'OK' ]:
+      return result
+
+    matchTime = time.time() - startTime
+    gLogger.info( "Match time: [%s]" % str( matchTime ) )
+    gMonitor.addMark( "matchTime", matchTime )
+    return result
+
+  def __getMatchConditions( self, resourceDescription ):
+    """ Check the resource request and build the conditions for the match
+        Returns S_OK( ( resourceDict, siteName, negativeCond ) )
+    """
     resourceDict = self.__processResourceDescription( resourceDescription )
 
     credDict = self.getRemoteCredentials()
@@ -194,7 +300,7 @@ class MatcherHandler( RequestHandler ):
       return S_ERROR( 'Missing Site Name in Resource JDL' )
 
     # Get common site mask and check the agent site
-    result = gJobDB.getSiteMask( siteState = 'Active' )
+    result = gSiteConditions.getSiteMask()
     if not result['OK']:
       return S_ERROR( 'Internal error: can not get site mask' )
     maskList = result['Value']
@@ -225,76 +331,104 @@ class MatcherHandler( RequestHandler ):
       if result['OK']:
         delayCond = result['Value']
         gLogger.verbose( 'Negative conditions for site %s after delay checking are: %s' % ( siteName, str( delayCond ) ) )
-        #Merge both negative dicts
-        for attr in delayCond:
-          if attr not in negativeCond:
-            negativeCond[ attr ] = []
-          for value in delayCond[ attr ]:
-            if value not in negativeCond[ attr ]:
-              negativeCond[ attr ].append( value )
+        self.__mergeConditions( negativeCond, delayCond )
 
     if negativeCond:
       gLogger.info( 'Negative conditions for site %s are: %s' % ( siteName, str( negativeCond ) ) )
 
-    result = gTaskQueueDB.matchAndGetJob( resourceDict, negativeCond = negativeCond )
-
-    if DEBUG:
-      print result
-
-    if not result['OK']:
-      return result
-    result = result['Value']
-    if not result['matchFound']:
-      return S_ERROR( 'No match found' )
+    return S_OK( ( resourceDict, siteName, negativeCond ) )
 
-    jobID = result['jobId']
-    resAtt = gJobDB.getJobAttributes( jobID, ['OwnerDN', 'OwnerGroup', 'Status'] )
+  def __mergeConditions( self, negativeCond, extraCond ):
+    """ Add the values of extraCond to the negativeCond dict of lists
+    """
+    for attr in extraCond:
+      if attr not in negativeCond:
+        negativeCond[ attr ] = []
+      for value in extraCond[ attr ]:
+        if value not in negativeCond[ attr ]:
+          negativeCond[ attr ].append( value )
+
+  def __assignJobs( self, jobIDs, siteName, countedIDs = () ):
+    """ Set the matched jobs as Matched and prepare the reply for the pilot
+        Jobs in countedIDs are already included in the site running counters
+    """
+    attNames = [ 'OwnerDN', 'OwnerGroup', 'Status' ]
+    limitNames = []
+    if self.__opsHelper.getValue( "JobScheduling/CheckJobLimits", True ):
+      result = self.__extractCSDictOfDicts( "JobScheduling/RunningLimit/%s" % siteName )
+      if result[ 'OK' ]:
+        limitNames = [ attName for attName in result[ 'Value' ] if attName in gJobDB.jobAttributeNames ]
+      for attName in limitNames:
+        if attName not in attNames:
+          attNames.append( attName )
+    delayDict = {}
+    if self.__opsHelper.getValue( "JobScheduling/CheckMatchingDelay", True ):
+      result = self.__extractCSDictOfDicts( "JobScheduling/MatchingDelay/%s" % siteName )
+      if result[ 'OK' ]:
+        delayDict = result[ 'Value' ]
+      for attName in delayDict:
+        if attName not in gJobDB.jobAttributeNames:
+          gLogger.error( "Attribute %s does not exist in the JobDB. Please fix it!" % attName )
+        elif attName not in attNames:
+          attNames.append( attName )
+
+    resAtt = gJobDB.getAttributesForJobList( jobIDs, attNames )
     if not resAtt['OK']:
       return S_ERROR( 'Could not retrieve job attributes' )
-    if not resAtt['Value']:
-      return S_ERROR( 'No attributes returned for job' )
-    if not resAtt['Value']['Status'] == 'Waiting':
-      gLogger.error( 'Job %s matched by the TQ is not in Waiting state' % str( jobID ) )
-      result = gTaskQueueDB.deleteJob( jobID )
-      if not result[ 'OK' ]:
-        return result
-      return S_ERROR( "Job %s is not in Waiting state" % str( jobID ) )
+    jobsAttrs = resAtt['Value']
+    assignedIDs = []
+    for jobID in jobIDs:
+      if jobID not in jobsAttrs:
+        gLogger.error( 'No attributes returned for job %s' % str( jobID ) )
+        continue
+      if not jobsAttrs[ jobID ]['Status'] == 'Waiting':
+        gLogger.error( 'Job %s matched by the TQ is not in Waiting state' % str( jobID ) )
+        result = gTaskQueueDB.deleteJob( jobID )
+        if not result[ 'OK' ]:
+          return result
+        continue
+      assignedIDs.append( jobID )
+    if not assignedIDs:
+      return S_ERROR( "Job %s is not in Waiting state" % ", ".join( [ str( jobID ) for jobID in jobIDs ] ) )
 
-    result = gJobDB.setJobStatus( jobID, status = 'Matched', minor = 'Assigned' )
-    result = gJobLoggingDB.addLoggingRecord( jobID,
-                                           status = 'Matched',
-                                           minor = 'Assigned',
-                                           source = 'Matcher' )
+    result = gJobDB.setJobsStatus( assignedIDs, status = 'Matched', minor = 'Assigned' )
+    if not result['OK']:
+      gLogger.error( "Cannot set the jobs to Matched", result['Message'] )
+    result = gJobLoggingDB.addLoggingRecords( [ ( jobID, 'Matched', 'Assigned', 'idem', '', 'Matcher' )
+                                                for jobID in assignedIDs ] )
 
-    result = gJobDB.getJobJDL( jobID )
+    result = gJobDB.getJDLsForJobList( assignedIDs )
     if not result['OK']:
       return S_ERROR( 'Failed to get the job JDL' )
-
-    resultDict = {}
-    resultDict['JDL'] = result['Value']
-    resultDict['JobID'] = jobID
-
-    matchTime = time.time() - startTime
-    gLogger.info( "Match time: [%s]" % str( matchTime ) )
-    gMonitor.addMark( "matchTime", matchTime )
+    jdlDict = result['Value']
 
     # Get some extra stuff into the response returned
-    resOpt = gJobDB.getJobOptParameters( jobID )
+    optDict = {}
+    resOpt = gJobDB.getOptParametersForJobList( assignedIDs )
     if resOpt['OK']:
-      for key, value in resOpt['Value'].items():
+      optDict = resOpt['Value']
+
+    if delayDict:
+      self.__updateDelayCounters( siteName, delayDict,
+                                  dict( [ ( jobID, jobsAttrs[ jobID ] ) for jobID in assignedIDs ] ) )
+
+    if limitNames:
+      gSiteConditions.addMatchedJobs( siteName,
+                                      dict( [ ( jobID, dict( [ ( attName, jobsAttrs[ jobID ][ attName ] )
+                                                               for attName in limitNames ] ) )
+                                              for jobID in assignedIDs if jobID not in countedIDs ] ) )
+
+    resultList = []
+    for jobID in assignedIDs:
+      resultDict = {}
+      resultDict['JDL'] = jdlDict.get( jobID, '' )
+      resultDict['JobID'] = jobID
+      for key, value in optDict.get( jobID, {} ).items():
         resultDict[key] = value
-    resAtt = gJobDB.getJobAttributes( jobID, ['OwnerDN', 'OwnerGroup'] )
-    if not resAtt['OK']:
-      return S_ERROR( 'Could not retrieve job attributes' )
-    if not resAtt['Value']:
-      return S_ERROR( 'No attributes returned for job' )
-
-    if self.__opsHelper.getValue( "JobScheduling/CheckMatchingDelay", True ):
-      self.__updateDelayCounters( siteName, jobID )
-
-    resultDict['DN'] = resAtt['Value']['OwnerDN']
-    resultDict['Group'] = resAtt['Value']['OwnerGroup']
-    return S_OK( resultDict )
+      resultDict['DN'] = jobsAttrs[ jobID ]['OwnerDN']
+      resultDict['Group'] = jobsAttrs[ jobID ]['OwnerGroup']
+      resultList.append( resultDict )
+    return S_OK( resultList )
 
   def __extractCSDictOfDicts( self, section ):
     stuffDict = MatcherHandler.__csDictCache.get( section )
@@ -339,11 +473,10 @@ class MatcherHandler( RequestHandler ):
       if attName not in gJobDB.jobAttributeNames:
         gLogger.error( "Attribute %s does not exist. Check the job limits" % attName )
         continue
-      result = gJobDB.getCounters( 'Jobs', [ attName ], { 'Site' : siteName, 'Status' : [ 'Running', 'Matched', 'Stalled' ] } )
+      result = gSiteConditions.getRunningCounters( siteName, attName )
       if not result[ 'OK' ]:
         return result
       data = result[ 'Value' ]
-      data = dict( [ ( k[0][ attName ], k[1] )  for k in data ] )
       for attValue in limitsDict[ attName ]:
         limit = limitsDict[ attName ][ attValue ]
         running = data.get( attValue, 0 )
@@ -356,39 +489,27 @@ class MatcherHandler( RequestHandler ):
     #negCond is something like : {'JobType': ['Merge']}
     return S_OK( negCond )
 
-  def __updateDelayCounters( self, siteName, jid ):
-    #Get the info from the CS
-    siteSection = "JobScheduling/MatchingDelay/%s" % siteName
-    result = self.__extractCSDictOfDicts( siteSection )
-    if not result['OK']:
-      return result
-    delayDict = result[ 'Value' ]
-    #limitsDict is something like { 'JobType' : { 'Merge' : 20, 'MCGen' : 1000 } }
-    if not delayDict:
-      return S_OK()
-    attNames = []
-    for attName in delayDict:
-      if attName not in gJobDB.jobAttributeNames:
-        gLogger.error( "Attribute %s does not exist in the JobDB. Please fix it!" % attName )
-      else:
-        attNames.append( attName )
-    result = gJobDB.getJobAttributes( jid, attNames )
-    if not result[ 'OK' ]:
-      gLogger.error( "While retrieving attributes coming from %s: %s" % ( siteSection, result[ 'Message' ] ) )
-      return result
-    atts = result[ 'Value' ]
+  def __updateDelayCounters( self, siteName, delayDict, jobsAttrs ):
+    """ Start the matching delays triggered by the attributes of the jobs just matched
+        delayDict is something like { 'JobType' : { 'Merge' : 20, 'MCGen' : 1000 } }
+        jobsAttrs is { jobID : { attName : attValue } }
+    """
     #Create the DictCache if not there
     if siteName not in MatcherHandler.__delayMem:
       MatcherHandler.__delayMem[ siteName ] = DictCache()
     #Update the counters
     delayCounter = MatcherHandler.__delayMem[ siteName ]
-    for attName in atts:
-      attValue = atts[ attName ]
-      if attValue in delayDict[ attName ]:
-        delayTime = delayDict[ attName ][ attValue ]
-        gLogger.notice( "Adding delay for %s/%s=%s of %s secs" % ( siteName, attName,
-                                                                   attValue, delayTime ) )
-        delayCounter.add( ( attName, attValue ), delayTime )
+    for jobID in jobsAttrs:
+      atts = jobsAttrs[ jobID ]
+      for attName in delayDict:
+        if attName not in atts:
+          continue
+        attValue = atts[ attName ]
+        if attValue in delayDict[ attName ]:
+          delayTime = delayDict[ attName ][ attValue ]
+          gLogger.notice( "Adding delay for %s/%s=%s of %s secs" % ( siteName, attName,
+                                                                     attValue, delayTime ) )
+          delayCounter.add( ( attName, attValue ), delayTime )
     return S_OK()
 
 
@@ -416,6 +537,18 @@ class MatcherHandler( RequestHandler ):
     gMonitor.addMark( "matchesDone" )
     return result
 
+##############################################################################
+  types_requestJobs = [ [StringType, DictType], [IntType, LongType] ]
+  def export_requestJobs( self, resourceDescription, numJobs ):
+    """ Serve up to numJobs jobs to the request of a multi slot agent. The jobs
+        are the highest priority ones matching the agent's site capacity.
+        Returns a list with a dictionary per job as returned by requestJob
+    """
+    maxJobs = self.srv_getCSOption( "MaxJobsPerRequest", 20 )
+    result = self.selectJobs( resourceDescription, max( 1, min( numJobs, maxJobs ) ) )
+    gMonitor.addMark( "matchesDone" )
+    return result
+
 ##############################################################################
   types_getActiveTaskQueues = []
   def export_getActiveTaskQueues( self ):
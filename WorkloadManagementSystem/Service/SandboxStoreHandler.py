@@ -25,7 +25,9 @@ from DIRAC.RequestManagementSystem.Client.RequestClient import RequestClient
 from DIRAC.RequestManagementSystem.Client.RequestContainer import RequestContainer
 from DIRAC.Resources.Storage.StorageElement import StorageElement
 from DIRAC.Core.Security import Properties
-from DIRAC.Core.Utilities import List
+from DIRAC.Core.Utilities import List, DEncode
+from DIRAC.WorkloadManagementSystem.private.SandboxChunks import isChunkHash, getChunkHash, decompressChunk, \
+                                                                 ChunkedFileReader
 
 sandboxDB = False
 
@@ -79,6 +81,9 @@ class SandboxStoreHandler( RequestHandler ):
     Receive a file as a sandbox
     """
 
+    if type( fileId ) in types.StringTypes and fileId.find( "Chunk:" ) == 0:
+      return self.__receiveChunk( fileId[6:], fileSize, fileHelper )
+
     if self.__maxUploadBytes and fileSize > self.__maxUploadBytes:
       fileHelper.markAsTransferred()
       return S_ERROR( "Sandbox is too big. Please upload it to a grid storage element" )
@@ -159,6 +164,178 @@ class SandboxStoreHandler( RequestHandler ):
       return result
     return S_OK( sbURL )
 
+  ##################
+  # Content addressed sandboxes
+
+  def __getOwnerId( self ):
+    credDict = self.getRemoteCredentials()
+    return sandboxDB.registerAndGetOwnerId( credDict[ 'username' ], credDict[ 'DN' ], credDict[ 'group' ] )
+
+  def __getChunkHDPath( self, ownerId, chunkHash ):
+    prefix = self.getCSOption( "SandboxPrefix", "SandBox" )
+    return self.__sbToHDPath( os.path.join( prefix, "Chunks", str( ownerId ), chunkHash[0:3], chunkHash ) )
+
+  types_getMissingSandboxChunks = [ ( types.ListType, types.TupleType ) ]
+  def export_getMissingSandboxChunks( self, chunkHashes ):
+    """
+    Get which chunks of a sandbox have to be uploaded
+    """
+    if not self.__useLocalStorage:
+      return S_ERROR( "Chunked sandboxes need local storage" )
+    for chunkHash in chunkHashes:
+      if not isChunkHash( chunkHash ):
+        return S_ERROR( "Invalid chunk hash %s" % str( chunkHash ) )
+    result = self.__getOwnerId()
+    if not result[ 'OK' ]:
+      return result
+    ownerId = result[ 'Value' ]
+    result = sandboxDB.getMissingChunks( ownerId, list( chunkHashes ) )
+    if not result[ 'OK' ]:
+      return result
+    missing = result[ 'Value' ]
+    #Registered chunks lost from the disk have to be sent again
+    for chunkHash in result[ 'Bytes' ]:
+      if not os.path.isfile( self.__getChunkHDPath( ownerId, chunkHash ) ):
+        missing.append( chunkHash )
+    return S_OK( missing )
+
+  def __receiveChunk( self, chunkHash, fileSize, fileHelper ):
+    """
+    Receive a compressed chunk and store it if its content matches its hash
+    """
+    if not self.__useLocalStorage:
+      fileHelper.markAsTransferred()
+      return S_ERROR( "Chunked sandboxes need local storage" )
+    if not isChunkHash( chunkHash ):
+      fileHelper.markAsTransferred()
+      return S_ERROR( "Invalid chunk hash %s" % chunkHash )
+    if self.__maxUploadBytes and fileSize > self.__maxUploadBytes:
+      fileHelper.markAsTransferred()
+      return S_ERROR( "Sandbox chunk is too big" )
+    result = self.__getOwnerId()
+    if not result[ 'OK' ]:
+      fileHelper.markAsTransferred()
+      return result
+    ownerId = result[ 'Value' ]
+
+    result = fileHelper.networkToString( maxFileSize = self.__maxUploadBytes )
+    if not result[ 'OK' ]:
+      return result
+    data = result[ 'Value' ]
+    try:
+      if getChunkHash( decompressChunk( data ) ) != chunkHash:
+        return S_ERROR( "Hashes don't match!" )
+    except Exception, e:
+      return S_ERROR( "Invalid chunk data: %s" % str( e ) )
+
+    hdPath = self.__getChunkHDPath( ownerId, chunkHash )
+    if not os.path.isdir( os.path.dirname( hdPath ) ):
+      try:
+        os.makedirs( os.path.dirname( hdPath ) )
+      except:
+        pass
+    #Write aside and rename so the chunk is never seen half written
+    tmpPath = "%s.%s" % ( hdPath, random.randint( 0, 2 ** 30 ) )
+    try:
+      fd = open( tmpPath, "wb" )
+      try:
+        fd.write( data )
+      finally:
+        fd.close()
+      os.rename( tmpPath, hdPath )
+    except Exception, e:
+      self.__secureUnlinkFile( tmpPath )
+      return S_ERROR( "Cannot write sandbox chunk: %s" % str( e ) )
+    return sandboxDB.registerChunk( ownerId, chunkHash, len( data ) )
+
+  types_registerChunkedSandbox = [ types.DictType, types.DictType ]
+  def export_registerChunkedSandbox( self, manifest, assignTo ):
+    """
+    Register a sandbox made of chunks already uploaded.
+    manifest is { 'Hash' : <md5 of the tar archive>, 'Size' : <archive bytes>, 'Chunks' : [ <chunk hash>, ... ] }
+    """
+    if not self.__useLocalStorage:
+      return S_ERROR( "Chunked sandboxes need local storage" )
+    try:
+      sbHash = manifest[ 'Hash' ]
+      chunkHashes = list( manifest[ 'Chunks' ] )
+      sbSize = int( manifest[ 'Size' ] )
+    except Exception, e:
+      return S_ERROR( "Invalid sandbox manifest: %s" % str( e ) )
+    for chunkHash in [ sbHash ] + chunkHashes:
+      if not isChunkHash( chunkHash ):
+        return S_ERROR( "Invalid hash %s in sandbox manifest" % str( chunkHash ) )
+    if not chunkHashes:
+      return S_ERROR( "Empty sandbox manifest" )
+
+    credDict = self.getRemoteCredentials()
+    result = self.__getOwnerId()
+    if not result[ 'OK' ]:
+      return result
+    ownerId = result[ 'Value' ]
+    result = sandboxDB.getMissingChunks( ownerId, chunkHashes )
+    if not result[ 'OK' ]:
+      return result
+    if result[ 'Value' ]:
+      return S_ERROR( "Sandbox chunks not uploaded: %s" % ", ".join( result[ 'Value' ] ) )
+    storedBytes = sum( [ result[ 'Bytes' ][ chunkHash ] for chunkHash in List.uniqueElements( chunkHashes ) ] )
+    if self.__maxUploadBytes and storedBytes > self.__maxUploadBytes:
+      return S_ERROR( "Sandbox is too big. Please upload it to a grid storage element" )
+
+    sbPath = self.__getSandboxPath( "%s.ctar" % sbHash )
+    sbURL = "SB:%s|%s" % ( self.__localSEName, sbPath )
+    result = sandboxDB.getSandboxId( self.__localSEName, sbPath, credDict[ 'username' ], credDict[ 'group' ] )
+    if not result[ 'OK' ]:
+      hdPath = self.__sbToHDPath( sbPath )
+      try:
+        if not os.path.isdir( os.path.dirname( hdPath ) ):
+          os.makedirs( os.path.dirname( hdPath ) )
+        fd = open( hdPath, "wb" )
+        try:
+          fd.write( DEncode.encode( { 'OwnerId' : ownerId, 'Size' : sbSize, 'Chunks' : chunkHashes } ) )
+        finally:
+          fd.close()
+      except Exception, e:
+        return S_ERROR( "Cannot write sandbox manifest: %s" % str( e ) )
+      result = sandboxDB.registerAndGetSandbox( credDict[ 'username' ], credDict[ 'DN' ], credDict[ 'group' ],
+                                                self.__localSEName, sbPath, storedBytes )
+      if not result[ 'OK' ]:
+        self.__secureUnlinkFile( hdPath )
+        return result
+      sbId = result[ 'Value' ][0]
+      result = sandboxDB.assignChunksToSandbox( sbId, ownerId, chunkHashes )
+      if not result[ 'OK' ]:
+        return result
+      gLogger.info( "Registered chunked sandbox", "%s with %s chunks" % ( sbURL, len( chunkHashes ) ) )
+    else:
+      gLogger.info( "Sandbox already exists. Skipping registration" )
+
+    assignTo = dict( [ ( key, [ ( sbURL, assignTo[ key ] ) ] ) for key in assignTo ] )
+    result = self.export_assignSandboxesToEntities( assignTo )
+    if not result[ 'OK' ]:
+      return result
+    return S_OK( sbURL )
+
+  def __getChunkedSandboxReader( self, hdPath ):
+    """
+    Get a file like object rebuilding the archive of a chunked sandbox
+    """
+    try:
+      fd = open( hdPath, "rb" )
+      try:
+        manifest = DEncode.decode( fd.read() )[0]
+      finally:
+        fd.close()
+    except Exception, e:
+      return S_ERROR( "Cannot read sandbox manifest: %s" % str( e ) )
+    chunkPaths = []
+    for chunkHash in manifest[ 'Chunks' ]:
+      chunkPath = self.__getChunkHDPath( manifest[ 'OwnerId' ], chunkHash )
+      if not os.path.isfile( chunkPath ):
+        return S_ERROR( "Sandbox chunk %s is missing" % chunkHash )
+      chunkPaths.append( chunkPath )
+    return S_OK( ChunkedFileReader( chunkPaths ) )
+
   def transfer_bulkFromClient( self, fileId, token, fileSize, fileHelper ):
     """ Receive files packed into a tar archive by the fileHelper logic.
         token is used for access rights confirmation.
@@ -377,6 +554,15 @@ class SandboxStoreHandler( RequestHandler ):
     hdPath = self.__sbToHDPath( fileID )
     if not os.path.isfile( hdPath ):
       return S_ERROR( "Sandbox does not exist" )
+    if hdPath[-5:] == ".ctar":
+      result = self.__getChunkedSandboxReader( hdPath )
+      if not result[ 'OK' ]:
+        return result
+      reader = result[ 'Value' ]
+      try:
+        return fileHelper.DataSourceToNetwork( reader )
+      finally:
+        reader.close()
     result = fileHelper.getFileDescriptor( hdPath, 'rb' )
     if not result[ 'OK' ]:
       return S_ERROR( 'Failed to get file descriptor: %s' % result[ 'Message' ] )
@@ -411,10 +597,26 @@ class SandboxStoreHandler( RequestHandler ):
     deletedFromSE = []
     for sbId, SEName, SEPFN in sbList:
       self.__purgeSandbox( sbId, SEName, SEPFN )
+    self.__purgeUnusedChunks()
 
     SandboxStoreHandler.__purgeWorking = False
     return S_OK()
 
+  def __purgeUnusedChunks( self ):
+    result = sandboxDB.getUnusedChunks()
+    if not result[ 'OK' ]:
+      gLogger.error( "Error while retrieving chunks to purge", result[ 'Message' ] )
+      return
+    chunkIds = []
+    for chunkId, ownerId, chunkHash in result[ 'Value' ]:
+      hdPath = self.__getChunkHDPath( ownerId, chunkHash )
+      if not os.path.isfile( hdPath ) or self.__secureUnlinkFile( hdPath ):
+        chunkIds.append( chunkId )
+    gLogger.info( "Purging %s unused sandbox chunks" % len( chunkIds ) )
+    result = sandboxDB.deleteChunks( chunkIds )
+    if not result[ 'OK' ]:
+      gLogger.error( "Cannot delete chunks from DB", result[ 'Message' ] )
+
   def __purgeSandbox( self, sbId, SEName, SEPFN ):
     result = self.__deleteSandboxFromBackend( SEName, SEPFN )
     if not result[ 'OK' ]:
@@ -0,0 +1,62 @@
+########################################################################
+# $HeadURL $
+# File: JobStateUpdateHandlerTestCase.py
+########################################################################
+
+""".. module:: JobStateUpdateHandlerTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.Service.JobStateUpdateHandler module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.Service import JobStateUpdateHandler
+
+class MemoryJobDB:
+  """ pending commands, duringRead is called while they are being read """
+
+  def __init__( self ):
+    self.pending = {}
+    self.duringRead = None
+
+  def getPendingJobCommands( self ):
+    pending = dict( [ ( jobID, dict( commands ) ) for jobID, commands in self.pending.items() ] )
+    if self.duringRead:
+      self.duringRead()
+    return S_OK( pending )
+
+########################################################################
+class JobStateUpdateHandlerTestCase( unittest.TestCase ):
+  """py:class JobStateUpdateHandlerTestCase
+  Test case for DIRAC.WorkloadManagementSystem.Service.JobStateUpdateHandler module.
+  """
+
+  def setUp( self ):
+    self.jobDB = MemoryJobDB()
+    JobStateUpdateHandler.jobDB = self.jobDB
+    JobStateUpdateHandler.gJobCommands = {}
+
+  def testRefreshJobCommands( self ):
+    """ commands sent or added while refreshing are not lost nor sent twice """
+    self.jobDB.pending = { 1 : { 'Kill' : '' }, 2 : { 'Kill' : '' } }
+    self.assertEqual( JobStateUpdateHandler.refreshJobCommands()[ 'OK' ], True )
+    def heartBeats():
+      self.assertEqual( JobStateUpdateHandler.popJobCommands( 1 ), { 'Kill' : '' } )
+      JobStateUpdateHandler.addJobCommand( 3, 'Kill', '' )
+    self.jobDB.duringRead = heartBeats
+    self.assertEqual( JobStateUpdateHandler.refreshJobCommands()[ 'OK' ], True )
+    self.assertEqual( JobStateUpdateHandler.popJobCommands( 1 ), {} )
+    self.assertEqual( JobStateUpdateHandler.popJobCommands( 2 ), { 'Kill' : '' } )
+    self.assertEqual( JobStateUpdateHandler.popJobCommands( 3 ), { 'Kill' : '' } )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( JobStateUpdateHandlerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
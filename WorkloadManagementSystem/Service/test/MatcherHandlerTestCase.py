@@ -0,0 +1,149 @@
+########################################################################
+# $HeadURL $
+# File: MatcherHandlerTestCase.py
+########################################################################
+
+""".. module:: MatcherHandlerTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.Service.MatcherHandler module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.Service import MatcherHandler
+
+class MemoryTaskQueueDB:
+  """ waiting jobs in priority order, matched unless a negative condition excludes them """
+
+  def __init__( self, jobs ):
+    self.jobs = list( jobs )
+    self.deleted = []
+
+  def getSingleValueTQDefFields( self ):
+    return ( 'OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime' )
+
+  def getMultiValueMatchFields( self ):
+    return ( 'GridCE', 'Site', 'GridMiddleware', 'LHCbPlatform', 'PilotType', 'SubmitPool', 'JobType' )
+
+  def matchAndGetJob( self, resourceDict, negativeCond = {} ):
+    for jobID, jobType in self.jobs:
+      if jobType not in negativeCond.get( 'JobType', [] ):
+        self.jobs.remove( ( jobID, jobType ) )
+        return S_OK( { 'matchFound' : True, 'jobId' : jobID, 'taskQueueId' : 1, 'tqMatch' : resourceDict } )
+    return S_OK( { 'matchFound' : False, 'tqMatch' : resourceDict } )
+
+  def deleteJob( self, jobID ):
+    self.deleted.append( jobID )
+    return S_OK()
+
+class MemoryJobDB:
+  """ the JobDB methods used by the matcher """
+
+  jobAttributeNames = [ 'JobID', 'JobType', 'OwnerDN', 'OwnerGroup', 'Status' ]
+
+  def __init__( self, jobs ):
+    self.attributes = dict( [ ( jobID, { 'JobType' : jobType, 'OwnerDN' : '/DN/user', 'OwnerGroup' : 'user',
+                                         'Status' : 'Waiting' } ) for jobID, jobType in jobs ] )
+
+  def getJobAttributes( self, jobID, attrList ):
+    return S_OK( dict( [ ( attName, self.attributes[ jobID ][ attName ] ) for attName in attrList ] ) )
+
+  def getAttributesForJobList( self, jobIDs, attrList ):
+    return S_OK( dict( [ ( jobID, self.getJobAttributes( jobID, attrList )[ 'Value' ] ) for jobID in jobIDs ] ) )
+
+  def setJobsStatus( self, jobIDs, status = None, minor = None ):
+    for jobID in jobIDs:
+      self.attributes[ jobID ][ 'Status' ] = status
+    return S_OK()
+
+  def getJDLsForJobList( self, jobIDs ):
+    return S_OK( dict( [ ( jobID, "[]" ) for jobID in jobIDs ] ) )
+
+  def getOptParametersForJobList( self, jobIDs ):
+    return S_OK( {} )
+
+class MemoryJobLoggingDB:
+
+  def addLoggingRecords( self, records ):
+    return S_OK()
+
+class MemorySiteConditions:
+
+  def getSiteMask( self ):
+    return S_OK( [ 'LCG.CERN.ch' ] )
+
+  def getRunningCounters( self, siteName, attName ):
+    return S_OK( {} )
+
+  def addMatchedJobs( self, siteName, jobsAttrs ):
+    pass
+
+class MemoryOperations:
+  """ a MatchingDelay of 600 secs for the Merge jobs at LCG.CERN.ch """
+
+  def getValue( self, optionPath, defaultValue ):
+    if optionPath == "Pilot/CheckVersion":
+      return False
+    return defaultValue
+
+  def getSections( self, section ):
+    if section == "JobScheduling/MatchingDelay/LCG.CERN.ch":
+      return S_OK( [ 'JobType' ] )
+    return S_OK( [] )
+
+  def getOptionsDict( self, optionPath ):
+    return S_OK( { 'Merge' : '600' } )
+
+class FakeMonitor:
+
+  def addMark( self, name, value = 1 ):
+    pass
+
+class TestMatcherHandler( MatcherHandler.MatcherHandler ):
+  """ a handler outside of a service, for a generic pilot """
+
+  def __init__( self ):
+    self._MatcherHandler__opsHelper = MemoryOperations()
+    self.serviceInfoDict = { 'clientSetup' : 'Production' }
+
+  def getRemoteCredentials( self ):
+    return { 'DN' : '/DN/pilot', 'group' : 'pilot', 'properties' : [ 'GenericPilot' ] }
+
+########################################################################
+class MatcherHandlerTestCase( unittest.TestCase ):
+  """py:class MatcherHandlerTestCase
+  Test case for DIRAC.WorkloadManagementSystem.Service.MatcherHandler module.
+  """
+
+  def setUp( self ):
+    jobs = [ ( 1, 'Merge' ), ( 2, 'Merge' ), ( 3, 'MCSimulation' ), ( 4, 'Merge' ), ( 5, 'MCSimulation' ) ]
+    self.tqDB = MemoryTaskQueueDB( jobs )
+    MatcherHandler.gTaskQueueDB = self.tqDB
+    MatcherHandler.gTaskQueueIndex = False
+    MatcherHandler.gJobDB = MemoryJobDB( jobs )
+    MatcherHandler.gJobLoggingDB = MemoryJobLoggingDB()
+    MatcherHandler.gSiteConditions = MemorySiteConditions()
+    MatcherHandler.gMonitor = FakeMonitor()
+    MatcherHandler.MatcherHandler._MatcherHandler__delayMem.clear()
+    self.handler = TestMatcherHandler()
+    self.resource = { 'Site' : 'LCG.CERN.ch', 'CPUTime' : 100000, 'Setup' : 'Production' }
+
+  def testMatchingDelay( self ):
+    """ one delayed job per request, and none until the delay is over """
+    result = self.handler.selectJobs( self.resource, 4 )
+    self.assertEqual( [ job[ 'JobID' ] for job in result[ 'Value' ] ], [ 1, 3, 5 ] )
+    result = self.handler.selectJobs( self.resource, 4 )
+    self.assertEqual( result[ 'OK' ], False )
+    self.assertEqual( self.tqDB.jobs, [ ( 2, 'Merge' ), ( 4, 'Merge' ) ] )
+
+## test suite execution
+if __name__ == "__main__":
+  TESTLOADER = unittest.TestLoader()
+  SUITE = TESTLOADER.loadTestsFromTestCase( MatcherHandlerTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( SUITE )
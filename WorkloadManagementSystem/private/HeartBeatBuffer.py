@@ -0,0 +1,167 @@
+########################################################################
+# $HeadURL$
+########################################################################
+""" Write-behind buffer of the job heart beats received by JobStateUpdate
+
+    Heart beats are coalesced per job in memory and written to the JobDB in
+    bulk by flush(): only the latest heart beat time and static data of a job
+    are kept, the dynamic data records keep their own time stamps.
+
+    Every heart beat is appended to a journal file before being acknowledged.
+    A flush moves the journal aside to <journal>.flushing and removes it once
+    the data is in the JobDB, so heart beats received before a service
+    restart are replayed from both files at start up.
+"""
+
+__RCSID__ = "$Id$"
+
+import os
+import threading
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Utilities import DEncode, Time
+
+class HeartBeatBuffer:
+
+  def __init__( self, jobDB, journalPath ):
+    self.__jobDB = jobDB
+    self.__journalPath = journalPath
+    self.__flushingPath = "%s.flushing" % journalPath
+    self.__log = gLogger.getSubLogger( "HeartBeatBuffer" )
+    #Heart beats received since the last flush { jobID : [ time, staticDict, dynamicList ] }
+    self.__pending = {}
+    #Heart beats of a failed flush, in the flushing journal as well
+    self.__failed = {}
+    self.__journal = None
+    #Protects the pending heart beats and the journal
+    self.__lock = threading.Lock()
+    #Only one flush at a time
+    self.__flushLock = threading.Lock()
+
+  def initialize( self ):
+    """ Load the heart beats not flushed by a previous run and open the journal
+    """
+    try:
+      journalDir = os.path.dirname( self.__journalPath )
+      if journalDir and not os.path.isdir( journalDir ):
+        os.makedirs( journalDir )
+      for path in ( self.__flushingPath, self.__journalPath ):
+        numRecords = self.__replay( path )
+        if numRecords:
+          self.__log.info( "Replayed %s heart beats from %s" % ( numRecords, path ) )
+      self.__journal = open( self.__journalPath, "ab" )
+    except Exception, excp:
+      return S_ERROR( "Cannot open the heart beat journal %s: %s" % ( self.__journalPath, str( excp ) ) )
+    return S_OK()
+
+  def __replay( self, path ):
+    """ Merge the heart beats journaled in path into the pending ones
+    """
+    if not os.path.isfile( path ):
+      return 0
+    numRecords = 0
+    jFile = open( path, "r+b" )
+    try:
+      while True:
+        recordStart = jFile.tell()
+        length = jFile.readline()
+        if not length.strip():
+          break
+        data = jFile.read( int( length ) )
+        #The service died while writing the last record, drop it so new ones can be appended
+        if len( data ) < int( length ) or length[-1] != "\n":
+          self.__log.warn( "Truncated record at the end of %s" % path )
+          jFile.truncate( recordStart )
+          break
+        jobID, heartBeatTime, staticData, dynamicData = DEncode.decode( data )[0]
+        self.__merge( self.__pending, jobID, heartBeatTime, staticData, dynamicData )
+        numRecords += 1
+    finally:
+      jFile.close()
+    return numRecords
+
+  def __merge( self, heartBeats, jobID, heartBeatTime, staticData, dynamicData ):
+    """ Coalesce one heart beat into heartBeats
+    """
+    if jobID not in heartBeats:
+      heartBeats[ jobID ] = [ heartBeatTime, {}, [] ]
+    entry = heartBeats[ jobID ]
+    entry[0] = max( entry[0], heartBeatTime )
+    entry[1].update( staticData )
+    entry[2].extend( [ ( key, value, heartBeatTime ) for key, value in dynamicData.items() ] )
+
+  def addHeartBeat( self, jobID, staticData, dynamicData ):
+    """ Journal a heart beat and keep it until the next flush
+    """
+    record = ( int( jobID ), Time.dateTime(), staticData, dynamicData )
+    try:
+      data = DEncode.encode( record )
+    except Exception, excp:
+      return S_ERROR( "Cannot encode the heart beat of job %s: %s" % ( jobID, str( excp ) ) )
+    self.__lock.acquire()
+    try:
+      try:
+        self.__journal.write( "%s\n%s" % ( len( data ), data ) )
+        self.__journal.flush()
+      except Exception, excp:
+        return S_ERROR( "Cannot journal the heart beat of job %s: %s" % ( jobID, str( excp ) ) )
+      self.__merge( self.__pending, *record )
+    finally:
+      self.__lock.release()
+    return S_OK()
+
+  def getNumPending( self ):
+    """ Number of jobs with heart beats waiting to be flushed
+    """
+    return len( self.__pending ) + len( self.__failed )
+
+  def flush( self ):
+    """ Write the buffered heart beats to the JobDB
+    """
+    self.__flushLock.acquire()
+    try:
+      self.__lock.acquire()
+      try:
+        heartBeats = self.__pending
+        if not heartBeats and not self.__failed:
+          return S_OK( 0 )
+        self.__pending = {}
+        #Append the journal to the one of the heart beats being flushed and start a new one
+        try:
+          self.__journal.close()
+          jFile = open( self.__journalPath, "rb" )
+          fFile = open( self.__flushingPath, "ab" )
+          try:
+            fFile.write( jFile.read() )
+            fFile.flush()
+            os.fsync( fFile.fileno() )
+          finally:
+            jFile.close()
+            fFile.close()
+          self.__journal = open( self.__journalPath, "wb" )
+        except Exception, excp:
+          #Keep the heart beats pending, they are still journaled
+          self.__pending = heartBeats
+          if self.__journal.closed:
+            self.__journal = open( self.__journalPath, "ab" )
+          return S_ERROR( "Cannot rotate the heart beat journal: %s" % str( excp ) )
+      finally:
+        self.__lock.release()
+
+      #Older heart beats of a failed flush go first
+      for jobID, ( heartBeatTime, staticData, dynamicList ) in heartBeats.items():
+        self.__merge( self.__failed, jobID, heartBeatTime, staticData, {} )
+        self.__failed[ jobID ][2].extend( dynamicList )
+      heartBeats = self.__failed
+      result = self.__jobDB.setHeartBeatDataForJobs( heartBeats )
+      if not result[ 'OK' ]:
+        self.__log.error( "Failed to flush the heart beats, will retry", result[ 'Message' ] )
+        return result
+      self.__failed = {}
+      try:
+        os.unlink( self.__flushingPath )
+      except OSError, excp:
+        self.__log.warn( "Cannot remove the flushed journal", str( excp ) )
+      self.__log.verbose( "Flushed the heart beats of %s jobs" % len( heartBeats ) )
+      return S_OK( len( heartBeats ) )
+    finally:
+      self.__flushLock.release()
@@ -0,0 +1,125 @@
+########################################################################
+# $HeadURL$
+########################################################################
+""" Helpers for the content addressed sandboxes of the SandboxStore
+
+    A chunked sandbox is an uncompressed tar archive split in chunks that
+    start at the tar member boundaries, so files shared by several sandboxes
+    end up in the same chunks. Chunks are identified by the md5 of their
+    content and travel and are stored zlib compressed. The SandboxStore keeps
+    a manifest with the list of chunks instead of the archive and rebuilds
+    the archive when the sandbox is downloaded.
+"""
+
+__RCSID__ = "$Id$"
+
+import re
+import zlib
+import tarfile
+try:
+  import hashlib as md5
+except:
+  import md5
+
+#Large files are split in chunks of this size
+CHUNK_SIZE = 4 * 1048576
+#Consecutive small pieces are packed together up to this size
+MIN_CHUNK_SIZE = 65536
+#Bigger chunks are refused by the SandboxStore
+MAX_CHUNK_SIZE = 16 * 1048576
+
+gChunkHashRE = re.compile( "^[0-9a-f]{32}$" )
+
+def isChunkHash( chunkHash ):
+  """ Check that chunkHash looks like a md5 hex digest
+  """
+  return type( chunkHash ) == type( "" ) and gChunkHashRE.match( chunkHash ) is not None
+
+def getTarChunks( tarPath, chunkSize = CHUNK_SIZE, minChunkSize = MIN_CHUNK_SIZE ):
+  """ Split an uncompressed tar archive in ( offset, length ) chunks. Member headers and
+      member data start new pieces, data is split every chunkSize bytes and consecutive
+      pieces are merged while they fit in minChunkSize
+  """
+  tf = tarfile.open( name = tarPath, mode = "r:" )
+  boundaries = []
+  try:
+    members = tf.getmembers()
+    endOffset = tf.offset
+  finally:
+    tf.close()
+  for i in range( len( members ) ):
+    tarInfo = members[i]
+    boundaries.append( tarInfo.offset )
+    if i + 1 < len( members ):
+      memberEnd = members[ i + 1 ].offset
+    else:
+      memberEnd = endOffset
+    dataOffset = tarInfo.offset_data
+    while dataOffset < memberEnd:
+      boundaries.append( dataOffset )
+      dataOffset += chunkSize
+  boundaries.append( endOffset )
+
+  fd = open( tarPath, "rb" )
+  try:
+    fd.seek( 0, 2 )
+    fileSize = fd.tell()
+  finally:
+    fd.close()
+  #End of archive blocks
+  boundaries.append( fileSize )
+
+  chunks = []
+  for i in range( len( boundaries ) - 1 ):
+    length = boundaries[ i + 1 ] - boundaries[ i ]
+    if length <= 0:
+      continue
+    if chunks and chunks[-1][1] + length <= minChunkSize:
+      chunks[-1] = ( chunks[-1][0], chunks[-1][1] + length )
+    else:
+      chunks.append( ( boundaries[ i ], length ) )
+  return chunks
+
+def getChunkHash( data ):
+  """ Identifier of a chunk given its uncompressed data
+  """
+  return md5.md5( data ).hexdigest()
+
+def compressChunk( data ):
+  """ Compress chunk data to be sent or stored
+  """
+  return zlib.compress( data, 6 )
+
+def decompressChunk( data, maxSize = MAX_CHUNK_SIZE ):
+  """ Decompress chunk data, refusing to expand it beyond maxSize
+  """
+  decompressor = zlib.decompressobj()
+  result = decompressor.decompress( data, maxSize )
+  if decompressor.unconsumed_tail:
+    raise ValueError( "Chunk bigger than %s bytes" % maxSize )
+  return result + decompressor.flush()
+
+class ChunkedFileReader:
+  """ File like object reading the concatenation of compressed chunk files
+  """
+
+  def __init__( self, chunkPaths ):
+    self.__chunkPaths = list( chunkPaths )
+    self.__buffer = ""
+
+  def read( self, size = -1 ):
+    while self.__chunkPaths and ( size < 0 or len( self.__buffer ) < size ):
+      fd = open( self.__chunkPaths.pop( 0 ), "rb" )
+      try:
+        self.__buffer += decompressChunk( fd.read() )
+      finally:
+        fd.close()
+    if size < 0:
+      size = len( self.__buffer )
+    data = self.__buffer[ :size ]
+    self.__buffer = self.__buffer[ size: ]
+    return data
+
+  def close( self ):
+    self.__chunkPaths = []
+    self.__buffer = ""
@@ -0,0 +1,106 @@
+########################################################################
+# $HeadURL$
+########################################################################
+""" Time bounded cache of the site conditions checked by the Matcher
+
+    The active site mask and the number of jobs deployed at a site per job
+    attribute value change on the scale of minutes but are needed for every
+    job request. They are kept in memory for a limited time:
+
+    - the site mask is reused while the site mask version of the JobDB, a one
+      row lookup increased by every change of the mask in any process, is the
+      one it was loaded with. Changes done in this process drop it at once. If
+      the version can not be read the mask is reloaded after its validity time
+    - the running counters are reloaded from the JobDB after their validity
+      time. In between, the jobs assigned by the Matcher are added to them so
+      the running limits stay respected between reloads
+"""
+
+__RCSID__ = "$Id$"
+
+import threading
+from DIRAC import gLogger, S_OK
+from DIRAC.Core.Utilities.DictCache import DictCache
+
+#Jobs counted against the running limits of a site
+RUNNING_STATES = [ 'Running', 'Matched', 'Stalled' ]
+
+class SiteConditionsCache:
+
+  def __init__( self, jobDB, maskValidity = 60, countersValidity = 60 ):
+    self.__jobDB = jobDB
+    self.__log = gLogger.getSubLogger( "SiteConditionsCache" )
+    self.__maskValidity = maskValidity
+    self.__countersValidity = countersValidity
+    self.__cache = DictCache()
+    #Site mask version of the JobDB when the cached mask was loaded
+    self.__maskVersion = None
+    #Protects the counters while they are being incremented
+    self.__lock = threading.Lock()
+    jobDB.addSiteMaskListener( self.invalidateSiteMask )
+
+  def getSiteMask( self ):
+    """ Get the list of active sites
+    """
+    siteMask = self.__cache.get( 'SiteMask' )
+    result = self.__jobDB.getSiteMaskVersion()
+    version = None
+    if result[ 'OK' ]:
+      version = result[ 'Value' ]
+    if siteMask is not False and ( version is None or version == self.__maskVersion ):
+      return S_OK( siteMask )
+    #The version is read first, a change done while loading the mask is seen at the next request
+    result = self.__jobDB.getSiteMask( siteState = 'Active' )
+    if not result[ 'OK' ]:
+      return result
+    siteMask = result[ 'Value' ]
+    #An empty mask is most likely a failed query, don't keep it
+    if siteMask:
+      self.__maskVersion = version
+      self.__cache.add( 'SiteMask', self.__maskValidity, siteMask )
+    return S_OK( siteMask )
+
+  def invalidateSiteMask( self, siteName = False ):
+    """ Forget the site mask, it will be reloaded at the next request
+    """
+    self.__log.verbose( "Site mask changed for %s" % siteName )
+    self.__cache.delete( 'SiteMask' )
+
+  def getRunningCounters( self, siteName, attName ):
+    """ Get the number of jobs deployed at siteName for each value of attName
+        Returns S_OK( { attValue : numJobs } )
+    """
+    cKey = ( 'Running', siteName, attName )
+    counters = self.__cache.get( cKey )
+    if counters is False:
+      result = self.__jobDB.getCounters( 'Jobs', [ attName ], { 'Site' : siteName, 'Status' : RUNNING_STATES } )
+      if not result[ 'OK' ]:
+        return result
+      counters = dict( [ ( k[0][ attName ], k[1] ) for k in result[ 'Value' ] ] )
+      self.__cache.add( cKey, self.__countersValidity, counters )
+    self.__lock.acquire()
+    try:
+      return S_OK( dict( counters ) )
+    finally:
+      self.__lock.release()
+
+  def addMatchedJobs( self, siteName, jobsAttrs ):
+    """ Count jobs just assigned to siteName in the cached running counters
+        jobsAttrs is { jobID : { attName : attValue } }
+    """
+    self.__lock.acquire()
+    try:
+      for jobID in jobsAttrs:
+        for attName, attValue in jobsAttrs[ jobID ].items():
+          counters = self.__cache.get( ( 'Running', siteName, attName ) )
+          if counters is not False:
+            counters[ attValue ] = counters.get( attValue, 0 ) + 1
+    finally:
+      self.__lock.release()
+
+  def invalidateSite( self, siteName ):
+    """ Forget the running counters of siteName
+    """
+    for cKey in self.__cache.getKeys():
+      if cKey[0] == 'Running' and cKey[1] == siteName:
+        self.__cache.delete( cKey )
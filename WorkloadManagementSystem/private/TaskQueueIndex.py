@@ -0,0 +1,372 @@
+########################################################################
+# $HeadURL$
+########################################################################
+""" In memory index of the task queues used by the Matcher
+
+    The index keeps the definition of every task queue and the jobs waiting
+    in them. Task queues are bucketed by Site, LHCbPlatform, SubmitPool and
+    CPUTime segment so a resource request only checks the task queues that
+    can possibly match it. The priority weighted random choice of task queue
+    and job that the TaskQueueDB does with ORDER BY RAND() is done in python.
+
+    The TaskQueueDB remains the reference: the only DB access while matching
+    is the atomic removal of the chosen job, and only one of the Matchers
+    trying to take the same job succeeds. Changes done by other processes
+    (new jobs, jobs taken by other Matcher instances, priority recalculation)
+    are picked up by refresh(), which only reloads the jobs of the task queues
+    whose ( numJobs, maxJobId, sumPriorities ) signature has changed.
+"""
+
+__RCSID__ = "$Id$"
+
+import types
+import random
+import threading
+from DIRAC import gLogger, S_OK, S_ERROR
+from DIRAC.Core.Security import Properties, CS
+
+class TaskQueueIndex:
+
+  #Match fields used to bucket the task queues. The TQ definition field is the plural
+  __bucketFields = ( 'Site', 'LHCbPlatform', 'SubmitPool' )
+  #Match fields TaskQueueDB._checkMatchDefinition requires
+  __mandatoryMatchFields = ( 'Setup', 'CPUTime' )
+
+  def __init__( self, tqDB, numJobsPerTry = 10, numQueuesPerTry = 10, maxMatchRetry = 3 ):
+    random.seed()
+    self.__tqDB = tqDB
+    self.__log = gLogger.getSubLogger( "TaskQueueIndex" )
+    self.__numJobsPerTry = numJobsPerTry
+    self.__numQueuesPerTry = numQueuesPerTry
+    self.__maxMatchRetry = maxMatchRetry
+    self.__multiValueMatchFields = tqDB.getMultiValueMatchFields()
+    self.__singleValueDefFields = tqDB.getSingleValueTQDefFields()
+    self.__lock = threading.Lock()
+    self.__refreshLock = threading.Lock()
+    #tqId -> TQ definition + Priority + Enabled
+    self.__taskQueues = {}
+    #tqId -> jobs signature in the DB when the jobs were loaded
+    self.__signatures = {}
+    #tqId -> { priority : [ realPriority, sorted list of jobIds ] }
+    self.__jobs = {}
+    #field -> { value : set( tqIds ) }
+    self.__buckets = dict( [ ( field, {} ) for field in self.__bucketFields ] )
+    #field -> set( tqIds ) of the TQs without restrictions for that field
+    self.__unrestricted = dict( [ ( field, set() ) for field in self.__bucketFields ] )
+    #CPUTime segment -> set( tqIds )
+    self.__cpuBuckets = {}
+
+  def getNumTaskQueues( self ):
+    return len( self.__taskQueues )
+
+  #####
+  #
+  # Index maintenance
+  #
+  #####
+
+  def refresh( self ):
+    """ Synchronize the index with the TaskQueueDB
+    """
+    #If another thread is already refreshing there's nothing to do
+    if not self.__refreshLock.acquire( False ):
+      return S_OK()
+    try:
+      result = self.__tqDB.getTaskQueuesState()
+      if not result[ 'OK' ]:
+        return result
+      dbState = result[ 'Value' ]
+      newTQs = [ tqId for tqId in dbState if tqId not in self.__taskQueues ]
+      result = self.__tqDB.getTaskQueuesMultiValues( newTQs )
+      if not result[ 'OK' ]:
+        return result
+      multiValues = result[ 'Value' ]
+      changedTQs = [ tqId for tqId in dbState if dbState[ tqId ][ 'JobsSignature' ] != self.__signatures.get( tqId ) ]
+      result = self.__tqDB.getJobsInTaskQueues( changedTQs )
+      if not result[ 'OK' ]:
+        return result
+      jobsData = result[ 'Value' ]
+
+      self.__lock.acquire()
+      try:
+        for tqId in [ tqId for tqId in self.__taskQueues if tqId not in dbState ]:
+          self.__removeTaskQueue( tqId )
+        for tqId in newTQs:
+          tqDict = dict( dbState[ tqId ] )
+          del tqDict[ 'JobsSignature' ]
+          tqDict.update( multiValues[ tqId ] )
+          self.__addTaskQueue( tqId, tqDict )
+        for tqId in dbState:
+          self.__taskQueues[ tqId ][ 'Priority' ] = dbState[ tqId ][ 'Priority' ]
+          self.__taskQueues[ tqId ][ 'Enabled' ] = dbState[ tqId ][ 'Enabled' ]
+        for tqId in changedTQs:
+          self.__jobs[ tqId ] = self.__groupJobs( jobsData[ tqId ] )
+          self.__signatures[ tqId ] = dbState[ tqId ][ 'JobsSignature' ]
+      finally:
+        self.__lock.release()
+      self.__log.verbose( "Index refreshed", "%s TQs, %s new, %s with changed jobs" % ( len( dbState ),
+                                                                                      len( newTQs ),
+                                                                                      len( changedTQs ) ) )
+      return S_OK()
+    finally:
+      self.__refreshLock.release()
+
+  def __groupJobs( self, jobsList ):
+    jobs = {}
+    for jobId, priority, realPriority in jobsList:
+      if priority not in jobs:
+        jobs[ priority ] = [ realPriority, [] ]
+      jobs[ priority ][1].append( jobId )
+    for priority in jobs:
+      jobs[ priority ][1].sort()
+    return jobs
+
+  def __addTaskQueue( self, tqId, tqDict ):
+    self.__taskQueues[ tqId ] = tqDict
+    for field in self.__bucketFields:
+      values = tqDict.get( "%ss" % field, [] )
+      if not values:
+        self.__unrestricted[ field ].add( tqId )
+      for value in values:
+        if value not in self.__buckets[ field ]:
+          self.__buckets[ field ][ value ] = set()
+        self.__buckets[ field ][ value ].add( tqId )
+    cpuTime = tqDict[ 'CPUTime' ]
+    if cpuTime not in self.__cpuBuckets:
+      self.__cpuBuckets[ cpuTime ] = set()
+    self.__cpuBuckets[ cpuTime ].add( tqId )
+
+  def __removeTaskQueue( self, tqId ):
+    tqDict = self.__taskQueues.pop( tqId )
+    self.__signatures.pop( tqId, None )
+    self.__jobs.pop( tqId, None )
+    for field in self.__bucketFields:
+      self.__unrestricted[ field ].discard( tqId )
+      for value in tqDict.get( "%ss" % field, [] ):
+        bucket = self.__buckets[ field ].get( value )
+        if bucket is not None:
+          bucket.discard( tqId )
+          if not bucket:
+            del self.__buckets[ field ][ value ]
+    bucket = self.__cpuBuckets[ tqDict[ 'CPUTime' ] ]
+    bucket.discard( tqId )
+    if not bucket:
+      del self.__cpuBuckets[ tqDict[ 'CPUTime' ] ]
+
+  #####
+  #
+  # Matching
+  #
+  #####
+
+  def __listify( self, value ):
+    if type( value ) in ( types.ListType, types.TupleType ):
+      return value
+    return [ value ]
+
+  def __getCandidateTaskQueues( self, tqMatchDict ):
+    """ Get the TQs in the buckets the resource falls in
+    """
+    if 'CPUTime' in tqMatchDict:
+      maxCPUTime = max( self.__listify( tqMatchDict[ 'CPUTime' ] ) )
+      candidates = set()
+      for cpuTime in self.__cpuBuckets:
+        if cpuTime <= maxCPUTime:
+          candidates.update( self.__cpuBuckets[ cpuTime ] )
+    else:
+      candidates = set( self.__taskQueues )
+    for field in self.__bucketFields:
+      if not tqMatchDict.get( field ):
+        continue
+      allowed = set( self.__unrestricted[ field ] )
+      for value in self.__listify( tqMatchDict[ field ] ):
+        allowed.update( self.__buckets[ field ].get( value, () ) )
+      candidates.intersection_update( allowed )
+    return candidates
+
+  def __ownerMatches( self, tqDict, tqMatchDict ):
+    if 'OwnerDN' in tqMatchDict and 'OwnerGroup' in tqMatchDict:
+      dns = self.__listify( tqMatchDict[ 'OwnerDN' ] )
+      for group in self.__listify( tqMatchDict[ 'OwnerGroup' ] ):
+        if tqDict[ 'OwnerGroup' ] != group:
+          continue
+        if Properties.JOB_SHARING in CS.getPropertiesForGroup( group ) or tqDict[ 'OwnerDN' ] in dns:
+          return True
+      return False
+    for field in ( 'OwnerGroup', 'OwnerDN' ):
+      if field in tqMatchDict and tqDict[ field ] not in self.__listify( tqMatchDict[ field ] ):
+        return False
+    return True
+
+  def __taskQueueMatches( self, tqDict, tqMatchDict, negativeCond ):
+    """ Same conditions as the SQL generated by the TaskQueueDB
+    """
+    if not tqDict[ 'Enabled' ]:
+      return False
+    if not self.__ownerMatches( tqDict, tqMatchDict ):
+      return False
+    if 'CPUTime' in tqMatchDict and tqDict[ 'CPUTime' ] > max( self.__listify( tqMatchDict[ 'CPUTime' ] ) ):
+      return False
+    if 'Setup' in tqMatchDict and tqDict[ 'Setup' ] not in self.__listify( tqMatchDict[ 'Setup' ] ):
+      return False
+    for field in self.__multiValueMatchFields:
+      tqValues = tqDict.get( "%ss" % field, [] )
+      if tqMatchDict.get( field ):
+        values = self.__listify( tqMatchDict[ field ] )
+        #Jobs for masked sites can only be matched if they explicitly require the GridCE
+        allowUnrestricted = field != 'GridCE' or 'Site' in tqMatchDict
+        if not ( allowUnrestricted and not tqValues ):
+          for value in values:
+            if value in tqValues:
+              break
+          else:
+            return False
+        if field == 'Site':
+          bannedValues = tqDict.get( 'BannedSites', [] )
+          for value in values:
+            if value in bannedValues:
+              return False
+      bannedField = "Banned%s" % field
+      if tqMatchDict.get( bannedField ):
+        for value in self.__listify( tqMatchDict[ bannedField ] ):
+          if value in tqValues:
+            return False
+    if 'PilotType' not in tqMatchDict and tqDict.get( 'PilotTypes' ):
+      return False
+    for field in negativeCond:
+      if field in self.__multiValueMatchFields:
+        tqValues = tqDict.get( "%ss" % field, [] )
+        for value in negativeCond[ field ]:
+          if value in tqValues:
+            return False
+      elif field in self.__singleValueDefFields:
+        if tqDict[ field ] in negativeCond[ field ]:
+          return False
+    return True
+
+  def getMatchingTaskQueues( self, tqMatchDict, negativeCond = {} ):
+    """ Get the ids of the TQs with jobs matching the request sorted by
+        RAND() / Priority as the TaskQueueDB does
+    """
+    self.__lock.acquire()
+    try:
+      sortList = []
+      for tqId in self.__getCandidateTaskQueues( tqMatchDict ):
+        if not self.__jobs.get( tqId ):
+          continue
+        tqDict = self.__taskQueues[ tqId ]
+        if self.__taskQueueMatches( tqDict, tqMatchDict, negativeCond ):
+          sortList.append( ( random.random() / max( tqDict[ 'Priority' ], 10 ** -6 ), tqId ) )
+    finally:
+      self.__lock.release()
+    sortList.sort()
+    return [ tqId for rnd, tqId in sortList ]
+
+  def __popJob( self, tqId ):
+    """ Take a job out of the index for a TQ the same way the TaskQueueDB does:
+        the job priority is chosen by ORDER BY RAND() / RealPriority and then
+        one of the first jobs with that priority is picked randomly.
+        The minimum of n uniform random numbers is drawn as 1 - U ** ( 1/n ),
+        so only one random number per priority is needed.
+        Returns ( jobId, priority, tqIsEmpty ) or False
+    """
+    self.__lock.acquire()
+    try:
+      jobs = self.__jobs.get( tqId )
+      if not jobs:
+        return False
+      winner = False
+      for priority in jobs:
+        realPriority, jobIds = jobs[ priority ]
+        rnd = ( 1 - random.random() ** ( 1.0 / len( jobIds ) ) ) / max( realPriority, 10 ** -6 )
+        if winner is False or rnd < winner[0]:
+          winner = ( rnd, priority )
+      priority = winner[1]
+      jobIds = jobs[ priority ][1]
+      jobId = jobIds.pop( random.randint( 0, min( self.__numJobsPerTry, len( jobIds ) ) - 1 ) )
+      if not jobIds:
+        del jobs[ priority ]
+      return ( jobId, priority, not jobs )
+    finally:
+      self.__lock.release()
+
+  def __forgetJobs( self, tqId ):
+    """ Something went wrong with this TQ, reload its jobs on the next refresh
+    """
+    self.__lock.acquire()
+    try:
+      self.__signatures.pop( tqId, None )
+    finally:
+      self.__lock.release()
+
+  def __checkMatchDefinition( self, tqMatchDict ):
+    """ Same checks as TaskQueueDB._checkMatchDefinition, values are not escaped as they are not used in SQL
+    """
+    def checkType( value, validTypes ):
+      if type( value ) in ( types.ListType, types.TupleType ):
+        for subValue in value:
+          if type( subValue ) not in validTypes:
+            return S_ERROR( "List contained type %s is not valid -> %s" % ( type( subValue ), validTypes ) )
+      elif type( value ) not in validTypes:
+        return S_ERROR( "Type %s is not valid -> %s" % ( type( value ), validTypes ) )
+      return S_OK()
+
+    for field in self.__singleValueDefFields:
+      if field not in tqMatchDict:
+        if field in self.__mandatoryMatchFields:
+          return S_ERROR( "Missing mandatory field '%s' in match request definition" % field )
+        continue
+      if field == "CPUTime":
+        result = checkType( tqMatchDict[ field ], ( types.IntType, types.LongType ) )
+      else:
+        result = checkType( tqMatchDict[ field ], ( types.StringType, types.UnicodeType ) )
+      if not result[ 'OK' ]:
+        return S_ERROR( "Match definition field %s failed : %s" % ( field, result[ 'Message' ] ) )
+    for multiField in self.__multiValueMatchFields:
+      for field in ( multiField, "Banned%s" % multiField ):
+        if field in tqMatchDict:
+          result = checkType( tqMatchDict[ field ], ( types.StringType, types.UnicodeType ) )
+          if not result[ 'OK' ]:
+            return S_ERROR( "Match definition field %s failed : %s" % ( field, result[ 'Message' ] ) )
+    return S_OK()
+
+  def matchAndGetJob( self, tqMatchDict, negativeCond = {} ):
+    """ Match a job. Same interface as TaskQueueDB.matchAndGetJob
+    """
+    retVal = self.__checkMatchDefinition( tqMatchDict )
+    if not retVal[ 'OK' ]:
+      self.__log.error( "TQ match request check failed", retVal[ 'Message' ] )
+      return retVal
+    for matchTry in range( self.__maxMatchRetry ):
+      tqList = self.getMatchingTaskQueues( tqMatchDict, negativeCond = negativeCond )
+      if not tqList:
+        self.__log.info( "No TQ matches requirements" )
+        return S_OK( { 'matchFound' : False, 'tqMatch' : tqMatchDict } )
+      for tqId in tqList[ :self.__numQueuesPerTry ]:
+        tqDict = self.__taskQueues.get( tqId )
+        if not tqDict:
+          continue
+        for jobTry in range( self.__numJobsPerTry ):
+          jobTuple = self.__popJob( tqId )
+          if not jobTuple:
+            break
+          jobId, priority, tqIsEmpty = jobTuple
+          result = self.__tqDB.extractJobFromTaskQueue( jobId, tqId, tqDict[ 'OwnerDN' ], tqDict[ 'OwnerGroup' ],
+                                                        deleteTQIfEmpty = tqIsEmpty )
+          if not result[ 'OK' ]:
+            self.__forgetJobs( tqId )
+            msgFix = "Could not take job"
+            msgVar = " %s out from the TQ %s: %s" % ( jobId, tqId, result[ 'Message' ] )
+            self.__log.error( msgFix, msgVar )
+            return S_ERROR( msgFix + msgVar )
+          if result[ 'Value' ]:
+            self.__log.info( "Extracted job %s with prio %s from TQ %s" % ( jobId, priority, tqId ) )
+            return S_OK( { 'matchFound' : True, 'jobId' : jobId, 'taskQueueId' : tqId, 'tqMatch' : tqMatchDict } )
+          #Somebody else took it
+          if tqIsEmpty:
+            result = self.__tqDB.deleteTaskQueueIfEmpty( tqId, tqDict[ 'OwnerDN' ], tqDict[ 'OwnerGroup' ] )
+            if not result[ 'OK' ]:
+              return result
+        self.__log.info( "No jobs could be extracted from TQ %s" % tqId )
+    self.__log.info( "Could not find a match after %s match retries" % self.__maxMatchRetry )
+    return S_ERROR( "Could not find a match after %s match retries" % self.__maxMatchRetry )
@@ -0,0 +1,90 @@
+########################################################################
+# $HeadURL $
+# File: HeartBeatBufferTestCase.py
+########################################################################
+
+""".. module:: HeartBeatBufferTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import shutil
+import tempfile
+import unittest
+## from DIRAC
+from DIRAC import S_OK, S_ERROR
+## SUT
+from DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer import HeartBeatBuffer
+
+class MemoryJobDB:
+  """ keeps what setHeartBeatDataForJobs is given """
+
+  def __init__( self ):
+    self.flushes = []
+    self.fail = False
+
+  def setHeartBeatDataForJobs( self, heartBeatDict ):
+    if self.fail:
+      return S_ERROR( "DB down" )
+    self.flushes.append( heartBeatDict )
+    return S_OK()
+
+########################################################################
+class HeartBeatBufferTestCase( unittest.TestCase ):
+  """py:class HeartBeatBufferTestCase
+  Test case for DIRAC.WorkloadManagementSystem.private.HeartBeatBuffer module.
+  """
+
+  def setUp( self ):
+    self.tmpDir = tempfile.mkdtemp()
+    self.journal = os.path.join( self.tmpDir, "work", "heartbeats.journal" )
+    self.jobDB = MemoryJobDB()
+    self.buffer = HeartBeatBuffer( self.jobDB, self.journal )
+    self.assertEqual( self.buffer.initialize()[ 'OK' ], True )
+
+  def tearDown( self ):
+    shutil.rmtree( self.tmpDir )
+
+  def testCoalesce( self ):
+    """ one entry per job with the latest static data and all dynamic records """
+    self.buffer.addHeartBeat( 1, { 'Node' : 'a' }, { 'LoadAverage' : 1.0 } )
+    self.buffer.addHeartBeat( 1, { 'Node' : 'b' }, { 'LoadAverage' : 2.0 } )
+    self.buffer.addHeartBeat( 2, {}, { 'MemoryUsed' : 100 } )
+    self.assertEqual( self.buffer.getNumPending(), 2 )
+    self.assertEqual( self.buffer.flush()[ 'Value' ], 2 )
+    heartBeats = self.jobDB.flushes[0]
+    self.assertEqual( heartBeats[1][1], { 'Node' : 'b' } )
+    self.assertEqual( [ record[1] for record in heartBeats[1][2] ], [ 1.0, 2.0 ] )
+    self.assertEqual( heartBeats[1][0], heartBeats[1][2][1][2] )
+    self.assertEqual( self.buffer.flush()[ 'Value' ], 0 )
+    self.assertEqual( os.path.exists( self.journal + ".flushing" ), False )
+
+  def testRestart( self ):
+    """ heart beats not flushed are replayed by a new buffer """
+    self.buffer.addHeartBeat( 1, { 'Node' : 'a' }, { 'LoadAverage' : 1.0 } )
+    self.jobDB.fail = True
+    self.assertEqual( self.buffer.flush()[ 'OK' ], False )
+    self.assertEqual( self.buffer.getNumPending(), 1 )
+    self.buffer.addHeartBeat( 2, {}, { 'MemoryUsed' : 100 } )
+    #A half written record is ignored
+    jFile = open( self.journal, "ab" )
+    jFile.write( "100\nabc" )
+    jFile.close()
+    jobDB = MemoryJobDB()
+    restarted = HeartBeatBuffer( jobDB, self.journal )
+    self.assertEqual( restarted.initialize()[ 'OK' ], True )
+    self.assertEqual( restarted.getNumPending(), 2 )
+    self.assertEqual( restarted.flush()[ 'OK' ], True )
+    self.assertEqual( sorted( jobDB.flushes[0].keys() ), [ 1, 2 ] )
+    self.assertEqual( os.path.getsize( self.journal ), 0 )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( HeartBeatBufferTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
@@ -0,0 +1,95 @@
+########################################################################
+# $HeadURL $
+# File: SandboxChunksTestCase.py
+########################################################################
+
+""".. module:: SandboxChunksTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.private.SandboxChunks module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import os
+import random
+import shutil
+import tarfile
+import tempfile
+import unittest
+## SUT
+from DIRAC.WorkloadManagementSystem.private.SandboxChunks import getTarChunks, getChunkHash, compressChunk, \
+                                                                 decompressChunk, ChunkedFileReader
+
+########################################################################
+class SandboxChunksTestCase( unittest.TestCase ):
+  """py:class SandboxChunksTestCase
+  Test case for DIRAC.WorkloadManagementSystem.private.SandboxChunks module.
+  """
+
+  def setUp( self ):
+    self.tmpDir = tempfile.mkdtemp()
+    random.seed( 1 )
+    bigData = "".join( [ chr( random.randint( 0, 255 ) ) for i in range( 300000 ) ] )
+    for fileName, data in ( ( "big.dat", bigData ), ( "jdl", "Executable = \"a\";" ), ( "jdl2", "Executable = \"b\";" ) ):
+      fd = open( os.path.join( self.tmpDir, fileName ), "wb" )
+      fd.write( data )
+      fd.close()
+
+  def tearDown( self ):
+    shutil.rmtree( self.tmpDir )
+
+  def __makeTar( self, tarName, fileNames ):
+    tarPath = os.path.join( self.tmpDir, tarName )
+    tf = tarfile.open( name = tarPath, mode = "w" )
+    for fileName in fileNames:
+      tf.add( os.path.join( self.tmpDir, fileName ), fileName )
+    tf.close()
+    return tarPath
+
+  def __getChunks( self, tarPath ):
+    fd = open( tarPath, "rb" )
+    chunks = []
+    for offset, length in getTarChunks( tarPath, chunkSize = 100000, minChunkSize = 4096 ):
+      fd.seek( offset )
+      chunks.append( fd.read( length ) )
+    fd.close()
+    return chunks
+
+  def testSplit( self ):
+    """ chunks cover the archive and the shared file gives the same chunks """
+    tarPath = self.__makeTar( "a.tar", [ "jdl", "big.dat" ] )
+    chunksA = self.__getChunks( tarPath )
+    self.assertEqual( "".join( chunksA ), open( tarPath, "rb" ).read() )
+    self.assertEqual( len( chunksA ) > 4, True )
+    chunksB = self.__getChunks( self.__makeTar( "b.tar", [ "jdl2", "big.dat" ] ) )
+    hashesA = set( [ getChunkHash( chunk ) for chunk in chunksA ] )
+    hashesB = set( [ getChunkHash( chunk ) for chunk in chunksB ] )
+    #Only the pieces with the different small file are not shared
+    self.assertEqual( len( hashesB - hashesA ), 1 )
+
+  def testReader( self ):
+    """ the reader rebuilds the archive from compressed chunk files """
+    tarPath = self.__makeTar( "a.tar", [ "jdl", "big.dat" ] )
+    chunkPaths = []
+    for chunk in self.__getChunks( tarPath ):
+      chunkPath = os.path.join( self.tmpDir, getChunkHash( chunk ) )
+      fd = open( chunkPath, "wb" )
+      fd.write( compressChunk( chunk ) )
+      fd.close()
+      chunkPaths.append( chunkPath )
+    reader = ChunkedFileReader( chunkPaths )
+    data = []
+    buf = reader.read( 65536 )
+    while buf:
+      data.append( buf )
+      buf = reader.read( 65536 )
+    self.assertEqual( "".join( data ), open( tarPath, "rb" ).read() )
+    self.assertRaises( ValueError, decompressChunk, compressChunk( "x" * 1000 ), 100 )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( SandboxChunksTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
@@ -0,0 +1,102 @@
+########################################################################
+# $HeadURL $
+# File: SiteConditionsCacheTestCase.py
+########################################################################
+
+""".. module:: SiteConditionsCacheTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.private.SiteConditionsCache module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.private.SiteConditionsCache import SiteConditionsCache
+
+class MemoryJobDB:
+  """ the JobDB methods used by the cache, counting the queries """
+
+  def __init__( self ):
+    self.siteMask = [ 'LCG.CERN.ch', 'LCG.CNAF.it' ]
+    self.running = { 'LCG.CERN.ch' : { 'MCSimulation' : 10, 'Merge' : 2 } }
+    self.listeners = []
+    self.queries = 0
+    self.maskVersion = 0
+
+  def addSiteMaskListener( self, callback ):
+    self.listeners.append( callback )
+    return S_OK()
+
+  def getSiteMaskVersion( self ):
+    return S_OK( self.maskVersion )
+
+  def banSiteInMask( self, site ):
+    self.siteMask.remove( site )
+    self.maskVersion += 1
+    for callback in self.listeners:
+      callback( site )
+    return S_OK()
+
+  def getSiteMask( self, siteState = 'Active' ):
+    self.queries += 1
+    return S_OK( list( self.siteMask ) )
+
+  def getCounters( self, table, attrList, condDict ):
+    self.queries += 1
+    counters = self.running.get( condDict[ 'Site' ], {} )
+    return S_OK( [ ( { attrList[0] : attValue }, counters[ attValue ] ) for attValue in counters ] )
+
+########################################################################
+class SiteConditionsCacheTestCase( unittest.TestCase ):
+  """py:class SiteConditionsCacheTestCase
+  Test case for DIRAC.WorkloadManagementSystem.private.SiteConditionsCache module.
+  """
+
+  def setUp( self ):
+    self.jobDB = MemoryJobDB()
+    self.cache = SiteConditionsCache( self.jobDB )
+
+  def testSiteMask( self ):
+    """ the mask is queried once and reloaded after a change """
+    for i in range( 10 ):
+      self.assertEqual( self.cache.getSiteMask()[ 'Value' ], [ 'LCG.CERN.ch', 'LCG.CNAF.it' ] )
+    self.assertEqual( self.jobDB.queries, 1 )
+    self.jobDB.banSiteInMask( 'LCG.CERN.ch' )
+    self.assertEqual( self.cache.getSiteMask()[ 'Value' ], [ 'LCG.CNAF.it' ] )
+    self.assertEqual( self.jobDB.queries, 2 )
+
+  def testSiteMaskOtherProcess( self ):
+    """ changes done by other processes are seen through the mask version """
+    self.assertEqual( self.cache.getSiteMask()[ 'Value' ], [ 'LCG.CERN.ch', 'LCG.CNAF.it' ] )
+    self.jobDB.siteMask.remove( 'LCG.CNAF.it' )
+    self.jobDB.maskVersion += 1
+    self.assertEqual( self.cache.getSiteMask()[ 'Value' ], [ 'LCG.CERN.ch' ] )
+    self.assertEqual( self.cache.getSiteMask()[ 'Value' ], [ 'LCG.CERN.ch' ] )
+    self.assertEqual( self.jobDB.queries, 2 )
+
+  def testRunningCounters( self ):
+    """ counters are cached and follow the assigned jobs """
+    self.assertEqual( self.cache.getRunningCounters( 'LCG.CERN.ch', 'JobType' )[ 'Value' ],
+                      { 'MCSimulation' : 10, 'Merge' : 2 } )
+    self.cache.addMatchedJobs( 'LCG.CERN.ch', { 1 : { 'JobType' : 'Merge' }, 2 : { 'JobType' : 'User' } } )
+    self.cache.addMatchedJobs( 'LCG.CNAF.it', { 3 : { 'JobType' : 'Merge' } } )
+    self.assertEqual( self.cache.getRunningCounters( 'LCG.CERN.ch', 'JobType' )[ 'Value' ],
+                      { 'MCSimulation' : 10, 'Merge' : 3, 'User' : 1 } )
+    self.assertEqual( self.jobDB.queries, 1 )
+    #Jobs are not counted for sites not loaded yet, the DB has them
+    self.assertEqual( self.cache.getRunningCounters( 'LCG.CNAF.it', 'JobType' )[ 'Value' ], {} )
+    self.cache.invalidateSite( 'LCG.CERN.ch' )
+    self.assertEqual( self.cache.getRunningCounters( 'LCG.CERN.ch', 'JobType' )[ 'Value' ],
+                      { 'MCSimulation' : 10, 'Merge' : 2 } )
+    self.assertEqual( self.jobDB.queries, 3 )
+
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( SiteConditionsCacheTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )
@@ -0,0 +1,165 @@
+########################################################################
+# $HeadURL $
+# File: TaskQueueIndexTestCase.py
+########################################################################
+
+""".. module:: TaskQueueIndexTestCase
+
+Test cases for DIRAC.WorkloadManagementSystem.private.TaskQueueIndex module.
+
+"""
+
+__RCSID__ = "$Id $"
+
+## imports
+import unittest
+## from DIRAC
+from DIRAC import S_OK
+## SUT
+from DIRAC.WorkloadManagementSystem.private.TaskQueueIndex import TaskQueueIndex
+
+class MemoryTaskQueueDB:
+  """ the TaskQueueDB methods used by the index, backed by dicts """
+
+  def __init__( self ):
+    self.taskQueues = {}
+    self.jobs = {}
+    self.extracted = []
+
+  def addTaskQueue( self, tqId, jobs, priority = 1.0, **tqDef ):
+    tqDict = { 'TQId' : tqId, 'Priority' : priority, 'Enabled' : True, 'OwnerDN' : '/DN/user',
+               'OwnerGroup' : 'user', 'Setup' : 'Production', 'CPUTime' : 86400 }
+    tqDict.update( tqDef )
+    self.taskQueues[ tqId ] = tqDict
+    for jobId, jobPriority in jobs:
+      self.jobs[ jobId ] = ( tqId, jobPriority )
+
+  def getMultiValueMatchFields( self ):
+    return ( 'GridCE', 'Site', 'GridMiddleware', 'LHCbPlatform', 'PilotType', 'SubmitPool', 'JobType' )
+
+  def getSingleValueTQDefFields( self ):
+    return ( 'OwnerDN', 'OwnerGroup', 'Setup', 'CPUTime' )
+
+  def getTaskQueuesState( self ):
+    state = {}
+    for tqId, tqDict in self.taskQueues.items():
+      tqJobs = [ ( jobId, prio ) for jobId, ( jobTQ, prio ) in self.jobs.items() if jobTQ == tqId ]
+      signature = ( 0, 0, 0 )
+      if tqJobs:
+        signature = ( len( tqJobs ), max( [ j[0] for j in tqJobs ] ), sum( [ j[1] for j in tqJobs ] ) )
+      state[ tqId ] = dict( [ ( k, v ) for k, v in tqDict.items() if k[-1] != 's' ] )
+      state[ tqId ][ 'JobsSignature' ] = signature
+    return S_OK( state )
+
+  def getTaskQueuesMultiValues( self, tqIdList ):
+    return S_OK( dict( [ ( tqId, dict( [ ( k, v ) for k, v in self.taskQueues[ tqId ].items() if k[-1] == 's' ] ) )
+                         for tqId in tqIdList ] ) )
+
+  def getJobsInTaskQueues( self, tqIdList ):
+    data = dict( [ ( tqId, [] ) for tqId in tqIdList ] )
+    for jobId, ( tqId, prio ) in self.jobs.items():
+      if tqId in data:
+        data[ tqId ].append( ( jobId, prio, float( prio ) ) )
+    return S_OK( data )
+
+  def extractJobFromTaskQueue( self, jobId, tqId, ownerDN, ownerGroup, deleteTQIfEmpty = True ):
+    if jobId not in self.jobs:
+      return S_OK( False )
+    del self.jobs[ jobId ]
+    self.extracted.append( jobId )
+    return S_OK( True )
+
+  def deleteTaskQueueIfEmpty( self, tqId, ownerDN = False, ownerGroup = False ):
+    return S_OK( False )
+
+########################################################################
+class TaskQueueIndexTestCase( unittest.TestCase ):
+  """py:class TaskQueueIndexTestCase
+  Test case for DIRAC.WorkloadManagementSystem.private.TaskQueueIndex module.
+  """
+
+  def setUp( self ):
+    self.tqDB = MemoryTaskQueueDB()
+    self.tqDB.addTaskQueue( 1, [ ( 10, 1 ), ( 11, 1 ) ], Sites = [ 'LCG.CERN.ch' ] )
+    self.tqDB.addTaskQueue( 2, [ ( 20, 1 ) ], BannedSites = [ 'LCG.CERN.ch' ] )
+    self.tqDB.addTaskQueue( 3, [ ( 30, 1 ) ], CPUTime = 500000 )
+    self.tqDB.addTaskQueue( 4, [ ( 40, 1 ) ], LHCbPlatforms = [ 'slc5' ], JobTypes = [ 'MCSimulation' ] )
+    self.tqDB.addTaskQueue( 5, [ ( 50, 1 ) ], PilotTypes = [ 'private' ] )
+    self.index = TaskQueueIndex( self.tqDB )
+    self.assertEqual( self.index.refresh()[ 'OK' ], True )
+    self.resource = { 'Setup' : 'Production', 'CPUTime' : 100000, 'OwnerDN' : '/DN/user', 'OwnerGroup' : 'user' }
+
+  def testMatching( self ):
+    """ same conditions as the SQL matching """
+    self.assertEqual( sorted( self.index.getMatchingTaskQueues( self.resource ) ), [ 1, 2, 4 ] )
+    resource = dict( self.resource, Site = 'LCG.CERN.ch', LHCbPlatform = 'slc6' )
+    self.assertEqual( sorted( self.index.getMatchingTaskQueues( resource ) ), [ 1 ] )
+    resource = dict( self.resource, Site = 'LCG.CNAF.it', LHCbPlatform = 'slc5', CPUTime = 10 ** 6 )
+    self.assertEqual( sorted( self.index.getMatchingTaskQueues( resource ) ), [ 2, 3, 4 ] )
+    self.assertEqual( sorted( self.index.getMatchingTaskQueues( resource, { 'JobType' : [ 'MCSimulation' ] } ) ), [ 2, 3 ] )
+    resource = dict( self.resource, PilotType = 'private' )
+    self.assertEqual( sorted( self.index.getMatchingTaskQueues( resource ) ), [ 1, 2, 4, 5 ] )
+    resource = dict( self.resource, OwnerDN = '/DN/other' )
+    self.assertEqual( self.index.getMatchingTaskQueues( resource ), [] )
+
+  def testMatchAndRefresh( self ):
+    """ jobs are taken once and changes in the DB are picked up """
+    resource = dict( self.resource, Site = 'LCG.CERN.ch', LHCbPlatform = 'slc6' )
+    matched = []
+    for i in range( 2 ):
+      result = self.index.matchAndGetJob( resource )
+      self.assertEqual( result[ 'Value' ][ 'matchFound' ], True )
+      matched.append( result[ 'Value' ][ 'jobId' ] )
+    self.assertEqual( sorted( matched ), [ 10, 11 ] )
+    self.assertEqual( self.index.matchAndGetJob( resource )[ 'Value' ][ 'matchFound' ], False )
+    #A job taken by somebody else is skipped
+    resource = dict( self.resource, LHCbPlatform = 'slc5' )
+    del self.tqDB.jobs[ 40 ]
+    result = self.index.matchAndGetJob( resource )
+    self.assertEqual( result[ 'Value' ][ 'jobId' ], 20 )
+    self.assertEqual( self.index.matchAndGetJob( resource )[ 'Value' ][ 'matchFound' ], False )
+    #New jobs and task queues show up after a refresh
+    self.tqDB.jobs[ 41 ] = ( 4, 1 )
+    self.tqDB.addTaskQueue( 6, [ ( 60, 1 ) ], LHCbPlatforms = [ 'slc5' ] )
+    self.index.refresh()
+    result = self.index.matchAndGetJob( dict( resource, JobType = 'User' ) )
+    self.assertEqual( result[ 'Value' ][ 'jobId' ] in ( 41, 60 ), True )
+
+  def testPriorities( self ):
+    """ task queues and jobs are sampled according to their priorities """
+    tqDB = MemoryTaskQueueDB()
+    tqDB.addTaskQueue( 1, [ ( jobId, 1 ) for jobId in range( 1000 ) ], priority = 1.0 )
+    tqDB.addTaskQueue( 2, [ ( jobId, 1 ) for jobId in range( 1000, 2000 ) ], priority = 3.0 )
+    tqDB.addTaskQueue( 3, [ ( jobId, 1 ) for jobId in range( 2000, 2900 ) ] + [ ( 2900 + jobId, 10 ) for jobId in range( 100 ) ],
+                       priority = 0.001, Setup = 'Certification' )
+    index = TaskQueueIndex( tqDB )
+    index.refresh()
+    tqCount = { 1 : 0, 2 : 0 }
+    for i in range( 800 ):
+      tqCount[ index.getMatchingTaskQueues( self.resource )[0] ] += 1
+    #P(TQ1 first) = 1/6 when comparing U1/1 and U2/3
+    self.assertEqual( 80 < tqCount[1] < 200, True )
+    #Jobs with priority 10 win most of the time even being fewer
+    highPrio = 0
+    for i in range( 200 ):
+      jobId = index._TaskQueueIndex__popJob( 3 )[0]
+      if jobId >= 2900:
+        highPrio += 1
+    self.assertEqual( highPrio > 60, True )
+
+
+  def testMatchDefinition( self ):
+    """ invalid requests are rejected as by TaskQueueDB._checkMatchDefinition """
+    resource = dict( self.resource )
+    del resource[ 'CPUTime' ]
+    self.assertEqual( self.index.matchAndGetJob( resource )[ 'OK' ], False )
+    resource = dict( self.resource, CPUTime = '100000' )
+    self.assertEqual( self.index.matchAndGetJob( resource )[ 'OK' ], False )
+    resource = dict( self.resource, Site = [ 'LCG.CERN.ch', 1 ] )
+    self.assertEqual( self.index.matchAndGetJob( resource )[ 'OK' ], False )
+    self.assertEqual( self.tqDB.extracted, [] )
+
+## test suite execution
+if __name__ == "__main__":
+  suite = unittest.TestLoader().loadTestsFromTestCase( TaskQueueIndexTestCase )
+  unittest.TextTestRunner( verbosity = 3 ).run( suite )